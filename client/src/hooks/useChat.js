@@ -2,6 +2,9 @@ import { useState, useRef, useEffect } from 'react';
 import { useTranslation } from 'react-i18next';
 import { sendTextMessage, sendAudioForTranscription } from '../services/api';
 
+// File search citations such as 【4:0†source】, removed by the server from the final reply
+const CITATION_PATTERN = /【\d+:\d+†source】/g;
+
 /**
  * Custom hook for managing chat functionality
  *
@@ -78,13 +81,34 @@ const useChat = (onAudioPlayRequest, processBookFunctionResults) => {
     setStatus(t('chat.thinking')); // Show status message at the bottom
     setProcessingSteps([]); // Clear processing steps
 
+    // The reply is rendered progressively under this id and replaced by the final response
+    const messageId = `ai-${Date.now()}`;
+    let streamedText = '';
+
+    // Handle reply text fragments as they are generated
+    const handleDelta = (delta, reset = false) => {
+      streamedText = reset ? delta : streamedText + delta;
+      const visibleText = streamedText.replace(CITATION_PATTERN, '');
+      setMessages(prev => {
+        const streamingMessage = {
+          id: messageId,
+          text: visibleText,
+          sender: 'assistant',
+          timestamp: new Date().toISOString(),
+          isStreaming: true
+        };
+        return prev.some(msg => msg.id === messageId)
+          ? prev.map(msg => (msg.id === messageId ? { ...msg, text: visibleText } : msg))
+          : [...prev, streamingMessage];
+      });
+    };
+
     try {
-      // Send user message to server, using SSE for real-time status updates
-      const response = await sendTextMessage(text, handleStatusUpdate);
+      // Send user message to server, using SSE for real-time status updates and reply text
+      const response = await sendTextMessage(text, handleStatusUpdate, handleDelta);
 
-      // Add actual reply
-      const messageId = `ai-${Date.now()}`;
-      setMessages(prev => [...prev, {
+      // Add actual reply, replacing the streamed text if any
+      const reply = {
         id: messageId,
         text: response.text,
         html: response.html, // Add HTML content from the server
@@ -93,7 +117,10 @@ const useChat = (onAudioPlayRequest, processBookFunctionResults) => {
         audioUrl: response.audio_url,
         isWarning: response.is_warning || false, // Add warning flag
         functionResults: response.function_results || [] // Add function call results
-      }]);
+      };
+      setMessages(prev => (prev.some(msg => msg.id === messageId)
+        ? prev.map(msg => (msg.id === messageId ? reply : msg))
+        : [...prev, reply]));
 
       // Process function call results, update activeBook state
       if (response.function_results && response.function_results.length > 0) {
@@ -111,7 +138,7 @@ const useChat = (onAudioPlayRequest, processBookFunctionResults) => {
       console.error('发送消息错误:', error);
       // Clear status message when error occurs
       setStatus('');
-      setMessages(prev => [...prev, {
+      setMessages(prev => [...prev.filter(msg => msg.id !== messageId), {
         id: Date.now().toString(),
         text: t('errors.apiError'),
         sender: 'system',
@@ -6,12 +6,13 @@ const API_BASE_URL = 'http://localhost:8000/api';
  *
  * @param {string} message - 用户输入的文本消息
  * @param {function} onStatusUpdate - 状态更新回调函数 (SSE模式使用)
+ * @param {function} onDelta - 回复文本增量回调函数 (SSE模式使用)
  * @returns {Promise<Object>} - 包含AI回复文本和音频URL的对象
  */
-export const sendTextMessage = async (message, onStatusUpdate = null) => {
+export const sendTextMessage = async (message, onStatusUpdate = null, onDelta = null) => {
   // 如果提供了状态更新回调，使用SSE模式
   if (onStatusUpdate) {
-    return sendTextMessageWithSSE(message, onStatusUpdate);
+    return sendTextMessageWithSSE(message, onStatusUpdate, onDelta);
   }
 
   // 否则使用常规模式
@@ -44,13 +45,14 @@ export const sendTextMessage = async (message, onStatusUpdate = null) => {
 };
 
 /**
- * 使用SSE（Server-Sent Events）发送文本消息，接收实时状态更新
+ * 使用SSE（Server-Sent Events）发送文本消息，接收实时状态更新和回复文本增量
  *
  * @param {string} message - 用户输入的文本消息
  * @param {function} onStatusUpdate - 状态更新回调函数
+ * @param {function} onDelta - 回复文本增量回调函数 (text, reset)，reset为true时丢弃之前的文本
  * @returns {Promise<Object>} - 包含AI回复文本和音频URL的对象
  */
-const sendTextMessageWithSSE = (message, onStatusUpdate) => {
+const sendTextMessageWithSSE = (message, onStatusUpdate, onDelta = null) => {
   return new Promise((resolve, reject) => {
     try {
       // 创建一个带查询参数的URL
@@ -73,13 +75,25 @@ const sendTextMessageWithSSE = (message, onStatusUpdate) => {
         onStatusUpdate(progressData.status, progressData.progress);
       });
 
-      // 监听完成事件
+      // 监听回复文本增量事件
+      eventSource.addEventListener('delta', (event) => {
+        if (onDelta) {
+          const deltaData = JSON.parse(event.data);
+          onDelta(deltaData.text, deltaData.reset);
+        }
+      });
+
+      // 监听完成事件：回复文本和音频URL已经到达，语音可能仍在后台合成，audio_url可以立即播放
       eventSource.addEventListener('complete', (event) => {
         finalResponse = JSON.parse(event.data);
-        eventSource.close();
         resolve(finalResponse);
       });
 
+      // 监听语音合成完成事件，这是服务器发送的最后一个事件
+      eventSource.addEventListener('audio_ready', () => {
+        eventSource.close();
+      });
+
       // 监听错误
       eventSource.addEventListener('error', (event) => {
         console.error('SSE错误:', event);
@@ -2,12 +2,14 @@
 Assistant API
 提供基于OpenAI Assistant API的聊天功能端点
 """
-from flask import Blueprint, jsonify, request, Response, stream_with_context
+from flask import Blueprint, jsonify, request, Response, current_app
 import os
 import json
 
 from services.assistant_service import AssistantService
+from utils.cancellation import CancellationToken
 from utils.file_utils import get_temp_file_path
+from utils.sse_utils import stream_until_disconnect
 
 # 创建蓝图
 assistant_api = Blueprint('assistant_api', __name__)
@@ -66,7 +68,8 @@ def assistant_chat_stream():
     """
     使用服务器发送事件（SSE）处理基于Assistant API的流式聊天请求
 
-    接收聊天消息并以流式方式返回AI回复
+    接收聊天消息并以流式方式返回AI回复。空闲时发送心跳注释，客户端断开后取消运行、
+    中止未完成的函数调用并跳过语音合成。
 
     请求:
         GET请求，URL参数包含'message'和可选的'language'
@@ -86,6 +89,9 @@ def assistant_chat_stream():
     language = request.args.get('language', 'en')
     session_id = request.cookies.get('session_id', 'default_user')
 
+    # 客户端断开时取消
+    cancel_token = CancellationToken()
+
     # 使用流式处理聊天
     def generate():
         try:
@@ -93,7 +99,8 @@ def assistant_chat_stream():
             for event_data in assistant_service.chat_stream(
                 message=message,
                 session_id=session_id,
-                language=language
+                language=language,
+                cancel_token=cancel_token
             ):
                 yield event_data
         except Exception as e:
@@ -102,6 +109,9 @@ def assistant_chat_stream():
             yield f"event: error\ndata: {json.dumps(error_data)}\n\n"
 
     return Response(
-        stream_with_context(generate()),
-        content_type="text/event-stream"
+        # 在后台线程中生成事件，以便在函数调用等阻塞阶段也能通过心跳发现客户端断开
+        stream_until_disconnect(generate(), cancel_token, current_app._get_current_object()),
+        content_type="text/event-stream",
+        # 禁止缓存和反向代理缓冲，保证文本增量立即到达客户端
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
@@ -2,7 +2,13 @@
 健康检查API
 提供系统健康状态检查端点
 """
-from flask import jsonify, Blueprint
+from flask import jsonify, Blueprint, current_app
+
+from services.openai_client import get_openai_pool
+from services.run_queue import get_run_queue
+from services.tts_cache import get_tts_cache
+from services.warning_bank import get_warning_bank
+from utils.cancellation import cancellation_stats
 
 # 创建蓝图
 health_api = Blueprint('health_api', __name__)
@@ -12,17 +18,41 @@ def health_check():
     """
     健康检查端点
 
-    返回系统健康状态和版本信息
+    返回系统健康状态、版本信息、各启动组件的就绪状态、运行队列的统计信息，
+    客户端断开后取消的运行、函数调用和语音合成的数量，共享OpenAI连接池的使用情况，
+    语音合成缓存的命中情况，以及审核警告从警告库取用和实时生成的次数。
+    HTTP服务在启动任务完成前就开始响应，status为starting时部分功能还在初始化，
+    degraded表示有组件初始化失败。
 
     返回:
-        JSON响应，包含状态和版本信息
+        JSON响应，包含状态、版本信息和组件状态
 
     示例:
         GET /api/health
-        响应: {"status": "healthy", "version": "1.0.0"}
+        响应: {"status": "healthy", "version": "1.0.0", "startup": "ready",
+               "components": {"catalog": {"state": "ready", ...}, ...},
+               "run_queue": {"active_runs": 1, "queued_messages": 2, "avg_wait_seconds": 1.2, ...},
+               "cancellation": {"runs_cancelled": 3, "tool_calls_aborted": 1, "tts_skipped": 2, ...},
+               "openai_pool": {"connections": 4, "active_connections": 1, "utilization": 0.05, ...},
+               "tts_cache": {"hits": 57, "misses": 21, "saved_calls": 59, ...},
+               "warning_bank": {"warnings": 42, "served": 5, "live_fallbacks": 0, ...}}
     """
-    return jsonify({
+    response = {
         "status": "healthy",
         "version": "1.0.0",
         "message": "服务正常运行"
-    })
+    }
+
+    graph = current_app.config.get('STARTUP')
+    if graph is not None:
+        startup = graph.status()
+        response["startup"] = startup["status"]
+        response["components"] = startup["components"]
+
+    response["run_queue"] = get_run_queue().stats()
+    response["cancellation"] = cancellation_stats()
+    response["openai_pool"] = get_openai_pool().stats()
+    response["tts_cache"] = get_tts_cache().stats()
+    response["warning_bank"] = get_warning_bank().stats()
+
+    return jsonify(response)
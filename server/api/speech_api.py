@@ -2,10 +2,11 @@
 语音API
 提供语音转文字和文字转语音功能的API端点
 """
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, Response, jsonify, request, send_file
 import os
 
 from services.speech_service import SpeechService
+from services.tts_cache import get_tts_cache
 from utils.audio_utils import is_valid_audio_format
 from utils.file_utils import get_temp_file_path
 import config
@@ -63,7 +64,7 @@ def text_to_speech():
     将文本转换为语音并返回音频URL
 
     请求:
-        POST请求，JSON数据包含'text'字段和可选的'voice'字段
+        POST请求，JSON数据包含'text'字段和可选的'voice'、'stream'字段
 
     返回:
         JSON响应，包含音频文件URL
@@ -71,7 +72,7 @@ def text_to_speech():
     示例:
         POST /api/text-to-speech
         请求体: {"text": "你好，世界", "voice": "alloy"}
-        响应: {"audio_url": "/api/audio/abc123.mp3"}
+        响应: {"audio_url": "/api/audio/tts-3f2a....mp3", "audio_playlist": ["/api/audio/tts-3f2a....mp3"]}
     """
     try:
         data = request.json
@@ -80,9 +81,10 @@ def text_to_speech():
 
         text = data['text']
         voice = data.get('voice')  # 可选参数
+        stream = data.get('stream')  # 可选参数，不提供时由TTS_STREAMING决定
 
         # 使用服务生成语音
-        result = speech_service.text_to_speech(text, voice)
+        result = speech_service.text_to_speech(text, voice, stream=stream)
 
         return jsonify(result)
 
@@ -95,7 +97,12 @@ def get_audio(filename):
     """
     获取生成的音频文件
 
-    通过文件名获取临时存储的音频文件
+    通过文件名获取音频文件。tts-<键>.<格式>形式的文件名来自语音合成缓存，
+    同一URL的内容不会改变，允许浏览器长期缓存；其他文件名对应临时存储的音频文件。
+    音频还在流式合成时以分块传输发送已收到的数据并继续转发后续数据，多个请求共享同一个合成。
+    ttsp-<键>.<格式>形式的文件名是长文本分段合成的播放列表，按顺序分块发送各段音频。
+    关闭流式播放（TTS_STREAMING=false）时，后台还在合成的音频最多等待TTS_AUDIO_WAIT_SECONDS秒，
+    仍未完成则返回202，客户端应在Retry-After秒后重试。
 
     参数:
         filename: 音频文件名
@@ -105,20 +112,50 @@ def get_audio(filename):
 
     示例:
         GET /api/audio/abc123.mp3
+        GET /api/audio/tts-3f2a....mp3
+        GET /api/audio/ttsp-9b1c....mp3
     """
     try:
-        # 获取音频文件路径
-        audio_path = get_temp_file_path(filename)
+        tts_cache = get_tts_cache()
+
+        # 不发送合成中的音频时，先短暂等待后台合成完成
+        if not tts_cache.streaming and tts_cache.wait_ready(filename, tts_cache.audio_wait_seconds) == "pending":
+            response = jsonify({"status": "pending", "message": "音频正在生成"})
+            response.status_code = 202
+            response.headers['Retry-After'] = '1'
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+
+        # 音频还在合成时加入进行中的流；合成结束前音频不完整，不允许缓存
+        live = tts_cache.live_stream(filename)
+        if live is not None:
+            response = Response(live.iter_chunks(), mimetype=tts_cache.mimetype_for(filename))
+            response.headers['Cache-Control'] = 'no-store'
+            response.headers['X-Content-Type-Options'] = 'nosniff'
+            return response
+
+        # 分段合成的长文本：按顺序拼接各段音频，后面的片段可能还在合成
+        playlist = tts_cache.playlist_stream(filename)
+        if playlist is not None:
+            response = Response(playlist, mimetype=tts_cache.mimetype_for(filename))
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Content-Type-Options'] = 'nosniff'
+            return response
+
+        # 获取音频文件路径，先查语音合成缓存
+        cached_path = tts_cache.resolve(filename)
+        audio_path = cached_path or get_temp_file_path(filename)
 
         if not audio_path:
             return jsonify({"error": "音频文件不存在"}), 404
 
         # 使用Flask的send_file函数，但添加必要的响应头
-        response = send_file(audio_path, mimetype='audio/mpeg', as_attachment=False)
+        mimetype = tts_cache.mimetype_for(filename) if cached_path else 'audio/mpeg'
+        response = send_file(audio_path, mimetype=mimetype, as_attachment=False)
 
         # 添加音频播放所需的响应头
         response.headers['Accept-Ranges'] = 'bytes'
-        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable' if cached_path else 'no-cache'
         response.headers['X-Content-Type-Options'] = 'nosniff'
 
         return response
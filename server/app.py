@@ -3,6 +3,7 @@
 初始化和配置Flask应用
 """
 import os
+import time
 from flask import Flask
 
 # 配置
@@ -17,6 +18,12 @@ from routes.api_routes import register_routes
 # 服务
 from services.assistant_service import AssistantService
 from services.data_service import DataService
+from services.title_index import get_title_index
+from services.catalog_sync import CatalogSync
+from services.assistant_registry import get_assistant_registry
+from services.openai_client import get_openai_pool
+from services.startup import StartupGraph
+from services.warning_bank import get_warning_bank
 from utils.file_utils import cleanup_temp_files
 
 def create_app():
@@ -43,72 +50,116 @@ def create_app():
 
 def init_assistants(app):
     """
-    初始化OpenAI Assistant
+    在后台初始化书籍目录和OpenAI Assistant
+
+    启动任务组织成依赖图，互不依赖的步骤并发执行：
+      catalog ──┬── title_index
+                ├── catalog_sync
+                └── recommendation_assistant ── vector_store_index
+      learning_assistant
+      openai_connections（预热共享连接池）
+      warning_bank（补齐审核警告并预先合成语音）
+    函数立即返回，HTTP服务不必等待；各组件的状态通过/api/health查看，
+    依赖某个组件的请求通过wait_for_component等待它就绪。
 
     参数:
         app: Flask应用实例
 
     返回:
-        tuple: (assistant_id, book_recommendation_assistant_id)
+        StartupGraph: 启动依赖图
     """
-    assistant_id = None
-    book_recommendation_assistant_id = None
-
-    try:
-        # 初始化数据服务
-        data_service = DataService()
-        # 获取书籍数据
-        library_data_file = data_service.fetch_all_production_books()
+    data_service = DataService()
+    graph = StartupGraph()
+
+    def export_catalog(deps):
+        # 获取书籍数据；导出失败时重试，仍然失败则步骤失败，依赖目录的步骤被跳过，
+        # 不会把空目录上传到Vector Store
+        attempts = max(1, int(os.getenv("CATALOG_EXPORT_ATTEMPTS", "3")))
+        retry_seconds = float(os.getenv("CATALOG_EXPORT_RETRY_SECONDS", "30"))
+        for attempt in range(1, attempts + 1):
+            try:
+                library_data_file = data_service.fetch_all_production_books()
+                break
+            except Exception as e:
+                if attempt == attempts:
+                    raise
+                print(f"⚠️ 书籍目录导出失败（第 {attempt}/{attempts} 次），{retry_seconds:g}s 后重试: {str(e)}")
+                time.sleep(retry_seconds)
         print(f"Library data file created at: {library_data_file}")
+        return library_data_file
 
-        # 初始化Assistant服务
-        assistant_service = AssistantService()
+    def build_title_index(deps):
+        # 预先构建书名索引，避免第一次搜索时等待
+        return get_title_index(deps["catalog"])
 
-        # 创建Assistant
-        assistant_id = assistant_service.ensure_assistant()
-        book_recommendation_assistant_id = assistant_service.ensure_book_recommendation_assistant(library_data_file)
+    def start_catalog_sync(deps):
+        # 在后台定期增量同步书籍目录
+        catalog_sync = CatalogSync(data_service)
+        catalog_sync.start_background()
+        app.config['CATALOG_SYNC'] = catalog_sync
+        return catalog_sync
 
-        # 保存Assistant ID到应用配置
+    def ensure_learning_assistant(deps):
+        assistant_id = AssistantService.ensure_assistant()
         app.config['OPENAI_ASSISTANT_ID'] = assistant_id
-        app.config['BOOK_RECOMMANDATION_ASSISTANT_ID'] = book_recommendation_assistant_id
-
         print(f"Assistant ID {assistant_id} saved to app config")
-        print(f"Book Recommendation Assistant ID {book_recommendation_assistant_id} saved to app config")
-
-        return assistant_id, book_recommendation_assistant_id
+        return assistant_id
 
-    except Exception as e:
-        print(f"初始化Assistant错误: {str(e)}")
-        return None, None
-
-def cleanup(app, assistant_id=None, book_recommendation_assistant_id=None):
+    def ensure_recommendation_assistant(deps):
+        book_recommendation_assistant_id = AssistantService.ensure_book_recommendation_assistant(deps["catalog"])
+        app.config['BOOK_RECOMMANDATION_ASSISTANT_ID'] = book_recommendation_assistant_id
+        print(f"Book Recommendation Assistant ID {book_recommendation_assistant_id} saved to app config")
+        return book_recommendation_assistant_id
+
+    def wait_for_vector_store_index(deps):
+        # 文件索引完成前file_search检索不到任何书籍
+        registry = get_assistant_registry()
+        return registry.wait_for_index(registry.vector_store_id("book_recommendation")).id
+
+    def warm_openai_connections(deps):
+        # 提前建立到OpenAI的连接，第一个用户请求不必等待TLS握手
+        return get_openai_pool().warm_up()
+
+    def build_warning_bank(deps):
+        # 预先生成审核警告和语音，内容被标记时不必等待模型和TTS
+        return get_warning_bank().ensure()
+
+    graph.add("openai_connections", warm_openai_connections)
+    graph.add("catalog", export_catalog)
+    graph.add("title_index", build_title_index, depends_on=["catalog"])
+    graph.add("catalog_sync", start_catalog_sync, depends_on=["catalog"])
+    graph.add("learning_assistant", ensure_learning_assistant)
+    graph.add("recommendation_assistant", ensure_recommendation_assistant, depends_on=["catalog"])
+    graph.add("vector_store_index", wait_for_vector_store_index, depends_on=["recommendation_assistant"])
+    graph.add("warning_bank", build_warning_bank)
+
+    app.config['STARTUP'] = graph
+    graph.start()
+    return graph
+
+def cleanup(app):
     """
-    清理资源，包括临时文件和Assistant
+    清理资源
+
+    Assistant和Vector Store记录在注册表中，下次启动时复用，这里不再删除；
+    遗留的对象使用gc_assistants.py清理。
 
     参数:
         app: Flask应用实例
-        assistant_id: 要删除的Assistant ID
-        book_recommendation_assistant_id: 要删除的图书推荐Assistant ID
     """
     print("\n🧹 正在清理...")
 
     # 清理临时文件
     cleanup_temp_files(app)
 
-    # 删除Assistant
-    if assistant_id:
-        AssistantService.delete_assistant(assistant_id)
-
-    if book_recommendation_assistant_id:
-        AssistantService.delete_assistant(book_recommendation_assistant_id)
-
 # 应用入口点
 if __name__ == '__main__':
     # 创建Flask应用
     app = create_app()
 
-    # 初始化Assistant
-    assistant_id, book_recommendation_assistant_id = init_assistants(app)
+    # 在后台初始化Assistant；使用自动重载时只在实际提供服务的子进程中初始化，避免两个进程同时创建
+    if not config.DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        init_assistants(app)
 
     try:
         # 运行应用
@@ -119,4 +170,4 @@ if __name__ == '__main__':
         )
     finally:
         # 清理资源
-        cleanup(app, assistant_id, book_recommendation_assistant_id)
+        cleanup(app)
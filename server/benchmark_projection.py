@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Command-line utility to benchmark the two book content projections.
+
+The python projection selects the whole EXTENDED_BOOK_INFO JSON blob and extracts
+rawText locally; the server projection flattens the pages in the database and only
+transfers the concatenated text. Both run against the configured DATA_BACKEND with
+the content cache bypassed, and their results are checked to be identical.
+
+Usage:
+    python benchmark_projection.py [--books N] [--batch N] [--repeat N] [--seed N]
+
+Example:
+    python seed_sqlite.py --books 20000 --pages 24 --force
+    DATA_BACKEND=sqlite python benchmark_projection.py --books 500 --batch 50
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+
+from services.data_service import DataService, CONTENT_PROJECTION_PYTHON, CONTENT_PROJECTION_SERVER
+from services.catalog_sync import read_catalog
+
+
+def row_bytes(rows):
+    """Approximates the bytes transferred for a result set."""
+    total = 0
+    for row in rows:
+        for value in row:
+            if value is not None:
+                total += len(str(value).encode("utf-8"))
+    return total
+
+
+def run_projection(data_service, projection, book_ids, batch_size, repeat):
+    """Fetches book_ids in batches with the given projection and returns timings and results."""
+    data_service.content_projection = projection
+    stats = {"bytes": 0}
+
+    original_query = data_service._query
+
+    def measured_query(sql, params=None):
+        rows = original_query(sql, params)
+        stats["bytes"] += row_bytes(rows)
+        return rows
+
+    data_service._query = measured_query
+    timings = []
+    books = {}
+    try:
+        for _ in range(repeat):
+            for i in range(0, len(book_ids), batch_size):
+                chunk = tuple(book_ids[i:i + batch_size])
+                placeholders = ", ".join(["%s"] * len(chunk))
+                started = time.perf_counter()
+                fetched = data_service._query_books(f"RB.PERMANENT_ID IN ({placeholders})", chunk)
+                timings.append((time.perf_counter() - started) * 1000)
+                for book in fetched:
+                    books[book["book_id"]] = book
+    finally:
+        data_service._query = original_query
+
+    return {
+        "projection": projection,
+        "batches": len(timings),
+        "mean_ms": statistics.mean(timings),
+        "p95_ms": sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0],
+        "bytes_per_book": stats["bytes"] / max(len(books) * repeat, 1),
+        "books": books
+    }
+
+
+def main():
+    """Main function that parses command-line arguments and runs the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark python vs server book content projection.")
+    parser.add_argument("--books", type=int, default=200, help="Number of catalog books to fetch")
+    parser.add_argument("--batch", type=int, default=20, help="Books per batched query")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of passes over the books")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for sampling books")
+    args = parser.parse_args()
+
+    data_service = DataService()
+    try:
+        catalog = read_catalog(data_service.fetch_all_production_books())
+        if not catalog:
+            print("❌ The catalog is empty, nothing to benchmark.")
+            sys.exit(1)
+
+        book_ids = random.Random(args.seed).sample(list(catalog), min(args.books, len(catalog)))
+        print(f"⏱️ Benchmarking {len(book_ids)} books on the {data_service.backend.name} backend "
+              f"(batch {args.batch}, {args.repeat} passes)...")
+
+        results = [
+            run_projection(data_service, projection, book_ids, args.batch, args.repeat)
+            for projection in (CONTENT_PROJECTION_PYTHON, CONTENT_PROJECTION_SERVER)
+        ]
+
+        print(f"\n{'projection':<12}{'mean ms/batch':>16}{'p95 ms/batch':>16}{'bytes/book':>14}")
+        for result in results:
+            print(f"{result['projection']:<12}{result['mean_ms']:>16.2f}{result['p95_ms']:>16.2f}"
+                  f"{result['bytes_per_book']:>14.0f}")
+
+        python_books, server_books = results[0]["books"], results[1]["books"]
+        if python_books == server_books:
+            print(f"\n✅ Both projections returned identical content for {len(python_books)} books")
+        else:
+            differing = [book_id for book_id in python_books if python_books[book_id] != server_books.get(book_id)]
+            print(f"\n❌ Projections differ for {len(differing)} books, e.g. {differing[:5]}")
+            sys.exit(1)
+
+    finally:
+        data_service.close_db_connection()
+
+
+if __name__ == "__main__":
+    main()
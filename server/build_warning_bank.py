@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Command-line utility to pre-generate the moderation warning bank.
+
+Flagged messages are answered from a bank of friendly warnings stored per
+moderation category and language (cache/warning_bank.json), with the speech
+for every warning rendered into the TTS cache ahead of time. The server fills
+in missing warnings at startup; this command does the same offline, e.g. before
+a deployment, so the first flagged message never waits for generation.
+
+Usage:
+    python build_warning_bank.py [--variants N] [--no-audio]
+
+Example:
+    python build_warning_bank.py
+    python build_warning_bank.py --variants 5
+"""
+
+import argparse
+
+from services.warning_bank import WarningBank
+
+
+def main():
+    """Main function that parses command-line arguments and fills the warning bank."""
+    parser = argparse.ArgumentParser(description="Pre-generate moderation warnings and their speech.")
+    parser.add_argument("--variants", type=int, default=None,
+                        help="Warnings to keep per category and language (default: WARNING_BANK_VARIANTS or 3)")
+    parser.add_argument("--no-audio", action="store_true",
+                        help="Only generate the warning texts, do not render their speech")
+    args = parser.parse_args()
+
+    bank = WarningBank(variants=args.variants)
+    print(f"Warning bank: {bank.path} ({bank.variants} variant(s) per category and language)")
+
+    result = bank.ensure(render_audio=not args.no_audio)
+
+    print(f"{result['warnings']} warning(s), {result['generated']} newly generated, "
+          f"{result['rendered']} with speech")
+
+
+if __name__ == "__main__":
+    main()
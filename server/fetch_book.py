@@ -3,16 +3,45 @@
 Command-line utility to fetch book content using book IDs.
 
 Usage:
-    python fetch_book.py <book_id>
+    python fetch_book.py <book_id> [<book_id> ...]
 
 Example:
     python fetch_book.py 12550-1
+    python fetch_book.py 12550-1 2590-3 2940-5
 """
 
 import sys
 import json
 import os
-from libs.data_source import fetch_book_content
+from services.data_service import DataService
+
+
+def print_book(result):
+    """Prints the details and a content preview of a single book."""
+    print("\n📖 Book details:")
+    print(f"ID: {result['book_id']}")
+    print(f"Title: {result['book_title']}")
+    print(f"Description: {result['book_description']}")
+
+    # Print content with formatting
+    print("\n📑 Content preview:")
+    content = result['book_content']
+    # If content is long, just show a preview
+    if len(content) > 500:
+        print(content[:500] + "...\n")
+        print(f"(Content truncated, total length: {len(content)} characters)")
+    else:
+        print(content)
+
+
+def save_book(result):
+    """Saves the full content of a book to book_<id>.txt and returns the file path."""
+    filename = f"book_{result['book_id']}.txt"
+    with open(filename, 'w', encoding='utf-8') as file:
+        file.write(f"Title: {result['book_title']}\n")
+        file.write(f"Description: {result['book_description']}\n\n")
+        file.write(result['book_content'])
+    return os.path.abspath(filename)
 
 
 def main():
@@ -20,50 +49,45 @@ def main():
     # Validate command-line arguments
     if len(sys.argv) < 2:
         print("Error: Missing book ID.")
-        print("Usage: python fetch_book.py <book_id>")
+        print("Usage: python fetch_book.py <book_id> [<book_id> ...]")
         print("Example: python fetch_book.py 12550-1")
         sys.exit(1)
 
-    book_id = sys.argv[1]
-    print(f"🔍 Fetching content for book ID: {book_id}...")
+    book_ids = sys.argv[1:]
+    print(f"🔍 Fetching content for book ID(s): {', '.join(book_ids)}...")
+
+    # Book content is fetched through the pooled, cached data service
+    data_service = DataService()
 
     try:
-        # Fetch the book content
-        result = fetch_book_content(book_id)
-
-        if result:
-            print("\n📖 Book details:")
-            print(f"ID: {result['book_id']}")
-            print(f"Title: {result['book_title']}")
-            print(f"Description: {result['book_description']}")
-
-            # Print content with formatting
-            print("\n📑 Content preview:")
-            content = result['book_content']
-            # If content is long, just show a preview
-            if len(content) > 500:
-                print(content[:500] + "...\n")
-                print(f"(Content truncated, total length: {len(content)} characters)")
-            else:
-                print(content)
+        # Fetch all requested books with a single batched query
+        books, missing = data_service.fetch_book_contents(book_ids)
+
+        for book_id in book_ids:
+            if book_id in books:
+                print_book(books[book_id])
 
+        for book_id in missing:
+            print(f"❌ No book found with ID: {book_id}")
+        if missing:
+            print("Available test book IDs: 12550-1, 2590-3, 2940-5")
+
+        if books:
             # Offer to save the full content to a file
             save_option = input("\nSave full content to a file? (y/n): ").lower()
             if save_option == 'y':
-                filename = f"book_{book_id}.txt"
-                with open(filename, 'w', encoding='utf-8') as file:
-                    file.write(f"Title: {result['book_title']}\n")
-                    file.write(f"Description: {result['book_description']}\n\n")
-                    file.write(result['book_content'])
-                print(f"✅ Content saved to {os.path.abspath(filename)}")
-        else:
-            print(f"❌ No book found with ID: {book_id}")
-            print("Available test book IDs: 12550-1, 2590-3, 2940-5")
+                for result in books.values():
+                    print(f"✅ Content saved to {save_book(result)}")
+
+        if not books:
+            sys.exit(1)
 
     except Exception as e:
         print(f"❌ Error fetching book content: {str(e)}")
         print("Make sure your environment is properly configured with database credentials.")
         sys.exit(1)
+    finally:
+        data_service.close_db_connection()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Command-line utility to remove assistants and vector stores left behind by past runs.
+
+Assistants are reused across restarts through the assistant registry
+(cache/assistants_registry.json). Anything tagged by this deployment that the
+registry no longer references is an orphan, e.g. from a crash or a lost
+registry file. This command lists or deletes those orphans.
+
+Usage:
+    python gc_assistants.py [--dry-run] [--include-untagged]
+
+Example:
+    python gc_assistants.py --dry-run
+    python gc_assistants.py --include-untagged
+"""
+
+import argparse
+
+from services.assistant_registry import get_assistant_registry
+
+
+def main():
+    """Main function that parses command-line arguments and removes orphaned objects."""
+    parser = argparse.ArgumentParser(description="Remove orphaned assistants and vector stores.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only list the objects that would be deleted")
+    parser.add_argument("--include-untagged", action="store_true",
+                        help="Also remove untagged objects created by older versions, matched by name")
+    args = parser.parse_args()
+
+    registry = get_assistant_registry()
+    print(f"Registry: {registry.path} (namespace: {registry.namespace})")
+
+    removed = registry.collect_garbage(dry_run=args.dry_run, include_untagged=args.include_untagged)
+
+    action = "Would delete" if args.dry_run else "Deleted"
+    print(f"{action} {len(removed['assistants'])} assistant(s) and {len(removed['vector_stores'])} vector store(s)")
+    for assistant_id in removed["assistants"]:
+        print(f"  assistant     {assistant_id}")
+    for vector_store_id in removed["vector_stores"]:
+        print(f"  vector store  {vector_store_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import snowflake.connector
 import json
 import os, sys
 import tempfile
@@ -10,23 +9,23 @@ load_dotenv()
 sys.path.append(os.path.dirname(__file__))
 import prompt_templates as pt
 
-conn = None
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from services.db_backend import get_default_backend
+
 def get_db_connection():
-  global conn
-  if conn is None:
-    conn = snowflake.connector.connect(
-        user=os.getenv("SNOWFLAKE_USER"),
-        password=os.getenv("SNOWFLAKE_PASSWORD"),
-        account=os.getenv("SNOWFLAKE_ACCOUNT")
+  """
+  从默认数据库后端的共享连接池取出一个连接，用完后需要调用release_db_connection归还
+  """
+  return get_default_backend().get_pool().acquire()
 
-    )
-  return conn
+def release_db_connection(conn):
+  """
+  把连接归还给共享连接池
+  """
+  get_default_backend().get_pool().release(conn)
 
 def close_db_connection():
-  global conn
-  if conn is not None:
-    conn.close()
-    conn = None
+  get_default_backend().get_pool().close()
   return
 
 
@@ -45,17 +44,18 @@ FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.REGULAR_BOOK RB
   """
   print("📊 Fetching book content...")
   conn = get_db_connection()
-  cursor = conn.cursor()
-  cursor.execute(sql)
-  rows = cursor.fetchall()
-  cursor.close()
+  try:
+    cursor = conn.cursor()
+    cursor.execute(get_default_backend().render(sql))
+    rows = cursor.fetchall()
+    cursor.close()
+  finally:
+    release_db_connection(conn)
   if len(rows) == 0:
     return None
   else:
     extended_info = json.loads(rows[0][3])
-    book_content = ""
-    for page in extended_info:
-      book_content += page["rawText"] + "\n"
+    book_content = "".join(page["rawText"] + "\n" for page in extended_info)
 
     return {
       "book_id": rows[0][0],
@@ -75,8 +75,6 @@ def fetch_all_production_books():
     return cache_file
 
   print("📊 Fetching all production books...")
-  conn = get_db_connection()
-  cursor = conn.cursor()
   sql = f"""
   SELECT distinct PERMANENT_ID, TITLE, DESCRIPTION,
   FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.REGULAR_BOOK RB
@@ -87,9 +85,14 @@ def fetch_all_production_books():
                     ON E.ID = PBE.ENVIRONMENTS_ID
     AND E.NAME = 'production';
   """
-  cursor.execute(sql)
-  rows = cursor.fetchall()
-  cursor.close()
+  conn = get_db_connection()
+  try:
+    cursor = conn.cursor()
+    cursor.execute(get_default_backend().render(sql))
+    rows = cursor.fetchall()
+    cursor.close()
+  finally:
+    release_db_connection(conn)
   library_data = ""
   for row in rows:
     json_data = {
@@ -1,11 +1,13 @@
-import openai
-import time
 import os
 import sys
 import json
 import re
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from services.openai_client import get_openai_client
+from services.run_watcher import get_run_watcher
+
 # 加载环境变量
 load_dotenv()
 
@@ -59,9 +61,114 @@ OPENAI_ANALYSIS_FUNCTION_RESULT_DESCRIPTION = """
 总结本次推荐的主要原因和理由，以及分析过程
 """
 
+LEARNING_ASSISTANT_NAME = "Learning Assistant"
+BOOK_RECOMMENDER_ASSISTANT_NAME = "Book Recommendation Assistant"
+
+# 学习助手的函数定义
+LEARNING_ASSISTANT_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "recommend_books",
+            "description": "根据用户的阅读喜好帮助用户推荐图书，如果用户有多个不同的喜好这个方法只调用一次，将多个喜好总结为一个短语。例如： 用户可能喜欢冒险类的数据也会对艺术有一点点兴趣。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_interests": {
+                        "type": "string",
+                        "description": "通过上对话的下文分析用户可能会感兴趣的图书类型，用一个短语来概括总结用户的阅读兴趣。"
+                    }
+                },
+                "required": ["user_interests"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_book_by_title",
+            "description": "根据书名搜索对应的图书ID。当用户提到想讨论某本书，但只提供了书名时，使用此功能查找匹配的图书。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "title": {
+                        "type": "string",
+                        "description": "用户提到的书名"
+                    }
+                },
+                "required": ["title"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_book_content",
+            "description": "获取指定book_id的图书内容。当确定用户想讨论某本特定图书时使用此功能。默认返回全书内容；如果只需要讨论其中几页，可以通过start_page和end_page只获取这些页面。返回结果中的page_count是全书的总页数。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "book_id": {
+                        "type": "string",
+                        "description": "图书的唯一标识符"
+                    },
+                    "start_page": {
+                        "type": "integer",
+                        "description": "起始页码（从1开始），不提供则从第一页开始"
+                    },
+                    "end_page": {
+                        "type": "integer",
+                        "description": "结束页码（包含该页），不提供则到最后一页"
+                    }
+                },
+                "required": ["book_id"]
+            }
+        }
+    }
+]
+
+# 图书推荐助手的工具定义
+BOOK_RECOMMENDER_TOOLS = [
+    {"type": "file_search"},  # 启用文件搜索工具
+    {
+        "type": "function",
+        "function": {
+            "name": "recommend_books_from_vector_store",
+            "description": OPENAI_ANALYSIS_FUNCTION_DESCRIPTION,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "recommended_books": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "book_id": {"type": "string", "description": "book_id in the Library Vector Store"},
+                                "book_title": {"type": "string", "description": "book_title in the Library Vector Store"},
+                                "reason": {"type": "string", "description": "Reason for recommendation"}
+                            }
+                        },
+                        "description": "推荐的书籍，包括书籍的 book_id, book_title, 和推荐理由"
+                    }
+                },
+                "required": ["recommended_books"]
+            }
+        }
+    }
+]
+
 
-# 初始化 OpenAI 客户端
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+# 使用共享连接池的 OpenAI 客户端
+client = get_openai_client(OPENAI_API_KEY)
+
+# 所有进行中的运行由共享的监视器统一轮询
+run_watcher = get_run_watcher(client)
+
+def _metadata_option(metadata: dict = None) -> dict:
+    """
+    只有提供了metadata时才把它传给创建接口
+    """
+    return {"metadata": metadata} if metadata else {}
 
 def clean_text(text: str) -> str:
     """
@@ -69,15 +176,15 @@ def clean_text(text: str) -> str:
     """
     return re.sub(r"【\d+:\d+†source】", "", text).strip()
 
-def create_vector_store_with_file(library_data_path: str) -> str:
+def create_vector_store_with_file(library_data_path: str, metadata: dict = None) -> str:
     """
-    1. 创建一个新的 vector store
+    1. 创建一个新的 vector store（可附带 metadata 标签）
     2. 上传本地书籍数据库文件
     3. 关联文件到 vector store
     4. 返回 vector store ID
     """
     # 创建 vector store
-    vector_store = client.vector_stores.create(name="Library Vector Store")
+    vector_store = client.vector_stores.create(name="Library Vector Store", **_metadata_option(metadata))
     vector_store_id = vector_store.id
     print(f"📁 Created vector store with ID: {vector_store_id}")
 
@@ -94,113 +201,36 @@ def create_vector_store_with_file(library_data_path: str) -> str:
     return vector_store_id
 
 
-def ensure_assistant() -> str:
+def ensure_assistant(metadata: dict = None) -> str:
     """
     确保存在一个基础的学习助手，若无则创建，并返回 assistant_id
     """
     assistant = client.beta.assistants.create(
-        name="Learning Assistant",
+        name=LEARNING_ASSISTANT_NAME,
         instructions=OPENAI_ASSISTANT_INSTRUCTION,
         model=OPENAI_MODEL,
-        tools=[
-            {
-                "type": "function",
-                "function": {
-                    "name": "recommend_books",
-                    "description": "根据用户的阅读喜好帮助用户推荐图书，如果用户有多个不同的喜好这个方法只调用一次，将多个喜好总结为一个短语。例如： 用户可能喜欢冒险类的数据也会对艺术有一点点兴趣。",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_interests": {
-                                "type": "string",
-                                "description": "通过上对话的下文分析用户可能会感兴趣的图书类型，用一个短语来概括总结用户的阅读兴趣。"
-                            }
-                        },
-                        "required": ["user_interests"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_book_by_title",
-                    "description": "根据书名搜索对应的图书ID。当用户提到想讨论某本书，但只提供了书名时，使用此功能查找匹配的图书。",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "title": {
-                                "type": "string",
-                                "description": "用户提到的书名"
-                            }
-                        },
-                        "required": ["title"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_book_content",
-                    "description": "获取指定book_id的图书完整内容。当确定用户想讨论某本特定图书时使用此功能。",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "book_id": {
-                                "type": "string",
-                                "description": "图书的唯一标识符"
-                            }
-                        },
-                        "required": ["book_id"]
-                    }
-                }
-            }
-        ]
+        tools=LEARNING_ASSISTANT_TOOLS,
+        **_metadata_option(metadata)
     )
 
     print(f"✅ Assistant created with ID: {assistant.id}")
     return assistant.id
 
 
-def ensure_assistant_for_recommand_books(library_data_path: str) -> str:
+def ensure_assistant_for_recommand_books(library_data_path: str, metadata: dict = None) -> str:
     """
     确保存在一个用于图书推荐的 Assistant，若无则创建，并返回 assistant_id
     同时上传本地参考文件到 Vector Store 并启用文件搜索工具。
     """
-    vector_store_id = create_vector_store_with_file(library_data_path)
+    vector_store_id = create_vector_store_with_file(library_data_path, metadata)
 
     assistant = client.beta.assistants.create(
-        name="Book Recommendation Assistant",
+        name=BOOK_RECOMMENDER_ASSISTANT_NAME,
         instructions=OPENAI_BOOK_RECOMMENDER_ASSISTANT_INSTRUCTION,
         model=OPENAI_MODEL,
-        tools=[
-            {"type": "file_search"},  # 启用文件搜索工具
-            {
-                "type": "function",
-                "function": {
-                    "name": "recommend_books_from_vector_store",
-                    "description": OPENAI_ANALYSIS_FUNCTION_DESCRIPTION,
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "recommended_books": {
-                                "type": "array",
-                                "items": {
-                                    "type": "object",
-                                    "properties": {
-                                        "book_id": {"type": "string", "description": "book_id in the Library Vector Store"},
-                                        "book_title": {"type": "string", "description": "book_title in the Library Vector Store"},
-                                        "reason": {"type": "string", "description": "Reason for recommendation"}
-                                    }
-                                },
-                                "description": "推荐的书籍，包括书籍的 book_id, book_title, 和推荐理由"
-                            }
-                        },
-                        "required": ["recommended_books"]
-                    }
-                }
-            }
-        ],
-        tool_resources={"file_search": {"vector_store_ids": [vector_store_id]}}  # 关联 vector store
+        tools=BOOK_RECOMMENDER_TOOLS,
+        tool_resources={"file_search": {"vector_store_ids": [vector_store_id]}},  # 关联 vector store
+        **_metadata_option(metadata)
     )
 
     print(f"✅ Book Recommander Assistant created with ID: {assistant.id}")
@@ -248,7 +278,7 @@ def search_book_by_title(vector_store_id: str, title: str) -> list:
 
         # 等待运行完成并处理结果
         while True:
-            run_status = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
+            run_status = run_watcher.wait(thread.id, run.id)
             print(f"🔄 Book search status: {run_status.status}")
 
             if run_status.status == "completed":
@@ -302,13 +332,11 @@ def search_book_by_title(vector_store_id: str, title: str) -> list:
                                     print(f"⚠️ Error parsing book info: {str(e)}")
                 break
 
-            elif run_status.status in ["failed", "cancelled", "expired"]:
+            else:
+                # 搜索助手没有函数工具，其余状态都表示运行没有成功
                 print(f"❌ Book search failed with status: {run_status.status}")
                 break
 
-            # 等待后再检查状态
-            time.sleep(1)
-
         # 清理临时助手
         client.beta.assistants.delete(temp_assistant.id)
 
@@ -385,7 +413,7 @@ def search_books_by_interest(book_recommendation_assistant_id: str, user_interes
 
         # 等待运行完成并处理结果
         while True:
-            run_status = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
+            run_status = run_watcher.wait(thread.id, run.id)
             print(f"🔄 Status: {run_status.status}")
 
             if run_status.status == "completed":
@@ -421,23 +449,24 @@ def search_books_by_interest(book_recommendation_assistant_id: str, user_interes
                             "output": json.dumps({"status": "success"})
                         })
 
-                # 提交工具输出
+                # 提交工具输出后继续等待同一个运行
                 if tool_outputs:
                     client.beta.threads.runs.submit_tool_outputs(
                         thread_id=thread.id,
                         run_id=run.id,
                         tool_outputs=tool_outputs
                     )
+                else:
+                    print("⚠️ No supported tool calls in requires_action, cancelling run")
+                    client.beta.threads.runs.cancel(thread_id=thread.id, run_id=run.id)
+                    return []
 
-            elif run_status.status in ["failed", "cancelled", "expired"]:
+            else:
                 print(f"❌ Assistant run failed with status: {run_status.status}")
                 if hasattr(run_status, "last_error"):
                     print(f"Error: {run_status.last_error}")
                 return []
 
-            # 等待后再检查状态
-            time.sleep(2)
-
         return recommended_books
 
     except Exception as e:
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Command-line utility to generate a synthetic book catalog in a local SQLite database.
+
+The database mirrors the production REGULAR_BOOK / PUBLISHED_BOOK / BOOK_EXTENDED_INFO
+tables, so DataService can run against it with DATA_BACKEND=sqlite to benchmark
+queries, caches and indexes without production credentials.
+
+Usage:
+    python seed_sqlite.py [--path PATH] [--books N] [--pages N] [--words N] [--seed N] [--force]
+
+Example:
+    python seed_sqlite.py --books 50000 --pages 24
+    DATA_BACKEND=sqlite python fetch_book.py 1-1 2-1
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from services.db_backend import SqliteBackend
+
+ADJECTIVES = ["Little", "Brave", "Sleepy", "Curious", "Lost", "Happy", "Tiny", "Magic",
+              "Silly", "Secret", "Golden", "Hungry", "Clever", "Gentle", "Noisy", "Shy"]
+NOUNS = ["Kitten", "Dragon", "Robot", "Bear", "Rabbit", "Pirate", "Princess", "Train",
+         "Dinosaur", "Owl", "Fox", "Astronaut", "Whale", "Giant", "Mouse", "Penguin"]
+PLACES = ["the Forest", "the Sea", "the Moon", "the Castle", "the City", "the Farm",
+          "the Jungle", "the Mountain", "the River", "the Stars", "the Desert", "the Garden"]
+WORDS = ["the", "a", "and", "went", "saw", "big", "small", "tree", "sun", "friend", "home",
+         "jumped", "ran", "found", "happy", "said", "looked", "water", "sky", "played",
+         "night", "day", "walked", "together", "laughed", "under", "over", "little"]
+
+# The first environment is production; books in the others are not part of the catalog
+ENVIRONMENTS = [(1, "production"), (2, "staging"), (3, "development")]
+
+
+def generate_book(book_number, rng, pages, words_per_page, synced_at):
+    """Generates the rows of a single synthetic book."""
+    adjective, noun, place = rng.choice(ADJECTIVES), rng.choice(NOUNS), rng.choice(PLACES)
+    title = f"The {adjective} {noun} of {place} {book_number}"
+    description = f"A story about a {adjective.lower()} {noun.lower()} who visits {place.lower()}."
+    # Like production, each page carries layout and illustration metadata next to its rawText
+    page_list = [
+        {
+            "pageNumber": page_number + 1,
+            "rawText": " ".join(rng.choice(WORDS) for _ in range(words_per_page)).capitalize() + ".",
+            "layout": {
+                "template": rng.choice(["full-bleed", "text-left", "text-right", "text-bottom"]),
+                "textBoxes": [{"x": rng.randrange(0, 400), "y": rng.randrange(0, 600),
+                               "width": 480, "height": 160, "fontSize": rng.choice([24, 28, 32]),
+                               "fontFamily": "Andika", "color": "#222222"}]
+            },
+            "illustration": {
+                "url": f"https://cdn.example.com/books/{book_number}/pages/{page_number + 1}.webp",
+                "width": 2048, "height": 1536
+            }
+        }
+        for page_number in range(pages)
+    ]
+    return {
+        "id": book_number,
+        "permanent_id": f"{book_number}-1",
+        "title": title,
+        "description": description,
+        "synced_at": synced_at,
+        "extended_info": json.dumps(page_list)
+    }
+
+
+def seed_database(path, books=1000, pages=12, words_per_page=40, seed=42,
+                  unpublished_ratio=0.05, batch_size=1000, force=False):
+    """
+    Creates the schema and inserts synthetic books, committing every batch_size books.
+    Returns the number of books inserted.
+    """
+    if force:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    backend = SqliteBackend(path)
+    conn = backend.connect()
+    try:
+        backend.create_schema(conn)
+        conn.executemany("INSERT OR IGNORE INTO ENVIRONMENT (ID, NAME) VALUES (?, ?)", ENVIRONMENTS)
+
+        rng = random.Random(seed)
+        start = conn.execute("SELECT COALESCE(MAX(ID), 0) FROM REGULAR_BOOK").fetchone()[0] + 1
+        # Spread sync timestamps over the past year so incremental syncs have something to find
+        base_time = datetime(2024, 1, 1)
+
+        for batch_start in range(start, start + books, batch_size):
+            batch = []
+            for book_number in range(batch_start, min(batch_start + batch_size, start + books)):
+                synced_at = (base_time + timedelta(minutes=rng.randrange(365 * 24 * 60))).isoformat()
+                batch.append(generate_book(book_number, rng, pages, words_per_page, synced_at))
+
+            conn.executemany(
+                "INSERT INTO REGULAR_BOOK (ID, PERMANENT_ID, TITLE, DESCRIPTION, _FIVETRAN_SYNCED) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(b["id"], b["permanent_id"], b["title"], b["description"], b["synced_at"]) for b in batch]
+            )
+            conn.executemany(
+                "INSERT INTO PUBLISHED_BOOK (ID, PUBLISHED_BOOK_ID, _FIVETRAN_SYNCED) VALUES (?, ?, ?)",
+                [(b["id"], b["id"], b["synced_at"]) for b in batch]
+            )
+            conn.executemany(
+                "INSERT INTO PUBLISHED_BOOK_ENVIRONMENTS (PUBLISHED_BOOK_ID, ENVIRONMENTS_ID, _FIVETRAN_SYNCED) "
+                "VALUES (?, ?, ?)",
+                [(b["id"], rng.choice(ENVIRONMENTS[1:])[0] if rng.random() < unpublished_ratio else 1,
+                  b["synced_at"]) for b in batch]
+            )
+            conn.executemany(
+                "INSERT INTO BOOK_EXTENDED_INFO (BOOK_ID, EXTENDED_BOOK_INFO) VALUES (?, ?)",
+                [(b["id"], b["extended_info"]) for b in batch]
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+    return books
+
+
+def main():
+    """Main function that parses command-line arguments and seeds the database."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic book catalog in SQLite.")
+    parser.add_argument("--path", default=None,
+                        help="SQLite database file (default: SQLITE_PATH or cache/books.sqlite)")
+    parser.add_argument("--books", type=int, default=1000, help="Number of books to generate")
+    parser.add_argument("--pages", type=int, default=12, help="Pages per book")
+    parser.add_argument("--words", type=int, default=40, help="Words per page")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible catalogs")
+    parser.add_argument("--unpublished-ratio", type=float, default=0.05,
+                        help="Fraction of books only published outside production")
+    parser.add_argument("--force", action="store_true", help="Delete the existing database first")
+    args = parser.parse_args()
+
+    path = SqliteBackend(args.path).path
+    print(f"🌱 Seeding {args.books} books into {path}...")
+
+    started = time.perf_counter()
+    try:
+        seed_database(path, books=args.books, pages=args.pages, words_per_page=args.words,
+                      seed=args.seed, unpublished_ratio=args.unpublished_ratio, force=args.force)
+    except Exception as e:
+        print(f"❌ Error seeding database: {str(e)}")
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - started
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"✅ Seeded {args.books} books in {elapsed:.1f}s ({size_mb:.1f} MB)")
+    print(f"Use it with: DATA_BACKEND=sqlite SQLITE_PATH={path}")
+
+
+if __name__ == "__main__":
+    main()
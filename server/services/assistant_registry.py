@@ -0,0 +1,467 @@
+"""
+Assistant注册表
+用指纹记录已创建的Assistant和Vector Store，重启时复用远端对象，只重建发生变化的部分
+"""
+import os
+import json
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import openai
+
+from utils.file_utils import ensure_directory_exists, write_file_atomic
+
+# 写入远端对象metadata的应用标签，垃圾回收只处理带有该标签的对象
+APP_TAG = "pickatale-assistant"
+
+# 旧版本创建的、没有metadata标签的对象名称
+LEGACY_ASSISTANT_NAMES = {"Learning Assistant", "Book Recommendation Assistant", "Book Search Assistant"}
+LEGACY_VECTOR_STORE_NAMES = {"Library Vector Store"}
+
+REGISTRY_VERSION = 1
+
+
+class AssistantSpec(NamedTuple):
+    """
+    一个Assistant的定义
+
+    属性:
+        role (str): 角色名，注册表中的键，例如learning或book_recommendation
+        name (str): Assistant名称
+        instructions (str): 指令
+        model (str): 模型
+        tools (List[Dict[str, Any]]): 工具定义
+        catalog_path (Optional[str]): 需要通过file_search检索的目录文件，提供时会关联一个Vector Store
+    """
+    role: str
+    name: str
+    instructions: str
+    model: str
+    tools: List[Dict[str, Any]]
+    catalog_path: Optional[str] = None
+
+
+def spec_fingerprint(spec: AssistantSpec) -> str:
+    """
+    计算Assistant定义的指纹（不包含目录内容）
+
+    参数:
+        spec (AssistantSpec): Assistant定义
+
+    返回:
+        str: SHA-256十六进制字符串
+
+    示例:
+        >>> spec_fingerprint(spec)
+        '3f2a...'
+    """
+    payload = json.dumps({
+        "name": spec.name,
+        "instructions": spec.instructions,
+        "model": spec.model,
+        "tools": spec.tools
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算文件内容的SHA-256
+
+    参数:
+        path (str): 文件路径
+        chunk_size (int): 每次读取的字节数
+
+    返回:
+        str: SHA-256十六进制字符串
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AssistantRegistry:
+    """
+    Assistant注册表
+
+    注册表文件（默认cache/assistants_registry.json）按角色记录Assistant ID、Vector Store ID、
+    定义指纹和目录内容哈希。ensure在启动时比较指纹：
+      - 指纹和目录哈希都没变且远端对象仍然存在：直接复用
+      - 定义变化：原地更新远端Assistant
+      - 目录内容变化：新建Vector Store，切换Assistant后删除旧的Vector Store
+      - 本地没有记录或远端对象已被删除：先按metadata查找可以复用的远端对象，找不到再创建
+
+    所有远端对象都带有metadata标签（app、namespace、role、fingerprint），
+    collect_garbage据此删除注册表中没有记录的对象，例如进程崩溃时遗留的Assistant。
+
+    属性:
+        client: OpenAI客户端
+        path (str): 注册表文件路径
+        namespace (str): 区分共用同一个OpenAI账号的不同部署
+    """
+
+    def __init__(self, client: Any, path: Optional[str] = None, namespace: Optional[str] = None):
+        """
+        初始化Assistant注册表
+
+        参数:
+            client: OpenAI客户端
+            path (Optional[str]): 注册表文件路径，默认从环境变量ASSISTANT_REGISTRY_PATH获取，
+                                  未设置时为项目根目录下的cache/assistants_registry.json
+            namespace (Optional[str]): 部署命名空间，默认从环境变量ASSISTANT_NAMESPACE获取，未设置时为default
+
+        示例:
+            >>> registry = AssistantRegistry(openai.OpenAI())
+            >>> assistant_id = registry.ensure(spec)
+        """
+        self.client = client
+        if path is None:
+            path = os.getenv("ASSISTANT_REGISTRY_PATH") or os.path.join(
+                os.path.dirname(__file__), "..", "..", "cache", "assistants_registry.json")
+        self.path = path
+        self.namespace = namespace or os.getenv("ASSISTANT_NAMESPACE", "default")
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Any]:
+        """
+        读取注册表文件
+
+        返回:
+            Dict[str, Any]: 注册表内容，文件不存在或损坏时返回空注册表
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == REGISTRY_VERSION and isinstance(data.get("assistants"), dict):
+                return data
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 读取Assistant注册表失败，将重新创建: {str(e)}")
+        return {"version": REGISTRY_VERSION, "assistants": {}}
+
+    def save(self, data: Dict[str, Any]) -> None:
+        """
+        原子地写入注册表文件
+
+        参数:
+            data (Dict[str, Any]): 注册表内容
+        """
+        ensure_directory_exists(os.path.dirname(os.path.abspath(self.path)))
+        write_file_atomic(self.path, json.dumps(data, ensure_ascii=False, indent=2))
+
+    def ensure(self, spec: AssistantSpec) -> str:
+        """
+        确保与定义一致的Assistant存在，返回其ID
+
+        参数:
+            spec (AssistantSpec): Assistant定义
+
+        返回:
+            str: Assistant ID
+
+        示例:
+            >>> assistant_id = registry.ensure(learning_assistant_spec())
+        """
+        # 远端操作不持有锁，不同角色可以并发确保；只有读写注册表文件时加锁
+        entry = self.load()["assistants"].get(spec.role) or {}
+        fingerprint = spec_fingerprint(spec)
+        catalog_hash = file_hash(spec.catalog_path) if spec.catalog_path else None
+
+        assistant = self._retrieve_assistant(entry.get("assistant_id"))
+        if assistant is None:
+            assistant = self._find_remote_assistant(spec.role, fingerprint, catalog_hash)
+            if assistant is not None:
+                entry = self._entry_from_remote(assistant)
+                print(f"♻️ 找到可以复用的远端Assistant: {spec.role} ({assistant.id})")
+
+        # 目录内容没变且Vector Store仍然存在时复用，否则新建
+        vector_store_id = entry.get("vector_store_id")
+        replaced_vector_store_id = None
+        if spec.catalog_path:
+            if entry.get("catalog_hash") != catalog_hash or not self._vector_store_exists(vector_store_id):
+                replaced_vector_store_id = vector_store_id
+                vector_store_id = self._create_vector_store(spec, catalog_hash)
+        else:
+            vector_store_id = None
+
+        metadata = self._metadata(spec.role, fingerprint, catalog_hash)
+        options = {
+            "name": spec.name,
+            "instructions": spec.instructions,
+            "model": spec.model,
+            "tools": spec.tools,
+            "metadata": metadata
+        }
+        if vector_store_id:
+            options["tool_resources"] = {"file_search": {"vector_store_ids": [vector_store_id]}}
+
+        if assistant is None:
+            assistant = self.client.beta.assistants.create(**options)
+            print(f"✅ 已创建Assistant: {spec.role} ({assistant.id})")
+        elif entry.get("fingerprint") != fingerprint or entry.get("vector_store_id") != vector_store_id:
+            assistant = self.client.beta.assistants.update(assistant.id, **options)
+            print(f"🔄 已更新Assistant: {spec.role} ({assistant.id})")
+        else:
+            print(f"♻️ 复用Assistant: {spec.role} ({assistant.id})")
+
+        with self._lock:
+            data = self.load()
+            data["assistants"][spec.role] = {
+                "assistant_id": assistant.id,
+                "vector_store_id": vector_store_id,
+                "fingerprint": fingerprint,
+                "catalog_hash": catalog_hash,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }
+            self.save(data)
+
+        # 新的Vector Store已经生效后再删除旧的
+        if replaced_vector_store_id and replaced_vector_store_id != vector_store_id:
+            self._delete_vector_store(replaced_vector_store_id)
+
+        return assistant.id
+
+    def vector_store_id(self, role: str) -> Optional[str]:
+        """
+        获取注册表中某个角色关联的Vector Store ID
+
+        参数:
+            role (str): 角色名
+
+        返回:
+            Optional[str]: Vector Store ID，没有时返回None
+        """
+        return (self.load()["assistants"].get(role) or {}).get("vector_store_id")
+
+    def wait_for_index(self, vector_store_id: str, timeout: Optional[float] = None,
+                       interval: float = 1.0, max_interval: float = 10.0) -> Any:
+        """
+        等待Vector Store中的文件完成索引
+
+        文件上传后需要一段时间才能被file_search检索到，在此之前推荐请求会看到空的索引。
+
+        参数:
+            vector_store_id (str): Vector Store ID
+            timeout (Optional[float]): 最长等待时间（秒），默认从环境变量VECTOR_STORE_INDEX_TIMEOUT获取
+            interval (float): 首次检查间隔（秒），之后逐渐增长
+            max_interval (float): 最长检查间隔（秒）
+
+        返回:
+            Any: 索引完成的Vector Store对象
+
+        异常:
+            RuntimeError: 有文件索引失败时抛出
+            TimeoutError: 超时时抛出
+
+        示例:
+            >>> registry.wait_for_index(registry.vector_store_id("book_recommendation"))
+        """
+        if timeout is None:
+            timeout = float(os.getenv("VECTOR_STORE_INDEX_TIMEOUT", "600"))
+        deadline = time.monotonic() + timeout
+
+        while True:
+            vector_store = self.client.vector_stores.retrieve(vector_store_id)
+            file_counts = vector_store.file_counts
+            if file_counts.in_progress == 0:
+                if file_counts.completed == 0 and file_counts.failed > 0:
+                    raise RuntimeError(f"Vector store {vector_store_id} has no indexed files "
+                                       f"({file_counts.failed} failed)")
+                if file_counts.failed:
+                    print(f"⚠️ Vector Store {vector_store_id} 中有 {file_counts.failed} 个文件索引失败")
+                return vector_store
+            if time.monotonic() + interval > deadline:
+                raise TimeoutError(f"Vector store {vector_store_id} is still indexing after {timeout:g} seconds")
+            print(f"⏳ 等待Vector Store索引: {file_counts.in_progress} 个文件处理中")
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
+
+    def collect_garbage(self, dry_run: bool = False, include_untagged: bool = False) -> Dict[str, List[str]]:
+        """
+        删除注册表中没有记录的Assistant和Vector Store
+
+        只处理metadata中app和namespace与当前注册表一致的对象；include_untagged为True时，
+        还会处理旧版本创建的、名称匹配但没有metadata的对象。
+
+        参数:
+            dry_run (bool): 只列出将要删除的对象，不实际删除
+            include_untagged (bool): 是否包含旧版本创建的未标记对象
+
+        返回:
+            Dict[str, List[str]]: 包含assistants和vector_stores两个ID列表的字典
+
+        示例:
+            >>> removed = registry.collect_garbage(dry_run=True)
+            >>> print(removed["assistants"])
+        """
+        with self._lock:
+            entries = self.load()["assistants"].values()
+            keep_assistants = {entry.get("assistant_id") for entry in entries}
+            keep_vector_stores = {entry.get("vector_store_id") for entry in entries}
+
+            removed = {"assistants": [], "vector_stores": []}
+
+            for assistant in self.client.beta.assistants.list(limit=100):
+                if assistant.id in keep_assistants:
+                    continue
+                if not self._is_collectable(assistant, LEGACY_ASSISTANT_NAMES, include_untagged):
+                    continue
+                removed["assistants"].append(assistant.id)
+                if not dry_run:
+                    self.client.beta.assistants.delete(assistant.id)
+                    print(f"🗑️ 已删除遗留的Assistant: {assistant.id} ({assistant.name})")
+
+            for vector_store in self.client.vector_stores.list(limit=100):
+                if vector_store.id in keep_vector_stores:
+                    continue
+                if not self._is_collectable(vector_store, LEGACY_VECTOR_STORE_NAMES, include_untagged):
+                    continue
+                removed["vector_stores"].append(vector_store.id)
+                if not dry_run:
+                    self._delete_vector_store(vector_store.id)
+
+            return removed
+
+    def _metadata(self, role: str, fingerprint: str, catalog_hash: Optional[str]) -> Dict[str, str]:
+        """生成远端对象的metadata标签"""
+        metadata = {"app": APP_TAG, "namespace": self.namespace, "role": role, "fingerprint": fingerprint}
+        if catalog_hash:
+            metadata["catalog_hash"] = catalog_hash
+        return metadata
+
+    def _is_collectable(self, obj: Any, legacy_names: set, include_untagged: bool) -> bool:
+        """判断远端对象是否属于当前部署，或是可以清理的旧版本对象"""
+        metadata = getattr(obj, "metadata", None) or {}
+        if metadata.get("app") == APP_TAG:
+            return metadata.get("namespace") == self.namespace
+        return include_untagged and not metadata and getattr(obj, "name", None) in legacy_names
+
+    def _retrieve_assistant(self, assistant_id: Optional[str]) -> Any:
+        """获取远端Assistant，不存在时返回None"""
+        if not assistant_id:
+            return None
+        try:
+            return self.client.beta.assistants.retrieve(assistant_id)
+        except openai.NotFoundError:
+            print(f"⚠️ 注册表中的Assistant已不存在: {assistant_id}")
+            return None
+
+    def _find_remote_assistant(self, role: str, fingerprint: str, catalog_hash: Optional[str]) -> Any:
+        """查找当前部署中定义和目录都一致的远端Assistant，用于注册表文件丢失后的恢复"""
+        for assistant in self.client.beta.assistants.list(limit=100):
+            metadata = getattr(assistant, "metadata", None) or {}
+            if metadata.get("app") == APP_TAG and metadata.get("namespace") == self.namespace \
+                    and metadata.get("role") == role and metadata.get("fingerprint") == fingerprint \
+                    and metadata.get("catalog_hash") == catalog_hash:
+                return assistant
+        return None
+
+    @staticmethod
+    def _entry_from_remote(assistant: Any) -> Dict[str, Any]:
+        """根据远端Assistant的metadata和tool_resources重建注册表记录"""
+        metadata = getattr(assistant, "metadata", None) or {}
+        vector_store_ids = []
+        tool_resources = getattr(assistant, "tool_resources", None)
+        file_search = getattr(tool_resources, "file_search", None) if tool_resources else None
+        if file_search is not None:
+            vector_store_ids = file_search.vector_store_ids or []
+        return {
+            "assistant_id": assistant.id,
+            "vector_store_id": vector_store_ids[0] if vector_store_ids else None,
+            "fingerprint": metadata.get("fingerprint"),
+            "catalog_hash": metadata.get("catalog_hash")
+        }
+
+    def _vector_store_exists(self, vector_store_id: Optional[str]) -> bool:
+        """检查远端Vector Store是否存在"""
+        if not vector_store_id:
+            return False
+        try:
+            self.client.vector_stores.retrieve(vector_store_id)
+            return True
+        except openai.NotFoundError:
+            print(f"⚠️ 注册表中的Vector Store已不存在: {vector_store_id}")
+            return False
+
+    def _create_vector_store(self, spec: AssistantSpec, catalog_hash: str) -> str:
+        """上传目录文件并创建带标签的Vector Store"""
+        metadata = {"app": APP_TAG, "namespace": self.namespace, "role": spec.role, "catalog_hash": catalog_hash}
+        vector_store = self.client.vector_stores.create(name="Library Vector Store", metadata=metadata)
+        with open(spec.catalog_path, "rb") as file:
+            uploaded_file = self.client.files.create(file=file, purpose="assistants")
+        self.client.vector_stores.files.create(vector_store_id=vector_store.id, file_id=uploaded_file.id)
+        print(f"📁 已创建Vector Store: {vector_store.id}（文件 {uploaded_file.id}）")
+        return vector_store.id
+
+    def _delete_vector_store(self, vector_store_id: str) -> None:
+        """删除Vector Store及其文件，失败时只记录日志"""
+        try:
+            for file in self.client.vector_stores.files.list(vector_store_id=vector_store_id):
+                self.client.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=file.id)
+                try:
+                    self.client.files.delete(file.id)
+                except openai.NotFoundError:
+                    pass
+            self.client.vector_stores.delete(vector_store_id)
+            print(f"🗑️ 已删除Vector Store: {vector_store_id}")
+        except openai.NotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ 删除Vector Store失败 {vector_store_id}: {str(e)}")
+
+
+def learning_assistant_spec() -> AssistantSpec:
+    """
+    学习助手的定义
+
+    返回:
+        AssistantSpec: 学习助手定义
+    """
+    from libs import openai_assistant as oa
+    return AssistantSpec("learning", oa.LEARNING_ASSISTANT_NAME, oa.OPENAI_ASSISTANT_INSTRUCTION,
+                         oa.OPENAI_MODEL, oa.LEARNING_ASSISTANT_TOOLS)
+
+
+def book_recommendation_assistant_spec(library_data_file: str) -> AssistantSpec:
+    """
+    图书推荐助手的定义
+
+    参数:
+        library_data_file (str): 图书目录文件路径，上传到Vector Store供file_search检索
+
+    返回:
+        AssistantSpec: 图书推荐助手定义
+    """
+    from libs import openai_assistant as oa
+    return AssistantSpec("book_recommendation", oa.BOOK_RECOMMENDER_ASSISTANT_NAME,
+                         oa.OPENAI_BOOK_RECOMMENDER_ASSISTANT_INSTRUCTION, oa.OPENAI_MODEL,
+                         oa.BOOK_RECOMMENDER_TOOLS, catalog_path=library_data_file)
+
+
+# 进程内共享的注册表
+_default_registry: Optional[AssistantRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_assistant_registry() -> AssistantRegistry:
+    """
+    获取进程内共享的Assistant注册表，使用libs.openai_assistant中的客户端
+
+    返回:
+        AssistantRegistry: Assistant注册表
+
+    示例:
+        >>> assistant_id = get_assistant_registry().ensure(learning_assistant_spec())
+    """
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            from libs import openai_assistant as oa
+            _default_registry = AssistantRegistry(oa.client)
+        return _default_registry
@@ -4,19 +4,34 @@ Assistant服务
 """
 import os
 import json
-import time
 import tempfile
+import threading
+import time
 from typing import Dict, List, Optional, Any, Tuple, Union
 
-import openai
 from flask import current_app
 
+from services.openai_client import get_openai_client
 from services.openai_service import OpenAIService
 from services.speech_service import SpeechService
-from utils.file_utils import create_temp_file, save_temp_file_reference
+from services.data_service import DataService
+from services.catalog_store import get_catalog_store
+from services.assistant_registry import (get_assistant_registry, learning_assistant_spec,
+                                         book_recommendation_assistant_spec)
+from services.run_engine import RunEngine, RunResult
+from services.run_queue import QUEUED, RunBatch, RunQueue, get_run_queue
+from services.session_store import SessionStore, get_session_store
+from services.startup import wait_for_component
+from services.tool_registry import ToolCall, ToolRegistry
+from services.tts_cache import TTSCache, get_tts_cache
+from services.warning_bank import WarningBank, get_warning_bank
+from utils.cancellation import CancellationToken, Cancelled, record_saved
 from utils.markdown_utils import render_markdown_to_html
 import config
 
+# 发送complete事件后等待回复语音合成完成的最长时间（秒）
+DEFAULT_AUDIO_READY_TIMEOUT = 120.0
+
 class AssistantService:
     """
     Assistant服务类
@@ -26,17 +41,32 @@ class AssistantService:
     属性:
         openai_service (OpenAIService): OpenAI服务实例
         speech_service (SpeechService): 语音服务实例
-        user_threads (Dict[str, str]): 用户线程ID字典
+        data_service (DataService): 数据服务实例
+        sessions (SessionStore): 会话ID到线程ID的存储，默认在所有实例间共享
+        run_queue (RunQueue): 按线程串行化运行并合并消息的队列
+        tts_cache (TTSCache): 回复和警告共用的语音合成缓存
+        warning_bank (WarningBank): 预先生成的审核警告
+        tools (ToolRegistry): Assistant可调用的函数
     """
 
     def __init__(self, openai_service: Optional[OpenAIService] = None,
-                 speech_service: Optional[SpeechService] = None):
+                 speech_service: Optional[SpeechService] = None,
+                 data_service: Optional[DataService] = None,
+                 session_store: Optional[SessionStore] = None,
+                 run_queue: Optional[RunQueue] = None,
+                 tts_cache: Optional[TTSCache] = None,
+                 warning_bank: Optional[WarningBank] = None):
         """
         初始化Assistant服务
 
         参数:
             openai_service (Optional[OpenAIService]): OpenAI服务实例，如不提供则创建新实例
             speech_service (Optional[SpeechService]): 语音服务实例，如不提供则创建新实例
+            data_service (Optional[DataService]): 数据服务实例，如不提供则创建新实例
+            session_store (Optional[SessionStore]): 会话存储，如不提供则使用由SESSION_STORE决定的共享存储
+            run_queue (Optional[RunQueue]): 按线程串行化运行的队列，如不提供则使用进程内共享的队列
+            tts_cache (Optional[TTSCache]): 语音合成缓存，如不提供则使用共享缓存
+            warning_bank (Optional[WarningBank]): 审核警告库，如不提供则使用共享警告库
 
         示例:
             >>> service = AssistantService()  # 使用默认服务实例
@@ -44,8 +74,14 @@ class AssistantService:
         """
         self.openai_service = openai_service or OpenAIService()
         self.speech_service = speech_service or SpeechService()
-        self.user_threads = {}  # 用于存储用户线程ID的字典
-        self.client = openai.OpenAI(api_key=config.OPENAI_API_KEY)
+        self.data_service = data_service or DataService()
+        self.sessions = session_store or get_session_store()
+        self.run_queue = run_queue or get_run_queue()
+        self.tts_cache = tts_cache or get_tts_cache()
+        self.warning_bank = warning_bank or get_warning_bank()
+        self.client = get_openai_client(config.OPENAI_API_KEY)
+        self.run_engine = RunEngine(self.client)
+        self.tools = self._register_tools()
 
     def init_assistant_thread(self, session_id: str = 'default_user') -> str:
         """
@@ -62,13 +98,13 @@ class AssistantService:
             >>> print(f"用户线程ID: {thread_id}")
         """
         try:
-            # 如果线程不存在，则创建一个新线程
-            if session_id not in self.user_threads:
-                thread = self.client.beta.threads.create()
-                self.user_threads[session_id] = thread.id
-                print(f"已为用户 {session_id} 创建新线程: {thread.id}")
+            # 如果线程不存在或已过期，则创建一个新线程；并发的首次请求只会创建一个线程
+            thread_id, created = self.sessions.get_or_create(
+                session_id, lambda: self.client.beta.threads.create().id)
+            if created:
+                print(f"已为用户 {session_id} 创建新线程: {thread_id}")
 
-            return self.user_threads[session_id]
+            return thread_id
 
         except Exception as e:
             print(f"初始化线程错误: {str(e)}")
@@ -102,40 +138,77 @@ class AssistantService:
         # 初始化或获取用户的线程ID
         thread_id = self.init_assistant_thread(session_id)
 
+        # 同一线程上同时只能有一个运行：正在运行时到达的消息合并到下一次运行，重复的消息共享同一个回复
+        batch, leader = self.run_queue.submit(thread_id, message)
+        # 发起者在开始运行前离开时，由本请求接替它运行这一批次
+        if not leader and not self.run_queue.follow(batch):
+            return batch.wait()
+
+        reply = None
+        try:
+            self.run_queue.acquire(batch)
+            reply = self._run_messages(thread_id, batch.messages)
+        except Exception as e:
+            self.run_queue.release(batch, error=e)
+            raise
+        self.run_queue.release(batch, reply)
+        return reply
+
+    def _run_messages(self, thread_id: str, messages: List[str]) -> Dict[str, Any]:
+        """
+        把一批用户消息添加到线程，运行助手并获取回复
+
+        参数:
+            thread_id (str): 线程ID
+            messages (List[str]): 用户消息
+
+        返回:
+            Dict[str, Any]: 助手回复，运行失败时为包含error的字典
+        """
         # 获取当前Assistant ID
         assistant_id = self._get_assistant_id()
 
         # 向线程添加用户消息
-        self.client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=message
-        )
+        self._add_messages(thread_id, messages)
 
-        # 运行助手
-        run = self.client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=assistant_id,
-        )
-
-        # 处理运行
+        # 运行助手并处理运行事件
         function_results = []
-        run_status = self._process_run(thread_id, run.id, function_results, is_stream)
+        result = self._process_run(thread_id, assistant_id, function_results)
 
-        if run_status not in ['completed']:
-            return {"error": f"Assistant run failed: {run_status}"}
+        if result.status not in ['completed']:
+            return {"error": f"Assistant run failed: {result.status}"}
 
         # 获取助手回复
-        return self._get_assistant_reply(thread_id, function_results)
+        return self._get_assistant_reply(thread_id, function_results, result.text)
 
-    def chat_stream(self, message: str, session_id: str = 'default_user', language: str = 'en'):
+    def _add_messages(self, thread_id: str, messages: List[str]) -> None:
+        """
+        向线程添加用户消息
+
+        参数:
+            thread_id (str): 线程ID
+            messages (List[str]): 用户消息，按提交顺序添加
+        """
+        for message in messages:
+            self.client.beta.threads.messages.create(
+                thread_id=thread_id,
+                role="user",
+                content=message
+            )
+
+    def chat_stream(self, message: str, session_id: str = 'default_user', language: str = 'en',
+                    cancel_token: Optional[CancellationToken] = None):
         """
         使用流式处理用户聊天消息（生成器函数）
 
+        cancel_token被取消（客户端断开）时，在服务端取消运行、中止未完成的函数调用并跳过语音合成。
+        同一批次中还有其他请求在等待回复时不取消运行，而是不再发送事件，继续运行并把回复交给它们。
+
         参数:
             message (str): 用户消息内容
             session_id (str): 用户会话ID，默认为'default_user'
             language (str): 用户语言代码，'en'或'zh'
+            cancel_token (Optional[CancellationToken]): 取消令牌
 
         返回:
             generator: 事件流生成器
@@ -159,71 +232,208 @@ class AssistantService:
             yield format_sse("status", {"status": "Content moderation check..."})
             warning_result = self._handle_flagged_content(categories, language)
             yield format_sse("complete", warning_result)
+            yield from self._audio_ready_events(warning_result, format_sse, cancel_token)
             return
 
         try:
             # 初始化线程
             thread_id = self.init_assistant_thread(session_id)
 
-            # 获取Assistant ID
-            assistant_id = self._get_assistant_id()
-            if not assistant_id:
-                yield format_sse("error", {"error": "Assistant ID not configured"})
+            # 同一线程上正在运行时，等待当前运行结束后和其他排队的消息一起运行
+            batch, leader = self.run_queue.submit(thread_id, message)
+            waiting_sent = False
+            if not leader:
+                yield format_sse("status", {"status": "Waiting for the previous reply..."})
+                waiting_sent = True
+                # 发起者在开始运行前离开时，由本请求接替它运行这一批次
+                leader = self.run_queue.follow(batch)
+            if leader:
+                reply = None
+                # 运行使用自己的取消令牌：客户端断开时只有批次中没有其他请求等待才取消运行
+                run_token = CancellationToken()
+                unregister = cancel_token.add_callback(
+                    lambda: self._leave_batch(batch, run_token, cancel_token.reason)
+                ) if cancel_token is not None else None
+                # 从等待到释放都在同一个try中：客户端在等待时断开，也要释放排队的批次
+                try:
+                    if batch.state == QUEUED and not waiting_sent:
+                        yield format_sse("status", {"status": "Waiting for the previous reply..."})
+                    self.run_queue.acquire(batch)
+                    reply = yield from self._forward_run(
+                        batch, self._stream_messages(thread_id, batch.messages, format_sse, run_token), run_token)
+                except Exception as e:
+                    self.run_queue.release(batch, error=e)
+                    raise
+                finally:
+                    if unregister is not None:
+                        unregister()
+                    # 客户端在开始运行前断开时生成器在等待状态处退出，批次交给等待同一批次的请求运行
+                    self.run_queue.release(batch, reply)
+            else:
+                reply = batch.wait()
+
+            if "error" in reply:
+                yield format_sse("error", reply)
                 return
 
-            # 添加用户消息
-            self.client.beta.threads.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=message
-            )
+            # 发送完成事件，语音仍在后台合成，完成后再发送audio_ready事件
+            yield format_sse("complete", reply)
+            yield from self._audio_ready_events(reply, format_sse, cancel_token)
 
-            yield format_sse("status", {"status": "Thinking..."})
+        except Exception as e:
+            if cancel_token is not None and cancel_token.is_cancelled:
+                # 客户端已经断开，不再发送事件
+                return
+            yield format_sse("error", {"error": str(e)})
 
-            # 运行助手
-            run = self.client.beta.threads.runs.create(
-                thread_id=thread_id,
-                assistant_id=assistant_id,
-            )
+    def _leave_batch(self, batch: RunBatch, run_token: CancellationToken, reason: Optional[str]) -> None:
+        """
+        发起者的客户端断开时调用：批次中没有其他请求等待时取消运行，否则继续运行
 
-            # 初始化函数调用结果
-            function_results = []
+        参数:
+            batch (RunBatch): 发起者的批次
+            run_token (CancellationToken): 本次运行的取消令牌
+            reason (Optional[str]): 取消原因
+        """
+        if self.run_queue.abandon(batch, reason or "client disconnected"):
+            run_token.cancel(reason or "client disconnected")
+        elif batch.waiters:
+            print(f"🔌 客户端已断开，批次中还有 {batch.waiters} 个请求在等待，继续运行")
 
-            # 处理运行
-            while True:
-                run_status = self.client.beta.threads.runs.retrieve(
-                    thread_id=thread_id,
-                    run_id=run.id
-                )
+    def _forward_run(self, batch: RunBatch, events, run_token: CancellationToken):
+        """
+        转发批次运行的事件流（生成器函数）
 
-                # 发送状态更新
-                yield format_sse("status", {"status": f"Assistant status: {run_status.status}"})
+        客户端断开时生成器在yield处被关闭。批次中没有其他请求等待时关闭运行的事件流；
+        否则不再发送事件，把运行执行完并通过release把回复交给它们。
 
-                if run_status.status == 'completed':
-                    yield format_sse("status", {"status": "Generating response..."})
-                    break
+        参数:
+            batch (RunBatch): 发起者的批次
+            events: _stream_messages返回的事件流
+            run_token (CancellationToken): 本次运行的取消令牌
 
-                elif run_status.status == 'requires_action':
-                    # 处理函数调用
-                    yield from self._handle_function_calls_stream(
-                        thread_id, run_status, run.id, function_results, format_sse
-                    )
+        返回:
+            generator: events中的事件，生成器的返回值为助手回复
+        """
+        while True:
+            try:
+                event = next(events)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                yield event
+            except GeneratorExit:
+                if not run_token.is_cancelled:
+                    self._leave_batch(batch, run_token, "client disconnected")
+                if run_token.is_cancelled:
+                    events.close()
+                    raise
+                try:
+                    while True:
+                        try:
+                            next(events)
+                        except StopIteration as stop:
+                            self.run_queue.release(batch, stop.value)
+                            break
+                except Exception as e:
+                    self.run_queue.release(batch, error=e)
+                raise
+
+    def _audio_ready_events(self, reply: Dict[str, Any], format_sse,
+                            cancel_token: Optional[CancellationToken] = None):
+        """
+        等待回复的语音在后台合成完成后发送audio_ready事件（生成器函数）
+
+        ready为false表示合成失败或在TTS_READY_TIMEOUT_SECONDS秒内没有完成，客户端仍可以请求audio_url。
 
-                elif run_status.status in ['failed', 'cancelled', 'expired']:
-                    yield format_sse("error", {"error": f"Assistant run failed: {run_status.status}"})
-                    return
+        参数:
+            reply (Dict[str, Any]): complete事件中的回复
+            format_sse: 格式化SSE消息的函数
+            cancel_token (Optional[CancellationToken]): 取消令牌，已取消时不再等待
 
-                # 等待后再检查状态
-                time.sleep(0.5)
+        返回:
+            generator: 最多一个audio_ready事件
+        """
+        audio_url = reply.get("audio_url")
+        if not audio_url:
+            return
 
-            # 获取助手回复
-            reply = self._get_assistant_reply(thread_id, function_results)
+        filename = audio_url.rsplit("/", 1)[-1]
+        deadline = time.monotonic() + float(os.getenv("TTS_READY_TIMEOUT_SECONDS", DEFAULT_AUDIO_READY_TIMEOUT))
+        status = self.tts_cache.audio_status(filename)
+        while status == "pending" and time.monotonic() < deadline:
+            if cancel_token is not None and cancel_token.is_cancelled:
+                return
+            status = self.tts_cache.wait_ready(filename, min(0.5, max(0.0, deadline - time.monotonic())))
 
-            # 发送完成事件
-            yield format_sse("complete", reply)
+        yield format_sse("audio_ready", {
+            "audio_url": audio_url,
+            "audio_playlist": reply.get("audio_playlist", [audio_url]),
+            "ready": status in ("ready", "missing")
+        })
 
-        except Exception as e:
-            yield format_sse("error", {"error": str(e)})
+    def _stream_messages(self, thread_id: str, messages: List[str], format_sse,
+                         cancel_token: Optional[CancellationToken] = None):
+        """
+        把一批用户消息添加到线程并以事件流运行助手（生成器函数）
+
+        参数:
+            thread_id (str): 线程ID
+            messages (List[str]): 用户消息
+            format_sse: 格式化SSE消息的函数
+            cancel_token (Optional[CancellationToken]): 取消令牌
+
+        返回:
+            generator: 状态、文本增量和函数调用进度事件，生成器的返回值为助手回复，
+                       运行失败时为包含error的字典
+
+        异常:
+            Cancelled: 取消令牌被取消时抛出
+        """
+        # 获取Assistant ID
+        assistant_id = self._get_assistant_id()
+        if not assistant_id:
+            return {"error": "Assistant ID not configured"}
+
+        # 添加用户消息
+        self._add_messages(thread_id, messages)
+
+        yield format_sse("status", {"status": "Thinking..."})
+
+        # 初始化函数调用结果
+        function_results = []
+
+        # 运行助手，状态变化、文本增量和函数调用随事件流到达后立即处理
+        result = None
+        # 函数调用之后助手会开始一条新消息，客户端需要丢弃之前流式显示的文本
+        reset_text = False
+        for event in self.run_engine.run(
+            thread_id, assistant_id,
+            lambda tool_calls: self._handle_function_calls_stream(tool_calls, function_results, format_sse,
+                                                                  cancel_token),
+            cancel_token
+        ):
+            if event.type == "status":
+                # 发送状态更新
+                yield format_sse("status", {"status": f"Assistant status: {event.data}"})
+                if event.data == "requires_action":
+                    reset_text = True
+            elif event.type == "delta":
+                # 发送文本增量，完整回复仍由complete事件给出
+                yield format_sse("delta", {"text": event.data, "reset": reset_text})
+                reset_text = False
+            elif event.type == "handler":
+                yield event.data
+            elif event.type == "done":
+                result = event.data
+
+        if result.status != 'completed':
+            return {"error": f"Assistant run failed: {result.status}"}
+
+        yield format_sse("status", {"status": "Generating response..."})
+
+        # 获取助手回复
+        return self._get_assistant_reply(thread_id, function_results, result.text, cancel_token)
 
     def _get_assistant_id(self) -> Optional[str]:
         """
@@ -235,7 +445,8 @@ class AssistantService:
         # 从环境变量获取
         assistant_id = os.getenv('OPENAI_ASSISTANT_ID')
         if not assistant_id:
-            # 从应用配置获取
+            # 从应用配置获取，服务刚启动时等待Assistant初始化完成
+            wait_for_component("learning_assistant")
             assistant_id = current_app.config.get('OPENAI_ASSISTANT_ID')
         return assistant_id
 
@@ -250,171 +461,164 @@ class AssistantService:
         返回:
             Dict[str, Any]: 包含警告信息的响应字典
         """
-        # 生成警告信息
-        warning_message = self.openai_service.generate_friendly_warning(categories, language)
-
-        # 生成语音
-        audio_data = self.openai_service.text_to_speech(warning_message)
-
-        # 创建临时文件
-        audio_path, filename = create_temp_file(audio_data, suffix='.mp3')
-
-        # 保存文件引用
-        save_temp_file_reference(filename, audio_path)
+        # 从警告库取用预先生成的警告和语音，只有警告库为空时才实时生成
+        warning = self.warning_bank.warning(categories, language)
 
         # 构建警告响应
         return {
-            "text": warning_message,
-            "html": render_markdown_to_html(warning_message),
+            "text": warning["text"],
+            "html": render_markdown_to_html(warning["text"]),
             "is_warning": True,
-            "audio_url": f"/api/audio/{filename}"
+            "audio_url": warning["audio_url"]
         }
 
-    def _process_run(self, thread_id: str, run_id: str, function_results: List[Dict[str, Any]],
-                     is_stream: bool = False) -> str:
+    def _process_run(self, thread_id: str, assistant_id: str, function_results: List[Dict[str, Any]],
+                     is_stream: bool = False) -> RunResult:
         """
-        处理Assistant运行
+        创建并处理Assistant运行
+
+        运行事件通过流式接口推送，requires_action到达时立即执行函数调用并提交结果。
 
         参数:
             thread_id (str): 线程ID
-            run_id (str): 运行ID
+            assistant_id (str): Assistant ID
             function_results (List[Dict[str, Any]]): 存储函数调用结果的列表
             is_stream (bool): 是否为流式处理
 
         返回:
-            str: 运行状态
+            RunResult: 运行结果，包含最终状态和助手回复文本
         """
-        while True:
-            run_status = self.client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run_id
-            )
+        return self.run_engine.run_to_completion(
+            thread_id, assistant_id,
+            lambda tool_calls: self._handle_function_calls(tool_calls, function_results)
+        )
 
-            if run_status.status == 'completed':
-                return 'completed'
+    def _register_tools(self) -> ToolRegistry:
+        """
+        登记Assistant可调用的函数及其超时时间和缓存策略
 
-            elif run_status.status == 'requires_action':
-                # 处理函数调用
-                self._handle_function_calls(thread_id, run_status, run_id, function_results)
+        返回:
+            ToolRegistry: 工具注册表
+        """
+        tools = ToolRegistry()
+        # 推荐需要运行另一个Assistant，耗时最长；相同兴趣短语的推荐结果可以短期复用
+        tools.register("recommend_books", self._recommend_books, timeout=90, cache_ttl=600,
+                       function_type="book_recommendation", icon="📚")
+        # 本地书名索引查询，结果只随目录同步变化
+        tools.register("search_book_by_title", self._search_book_by_title, timeout=10, cache_ttl=300,
+                       function_type="book_search", icon="🔍")
+        # 图书内容已由DataService缓存，这里不再重复缓存
+        tools.register("get_book_content", self._get_book_content, timeout=30,
+                       function_type="book_content", icon="📖")
+        return tools
 
-            elif run_status.status in ['failed', 'cancelled', 'expired']:
-                return run_status.status
+    @staticmethod
+    def _parse_tool_calls(tool_calls: List[Any]) -> List[ToolCall]:
+        """
+        把requires_action中的工具调用转换为ToolCall列表
 
-            # 等待后再检查状态
-            time.sleep(0.5)
+        参数:
+            tool_calls (List[Any]): requires_action中的工具调用
+
+        返回:
+            List[ToolCall]: 解析了参数的工具调用
+        """
+        return [ToolCall(tool_call.id, tool_call.function.name, json.loads(tool_call.function.arguments))
+                for tool_call in tool_calls]
 
-    def _handle_function_calls(self, thread_id: str, run_status: Any, run_id: str,
-                              function_results: List[Dict[str, Any]]) -> None:
+    def _handle_function_calls(self, tool_calls: List[Any],
+                              function_results: List[Dict[str, Any]]) -> List[Dict[str, str]]:
         """
-        处理函数调用
+        处理函数调用，同一步骤中的调用并发执行
 
         参数:
-            thread_id (str): 线程ID
-            run_status (Any): 运行状态对象
-            run_id (str): 运行ID
+            tool_calls (List[Any]): requires_action中的工具调用
             function_results (List[Dict[str, Any]]): 存储函数调用结果的列表
-        """
-        if run_status.required_action.type == "submit_tool_outputs":
-            tool_calls = run_status.required_action.submit_tool_outputs.tool_calls
-            tool_outputs = []
 
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
+        返回:
+            List[Dict[str, str]]: 提交给运行的工具输出
+        """
+        tool_outputs = []
 
+        for event in self.tools.run_batch(self._parse_tool_calls(tool_calls)):
+            if event.type == "start":
                 # 记录函数调用
                 function_results.append({
-                    "name": function_name,
-                    "arguments": function_args
+                    "name": event.call.name,
+                    "arguments": event.call.arguments
                 })
-
-                # 处理不同的函数调用
-                result = self._execute_function(function_name, function_args)
-
+            elif event.type == "result":
                 # 记录函数调用结果
-                function_results[-1]["result"] = result
+                function_results[-1]["result"] = event.data
 
                 # 添加到工具输出
                 tool_outputs.append({
-                    "tool_call_id": tool_call.id,
-                    "output": json.dumps(result)
+                    "tool_call_id": event.call.call_id,
+                    "output": json.dumps(event.data)
                 })
 
-            # 提交函数执行结果
-            self.client.beta.threads.runs.submit_tool_outputs(
-                thread_id=thread_id,
-                run_id=run_id,
-                tool_outputs=tool_outputs
-            )
+        return tool_outputs
 
-    def _handle_function_calls_stream(self, thread_id: str, run_status: Any, run_id: str,
-                                     function_results: List[Dict[str, Any]], format_sse) -> Any:
+    def _handle_function_calls_stream(self, tool_calls: List[Any], function_results: List[Dict[str, Any]],
+                                     format_sse, cancel_token: Optional[CancellationToken] = None) -> Any:
         """
-        处理流式函数调用
+        处理流式函数调用（生成器函数）
+
+        同一步骤中的调用并发执行，状态和进度事件仍按调用顺序输出。
 
         参数:
-            thread_id (str): 线程ID
-            run_status (Any): 运行状态对象
-            run_id (str): 运行ID
+            tool_calls (List[Any]): requires_action中的工具调用
             function_results (List[Dict[str, Any]]): 存储函数调用结果的列表
             format_sse: 格式化SSE消息的函数
+            cancel_token (Optional[CancellationToken]): 取消令牌，取消后未完成的调用被中止
 
         返回:
-            generator: 事件流生成器
+            generator: 事件流生成器，结束时返回提交给运行的工具输出
         """
-        if run_status.required_action.type == "submit_tool_outputs":
-            tool_calls = run_status.required_action.submit_tool_outputs.tool_calls
-            tool_outputs = []
-
-            yield format_sse("status", {"status": "Executing function calls..."})
+        tool_outputs = []
 
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
+        yield format_sse("status", {"status": "Executing function calls..."})
 
+        for event in self.tools.run_batch(self._parse_tool_calls(tool_calls), cancel_token):
+            if event.type == "start":
                 # 记录函数调用
                 function_results.append({
-                    "name": function_name,
-                    "arguments": function_args
+                    "name": event.call.name,
+                    "arguments": event.call.arguments
                 })
 
-                yield format_sse("status", {"status": f"Calling function: {function_name}"})
+                yield format_sse("status", {"status": f"Calling function: {event.call.name}"})
 
                 # 提供进度更新
-                function_type = self._get_function_type(function_name)
-                if function_type:
+                spec = event.data
+                if spec is not None and spec.function_type:
                     yield format_sse("progress", {
-                        "status": f"Processing {function_type}...",
+                        "status": f"Processing {spec.function_type}...",
                         "progress": {
-                            "type": function_type,
-                            "icon": self._get_function_icon(function_type)
+                            "type": spec.function_type,
+                            "icon": spec.icon
                         }
                     })
 
-                # 处理不同的函数调用
-                result = self._execute_function(function_name, function_args,
-                                              yield_status=lambda s: format_sse("status", {"status": s}))
+            elif event.type == "status":
+                yield format_sse("status", {"status": event.data})
 
+            elif event.type == "result":
                 # 记录函数调用结果
-                function_results[-1]["result"] = result
+                function_results[-1]["result"] = event.data
 
                 # 添加到工具输出
                 tool_outputs.append({
-                    "tool_call_id": tool_call.id,
-                    "output": json.dumps(result)
+                    "tool_call_id": event.call.call_id,
+                    "output": json.dumps(event.data)
                 })
 
-            # 提交函数执行结果
-            self.client.beta.threads.runs.submit_tool_outputs(
-                thread_id=thread_id,
-                run_id=run_id,
-                tool_outputs=tool_outputs
-            )
+        return tool_outputs
 
     def _execute_function(self, function_name: str, function_args: Dict[str, Any],
                          yield_status=None) -> Dict[str, Any]:
         """
-        执行函数调用
+        执行单个函数调用
 
         参数:
             function_name (str): 函数名称
@@ -424,175 +628,209 @@ class AssistantService:
         返回:
             Dict[str, Any]: 函数执行结果
         """
-        # 根据不同的函数名执行不同的功能
-        if function_name == "recommend_books":
-            user_interests = function_args.get("user_interests", "")
-
-            if yield_status:
-                yield_status("Analyzing reading interests and recommending books...")
-
-            # 获取书籍推荐助手ID
-            book_recommendation_assistant_id = current_app.config.get('BOOK_RECOMMANDATION_ASSISTANT_ID')
-            if not book_recommendation_assistant_id:
-                if yield_status:
-                    yield_status("Book recommendation assistant ID not configured")
-                return {"status": "error", "recommended_books": []}
-
-            # 调用search_books_by_interest
-            from libs import openai_assistant as oa
-            recommended_books = oa.search_books_by_interest(
-                book_recommendation_assistant_id,
-                user_interests
-            )
+        return self.tools.execute(function_name, function_args, report=yield_status)
 
-            if yield_status:
-                yield_status(f"Found {len(recommended_books)} matching book recommendations")
+    def _recommend_books(self, function_args: Dict[str, Any], report) -> Dict[str, Any]:
+        """
+        recommend_books：根据用户兴趣推荐图书
 
-            return {"status": "success", "recommended_books": recommended_books}
+        参数:
+            function_args (Dict[str, Any]): 包含user_interests的参数
+            report: 状态更新回调函数
 
-        elif function_name == "search_book_by_title":
-            title = function_args.get("title", "")
+        返回:
+            Dict[str, Any]: 包含status和recommended_books的结果
+        """
+        user_interests = function_args.get("user_interests", "")
 
-            if yield_status:
-                yield_status(f"Searching for books matching title: {title}")
+        report("Analyzing reading interests and recommending books...")
 
-            # 获取书籍推荐助手ID来获取关联的vector_store_id
-            book_recommendation_assistant_id = current_app.config.get('BOOK_RECOMMANDATION_ASSISTANT_ID')
-            if not book_recommendation_assistant_id:
-                if yield_status:
-                    yield_status("Book recommendation assistant ID not configured")
-                return {"status": "error", "matched_books": []}
+        # 服务刚启动时图书索引可能还在构建，空索引只会返回空推荐，短暂等待后仍未就绪则降级
+        if not wait_for_component("vector_store_index"):
+            report("The book library is still being prepared")
+            return {
+                "status": "unavailable",
+                "recommended_books": [],
+                "message": "The book library is still being indexed. Please try again in a minute."
+            }
 
-            # 获取助手详情以获取vector_store_id
-            from libs import openai_assistant as oa
-            client = openai.OpenAI()
-            assistant = client.beta.assistants.retrieve(book_recommendation_assistant_id)
+        # 获取书籍推荐助手ID
+        book_recommendation_assistant_id = current_app.config.get('BOOK_RECOMMANDATION_ASSISTANT_ID')
+        if not book_recommendation_assistant_id:
+            report("Book recommendation assistant ID not configured")
+            return {"status": "error", "recommended_books": []}
 
-            if assistant.tool_resources and assistant.tool_resources.file_search:
-                vector_store_ids = assistant.tool_resources.file_search.vector_store_ids
-                if vector_store_ids:
-                    vector_store_id = vector_store_ids[0]
-                    if yield_status:
-                        yield_status(f"Searching using vector_store: {vector_store_id}")
+        # 调用search_books_by_interest
+        from libs import openai_assistant as oa
+        recommended_books = oa.search_books_by_interest(
+            book_recommendation_assistant_id,
+            user_interests
+        )
 
-                    matched_books = oa.search_book_by_title(vector_store_id, title)
+        recommended_books = self._validate_recommendations(recommended_books)
 
-                    if yield_status:
-                        yield_status(f"Found {len(matched_books)} matching books")
+        report(f"Found {len(recommended_books)} matching book recommendations")
 
-                    return {"status": "success", "matched_books": matched_books}
+        # 孩子通常会接着讨论推荐的书，提前在后台批量加载内容到缓存
+        book_ids = [book["book_id"] for book in recommended_books if book.get("book_id")]
+        if book_ids:
+            threading.Thread(
+                target=self.data_service.warm_content_cache,
+                args=(book_ids,),
+                daemon=True
+            ).start()
 
-            return {"status": "error", "matched_books": []}
+        return {"status": "success", "recommended_books": recommended_books}
 
-        elif function_name == "get_book_content":
-            book_id = function_args.get("book_id", "")
+    def _search_book_by_title(self, function_args: Dict[str, Any], report) -> Dict[str, Any]:
+        """
+        search_book_by_title：根据书名搜索图书
 
-            if yield_status:
-                yield_status(f"Retrieving content for book: {book_id}")
+        参数:
+            function_args (Dict[str, Any]): 包含title的参数
+            report: 状态更新回调函数
 
-            # 调用data_source获取图书内容
-            from libs import openai_assistant as oa
-            book_data = oa.get_book_content(book_id)
+        返回:
+            Dict[str, Any]: 包含status和matched_books的结果
+        """
+        title = function_args.get("title", "")
 
-            if book_data:
-                if yield_status:
-                    yield_status(f"Successfully retrieved content for '{book_data['book_title']}'")
-                return {"status": "success", "book": book_data}
-            else:
-                if yield_status:
-                    yield_status(f"Book with ID {book_id} not found")
-                return {"status": "not_found", "book": None}
+        report(f"Searching for books matching title: {title}")
+
+        # 使用本地书名索引搜索，无需调用OpenAI
+        matched_books = self.data_service.search_books_by_title(title)
 
-        return {"status": "function_not_found"}
+        report(f"Found {len(matched_books)} matching books")
 
-    def _get_assistant_reply(self, thread_id: str, function_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"status": "success", "matched_books": matched_books}
+
+    def _get_book_content(self, function_args: Dict[str, Any], report) -> Dict[str, Any]:
         """
-        获取Assistant的回复
+        get_book_content：获取图书内容，可以只获取部分页面
 
         参数:
-            thread_id (str): 线程ID
-            function_results (List[Dict[str, Any]]): 函数调用结果列表
+            function_args (Dict[str, Any]): 包含book_id以及可选的start_page和end_page的参数
+            report: 状态更新回调函数
 
         返回:
-            Dict[str, Any]: 包含回复文本、音频URL和函数调用结果的字典
+            Dict[str, Any]: 包含status和book的结果
         """
-        # 获取最新的助手回复
-        messages = self.client.beta.threads.messages.list(thread_id=thread_id)
+        book_id = function_args.get("book_id", "")
+        start_page = function_args.get("start_page")
+        end_page = function_args.get("end_page")
 
-        # 获取最新的助手回复（第一条消息是最新的）
-        assistant_message = None
-        for msg in messages.data:
-            if msg.role == "assistant":
-                assistant_message = msg
-                break
+        report(f"Retrieving content for book: {book_id}")
 
-        if not assistant_message:
-            return {"error": "No response received from assistant"}
+        # 通过数据服务获取图书内容（带本地缓存），只返回请求的页面
+        book_data = self.data_service.get_book_pages(book_id, start_page, end_page)
 
-        # 提取文本内容
-        ai_response = ""
-        for content in assistant_message.content:
-            if content.type == "text":
-                # 使用openai_assistant模块中的clean_text函数清理文本
-                from libs.openai_assistant import clean_text
-                ai_response += clean_text(content.text.value)
+        if book_data:
+            report(f"Successfully retrieved content for '{book_data['book_title']}' "
+                   f"(pages {book_data['start_page']}-{book_data['end_page']} of {book_data['page_count']})")
+            return {"status": "success", "book": book_data}
 
-        # 生成语音
-        audio_data = self.openai_service.text_to_speech(ai_response)
+        report(f"Book with ID {book_id} not found")
+        return {"status": "not_found", "book": None}
 
-        # 创建临时文件
-        audio_path, filename = create_temp_file(audio_data, suffix='.mp3')
+    def _validate_recommendations(self, recommended_books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        用本地书籍目录校验推荐助手返回的书籍
 
-        # 保存文件引用
-        save_temp_file_reference(filename, audio_path)
+        丢弃目录中不存在的book_id，并用目录中的标题和描述替换助手生成的内容；
+        本地目录尚未同步（为空）时原样返回。
 
-        # 构建响应
-        return {
-            "text": ai_response,
-            "html": render_markdown_to_html(ai_response),
-            "audio_url": f"/api/audio/{filename}",
-            "function_results": function_results
-        }
+        参数:
+            recommended_books (List[Dict[str, Any]]): 推荐助手返回的书籍列表
 
-    def _get_function_type(self, function_name: str) -> Optional[str]:
+        返回:
+            List[Dict[str, Any]]: 校验后的书籍列表
+        """
+        store = get_catalog_store(self.data_service.catalog_path)
+        if len(store) == 0:
+            return recommended_books
+
+        validated = []
+        for book in recommended_books:
+            record = store.get(book.get("book_id", ""))
+            if record is None:
+                print(f"⚠️ 推荐的书籍不在目录中，已忽略: {book.get('book_id')}")
+                continue
+            validated.append({
+                **book,
+                "book_title": record.get("book_title", book.get("book_title")),
+                "book_description": record.get("book_Description", "")
+            })
+        return validated
+
+    def _get_assistant_reply(self, thread_id: str, function_results: List[Dict[str, Any]],
+                             reply_text: Optional[str] = None,
+                             cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
-        根据函数名获取函数类型
+        获取Assistant的回复
 
         参数:
-            function_name (str): 函数名称
+            thread_id (str): 线程ID
+            function_results (List[Dict[str, Any]]): 函数调用结果列表
+            reply_text (Optional[str]): 运行事件流中已经收到的回复文本，提供时不再查询消息列表
+            cancel_token (Optional[CancellationToken]): 取消令牌，已取消时跳过语音合成
 
         返回:
-            Optional[str]: 函数类型或None
-        """
-        function_types = {
-            "recommend_books": "book_recommendation",
-            "search_book_by_title": "book_search",
-            "get_book_content": "book_content"
-        }
-        return function_types.get(function_name)
+            Dict[str, Any]: 包含回复文本、音频URL、分段音频的播放列表和函数调用结果的字典
 
-    def _get_function_icon(self, function_type: str) -> str:
+        异常:
+            Cancelled: 取消令牌被取消时抛出
         """
-        根据函数类型获取图标
+        # 使用openai_assistant模块中的clean_text函数清理文本
+        from libs.openai_assistant import clean_text
 
-        参数:
-            function_type (str): 函数类型
+        if reply_text:
+            ai_response = clean_text(reply_text)
+        else:
+            # 获取最新的助手回复
+            messages = self.client.beta.threads.messages.list(thread_id=thread_id)
 
-        返回:
-            str: 图标字符
-        """
-        icons = {
-            "book_recommendation": "📚",
-            "book_search": "🔍",
-            "book_content": "📖"
+            # 获取最新的助手回复（第一条消息是最新的）
+            assistant_message = None
+            for msg in messages.data:
+                if msg.role == "assistant":
+                    assistant_message = msg
+                    break
+
+            if not assistant_message:
+                return {"error": "No response received from assistant"}
+
+            # 提取文本内容
+            ai_response = ""
+            for content in assistant_message.content:
+                if content.type == "text":
+                    ai_response += clean_text(content.text.value)
+
+        # 客户端已经断开时没有人会播放语音
+        if cancel_token is not None and cancel_token.is_cancelled:
+            record_saved("tts_skipped")
+            raise Cancelled(cancel_token.reason)
+
+        # 在后台按句子分段合成语音，回复文本立即返回；audio_url在合成完成前就可以请求，
+        # 第一句可以在后面的句子还在合成时开始播放
+        audio_url, playlist = self.tts_cache.synthesize_playlist(ai_response, openai_service=self.openai_service,
+                                                                 stream=True)
+
+        # 构建响应
+        return {
+            "text": ai_response,
+            "html": render_markdown_to_html(ai_response),
+            "audio_url": audio_url,
+            "audio_playlist": playlist,
+            "function_results": function_results
         }
-        return icons.get(function_type, "🔄")
 
     @staticmethod
     def ensure_assistant() -> str:
         """
         确保Assistant存在，若不存在则创建
 
+        定义没有变化时复用注册表中记录的Assistant，变化时原地更新。
+
         返回:
             str: Assistant ID
 
@@ -600,14 +838,15 @@ class AssistantService:
             >>> assistant_id = AssistantService.ensure_assistant()
             >>> print(f"Assistant ID: {assistant_id}")
         """
-        from libs import openai_assistant as oa
-        return oa.ensure_assistant()
+        return get_assistant_registry().ensure(learning_assistant_spec())
 
     @staticmethod
     def ensure_book_recommendation_assistant(library_data_file: str) -> str:
         """
         确保图书推荐Assistant存在，若不存在则创建
 
+        图书目录内容没有变化时复用已有的Vector Store，变化时上传新目录并替换旧的Vector Store。
+
         参数:
             library_data_file (str): 图书数据文件路径
 
@@ -618,8 +857,7 @@ class AssistantService:
             >>> assistant_id = AssistantService.ensure_book_recommendation_assistant("/path/to/library.json")
             >>> print(f"Book Recommendation Assistant ID: {assistant_id}")
         """
-        from libs import openai_assistant as oa
-        return oa.ensure_assistant_for_recommand_books(library_data_file)
+        return get_assistant_registry().ensure(book_recommendation_assistant_spec(library_data_file))
 
     @staticmethod
     def delete_assistant(assistant_id: str) -> None:
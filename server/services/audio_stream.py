@@ -0,0 +1,262 @@
+"""
+音频流
+在后台线程中消费流式合成的音频，把收到的数据块同时转发给所有收听者并在结束后写入存储
+"""
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class AudioStream:
+    """
+    一次正在进行的流式合成
+
+    生产者通过append追加数据块、通过finish结束；收听者通过iter_chunks从头读取，
+    读到已有数据的末尾时等待新的数据块，因此后加入的收听者也能得到完整的音频。
+
+    属性:
+        key (str): 流的键
+        started_at (float): 开始合成的时间（time.monotonic）
+        first_byte_at (Optional[float]): 收到第一个数据块的时间
+        error (Optional[BaseException]): 合成失败时的异常
+        listeners (int): 加入过的收听者数
+    """
+
+    def __init__(self, key: str):
+        """
+        初始化音频流
+
+        参数:
+            key (str): 流的键
+
+        示例:
+            >>> stream = AudioStream("3f2a...")
+            >>> stream.append(b"ID3...")
+            >>> stream.finish()
+        """
+        self.key = key
+        self.started_at = time.monotonic()
+        self.first_byte_at: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self.listeners = 0
+        self._chunks: List[bytes] = []
+        self._done = False
+        self._cond = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        """是否已经结束（成功或失败）"""
+        with self._cond:
+            return self._done
+
+    def append(self, chunk: bytes) -> None:
+        """
+        追加数据块并唤醒等待的收听者
+
+        参数:
+            chunk (bytes): 音频数据块
+        """
+        if not chunk:
+            return
+        with self._cond:
+            if self.first_byte_at is None:
+                self.first_byte_at = time.monotonic()
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """
+        结束音频流
+
+        参数:
+            error (Optional[BaseException]): 合成失败时的异常
+        """
+        with self._cond:
+            self.error = error
+            self._done = True
+            self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待音频流结束
+
+        参数:
+            timeout (Optional[float]): 最长等待时间（秒），None表示一直等待
+
+        返回:
+            bool: 是否已经结束
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._done, timeout)
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """
+        从头读取音频数据块，直到音频流结束（生成器函数）
+
+        合成失败时在已发送的数据之后结束，不抛出异常。
+
+        返回:
+            Iterator[bytes]: 音频数据块
+
+        示例:
+            >>> return Response(stream.iter_chunks(), mimetype="audio/mpeg")
+        """
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: index < len(self._chunks) or self._done)
+                chunks = self._chunks[index:]
+                done = self._done
+            index += len(chunks)
+            for chunk in chunks:
+                yield chunk
+            if done and not chunks:
+                return
+
+    def data(self) -> bytes:
+        """
+        获取目前收到的全部音频数据
+
+        返回:
+            bytes: 音频数据
+        """
+        with self._cond:
+            return b"".join(self._chunks)
+
+
+class AudioStreamHub:
+    """
+    音频流中心
+
+    同一个键同时只有一个合成在进行：start在后台线程中消费合成流并返回AudioStream，
+    重复的start和get返回同一个流，让第二个收听者加入还在进行的合成。
+    合成成功后先调用on_complete保存完整音频，再把流从中心移除，
+    因此找不到进行中的流时，音频要么已经保存，要么合成失败了。
+
+    属性:
+        streams (Dict[str, AudioStream]): 进行中的音频流
+    """
+
+    def __init__(self):
+        """
+        初始化音频流中心
+
+        示例:
+            >>> hub = AudioStreamHub()
+            >>> stream, started = hub.start(key, lambda: service.text_to_speech_stream(text), save)
+        """
+        self.streams: Dict[str, AudioStream] = {}
+        self._lock = threading.Lock()
+        self._metrics = {"started": 0, "completed": 0, "failed": 0, "listeners": 0, "shared_listeners": 0,
+                         "first_bytes": 0, "first_byte_seconds_total": 0.0}
+
+    def start(self, key: str, source: Callable[[], Iterable[bytes]],
+              on_complete: Optional[Callable[[bytes], Any]] = None,
+              executor: Optional[Executor] = None) -> Tuple[AudioStream, bool]:
+        """
+        开始一次流式合成，同一个键的合成已在进行时直接返回它
+
+        流在调用时就登记，收听者可以立即加入；提供executor时合成在其中排队执行，
+        用于限制一组合成的并发数，在轮到它之前收听者等待第一个数据块。
+
+        参数:
+            key (str): 流的键
+            source (Callable[[], Iterable[bytes]]): 返回音频数据块的函数，在后台线程中调用
+            on_complete (Optional[Callable[[bytes], Any]]): 合成成功后用完整音频调用的函数
+            executor (Optional[Executor]): 执行合成的线程池，默认为每个合成启动一个线程
+
+        返回:
+            Tuple[AudioStream, bool]: 音频流，以及本次调用是否开始了新的合成
+        """
+        with self._lock:
+            stream = self.streams.get(key)
+            if stream is not None:
+                return stream, False
+            stream = AudioStream(key)
+            self.streams[key] = stream
+            self._metrics["started"] += 1
+
+        if executor is not None:
+            executor.submit(self._produce, stream, source, on_complete)
+        else:
+            threading.Thread(target=self._produce, args=(stream, source, on_complete),
+                             name="tts-stream", daemon=True).start()
+        return stream, True
+
+    def _produce(self, stream: AudioStream, source: Callable[[], Iterable[bytes]],
+                 on_complete: Optional[Callable[[bytes], Any]]) -> None:
+        """消费合成流，结束后保存音频并移除流"""
+        # 在线程池中排队的时间不计入首字节时间
+        stream.started_at = time.monotonic()
+        error = None
+        try:
+            for chunk in source():
+                stream.append(chunk)
+            if on_complete is not None:
+                on_complete(stream.data())
+        except Exception as e:
+            error = e
+            print(f"⚠️ 流式语音合成失败: {str(e)}")
+        finally:
+            with self._lock:
+                self.streams.pop(stream.key, None)
+                self._metrics["failed" if error is not None else "completed"] += 1
+                if stream.first_byte_at is not None:
+                    self._metrics["first_bytes"] += 1
+                    self._metrics["first_byte_seconds_total"] += stream.first_byte_at - stream.started_at
+            stream.finish(error)
+
+    def get(self, key: str) -> Optional[AudioStream]:
+        """
+        获取进行中的音频流
+
+        参数:
+            key (str): 流的键
+
+        返回:
+            Optional[AudioStream]: 进行中的音频流，不存在时返回None
+        """
+        with self._lock:
+            return self.streams.get(key)
+
+    def attach(self, key: str) -> Optional[AudioStream]:
+        """
+        作为收听者加入进行中的音频流
+
+        参数:
+            key (str): 流的键
+
+        返回:
+            Optional[AudioStream]: 进行中的音频流，不存在时返回None
+
+        示例:
+            >>> stream = hub.attach(key)
+            >>> if stream is not None:
+            >>>     return Response(stream.iter_chunks(), mimetype="audio/mpeg")
+        """
+        with self._lock:
+            stream = self.streams.get(key)
+            if stream is not None:
+                stream.listeners += 1
+                self._metrics["listeners"] += 1
+                if stream.listeners > 1:
+                    self._metrics["shared_listeners"] += 1
+            return stream
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+
+        返回:
+            Dict[str, Any]: 包含active（进行中的流数）、started、completed、failed、listeners、
+                            shared_listeners（加入已有收听者的流的次数）和avg_first_byte_seconds的字典
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            active = len(self.streams)
+        first_bytes = metrics.pop("first_bytes")
+        total = metrics.pop("first_byte_seconds_total")
+        metrics["active"] = active
+        metrics["avg_first_byte_seconds"] = round(total / first_bytes, 3) if first_bytes else 0.0
+        return metrics
@@ -0,0 +1,115 @@
+"""
+书籍内容缓存
+把从数据库获取的书籍内容压缩后缓存到本地磁盘
+"""
+import os
+import gzip
+import json
+from typing import Optional, Dict, Any
+
+from utils.disk_cache import DiskLRUCache
+
+# 默认缓存容量上限（字节）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 默认缓存有效期（秒）
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+class BookContentCache:
+    """
+    书籍内容缓存类
+
+    以书籍的PERMANENT_ID为键，将书籍记录序列化为JSON并使用gzip压缩后保存在
+    cache目录下，超出容量上限时按LRU淘汰，超过有效期的条目视为未命中。
+
+    属性:
+        store (DiskLRUCache): 底层磁盘缓存
+    """
+
+    def __init__(self, cache_dir: str,
+                 max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        """
+        初始化书籍内容缓存
+
+        参数:
+            cache_dir (str): 项目缓存目录，书籍内容保存在其中的book_content子目录
+            max_bytes (Optional[int]): 缓存容量上限，默认从环境变量BOOK_CACHE_MAX_BYTES获取
+            ttl_seconds (Optional[float]): 缓存有效期（秒），默认从环境变量BOOK_CACHE_TTL_SECONDS获取
+
+        示例:
+            >>> cache = BookContentCache("/path/to/cache")
+            >>> cache = BookContentCache("/path/to/cache", max_bytes=10 * 1024 * 1024, ttl_seconds=600)
+        """
+        if max_bytes is None:
+            max_bytes = int(os.getenv("BOOK_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("BOOK_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+
+        self.store = DiskLRUCache(
+            os.path.join(cache_dir, "book_content"),
+            max_bytes=max_bytes,
+            ttl_seconds=ttl_seconds,
+            suffix=".json.gz"
+        )
+
+    def get(self, book_id: str) -> Optional[Dict[str, Any]]:
+        """
+        从缓存中读取书籍记录
+
+        参数:
+            book_id (str): 书籍ID
+
+        返回:
+            Optional[Dict[str, Any]]: 缓存的书籍记录，未命中时返回None
+
+        示例:
+            >>> book = cache.get("12550-1")
+        """
+        data = self.store.get(book_id)
+        if data is None:
+            return None
+
+        try:
+            return json.loads(gzip.decompress(data).decode("utf-8"))
+        except (OSError, ValueError) as e:
+            # 损坏的缓存文件直接丢弃
+            print(f"⚠️ 书籍缓存条目损坏 {book_id}: {str(e)}")
+            self.store.delete(book_id)
+            return None
+
+    def set(self, book_id: str, book: Dict[str, Any]) -> None:
+        """
+        把书籍记录写入缓存
+
+        参数:
+            book_id (str): 书籍ID
+            book (Dict[str, Any]): 书籍记录
+
+        示例:
+            >>> cache.set("12550-1", {"book_id": "12550-1", "book_title": "...", ...})
+        """
+        payload = json.dumps(book, ensure_ascii=False).encode("utf-8")
+        try:
+            self.store.set(book_id, gzip.compress(payload, compresslevel=6))
+        except OSError as e:
+            # 缓存写入失败不影响正常返回
+            print(f"⚠️ 书籍缓存写入错误 {book_id}: {str(e)}")
+
+    def invalidate(self, book_id: str) -> None:
+        """
+        删除书籍的缓存记录
+
+        参数:
+            book_id (str): 书籍ID
+        """
+        self.store.delete(book_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        返回:
+            Dict[str, Any]: 命中/未命中计数、条目数和占用字节数
+        """
+        return self.store.stats()
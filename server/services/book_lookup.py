@@ -0,0 +1,138 @@
+"""
+书籍查询的共享状态
+使用同一个数据库的DataService实例共享负缓存和进行中的查询，目录同步清除的负缓存对所有实例生效
+"""
+import time
+import threading
+import weakref
+from typing import Any, Dict, List, Optional
+
+from utils.single_flight import SingleFlight
+
+# 负缓存最多记录的书籍ID数量
+NEGATIVE_CACHE_MAX_ENTRIES = 10000
+
+
+class BookLookup:
+    """
+    书籍查询的负缓存和请求合并
+
+    负缓存记录数据库中不存在的书籍ID及其过期时间，有效期由记录它的DataService决定；
+    flight让相同书籍的并发查询共享一次数据库查询。
+
+    属性:
+        flight (SingleFlight): 进行中的书籍查询
+    """
+
+    def __init__(self, max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES):
+        """
+        初始化书籍查询状态
+
+        参数:
+            max_entries (int): 负缓存最多记录的书籍ID数量
+
+        示例:
+            >>> lookup = BookLookup()
+            >>> lookup.remember_missing(["404-1"], ttl=60)
+        """
+        self.flight = SingleFlight()
+        self.max_entries = max_entries
+        self._missing_books: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._negative_hits = 0
+
+    def is_missing(self, book_id: str) -> bool:
+        """
+        判断书籍ID是否在负缓存中且未过期
+
+        参数:
+            book_id (str): 书籍ID
+
+        返回:
+            bool: 在有效期内被记录为不存在时返回True
+        """
+        with self._lock:
+            expires_at = self._missing_books.get(book_id)
+            if expires_at is None:
+                return False
+            if expires_at <= time.monotonic():
+                del self._missing_books[book_id]
+                return False
+            self._negative_hits += 1
+            return True
+
+    def remember_missing(self, book_ids: List[str], ttl: float) -> None:
+        """
+        把数据库中不存在的书籍ID记入负缓存
+
+        参数:
+            book_ids (List[str]): 书籍ID列表
+            ttl (float): 有效期（秒）
+        """
+        if ttl <= 0 or not book_ids:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for book_id in book_ids:
+                self._missing_books.pop(book_id, None)
+                self._missing_books[book_id] = now + ttl
+            if len(self._missing_books) > self.max_entries:
+                # 先清理过期的ID，仍然超出时丢弃最早记录的ID
+                for book_id in [key for key, expires_at in self._missing_books.items() if expires_at <= now]:
+                    del self._missing_books[book_id]
+                while len(self._missing_books) > self.max_entries:
+                    del self._missing_books[next(iter(self._missing_books))]
+
+    def forget_missing(self, book_ids: Optional[List[str]] = None) -> None:
+        """
+        从负缓存中移除书籍ID
+
+        参数:
+            book_ids (Optional[List[str]]): 要移除的书籍ID，为None时清空负缓存
+        """
+        with self._lock:
+            if book_ids is None:
+                self._missing_books.clear()
+                return
+            for book_id in book_ids:
+                self._missing_books.pop(book_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取负缓存统计信息
+
+        返回:
+            Dict[str, int]: 包含negative_hits（负缓存命中数）和negative_entries（记录的书籍ID数）的字典
+        """
+        with self._lock:
+            return {"negative_hits": self._negative_hits, "negative_entries": len(self._missing_books)}
+
+
+# 进程内共享的书籍查询状态，按连接池区分：连接池对应一个数据库，连接池被回收时状态随之释放
+_shared_lookups: "weakref.WeakKeyDictionary[Any, BookLookup]" = weakref.WeakKeyDictionary()
+_shared_lookups_lock = threading.Lock()
+
+
+def get_book_lookup(pool: Any) -> BookLookup:
+    """
+    获取使用该连接池的DataService共享的书籍查询状态
+
+    api、controllers和目录同步中的DataService使用后端的共享连接池，因此共享同一个负缓存：
+    目录同步发现新上架的书籍时清除的负缓存对所有实例生效。
+
+    参数:
+        pool (Any): DataService的数据库连接池
+
+    返回:
+        BookLookup: 书籍查询状态
+
+    示例:
+        >>> lookup = get_book_lookup(data_service.pool)
+        >>> lookup.forget_missing(["12550-1"])
+    """
+    with _shared_lookups_lock:
+        lookup = _shared_lookups.get(pool)
+        if lookup is None:
+            lookup = BookLookup()
+            _shared_lookups[pool] = lookup
+        return lookup
@@ -0,0 +1,211 @@
+"""
+书籍目录存储
+通过mmap和book_id偏移索引按需读取书籍目录中的单条记录
+"""
+import os
+import mmap
+import json
+import time
+import threading
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from utils.file_utils import write_file_atomic
+
+# 检查目录文件是否变化的最短间隔（秒）
+STAT_CHECK_INTERVAL = 1.0
+
+
+def build_offset_index(catalog_path: str, catalog_file: Optional[BinaryIO] = None) -> Dict[str, Any]:
+    """
+    扫描JSON Lines格式的目录文件，生成book_id到(偏移, 长度)的索引并写入旁边的.idx文件
+
+    参数:
+        catalog_path (str): 目录文件路径
+        catalog_file (Optional[BinaryIO]): 已打开的目录文件，传入时基于该文件生成索引，
+                                           保证索引与调用方映射的是同一个文件
+
+    返回:
+        Dict[str, Any]: 索引内容，包含source_size、source_mtime_ns和offsets
+
+    示例:
+        >>> index = build_offset_index("cache/production_books.json")
+        >>> print(f"索引了 {len(index['offsets'])} 本书")
+    """
+    if catalog_file is None:
+        with open(catalog_path, "rb") as f:
+            return build_offset_index(catalog_path, f)
+
+    stat = os.fstat(catalog_file.fileno())
+    offsets = {}
+    position = 0
+    catalog_file.seek(0)
+    for line in catalog_file:
+        length = len(line.rstrip(b"\r\n"))
+        if length:
+            try:
+                book_id = json.loads(line[:length]).get("book_id")
+            except ValueError:
+                book_id = None
+            if book_id:
+                offsets[book_id] = [position, length]
+        position += len(line)
+
+    index = {
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "offsets": offsets
+    }
+    write_file_atomic(index_path_for(catalog_path), json.dumps(index, separators=(",", ":")))
+    return index
+
+
+def index_path_for(catalog_path: str) -> str:
+    """返回目录文件对应的偏移索引文件路径"""
+    return os.path.splitext(catalog_path)[0] + ".idx"
+
+
+class CatalogStore:
+    """
+    基于mmap的书籍目录存储
+
+    目录文件以只读方式映射到内存，同一台机器上的所有工作进程共享操作系统的页缓存；
+    偏移索引记录每个book_id所在行的位置，查找一条记录只需一次切片和一次小的JSON解码。
+    目录文件被替换（例如CatalogSync原子写入）后会自动重新映射，索引过期时自动重建。
+
+    属性:
+        catalog_path (str): 目录文件路径
+        index_path (str): 偏移索引文件路径
+    """
+
+    def __init__(self, catalog_path: str):
+        """
+        初始化目录存储
+
+        参数:
+            catalog_path (str): JSON Lines格式的目录文件路径
+
+        示例:
+            >>> store = CatalogStore("cache/production_books.json")
+            >>> book = store.get("14082-1")
+        """
+        self.catalog_path = catalog_path
+        self.index_path = index_path_for(catalog_path)
+
+        self._lock = threading.Lock()
+        self._mmap: Optional[mmap.mmap] = None
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+        self._last_stat_check = 0.0
+
+    def _load_index(self, catalog_file: BinaryIO, signature: Tuple[int, int]) -> Dict[str, Any]:
+        """读取与当前目录文件匹配的索引，不匹配或不存在时重建"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if (index.get("source_size"), index.get("source_mtime_ns")) == signature:
+                return index
+        except (OSError, ValueError):
+            pass
+        return build_offset_index(self.catalog_path, catalog_file)
+
+    def _refresh_locked(self) -> None:
+        """目录文件变化时重新映射文件并加载索引，调用方需持有锁"""
+        try:
+            stat = os.stat(self.catalog_path)
+        except OSError:
+            self._close_locked()
+            return
+
+        if (stat.st_size, stat.st_mtime_ns) == self._signature:
+            return
+
+        self._close_locked()
+        with open(self.catalog_path, "rb") as f:
+            # 以打开的文件为准，避免文件在检查和映射之间被替换
+            stat = os.fstat(f.fileno())
+            signature = (stat.st_size, stat.st_mtime_ns)
+            index = self._load_index(f, signature)
+            if stat.st_size > 0:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = {book_id: tuple(entry) for book_id, entry in index["offsets"].items()}
+        self._signature = signature
+
+    def _close_locked(self) -> None:
+        """释放当前的内存映射，调用方需持有锁"""
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = None
+        self._offsets = {}
+        self._signature = None
+
+    def _ensure_fresh(self) -> None:
+        """按STAT_CHECK_INTERVAL节流检查目录文件是否变化"""
+        now = time.monotonic()
+        if self._signature is not None and now - self._last_stat_check < STAT_CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._last_stat_check = now
+            self._refresh_locked()
+
+    def get(self, book_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按book_id读取目录记录
+
+        参数:
+            book_id (str): 书籍ID
+
+        返回:
+            Optional[Dict[str, Any]]: 目录记录（book_id、book_title、book_Description），不存在时返回None
+
+        示例:
+            >>> book = store.get("14082-1")
+            >>> if book:
+            >>>     print(book["book_title"])
+        """
+        self._ensure_fresh()
+        with self._lock:
+            entry = self._offsets.get(book_id)
+            if entry is None or self._mmap is None:
+                return None
+            offset, length = entry
+            data = self._mmap[offset:offset + length]
+        return json.loads(data)
+
+    def __contains__(self, book_id: str) -> bool:
+        self._ensure_fresh()
+        return book_id in self._offsets
+
+    def __len__(self) -> int:
+        self._ensure_fresh()
+        return len(self._offsets)
+
+    def close(self) -> None:
+        """释放内存映射"""
+        with self._lock:
+            self._close_locked()
+
+
+# 进程内共享的目录存储，按目录文件路径区分
+_shared_stores: Dict[str, CatalogStore] = {}
+_shared_stores_lock = threading.Lock()
+
+
+def get_catalog_store(catalog_path: str) -> CatalogStore:
+    """
+    获取进程内共享的目录存储
+
+    参数:
+        catalog_path (str): 目录文件路径
+
+    返回:
+        CatalogStore: 目录存储
+
+    示例:
+        >>> store = get_catalog_store(data_service.catalog_path)
+    """
+    with _shared_stores_lock:
+        store = _shared_stores.get(catalog_path)
+        if store is None:
+            store = CatalogStore(catalog_path)
+            _shared_stores[catalog_path] = store
+        return store
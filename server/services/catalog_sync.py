@@ -0,0 +1,271 @@
+"""
+书籍目录同步
+增量同步生产环境书籍目录（production_books.json）到本地缓存
+"""
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from utils.file_utils import write_file_atomic
+from services.catalog_store import build_offset_index
+
+# 默认增量同步间隔（秒）
+DEFAULT_SYNC_INTERVAL = 15 * 60
+# 默认全量刷新间隔（秒），全量刷新可以移除已下架的书籍
+DEFAULT_FULL_REFRESH_INTERVAL = 24 * 60 * 60
+
+# 书籍目录查询，{condition}为增量同步的过滤条件
+CATALOG_SQL = """
+SELECT distinct PERMANENT_ID, TITLE, DESCRIPTION,
+       GREATEST(RB._FIVETRAN_SYNCED, PB._FIVETRAN_SYNCED, PBE._FIVETRAN_SYNCED) AS SYNCED_AT
+FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.REGULAR_BOOK RB
+        INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK PB ON PB.PUBLISHED_BOOK_ID = RB.ID
+        INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK_ENVIRONMENTS PBE
+                ON PBE.PUBLISHED_BOOK_ID = PB.ID
+        INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.ENVIRONMENT E
+                ON E.ID = PBE.ENVIRONMENTS_ID
+    AND E.NAME = 'production'
+{condition};
+"""
+
+INCREMENTAL_CONDITION = "WHERE GREATEST(RB._FIVETRAN_SYNCED, PB._FIVETRAN_SYNCED, PBE._FIVETRAN_SYNCED) >= %s"
+
+
+def read_catalog(catalog_path: str) -> "OrderedDict[str, Dict[str, Any]]":
+    """
+    读取JSON Lines格式的书籍目录
+
+    参数:
+        catalog_path (str): 目录文件路径
+
+    返回:
+        OrderedDict[str, Dict[str, Any]]: 以book_id为键、保持文件顺序的书籍记录，文件不存在时为空
+    """
+    books = OrderedDict()
+    if not os.path.exists(catalog_path):
+        return books
+
+    with open(catalog_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                book = json.loads(line)
+            except ValueError:
+                continue
+            if book.get("book_id"):
+                books[book["book_id"]] = book
+    return books
+
+
+class CatalogSync:
+    """
+    书籍目录同步器
+
+    以Fivetran的_FIVETRAN_SYNCED时间戳作为水位线，每次只拉取水位线之后新增或修改的书籍，
+    合并到本地目录文件后原子替换。全量刷新返回空结果时拒绝覆盖已有的目录。
+    同步状态保存在目录文件旁边的.meta.json文件中。
+
+    属性:
+        data_service: 数据服务实例，提供catalog_path、_query和content_cache
+        catalog_path (str): 目录文件路径
+        meta_path (str): 同步状态文件路径
+        interval (float): 后台增量同步间隔（秒）
+        full_refresh_interval (float): 全量刷新间隔（秒）
+    """
+
+    def __init__(self, data_service: Any,
+                 interval: Optional[float] = None,
+                 full_refresh_interval: Optional[float] = None):
+        """
+        初始化目录同步器
+
+        参数:
+            data_service: 数据服务实例
+            interval (Optional[float]): 后台增量同步间隔（秒），默认从环境变量CATALOG_SYNC_INTERVAL_SECONDS获取
+            full_refresh_interval (Optional[float]): 全量刷新间隔（秒），默认从环境变量CATALOG_FULL_REFRESH_SECONDS获取
+
+        示例:
+            >>> sync = CatalogSync(DataService())
+            >>> sync.sync()
+        """
+        self.data_service = data_service
+        self.catalog_path = data_service.catalog_path
+        self.meta_path = os.path.splitext(self.catalog_path)[0] + ".meta.json"
+        self.interval = interval if interval is not None else float(
+            os.getenv("CATALOG_SYNC_INTERVAL_SECONDS", DEFAULT_SYNC_INTERVAL))
+        self.full_refresh_interval = full_refresh_interval if full_refresh_interval is not None else float(
+            os.getenv("CATALOG_FULL_REFRESH_SECONDS", DEFAULT_FULL_REFRESH_INTERVAL))
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def load_meta(self) -> Dict[str, Any]:
+        """
+        读取同步状态
+
+        返回:
+            Dict[str, Any]: 包含watermark、last_sync、last_full_sync和book_count的字典，不存在时为空
+        """
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self, meta: Dict[str, Any]) -> None:
+        """原子地保存同步状态"""
+        write_file_atomic(self.meta_path, json.dumps(meta, indent=2))
+
+    def needs_full_refresh(self, meta: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        判断是否需要全量刷新（没有水位线或距离上次全量刷新已超过全量刷新间隔）
+
+        参数:
+            meta (Optional[Dict[str, Any]]): 同步状态，默认从文件读取
+
+        返回:
+            bool: 需要全量刷新时返回True
+        """
+        meta = self.load_meta() if meta is None else meta
+        if not meta.get("watermark") or not os.path.exists(self.catalog_path):
+            return True
+        return time.time() - meta.get("last_full_sync", 0) > self.full_refresh_interval
+
+    def sync(self, full: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        同步书籍目录
+
+        参数:
+            full (Optional[bool]): True为全量刷新，False为增量同步，None时自动判断
+
+        返回:
+            Dict[str, Any]: 同步结果，包含mode、fetched、added、updated、removed和book_count
+
+        异常:
+            Exception: 数据库查询失败时抛出，已有的目录文件保持不变
+
+        示例:
+            >>> result = sync.sync()
+            >>> print(f"新增 {result['added']} 本，更新 {result['updated']} 本")
+        """
+        with self._lock:
+            meta = self.load_meta()
+            if full is None:
+                full = self.needs_full_refresh(meta)
+
+            if full:
+                rows = self.data_service._query(CATALOG_SQL.format(condition=""))
+            else:
+                rows = self.data_service._query(
+                    CATALOG_SQL.format(condition=INCREMENTAL_CONDITION),
+                    (meta["watermark"],)
+                )
+
+            current = read_catalog(self.catalog_path)
+            fetched = OrderedDict()
+            watermark = meta.get("watermark")
+            for row in rows:
+                fetched[row[0]] = {
+                    "book_id": row[0],
+                    "book_title": row[1],
+                    "book_Description": row[2]
+                }
+                synced_at = self._format_watermark(row[3]) if len(row) > 3 else None
+                if synced_at and (watermark is None or synced_at > watermark):
+                    watermark = synced_at
+
+            result = {"mode": "full" if full else "incremental", "fetched": len(fetched),
+                      "added": 0, "updated": 0, "removed": 0}
+
+            if full:
+                if not fetched:
+                    # 拒绝用空结果覆盖已有的目录，也不创建空目录
+                    print(f"⚠️ 全量同步返回0本书，保留现有目录（{len(current)} 本）")
+                    result.update({"book_count": len(current), "refused": True})
+                    return result
+                merged = fetched
+                result["removed"] = len([book_id for book_id in current if book_id not in fetched])
+            else:
+                merged = OrderedDict(current)
+                merged.update(fetched)
+
+            changed_ids = []
+            added_ids = []
+            for book_id, book in fetched.items():
+                if book_id not in current:
+                    result["added"] += 1
+                    added_ids.append(book_id)
+                elif current[book_id] != book:
+                    result["updated"] += 1
+                    changed_ids.append(book_id)
+
+            if result["added"] or result["updated"] or result["removed"] or not os.path.exists(self.catalog_path):
+                write_file_atomic(
+                    self.catalog_path,
+                    "".join(json.dumps(book) + "\n" for book in merged.values())
+                )
+                # 同时生成偏移索引，其他进程打开目录时无需重新扫描
+                build_offset_index(self.catalog_path)
+
+            # 书籍信息变化时，丢弃其内容缓存以便下次重新获取
+            for book_id in changed_ids:
+                self.data_service.content_cache.invalidate(book_id)
+            # 新上架的书籍可能之前被记入了负缓存（负缓存由同一数据库上的所有DataService共享）
+            if added_ids:
+                self.data_service.forget_missing(added_ids)
+
+            now = time.time()
+            meta.update({
+                "watermark": watermark,
+                "last_sync": now,
+                "book_count": len(merged)
+            })
+            if full:
+                meta["last_full_sync"] = now
+            self._save_meta(meta)
+
+            result["book_count"] = len(merged)
+            print(f"✅ 书籍目录同步完成（{result['mode']}）: 获取 {result['fetched']} 本，新增 {result['added']} 本，"
+                  f"更新 {result['updated']} 本，移除 {result['removed']} 本，共 {result['book_count']} 本")
+            return result
+
+    def _format_watermark(self, value: Any) -> Optional[str]:
+        """把数据库返回的时间戳转换为可比较、可绑定的ISO字符串"""
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+
+    def start_background(self) -> None:
+        """
+        启动后台同步线程，立即同步一次后按interval定期同步目录
+
+        示例:
+            >>> sync.start_background()
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台同步线程"""
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        """后台同步循环，启动后立即同步一次，之后每隔interval同步一次"""
+        while not self._stop_event.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"⚠️ 后台书籍目录同步错误: {str(e)}")
+            self._stop_event.wait(self.interval)
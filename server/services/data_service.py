@@ -5,13 +5,47 @@
 import os
 import json
 import tempfile
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple, Iterator
 
-# 数据库连接
-import snowflake.connector
+# 数据库连接池
+from services.db_pool import ConnectionPool, is_session_expired_error
+from services.db_backend import DatabaseBackend, create_backend
 
 # 文件路径工具函数
 from utils.file_utils import ensure_directory_exists
+from utils.book_pages import join_pages, iter_pages, parse_page_number, slice_pages
+from services.book_cache import BookContentCache
+from services.book_lookup import get_book_lookup
+from services.title_index import get_title_index
+from services.catalog_sync import CatalogSync
+from services.catalog_store import get_catalog_store
+
+# 批量获取书籍内容时每次IN查询最多包含的ID数量
+BOOK_BATCH_CHUNK_SIZE = 200
+
+# 不存在的书籍ID默认的负缓存有效期（秒）
+DEFAULT_NEGATIVE_CACHE_TTL = 60
+
+# 书籍内容查询，{condition}为按书籍ID过滤的条件
+BOOK_CONTENT_SQL = """
+SELECT distinct PERMANENT_ID, TITLE, DESCRIPTION, EXTENDED_BOOK_INFO
+FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.REGULAR_BOOK RB
+         INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK PB ON PB.PUBLISHED_BOOK_ID = RB.ID
+         INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK_ENVIRONMENTS PBE
+                    ON PBE.PUBLISHED_BOOK_ID = PB.ID
+         INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.ENVIRONMENT E
+                    ON E.ID = PBE.ENVIRONMENTS_ID
+         INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.BOOK_EXTENDED_INFO BEI on BEI.BOOK_ID = RB.ID
+    AND E.NAME = 'production'
+    AND {condition};
+"""
+
+# 书籍内容的投影方式：python在本地解析EXTENDED_BOOK_INFO，server在数据库中只提取页面文本
+CONTENT_PROJECTION_PYTHON = "python"
+CONTENT_PROJECTION_SERVER = "server"
+
+# 服务端投影不限制结束页码时使用的页码上限
+MAX_PAGE_INDEX = 2 ** 31 - 1
 
 class DataService:
     """
@@ -20,15 +54,24 @@ class DataService:
     处理数据库连接、书籍数据获取和缓存管理。
 
     属性:
-        conn: 数据库连接对象
+        backend: 数据库后端（Snowflake或本地SQLite）
+        pool: 数据库连接池
         cache_dir: 缓存目录
+        content_cache: 书籍内容缓存
+        content_projection: 书籍内容的投影方式（python或server）
+        negative_cache_ttl: 不存在的书籍ID在负缓存中的有效期（秒）
     """
 
     def __init__(self,
                 snowflake_user: Optional[str] = None,
                 snowflake_password: Optional[str] = None,
                 snowflake_account: Optional[str] = None,
-                cache_dir: Optional[str] = None):
+                cache_dir: Optional[str] = None,
+                content_cache: Optional[BookContentCache] = None,
+                pool: Optional[ConnectionPool] = None,
+                backend: Optional[DatabaseBackend] = None,
+                content_projection: Optional[str] = None,
+                negative_cache_ttl: Optional[float] = None):
         """
         初始化数据服务
 
@@ -37,16 +80,38 @@ class DataService:
             snowflake_password (Optional[str]): Snowflake密码，默认从环境变量获取
             snowflake_account (Optional[str]): Snowflake账户，默认从环境变量获取
             cache_dir (Optional[str]): 缓存目录路径，默认为项目根目录下的cache目录
+            content_cache (Optional[BookContentCache]): 书籍内容缓存，默认在缓存目录下创建
+            pool (Optional[ConnectionPool]): 数据库连接池，默认使用数据库后端的共享连接池
+            backend (Optional[DatabaseBackend]): 数据库后端，默认由环境变量DATA_BACKEND决定（snowflake或sqlite）
+            content_projection (Optional[str]): 书籍内容的投影方式，python或server，
+                                                默认从环境变量BOOK_CONTENT_PROJECTION获取，未设置时为python
+            negative_cache_ttl (Optional[float]): 不存在的书籍ID的负缓存有效期（秒），0表示不缓存，
+                                                  默认从环境变量BOOK_NEGATIVE_CACHE_TTL_SECONDS获取
 
         示例:
             >>> service = DataService()  # 使用环境变量中的配置
             >>> service = DataService(snowflake_user="user", snowflake_password="pass", snowflake_account="acct")  # 自定义配置
+            >>> service = DataService(backend=SqliteBackend("cache/books.sqlite"))  # 使用本地SQLite数据
         """
-        self.conn = None
         self.snowflake_user = snowflake_user or os.getenv("SNOWFLAKE_USER")
         self.snowflake_password = snowflake_password or os.getenv("SNOWFLAKE_PASSWORD")
         self.snowflake_account = snowflake_account or os.getenv("SNOWFLAKE_ACCOUNT")
 
+        # 数据库后端决定连接方式和SQL方言，由环境变量DATA_BACKEND选择；Snowflake凭据只用于snowflake后端
+        self.backend = backend or create_backend(user=self.snowflake_user,
+                                                 password=self.snowflake_password,
+                                                 account=self.snowflake_account)
+
+        # 所有查询共享同一个有上限的连接池
+        self.pool = pool or self.backend.get_pool()
+
+        # server投影在数据库中展开页面并拼接文本，只传输页面文本；后端不支持时使用python投影
+        self.content_projection = (content_projection or
+                                   os.getenv("BOOK_CONTENT_PROJECTION", CONTENT_PROJECTION_PYTHON)).lower()
+        if self.content_projection == CONTENT_PROJECTION_SERVER and not self.backend.book_text_sql:
+            print(f"⚠️ {self.backend.name}后端不支持服务端投影，使用python投影")
+            self.content_projection = CONTENT_PROJECTION_PYTHON
+
         # 设置缓存目录
         if cache_dir:
             self.cache_dir = cache_dir
@@ -55,40 +120,73 @@ class DataService:
             self.cache_dir = os.path.join(os.path.dirname(__file__), "..", "..", "cache")
             ensure_directory_exists(self.cache_dir)
 
-    def get_db_connection(self):
+        # 生产环境书籍目录文件（JSON Lines格式）
+        self.catalog_path = os.path.join(self.cache_dir, "production_books.json")
+
+        # 书籍内容缓存
+        self.content_cache = content_cache or BookContentCache(self.cache_dir)
+
+        # 负缓存和进行中的查询由使用同一个连接池的实例共享：相同书籍的并发查询共享一次数据库查询，
+        # 目录同步清除的负缓存对api和controllers中的实例同样生效
+        self._lookup = get_book_lookup(self.pool)
+        self._inflight = self._lookup.flight
+
+        # 负缓存：在有效期内直接判定不存在的书籍ID，避免重复查询数据库
+        self.negative_cache_ttl = negative_cache_ttl if negative_cache_ttl is not None else float(
+            os.getenv("BOOK_NEGATIVE_CACHE_TTL_SECONDS", DEFAULT_NEGATIVE_CACHE_TTL))
+
+    def _query(self, sql: str, params: Optional[Any] = None) -> List[tuple]:
         """
-        获取数据库连接，如果不存在则创建新连接
+        从连接池取出连接执行查询并返回所有结果行
+
+        SQL按Snowflake的写法编写，执行前由数据库后端转换为对应的方言。
+        如果连接的会话已过期，该连接会被连接池丢弃，并使用新连接重试一次。
+
+        参数:
+            sql (str): SQL语句
+            params (Optional[Any]): 绑定参数
 
         返回:
-            数据库连接对象
+            List[tuple]: 查询结果行
 
         示例:
-            >>> conn = data_service.get_db_connection()
-            >>> cursor = conn.cursor()
+            >>> rows = data_service._query("SELECT 1")
         """
-        if self.conn is None:
-            self.conn = snowflake.connector.connect(
-                user=self.snowflake_user,
-                password=self.snowflake_password,
-                account=self.snowflake_account
-            )
-        return self.conn
+        sql = self.backend.render(sql)
+        for attempt in range(2):
+            try:
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        if params is None:
+                            cursor.execute(sql)
+                        else:
+                            cursor.execute(sql, params)
+                        return cursor.fetchall()
+                    finally:
+                        cursor.close()
+            except Exception as e:
+                if attempt == 0 and is_session_expired_error(e):
+                    print(f"🔄 数据库会话已过期，重新连接: {str(e)}")
+                    continue
+                raise
 
     def close_db_connection(self):
         """
-        关闭数据库连接
+        关闭连接池中的数据库连接
 
         示例:
             >>> data_service.close_db_connection()
         """
-        if self.conn is not None:
-            self.conn.close()
-            self.conn = None
+        self.pool.close()
 
     def fetch_book_content(self, book_id: str) -> Optional[Dict[str, Any]]:
         """
         根据书籍ID获取书籍内容
 
+        优先从本地书籍内容缓存读取，未命中时查询数据库并写入缓存。
+        同一本书的并发请求共享一次查询；不存在的书籍ID在负缓存有效期内不会重复查询。
+
         参数:
             book_id (str): 书籍ID
 
@@ -100,118 +198,442 @@ class DataService:
             >>> if book:
             >>>     print(f"Book title: {book['book_title']}")
         """
-        sql = f"""
-        SELECT distinct PERMANENT_ID, TITLE, DESCRIPTION, EXTENDED_BOOK_INFO
-        FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.REGULAR_BOOK RB
-                 INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK PB ON PB.PUBLISHED_BOOK_ID = RB.ID
-                 INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK_ENVIRONMENTS PBE
-                            ON PBE.PUBLISHED_BOOK_ID = PB.ID
-                 INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.ENVIRONMENT E
-                            ON E.ID = PBE.ENVIRONMENTS_ID
-                 INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.BOOK_EXTENDED_INFO BEI on BEI.BOOK_ID = RB.ID
-            AND E.NAME = 'production'
-            AND RB.PERMANENT_ID = '{book_id}';
+        cached_book = self.content_cache.get(book_id)
+        if cached_book is not None:
+            print(f"📦 使用缓存的书籍内容: {book_id}")
+            return cached_book
+
+        if self._is_known_missing(book_id):
+            print(f"🚫 书籍不存在（负缓存）: {book_id}")
+            return None
+
+        try:
+            book, shared = self._inflight.do(("book", book_id), self._load_book, book_id)
+            if shared:
+                print(f"🔗 共享进行中的书籍查询: {book_id}")
+            return book
+
+        except Exception as e:
+            print(f"⚠️ 获取书籍内容错误: {str(e)}")
+            return None
+
+    def _load_book(self, book_id: str) -> Optional[Dict[str, Any]]:
         """
+        从数据库查询一本书并写入缓存，未找到时记入负缓存
+
+        参数:
+            book_id (str): 书籍ID
+
+        返回:
+            Optional[Dict[str, Any]]: 书籍字典，未找到时返回None
+
+        异常:
+            Exception: 数据库查询失败时抛出
+        """
+        # 上一次查询可能刚刚完成并写入了缓存
+        cached_book = self.content_cache.get(book_id)
+        if cached_book is not None:
+            return cached_book
+
         print(f"📊 获取书籍内容: {book_id}")
+        books = self._query_books("RB.PERMANENT_ID = %s", (book_id,))
+
+        if not books:
+            self._remember_missing([book_id])
+            return None
+
+        book = books[0]
+        self.content_cache.set(book_id, book)
+        return book
+
+    def fetch_book_contents(self, book_ids: List[str],
+                            chunk_size: int = BOOK_BATCH_CHUNK_SIZE) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        批量获取多本书籍的内容
+
+        先从本地书籍内容缓存读取，未命中的书籍通过带绑定参数的IN查询一次性获取，
+        ID数量很多时按chunk_size分批查询。查询到的书籍会写入缓存。
+        负缓存中的ID直接视为缺失；其他请求正在查询的ID不会重复查询，而是等待共享其结果。
+
+        参数:
+            book_ids (List[str]): 书籍ID列表，重复的ID只查询一次
+            chunk_size (int): 每次IN查询最多包含的ID数量
+
+        返回:
+            Tuple[Dict[str, Dict[str, Any]], List[str]]:
+                - 第一个元素是以书籍ID为键的书籍字典
+                - 第二个元素是未找到（或查询失败）的书籍ID列表，保持输入顺序
+
+        示例:
+            >>> books, missing = data_service.fetch_book_contents(["12550-1", "2590-3", "2940-5"])
+            >>> print(f"获取到 {len(books)} 本书，缺失: {missing}")
+        """
+        # 去重并保持顺序
+        unique_ids = list(dict.fromkeys(book_ids))
+
+        books = {}
+        pending = []
+        for book_id in unique_ids:
+            cached_book = self.content_cache.get(book_id)
+            if cached_book is not None:
+                books[book_id] = cached_book
+            elif not self._is_known_missing(book_id):
+                pending.append(book_id)
+
+        if books:
+            print(f"📦 使用缓存的书籍内容: {len(books)} 本")
+
+        # 只查询没有其他请求正在查询的ID，其余的等待共享结果
+        owned = []
+        waiting = []
+        for book_id in pending:
+            call, leader = self._inflight.begin(("book", book_id))
+            (owned if leader else waiting).append((book_id, call))
 
         try:
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(sql)
-            rows = cursor.fetchall()
-            cursor.close()
+            for i in range(0, len(owned), chunk_size):
+                chunk = [book_id for book_id, _ in owned[i:i + chunk_size]]
+                print(f"📊 批量获取书籍内容: {len(chunk)} 本")
+
+                try:
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    fetched = self._query_books(f"RB.PERMANENT_ID IN ({placeholders})", tuple(chunk))
+                except Exception as e:
+                    print(f"⚠️ 批量获取书籍内容错误: {str(e)}")
+                    continue
+
+                for book in fetched:
+                    if book["book_id"] in books:
+                        continue
+                    books[book["book_id"]] = book
+                    self.content_cache.set(book["book_id"], book)
+                self._remember_missing([book_id for book_id in chunk if book_id not in books])
+        finally:
+            for book_id, call in owned:
+                self._inflight.finish(("book", book_id), call, result=books.get(book_id))
+
+        if waiting:
+            print(f"🔗 共享进行中的书籍查询: {len(waiting)} 本")
+        for book_id, call in waiting:
+            try:
+                book = call.wait()
+            except Exception:
+                book = None
+            if book is not None:
+                books[book_id] = book
+
+        missing = [book_id for book_id in unique_ids if book_id not in books]
+        if missing:
+            print(f"⚠️ 未找到的书籍: {', '.join(missing)}")
+
+        return books, missing
+
+    def get_book_pages(self, book_id: str, start_page: Optional[int] = None,
+                       end_page: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        获取书籍中指定页码范围的内容
 
-            if not rows:
+        参数:
+            book_id (str): 书籍ID
+            start_page (Optional[int]): 起始页码（从1开始），默认第一页
+            end_page (Optional[int]): 结束页码（包含），默认最后一页
+
+        返回:
+            Optional[Dict[str, Any]]: 只包含所选页面内容的书籍字典，附带start_page、end_page和page_count；
+                                      如果未找到书籍则返回None
+
+        示例:
+            >>> part = data_service.get_book_pages("12550-1", start_page=1, end_page=3)
+            >>> print(f"第{part['start_page']}-{part['end_page']}页，共{part['page_count']}页")
+        """
+        # 页码可能来自模型的函数调用参数，无法解析的页码视为未指定
+        start_page = parse_page_number(start_page)
+        end_page = parse_page_number(end_page)
+        partial = start_page is not None or end_page is not None
+        if (partial and self.content_projection == CONTENT_PROJECTION_SERVER
+                and self.content_cache.get(book_id) is None):
+            if self._is_known_missing(book_id):
                 return None
+            # 书籍未缓存时只从数据库获取所选页面的文本
+            part, _ = self._inflight.do(("pages", book_id, start_page, end_page),
+                                        self._fetch_page_range, book_id, start_page, end_page)
+            return part
+
+        book = self.fetch_book_content(book_id)
+        if book is None:
+            return None
+        return slice_pages(book, start_page, end_page)
+
+    def iter_book_pages(self, book_id: str, start_page: int = 1,
+                        end_page: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐页遍历书籍内容（生成器函数）
+
+        参数:
+            book_id (str): 书籍ID
+            start_page (int): 起始页码（从1开始）
+            end_page (Optional[int]): 结束页码（包含），默认到最后一页
+
+        返回:
+            Iterator[Dict[str, Any]]: 每页一个字典，包含page_number和text；未找到书籍时不产生任何页面
 
-            # 解析扩展信息获取书籍内容
-            extended_info = json.loads(rows[0][3])
-            book_content = ""
-            for page in extended_info:
-                book_content += page["rawText"] + "\n"
+        示例:
+            >>> for page in data_service.iter_book_pages("12550-1"):
+            >>>     print(page["page_number"], page["text"])
+        """
+        book = self.fetch_book_content(book_id)
+        if book is None:
+            return
+        yield from iter_pages(book, start_page, end_page)
 
-            return {
-                "book_id": rows[0][0],
-                "book_title": rows[0][1],
-                "book_description": rows[0][2],
-                "book_content": book_content
-            }
+    def warm_content_cache(self, book_ids: List[str]) -> int:
+        """
+        预先把书籍内容加载到本地缓存
 
+        参数:
+            book_ids (List[str]): 书籍ID列表
+
+        返回:
+            int: 缓存中可用的书籍数量
+
+        示例:
+            >>> data_service.warm_content_cache(["12550-1", "2590-3"])
+        """
+        books, _ = self.fetch_book_contents(book_ids)
+        return len(books)
+
+    def _is_known_missing(self, book_id: str) -> bool:
+        """判断书籍ID是否在负缓存中且未过期"""
+        if self.negative_cache_ttl <= 0:
+            return False
+        return self._lookup.is_missing(book_id)
+
+    def _remember_missing(self, book_ids: List[str]) -> None:
+        """把数据库中不存在的书籍ID记入负缓存"""
+        self._lookup.remember_missing(book_ids, self.negative_cache_ttl)
+
+    def forget_missing(self, book_ids: Optional[List[str]] = None) -> None:
+        """
+        从负缓存中移除书籍ID，例如目录同步发现新上架的书籍时
+
+        负缓存由使用同一个连接池的DataService实例共享，移除对所有实例生效。
+
+        参数:
+            book_ids (Optional[List[str]]): 要移除的书籍ID，为None时清空负缓存
+
+        示例:
+            >>> data_service.forget_missing(["12550-1"])
+        """
+        self._lookup.forget_missing(book_ids)
+
+    def lookup_stats(self) -> Dict[str, int]:
+        """
+        获取书籍查询的请求合并和负缓存统计
+
+        返回:
+            Dict[str, int]: 包含fetches（实际执行的查询数）、coalesced（共享进行中查询的请求数）、
+                            in_flight、negative_hits（负缓存命中数）和negative_entries的字典
+
+        示例:
+            >>> stats = data_service.lookup_stats()
+            >>> print(f"合并 {stats['coalesced']} 次，负缓存命中 {stats['negative_hits']} 次")
+        """
+        flight = self._inflight.stats()
+        negative = self._lookup.stats()
+        return {
+            "fetches": flight["calls"],
+            "coalesced": flight["coalesced"],
+            "in_flight": flight["in_flight"],
+            "negative_hits": negative["negative_hits"],
+            "negative_entries": negative["negative_entries"]
+        }
+
+    def _query_books(self, condition: str, params: tuple) -> List[Dict[str, Any]]:
+        """
+        按条件查询书籍内容并解析为书籍字典
+
+        python投影查询完整的EXTENDED_BOOK_INFO并在本地提取页面文本；
+        server投影使用数据库后端的book_text_sql，在数据库中按页码拼接rawText。
+
+        参数:
+            condition (str): 过滤条件，如"RB.PERMANENT_ID = %s"
+            params (tuple): 过滤条件的绑定参数
+
+        返回:
+            List[Dict[str, Any]]: 书籍字典列表，无法解析的行会被跳过
+        """
+        if self.content_projection == CONTENT_PROJECTION_SERVER:
+            page_range = (0, MAX_PAGE_INDEX) * 2
+            rows = self._query(self.backend.book_text_sql.format(condition=condition), page_range + params)
+            parse = self._parse_projected_row
+        else:
+            rows = self._query(BOOK_CONTENT_SQL.format(condition=condition), params)
+            parse = self._parse_book_row
+
+        books = []
+        for row in rows:
+            try:
+                books.append(parse(row))
+            except Exception as e:
+                print(f"⚠️ 解析书籍内容错误 {row[0]}: {str(e)}")
+        return books
+
+    def _fetch_page_range(self, book_id: str, start_page: Optional[int],
+                          end_page: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        使用server投影只获取书籍中指定页码范围的文本，结果与slice_pages的格式一致，不写入缓存
+
+        参数:
+            book_id (str): 书籍ID
+            start_page (Optional[int]): 起始页码（从1开始），默认第一页
+            end_page (Optional[int]): 结束页码（包含），默认最后一页
+
+        返回:
+            Optional[Dict[str, Any]]: 书籍字典，包含book_content、start_page、end_page和page_count；未找到时返回None
+        """
+        print(f"📊 获取书籍页面: {book_id} ({start_page or 1}-{end_page or '末页'})")
+
+        first = max(1, start_page or 1) - 1
+        last = MAX_PAGE_INDEX if end_page is None else end_page - 1
+        sql = self.backend.book_text_sql.format(condition="RB.PERMANENT_ID = %s")
+
+        try:
+            rows = self._query(sql, (first, last, first, last, book_id))
         except Exception as e:
-            print(f"⚠️ 获取书籍内容错误: {str(e)}")
+            print(f"⚠️ 获取书籍页面错误: {str(e)}")
+            return None
+
+        if not rows:
+            self._remember_missing([book_id])
             return None
 
+        row = rows[0]
+        page_count = int(row[5] or 0)
+        return {
+            "book_id": row[0],
+            "book_title": row[1],
+            "book_description": row[2],
+            "book_content": row[3] or "",
+            "start_page": first + 1,
+            "end_page": page_count if end_page is None else min(end_page, page_count),
+            "page_count": page_count
+        }
+
+    def _parse_book_row(self, row: tuple) -> Dict[str, Any]:
+        """
+        把书籍内容查询的结果行转换为书籍字典
+
+        参数:
+            row (tuple): (PERMANENT_ID, TITLE, DESCRIPTION, EXTENDED_BOOK_INFO)
+
+        返回:
+            Dict[str, Any]: 包含书籍ID、标题、描述、内容和每页起始偏移的字典
+        """
+        # 解析扩展信息获取书籍内容，同时记录每页的起始偏移
+        extended_info = json.loads(row[3])
+        book_content, page_offsets = join_pages([page["rawText"] for page in extended_info])
+
+        return {
+            "book_id": row[0],
+            "book_title": row[1],
+            "book_description": row[2],
+            "book_content": book_content,
+            "page_offsets": page_offsets
+        }
+
+    def _parse_projected_row(self, row: tuple) -> Dict[str, Any]:
+        """
+        把服务端投影查询的结果行转换为书籍字典
+
+        参数:
+            row (tuple): (PERMANENT_ID, TITLE, DESCRIPTION, BOOK_CONTENT, PAGE_LENGTHS, PAGE_COUNT)，
+                         BOOK_CONTENT中每页文本后带一个换行符，PAGE_LENGTHS为逗号分隔的每页长度
+
+        返回:
+            Dict[str, Any]: 与_parse_book_row格式相同的书籍字典
+        """
+        page_offsets = []
+        position = 0
+        for length in (row[4] or "").split(","):
+            if length:
+                page_offsets.append(position)
+                position += int(length) + 1
+
+        return {
+            "book_id": row[0],
+            "book_title": row[1],
+            "book_description": row[2],
+            "book_content": row[3] or "",
+            "page_offsets": page_offsets
+        }
+
     def fetch_all_production_books(self) -> str:
         """
         获取所有生产环境中的书籍信息，并缓存到文件中
 
+        目录文件已存在且不为空时立即返回，由后台的CatalogSync负责增量更新；
+        否则同步执行一次全量同步。查询失败或没有获取到任何书籍时抛出异常，不写入空目录，
+        启动步骤因此显示为失败，而不是把空目录交给依赖它的步骤。
+
         返回:
             str: 缓存文件路径
 
+        异常:
+            Exception: 全量同步失败或返回0本书时抛出
+
         示例:
             >>> cache_file = data_service.fetch_all_production_books()
             >>> print(f"书籍数据已缓存到: {cache_file}")
         """
-        # 检查缓存文件是否存在
-        cache_file = os.path.join(self.cache_dir, "production_books.json")
-        if os.path.exists(cache_file):
+        # 检查缓存文件是否存在；旧版本在导出失败时写入的空文件视为不存在
+        cache_file = self.catalog_path
+        if os.path.exists(cache_file) and os.path.getsize(cache_file) > 0:
             print(f"📚 使用缓存的书籍数据: {cache_file}")
             return cache_file
 
         print("📊 获取所有生产环境中的书籍...")
 
         try:
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-
-            sql = """
-            SELECT distinct PERMANENT_ID, TITLE, DESCRIPTION
-            FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.REGULAR_BOOK RB
-                    INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK PB ON PB.PUBLISHED_BOOK_ID = RB.ID
-                    INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK_ENVIRONMENTS PBE
-                            ON PBE.PUBLISHED_BOOK_ID = PB.ID
-                    INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.ENVIRONMENT E
-                            ON E.ID = PBE.ENVIRONMENTS_ID
-                AND E.NAME = 'production';
-            """
-
-            cursor.execute(sql)
-            rows = cursor.fetchall()
-            cursor.close()
-
-            # 将数据转换为JSON格式
-            library_data = ""
-            for row in rows:
-                json_data = {
-                    "book_id": row[0],
-                    "book_title": row[1],
-                    "book_Description": row[2]
-                }
-                library_data += json.dumps(json_data) + "\n"
+            result = CatalogSync(self).sync(full=True)
+        except Exception as e:
+            print(f"⚠️ 获取书籍数据错误: {str(e)}")
+            raise
 
-            # 创建临时文件并写入数据
-            ensure_directory_exists(self.cache_dir)
-            with open(cache_file, 'w') as f:
-                f.write(library_data)
+        if not result.get("book_count"):
+            raise RuntimeError("Catalog export returned no books")
 
-            print(f"✅ 书籍数据已保存到: {cache_file}")
-            return cache_file
+        print(f"✅ 书籍数据已保存到: {cache_file}")
+        return cache_file
 
-        except Exception as e:
-            print(f"⚠️ 获取书籍数据错误: {str(e)}")
+    def get_catalog_record(self, book_id: str) -> Optional[Dict[str, Any]]:
+        """
+        从本地书籍目录中按ID读取书籍信息
 
-            # 如果出错，创建一个空的缓存文件作为备用
-            with open(cache_file, 'w') as f:
-                f.write("")
+        通过内存映射的目录文件和book_id偏移索引直接定位记录，不需要读取整个目录。
 
-            return cache_file
+        参数:
+            book_id (str): 书籍ID
+
+        返回:
+            Optional[Dict[str, Any]]: 包含book_id、book_title和book_Description的字典，不在目录中时返回None
+
+        示例:
+            >>> book = data_service.get_catalog_record("12550-1")
+            >>> if book:
+            >>>     print(book["book_title"])
+        """
+        return get_catalog_store(self.catalog_path).get(book_id)
 
-    def search_books_by_title(self, title: str) -> List[Dict[str, Any]]:
+    def search_books_by_title(self, title: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
         根据标题搜索书籍
 
+        优先使用基于本地书籍目录构建的书名索引，支持模糊和拼写容错匹配，
+        结果按相关度排序；书籍目录尚不存在时退回到数据库的LIKE查询。
+
         参数:
             title (str): 书籍标题关键词
+            limit (int): 最多返回的结果数
 
         返回:
             List[Dict[str, Any]]: 匹配的书籍列表
@@ -220,7 +642,13 @@ class DataService:
             >>> books = data_service.search_books_by_title("Adventure")
             >>> print(f"找到 {len(books)} 本匹配的书籍")
         """
-        sql = f"""
+        print(f"📊 搜索书籍标题: {title}")
+
+        index = get_title_index(self.catalog_path)
+        if index is not None and len(index) > 0:
+            return index.search(title, limit=limit)
+
+        sql = """
         SELECT distinct PERMANENT_ID, TITLE, DESCRIPTION
         FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.REGULAR_BOOK RB
                 INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK PB ON PB.PUBLISHED_BOOK_ID = RB.ID
@@ -229,17 +657,12 @@ class DataService:
                 INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.ENVIRONMENT E
                         ON E.ID = PBE.ENVIRONMENTS_ID
             AND E.NAME = 'production'
-            AND UPPER(RB.TITLE) LIKE UPPER('%{title}%');
+            AND UPPER(RB.TITLE) LIKE UPPER(%s)
+        LIMIT %s;
         """
 
-        print(f"📊 搜索书籍标题: {title}")
-
         try:
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(sql)
-            rows = cursor.fetchall()
-            cursor.close()
+            rows = self._query(sql, (f"%{title}%", limit))
 
             results = []
             for row in rows:
@@ -0,0 +1,305 @@
+"""
+数据库后端
+把书籍查询与具体的数据库解耦，支持生产环境的Snowflake和用于离线测试、压测的本地SQLite
+"""
+import os
+import abc
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Any, Optional
+
+from services.db_pool import ConnectionPool, get_snowflake_pool, get_shared_pool
+
+# SQL语句中使用的Snowflake库名和模式名前缀
+SNOWFLAKE_SCHEMA_PREFIX = "FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC."
+
+# 默认的SQLite数据库文件，位于项目根目录下的cache目录
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "cache", "books.sqlite")
+
+# 与生产环境表结构一致的SQLite表，只包含书籍查询用到的列
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS REGULAR_BOOK (
+    ID INTEGER PRIMARY KEY,
+    PERMANENT_ID TEXT NOT NULL,
+    TITLE TEXT,
+    DESCRIPTION TEXT,
+    _FIVETRAN_SYNCED TEXT
+);
+CREATE TABLE IF NOT EXISTS PUBLISHED_BOOK (
+    ID INTEGER PRIMARY KEY,
+    PUBLISHED_BOOK_ID INTEGER NOT NULL,
+    _FIVETRAN_SYNCED TEXT
+);
+CREATE TABLE IF NOT EXISTS PUBLISHED_BOOK_ENVIRONMENTS (
+    PUBLISHED_BOOK_ID INTEGER NOT NULL,
+    ENVIRONMENTS_ID INTEGER NOT NULL,
+    _FIVETRAN_SYNCED TEXT
+);
+CREATE TABLE IF NOT EXISTS ENVIRONMENT (
+    ID INTEGER PRIMARY KEY,
+    NAME TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS BOOK_EXTENDED_INFO (
+    BOOK_ID INTEGER PRIMARY KEY,
+    EXTENDED_BOOK_INFO TEXT
+);
+CREATE INDEX IF NOT EXISTS IDX_REGULAR_BOOK_PERMANENT_ID ON REGULAR_BOOK (PERMANENT_ID);
+CREATE INDEX IF NOT EXISTS IDX_PUBLISHED_BOOK_PUBLISHED_BOOK_ID ON PUBLISHED_BOOK (PUBLISHED_BOOK_ID);
+CREATE INDEX IF NOT EXISTS IDX_PUBLISHED_BOOK_ENVIRONMENTS_PUBLISHED_BOOK_ID
+    ON PUBLISHED_BOOK_ENVIRONMENTS (PUBLISHED_BOOK_ID);
+"""
+
+# 在数据库中展开页面并按页码拼接rawText的书籍内容查询（Snowflake方言）
+# 只有文本和每页长度离开数据库，页码范围由前两组%s参数给出（从0开始，包含两端）
+SNOWFLAKE_BOOK_TEXT_SQL = """
+SELECT RB.PERMANENT_ID, RB.TITLE, RB.DESCRIPTION,
+       LISTAGG(CASE WHEN P.INDEX BETWEEN %s AND %s THEN COALESCE(P.VALUE:rawText::STRING, '') || '\\n' END, '')
+           WITHIN GROUP (ORDER BY P.INDEX) AS BOOK_CONTENT,
+       LISTAGG(CASE WHEN P.INDEX BETWEEN %s AND %s THEN LENGTH(COALESCE(P.VALUE:rawText::STRING, '')) END, ',')
+           WITHIN GROUP (ORDER BY P.INDEX) AS PAGE_LENGTHS,
+       COUNT(P.INDEX) AS PAGE_COUNT
+FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.REGULAR_BOOK RB
+         INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.BOOK_EXTENDED_INFO BEI on BEI.BOOK_ID = RB.ID,
+     LATERAL FLATTEN(input => PARSE_JSON(TO_VARCHAR(BEI.EXTENDED_BOOK_INFO)), OUTER => TRUE) P
+WHERE {condition}
+  AND EXISTS (SELECT 1
+              FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK PB
+                       INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK_ENVIRONMENTS PBE
+                                  ON PBE.PUBLISHED_BOOK_ID = PB.ID
+                       INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.ENVIRONMENT E
+                                  ON E.ID = PBE.ENVIRONMENTS_ID
+              WHERE PB.PUBLISHED_BOOK_ID = RB.ID
+                AND E.NAME = 'production')
+GROUP BY RB.ID, RB.PERMANENT_ID, RB.TITLE, RB.DESCRIPTION;
+"""
+
+# 与SNOWFLAKE_BOOK_TEXT_SQL等价的SQLite查询，子查询按页码排序以保证拼接顺序
+SQLITE_BOOK_TEXT_SQL = """
+SELECT PERMANENT_ID, TITLE, DESCRIPTION,
+       group_concat(CASE WHEN PAGE_INDEX BETWEEN %s AND %s THEN PAGE_TEXT || char(10) END, '') AS BOOK_CONTENT,
+       group_concat(CASE WHEN PAGE_INDEX BETWEEN %s AND %s THEN length(PAGE_TEXT) END, ',') AS PAGE_LENGTHS,
+       COUNT(PAGE_INDEX) AS PAGE_COUNT
+FROM (
+    SELECT RB.ID, RB.PERMANENT_ID, RB.TITLE, RB.DESCRIPTION, P.key AS PAGE_INDEX,
+           COALESCE(json_extract(P.value, '$.rawText'), '') AS PAGE_TEXT
+    FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.REGULAR_BOOK RB
+             INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.BOOK_EXTENDED_INFO BEI on BEI.BOOK_ID = RB.ID
+             LEFT JOIN json_each(BEI.EXTENDED_BOOK_INFO) P
+    WHERE {condition}
+      AND EXISTS (SELECT 1
+                  FROM FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK PB
+                           INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.PUBLISHED_BOOK_ENVIRONMENTS PBE
+                                      ON PBE.PUBLISHED_BOOK_ID = PB.ID
+                           INNER JOIN FIVETRAN_DATABASE.PICKATALE_STUDIO_PROD_PUBLIC.ENVIRONMENT E
+                                      ON E.ID = PBE.ENVIRONMENTS_ID
+                  WHERE PB.PUBLISHED_BOOK_ID = RB.ID
+                    AND E.NAME = 'production')
+    ORDER BY RB.ID, P.key
+)
+GROUP BY ID, PERMANENT_ID, TITLE, DESCRIPTION;
+"""
+
+
+class DatabaseBackend(abc.ABC):
+    """
+    数据库后端抽象基类
+
+    书籍查询的SQL按Snowflake的写法编写（完整的表名和%s占位符），
+    各个后端通过render把它转换为自己的方言，并提供共享的连接池。
+
+    属性:
+        name (str): 后端名称
+        book_text_sql (Optional[str]): 在数据库中拼接页面文本的书籍内容查询，为None时不支持服务端投影
+    """
+
+    name = "base"
+    book_text_sql: Optional[str] = None
+
+    @abc.abstractmethod
+    def get_pool(self) -> ConnectionPool:
+        """
+        获取该后端的连接池
+
+        返回:
+            ConnectionPool: 连接池
+        """
+
+    def render(self, sql: str) -> str:
+        """
+        把Snowflake写法的SQL转换为该后端的方言
+
+        参数:
+            sql (str): Snowflake写法的SQL语句
+
+        返回:
+            str: 可以在该后端执行的SQL语句
+        """
+        return sql
+
+
+class SnowflakeBackend(DatabaseBackend):
+    """
+    生产环境的Snowflake后端
+
+    属性:
+        user (Optional[str]): Snowflake用户名
+        password (Optional[str]): Snowflake密码
+        account (Optional[str]): Snowflake账户
+    """
+
+    name = "snowflake"
+    book_text_sql = SNOWFLAKE_BOOK_TEXT_SQL
+
+    def __init__(self, user: Optional[str] = None,
+                 password: Optional[str] = None,
+                 account: Optional[str] = None):
+        """
+        初始化Snowflake后端
+
+        参数:
+            user (Optional[str]): Snowflake用户名，默认从环境变量获取
+            password (Optional[str]): Snowflake密码，默认从环境变量获取
+            account (Optional[str]): Snowflake账户，默认从环境变量获取
+        """
+        self.user = user or os.getenv("SNOWFLAKE_USER")
+        self.password = password or os.getenv("SNOWFLAKE_PASSWORD")
+        self.account = account or os.getenv("SNOWFLAKE_ACCOUNT")
+
+    def get_pool(self) -> ConnectionPool:
+        return get_snowflake_pool(self.user, self.password, self.account)
+
+
+def _greatest(*values: Any) -> Any:
+    """SQLite中的GREATEST函数，与Snowflake一致，任一参数为NULL时返回NULL"""
+    if any(value is None for value in values):
+        return None
+    return max(values)
+
+
+@lru_cache(maxsize=256)
+def _render_sqlite(sql: str) -> str:
+    """去掉库名和模式名前缀，并把%s占位符换成SQLite的?占位符"""
+    return sql.replace(SNOWFLAKE_SCHEMA_PREFIX, "").replace("%s", "?")
+
+
+class SqliteBackend(DatabaseBackend):
+    """
+    本地SQLite后端
+
+    表结构与生产环境的REGULAR_BOOK、PUBLISHED_BOOK、PUBLISHED_BOOK_ENVIRONMENTS、
+    ENVIRONMENT和BOOK_EXTENDED_INFO一致，可以用seed_sqlite.py生成大规模的模拟数据，
+    在没有生产环境凭据时测试和压测查询、缓存和索引的性能。
+
+    属性:
+        path (str): SQLite数据库文件路径
+    """
+
+    name = "sqlite"
+    book_text_sql = SQLITE_BOOK_TEXT_SQL
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化SQLite后端
+
+        参数:
+            path (Optional[str]): 数据库文件路径，默认从环境变量SQLITE_PATH获取，
+                                  未设置时使用cache/books.sqlite
+
+        示例:
+            >>> backend = SqliteBackend("cache/books.sqlite")
+            >>> data_service = DataService(backend=backend)
+        """
+        self.path = os.path.abspath(path or os.getenv("SQLITE_PATH") or DEFAULT_SQLITE_PATH)
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        创建新的SQLite连接
+
+        连接可以在线程之间传递（连接池保证同一时间只有一个线程使用），
+        并注册了查询中用到的Snowflake函数。
+
+        返回:
+            sqlite3.Connection: 数据库连接
+        """
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.create_function("GREATEST", -1, _greatest, deterministic=True)
+        # WAL模式下写入（例如重新生成数据）不会阻塞读取
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def create_schema(self, conn: Optional[sqlite3.Connection] = None) -> None:
+        """
+        创建表和索引（已存在时跳过）
+
+        参数:
+            conn (Optional[sqlite3.Connection]): 使用的连接，默认新建一个连接
+        """
+        if conn is not None:
+            conn.executescript(SQLITE_SCHEMA)
+            return
+        conn = self.connect()
+        try:
+            conn.executescript(SQLITE_SCHEMA)
+        finally:
+            conn.close()
+
+    def get_pool(self) -> ConnectionPool:
+        return get_shared_pool(("sqlite", self.path), self.connect)
+
+    def render(self, sql: str) -> str:
+        return _render_sqlite(sql)
+
+
+def create_backend(name: Optional[str] = None,
+                   user: Optional[str] = None,
+                   password: Optional[str] = None,
+                   account: Optional[str] = None,
+                   path: Optional[str] = None) -> DatabaseBackend:
+    """
+    根据名称创建数据库后端
+
+    参数:
+        name (Optional[str]): 后端名称（snowflake或sqlite），默认从环境变量DATA_BACKEND获取，未设置时为snowflake
+        user (Optional[str]): Snowflake用户名，只用于snowflake后端，默认从环境变量获取
+        password (Optional[str]): Snowflake密码，只用于snowflake后端，默认从环境变量获取
+        account (Optional[str]): Snowflake账户，只用于snowflake后端，默认从环境变量获取
+        path (Optional[str]): 数据库文件路径，只用于sqlite后端，默认从环境变量SQLITE_PATH获取
+
+    返回:
+        DatabaseBackend: 数据库后端
+
+    异常:
+        ValueError: 后端名称无效时抛出
+
+    示例:
+        >>> backend = create_backend("sqlite", path="cache/books.sqlite")
+    """
+    name = (name or os.getenv("DATA_BACKEND") or SnowflakeBackend.name).lower()
+    if name == SnowflakeBackend.name:
+        return SnowflakeBackend(user=user, password=password, account=account)
+    if name == SqliteBackend.name:
+        return SqliteBackend(path=path)
+    raise ValueError(f"Unknown data backend: {name}")
+
+
+# 进程内共享的默认后端
+_default_backend: Optional[DatabaseBackend] = None
+_default_backend_lock = threading.Lock()
+
+
+def get_default_backend() -> DatabaseBackend:
+    """
+    获取进程内共享的默认数据库后端（由DATA_BACKEND环境变量决定）
+
+    返回:
+        DatabaseBackend: 数据库后端
+
+    示例:
+        >>> pool = get_default_backend().get_pool()
+    """
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            _default_backend = create_backend()
+        return _default_backend
@@ -0,0 +1,441 @@
+"""
+数据库连接池
+为多个请求线程提供有上限、可健康检查的数据库连接
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Snowflake会话过期相关的错误码
+SESSION_EXPIRED_ERRNOS = {390111, 390112, 390114}
+
+# 连接池默认配置
+DEFAULT_MAX_SIZE = 8
+DEFAULT_CHECKOUT_TIMEOUT = 30.0
+DEFAULT_MAX_IDLE_SECONDS = 10 * 60
+DEFAULT_HEALTH_CHECK_INTERVAL = 60.0
+
+
+class PoolTimeoutError(Exception):
+    """在超时时间内无法从连接池获取连接"""
+
+
+def is_session_expired_error(error: Exception) -> bool:
+    """
+    判断异常是否表示数据库会话已过期或连接已断开
+
+    参数:
+        error (Exception): 数据库操作抛出的异常
+
+    返回:
+        bool: 如果应该丢弃该连接并重新连接则返回True
+    """
+    errno = getattr(error, "errno", None)
+    if errno in SESSION_EXPIRED_ERRNOS:
+        return True
+    message = str(error).lower()
+    return "session" in message and ("expired" in message or "no longer exists" in message)
+
+
+class _PooledConnection:
+    """连接池内部使用的连接包装，记录创建和最后使用时间"""
+
+    __slots__ = ("conn", "created_at", "last_used_at", "last_checked_at")
+
+    def __init__(self, conn: Any):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+        self.last_checked_at = now
+
+
+class ConnectionPool:
+    """
+    线程安全的数据库连接池
+
+    连接按需创建，总数不超过max_size。取出连接时会对空闲过久的连接做健康检查，
+    失效的连接会被关闭并重新创建；后台线程定期关闭空闲超过max_idle_seconds的连接。
+    每次取用都会记录等待时间和占用时间。
+
+    属性:
+        connect (Callable[[], Any]): 创建新连接的函数
+        max_size (int): 连接总数上限
+        checkout_timeout (float): 获取连接的最长等待时间（秒）
+        max_idle_seconds (float): 空闲连接的最长保留时间（秒）
+        health_check_interval (float): 空闲多久后取出连接前需要做健康检查（秒）
+    """
+
+    def __init__(self, connect: Callable[[], Any],
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 checkout_timeout: float = DEFAULT_CHECKOUT_TIMEOUT,
+                 max_idle_seconds: float = DEFAULT_MAX_IDLE_SECONDS,
+                 health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+                 health_check_sql: str = "SELECT 1"):
+        """
+        初始化连接池
+
+        参数:
+            connect (Callable[[], Any]): 创建新连接的函数
+            max_size (int): 连接总数上限
+            checkout_timeout (float): 获取连接的最长等待时间（秒）
+            max_idle_seconds (float): 空闲连接的最长保留时间（秒），0表示不回收
+            health_check_interval (float): 空闲多久后取出连接前需要做健康检查（秒）
+            health_check_sql (str): 健康检查使用的SQL语句
+
+        示例:
+            >>> pool = ConnectionPool(lambda: snowflake.connector.connect(...), max_size=4)
+            >>> with pool.connection() as conn:
+            >>>     cursor = conn.cursor()
+        """
+        self.connect = connect
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_interval = health_check_interval
+        self.health_check_sql = health_check_sql
+
+        # 空闲连接按归还顺序排列，末尾是最近使用的连接；与_size一起由_lock保护
+        self._idle: List[_PooledConnection] = []
+        self._in_use: Dict[int, Tuple[_PooledConnection, float]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        # 有连接归还或名额释放时唤醒等待获取连接的线程
+        self._available = threading.Condition(self._lock)
+        self._closed = False
+
+        self._metrics = {
+            "created": 0,
+            "closed": 0,
+            "reaped": 0,
+            "reconnects": 0,
+            "failed_health_checks": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "total_hold_ms": 0.0,
+            "max_hold_ms": 0.0,
+        }
+
+        self._reaper = None
+        if self.max_idle_seconds > 0:
+            self._reaper = threading.Thread(target=self._reap_loop, name="db-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _open(self) -> _PooledConnection:
+        """创建新连接，失败时释放占用的名额"""
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._available.notify()
+            raise
+        with self._lock:
+            self._metrics["created"] += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        """关闭连接并释放名额"""
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._metrics["closed"] += 1
+            self._available.notify()
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        """执行健康检查SQL，判断连接是否可用"""
+        try:
+            is_closed = getattr(pooled.conn, "is_closed", None)
+            if callable(is_closed) and is_closed():
+                return False
+            cursor = pooled.conn.cursor()
+            try:
+                cursor.execute(self.health_check_sql)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            pooled.last_checked_at = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """
+        从连接池获取连接
+
+        参数:
+            timeout (Optional[float]): 最长等待时间（秒），默认使用checkout_timeout
+
+        返回:
+            Any: 数据库连接对象，用完后必须调用release归还
+
+        异常:
+            PoolTimeoutError: 超时仍无可用连接
+        """
+        if self._closed:
+            raise RuntimeError("连接池已关闭")
+
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            with self._lock:
+                # 等待空闲连接或空出的名额：release归还连接和_discard关闭连接时都会唤醒
+                while True:
+                    if self._closed:
+                        raise RuntimeError("连接池已关闭")
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        create = False
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        raise PoolTimeoutError(f"等待数据库连接超时（{timeout}秒）")
+                    self._available.wait(remaining)
+
+            if create:
+                pooled = self._open()
+
+            # 空闲过久的连接在使用前做健康检查
+            now = time.monotonic()
+            if now - pooled.last_checked_at > self.health_check_interval and not self._is_healthy(pooled):
+                with self._lock:
+                    self._metrics["failed_health_checks"] += 1
+                self._discard(pooled)
+                continue
+
+            break
+
+        pooled.last_used_at = now
+        wait_ms = (now - started) * 1000
+        with self._lock:
+            self._in_use[id(pooled.conn)] = (pooled, now)
+            self._metrics["checkouts"] += 1
+            self._metrics["total_wait_ms"] += wait_ms
+            self._metrics["max_wait_ms"] = max(self._metrics["max_wait_ms"], wait_ms)
+        return pooled.conn
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """
+        归还连接
+
+        参数:
+            conn (Any): 通过acquire获取的连接
+            discard (bool): 为True时关闭该连接而不是放回池中（例如会话已过期）
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._in_use.pop(id(conn), None)
+            if entry is None:
+                return
+            pooled, checked_out_at = entry
+            hold_ms = (now - checked_out_at) * 1000
+            self._metrics["total_hold_ms"] += hold_ms
+            self._metrics["max_hold_ms"] = max(self._metrics["max_hold_ms"], hold_ms)
+            if discard:
+                self._metrics["reconnects"] += 1
+
+        if discard or self._closed:
+            self._discard(pooled)
+            return
+
+        pooled.last_used_at = now
+        with self._lock:
+            self._idle.append(pooled)
+            self._available.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """
+        以上下文管理器的方式使用连接
+
+        如果代码块中抛出会话过期类的异常，该连接会被丢弃，下次取用时自动重新连接。
+
+        参数:
+            timeout (Optional[float]): 最长等待时间（秒）
+
+        示例:
+            >>> with pool.connection() as conn:
+            >>>     cursor = conn.cursor()
+            >>>     cursor.execute("SELECT 1")
+        """
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except Exception as e:
+            discard = is_session_expired_error(e)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def _drain_idle(self) -> List[_PooledConnection]:
+        """取出所有空闲连接"""
+        with self._lock:
+            drained = self._idle
+            self._idle = []
+        return drained
+
+    def reap_idle(self) -> int:
+        """
+        关闭空闲超过max_idle_seconds的连接
+
+        返回:
+            int: 被关闭的连接数
+        """
+        now = time.monotonic()
+        reaped = 0
+        keep = []
+        for pooled in self._drain_idle():
+            if now - pooled.last_used_at > self.max_idle_seconds:
+                self._discard(pooled)
+                reaped += 1
+            else:
+                keep.append(pooled)
+
+        # 按从旧到新的顺序放回，保持最近使用的连接优先被取用；回收期间归还的连接更新，放在后面
+        if keep:
+            with self._lock:
+                self._idle[:0] = sorted(keep, key=lambda p: p.last_used_at)
+                self._available.notify(len(keep))
+
+        if reaped:
+            with self._lock:
+                self._metrics["reaped"] += reaped
+        return reaped
+
+    def _reap_loop(self) -> None:
+        """后台回收线程"""
+        interval = max(1.0, min(self.max_idle_seconds / 2, 60.0))
+        while not self._closed:
+            time.sleep(interval)
+            if not self._closed:
+                self.reap_idle()
+
+    def close(self) -> None:
+        """关闭连接池中的所有空闲连接，正在使用的连接归还时关闭"""
+        self._closed = True
+        for pooled in self._drain_idle():
+            self._discard(pooled)
+        with self._lock:
+            self._available.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计信息
+
+        返回:
+            Dict[str, Any]: 连接数量、取用次数以及等待/占用时间等指标
+
+        示例:
+            >>> stats = pool.stats()
+            >>> print(f"平均等待: {stats['avg_wait_ms']:.1f}ms")
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["size"] = self._size
+            metrics["in_use"] = len(self._in_use)
+            metrics["max_size"] = self.max_size
+            metrics["idle"] = len(self._idle)
+
+        checkouts = metrics["checkouts"]
+        metrics["avg_wait_ms"] = metrics["total_wait_ms"] / checkouts if checkouts else 0.0
+        metrics["avg_hold_ms"] = metrics["total_hold_ms"] / checkouts if checkouts else 0.0
+        return metrics
+
+
+# 进程内共享的连接池，按连接参数区分
+_shared_pools: Dict[Tuple, ConnectionPool] = {}
+_shared_pools_lock = threading.Lock()
+
+
+def get_snowflake_pool(user: Optional[str] = None,
+                       password: Optional[str] = None,
+                       account: Optional[str] = None) -> ConnectionPool:
+    """
+    获取进程内共享的Snowflake连接池，相同连接参数只会创建一个连接池
+
+    连接池参数从环境变量DB_POOL_MAX_SIZE、DB_POOL_TIMEOUT、DB_POOL_MAX_IDLE_SECONDS
+    和DB_POOL_HEALTH_CHECK_INTERVAL读取。
+
+    参数:
+        user (Optional[str]): Snowflake用户名，默认从环境变量获取
+        password (Optional[str]): Snowflake密码，默认从环境变量获取
+        account (Optional[str]): Snowflake账户，默认从环境变量获取
+
+    返回:
+        ConnectionPool: 共享的连接池
+
+    示例:
+        >>> pool = get_snowflake_pool()
+        >>> with pool.connection() as conn:
+        >>>     cursor = conn.cursor()
+    """
+    user = user or os.getenv("SNOWFLAKE_USER")
+    password = password or os.getenv("SNOWFLAKE_PASSWORD")
+    account = account or os.getenv("SNOWFLAKE_ACCOUNT")
+    key = ("snowflake", user, password, account)
+
+    with _shared_pools_lock:
+        pool = _shared_pools.get(key)
+        if pool is None or pool._closed:
+            def connect():
+                import snowflake.connector
+                return snowflake.connector.connect(
+                    user=user,
+                    password=password,
+                    account=account,
+                    # 让服务端保持会话，减少会话过期后的重连
+                    client_session_keep_alive=True
+                )
+
+            pool = ConnectionPool(connect, **_pool_options_from_env())
+            _shared_pools[key] = pool
+        return pool
+
+
+def get_shared_pool(key: Tuple, connect: Callable[[], Any]) -> ConnectionPool:
+    """
+    获取进程内共享的连接池，相同key只会创建一个连接池
+
+    连接池参数与get_snowflake_pool相同，从DB_POOL_*环境变量读取。
+
+    参数:
+        key (Tuple): 连接池的标识，通常包含后端名称和连接参数
+        connect (Callable[[], Any]): 创建新连接的函数
+
+    返回:
+        ConnectionPool: 共享的连接池
+
+    示例:
+        >>> pool = get_shared_pool(("sqlite", path), lambda: sqlite3.connect(path))
+    """
+    with _shared_pools_lock:
+        pool = _shared_pools.get(key)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(connect, **_pool_options_from_env())
+            _shared_pools[key] = pool
+        return pool
+
+
+def _pool_options_from_env() -> Dict[str, Any]:
+    """从DB_POOL_*环境变量读取连接池参数"""
+    return {
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", DEFAULT_MAX_SIZE)),
+        "checkout_timeout": float(os.getenv("DB_POOL_TIMEOUT", DEFAULT_CHECKOUT_TIMEOUT)),
+        "max_idle_seconds": float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", DEFAULT_MAX_IDLE_SECONDS)),
+        "health_check_interval": float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", DEFAULT_HEALTH_CHECK_INTERVAL))
+    }
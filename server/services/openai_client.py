@@ -0,0 +1,241 @@
+"""
+共享OpenAI客户端
+所有服务共用一个OpenAI客户端和它的keep-alive连接池，支持预热和连接池统计
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import openai
+
+# 默认配置：连接数上限沿用SDK的默认值，整个进程共用一个连接池，流式运行和流式语音合成
+# 会在整个持续时间内占用连接，上限过小时请求会排队等待空闲连接
+DEFAULT_MAX_CONNECTIONS = openai.DEFAULT_CONNECTION_LIMITS.max_connections
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = openai.DEFAULT_CONNECTION_LIMITS.max_keepalive_connections
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 120.0
+DEFAULT_POOL_TIMEOUT = 10.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_WARM_CONNECTIONS = 2
+
+# openai所依赖的httpx版本中的Limits类，不直接导入httpx，避免与SDK使用的版本不一致
+_Limits = type(openai.DEFAULT_CONNECTION_LIMITS)
+
+
+class OpenAIClientPool:
+    """
+    共享的OpenAI客户端及其连接池
+
+    每个openai.OpenAI实例默认有自己的连接池，分散创建客户端会导致每个服务各自进行TCP和TLS握手。
+    这里只创建一个带有调优连接池的HTTP客户端，所有服务通过get_openai_client使用同一个OpenAI客户端，
+    使用其他API密钥时也复用同一个连接池。
+
+    属性:
+        client (openai.OpenAI): 共享的OpenAI客户端
+        http_client: 底层的HTTP客户端
+        max_connections (int): 最大连接数
+        max_keepalive_connections (int): 最多保持的空闲连接数
+    """
+
+    def __init__(self, api_key: Optional[str] = None, max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None, keepalive_expiry: Optional[float] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 pool_timeout: Optional[float] = None, max_retries: Optional[int] = None):
+        """
+        初始化共享客户端
+
+        参数:
+            api_key (Optional[str]): OpenAI API密钥，默认从环境变量OPENAI_API_KEY获取
+            max_connections (Optional[int]): 最大连接数，默认从环境变量OPENAI_MAX_CONNECTIONS获取
+            max_keepalive_connections (Optional[int]): 最多保持的空闲连接数，
+                                                       默认从环境变量OPENAI_MAX_KEEPALIVE_CONNECTIONS获取
+            keepalive_expiry (Optional[float]): 空闲连接的保持时间（秒），默认从环境变量OPENAI_KEEPALIVE_EXPIRY获取
+            connect_timeout (Optional[float]): 连接超时（秒），默认从环境变量OPENAI_CONNECT_TIMEOUT获取
+            read_timeout (Optional[float]): 读取超时（秒），默认从环境变量OPENAI_READ_TIMEOUT获取
+            pool_timeout (Optional[float]): 连接池已满时等待空闲连接的最长时间（秒），
+                                            默认从环境变量OPENAI_POOL_TIMEOUT获取
+            max_retries (Optional[int]): 失败重试次数，默认从环境变量OPENAI_MAX_RETRIES获取
+
+        示例:
+            >>> pool = OpenAIClientPool(max_connections=50)
+            >>> pool.client.moderations.create(input="hello")
+        """
+        self.max_connections = max_connections or int(os.getenv("OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS))
+        self.max_keepalive_connections = min(self.max_connections, max_keepalive_connections or int(
+            os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", DEFAULT_MAX_KEEPALIVE_CONNECTIONS)))
+        keepalive_expiry = keepalive_expiry or float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY))
+        connect_timeout = connect_timeout or float(os.getenv("OPENAI_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT))
+        read_timeout = read_timeout or float(os.getenv("OPENAI_READ_TIMEOUT", DEFAULT_READ_TIMEOUT))
+        pool_timeout = pool_timeout or float(os.getenv("OPENAI_POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT))
+        if max_retries is None:
+            max_retries = int(os.getenv("OPENAI_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+
+        self._lock = threading.Lock()
+        self._metrics = {"requests": 0, "active_peak": 0, "warmed": 0}
+
+        # 等待空闲连接单独设置较短的超时，连接池用尽时尽快报错，而不是按读取超时排队
+        timeout = openai.Timeout(read_timeout, connect=connect_timeout, pool=pool_timeout)
+        self.http_client = openai.DefaultHttpxClient(
+            limits=_Limits(max_connections=self.max_connections,
+                           max_keepalive_connections=self.max_keepalive_connections,
+                           keepalive_expiry=keepalive_expiry),
+            timeout=timeout,
+            event_hooks={"request": [self._on_request]}
+        )
+        self.client = openai.OpenAI(api_key=api_key, http_client=self.http_client,
+                                    timeout=timeout, max_retries=max_retries)
+
+    def _on_request(self, request: Any) -> None:
+        """每个请求发出前记录请求数和当时的活动连接数峰值"""
+        active = sum(1 for connection in self._pool_connections() if not _is_idle(connection))
+        with self._lock:
+            self._metrics["requests"] += 1
+            self._metrics["active_peak"] = max(self._metrics["active_peak"], active)
+
+    def with_api_key(self, api_key: str) -> openai.OpenAI:
+        """
+        获取使用其他API密钥、但共享同一个连接池的客户端
+
+        参数:
+            api_key (str): OpenAI API密钥
+
+        返回:
+            openai.OpenAI: OpenAI客户端
+        """
+        return self.client.with_options(api_key=api_key)
+
+    def warm_up(self, connections: Optional[int] = None) -> int:
+        """
+        预热连接池：并发发送轻量请求，提前完成TCP和TLS握手，使第一个用户请求不必等待建立连接
+
+        参数:
+            connections (Optional[int]): 预热的连接数，默认从环境变量OPENAI_WARM_CONNECTIONS获取
+
+        返回:
+            int: 成功的预热请求数
+
+        示例:
+            >>> pool.warm_up()
+            2
+        """
+        if connections is None:
+            connections = int(os.getenv("OPENAI_WARM_CONNECTIONS", DEFAULT_WARM_CONNECTIONS))
+        connections = min(connections, self.max_keepalive_connections)
+        if connections <= 0:
+            return 0
+
+        # 预热失败不影响服务，不重试
+        client = self.client.with_options(max_retries=0)
+
+        def ping(_):
+            try:
+                client.models.list()
+                return True
+            except Exception as e:
+                print(f"⚠️ OpenAI连接预热失败: {str(e)}")
+                return False
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="openai-warm") as executor:
+            warmed = sum(executor.map(ping, range(connections)))
+        with self._lock:
+            self._metrics["warmed"] += warmed
+        print(f"🔥 已预热 {warmed} 个OpenAI连接 ({time.monotonic() - started:.2f}s)")
+        return warmed
+
+    def _pool_connections(self) -> list:
+        """读取底层连接池中的连接，HTTP客户端不支持时返回空列表"""
+        pool = getattr(getattr(self.http_client, "_transport", None), "_pool", None)
+        try:
+            return list(getattr(pool, "connections", None) or [])
+        except Exception:
+            return []
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计信息
+
+        返回:
+            Dict[str, Any]: 包含requests、active_peak（发出请求时观察到的活动连接数峰值）、warmed、
+                            connections、active_connections、idle_connections、max_connections、
+                            max_keepalive_connections和utilization（活动连接数占最大连接数的比例）的字典
+
+        示例:
+            >>> stats = pool.stats()
+            >>> print(f"连接池使用率: {stats['utilization']:.0%}")
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        connections = self._pool_connections()
+        idle = sum(1 for connection in connections if _is_idle(connection))
+        active = len(connections) - idle
+        metrics.update({
+            "connections": len(connections),
+            "active_connections": active,
+            "idle_connections": idle,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "utilization": round(active / self.max_connections, 3) if self.max_connections else 0.0
+        })
+        return metrics
+
+    def close(self) -> None:
+        """
+        关闭连接池
+
+        示例:
+            >>> pool.close()
+        """
+        self.http_client.close()
+
+
+def _is_idle(connection: Any) -> bool:
+    try:
+        return bool(connection.is_idle())
+    except Exception:
+        return False
+
+
+# 进程内共享的客户端
+_default_pool: Optional[OpenAIClientPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_openai_pool() -> OpenAIClientPool:
+    """
+    获取进程内共享的OpenAI客户端池
+
+    返回:
+        OpenAIClientPool: 共享的客户端池
+
+    示例:
+        >>> get_openai_pool().warm_up()
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = OpenAIClientPool()
+        return _default_pool
+
+
+def get_openai_client(api_key: Optional[str] = None) -> openai.OpenAI:
+    """
+    获取共享的OpenAI客户端
+
+    参数:
+        api_key (Optional[str]): 使用其他API密钥时提供，返回的客户端仍共享同一个连接池
+
+    返回:
+        openai.OpenAI: OpenAI客户端
+
+    示例:
+        >>> client = get_openai_client()
+        >>> client.beta.threads.create()
+    """
+    pool = get_openai_pool()
+    if api_key is None or api_key == pool.client.api_key:
+        return pool.client
+    return pool.with_api_key(api_key)
@@ -3,12 +3,10 @@ OpenAI服务 - 基础服务
 提供与OpenAI API交互的核心功能
 """
 import json
-import openai
-from typing import Any, Dict, List, Optional, Tuple, Union
-import config
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
-# 配置OpenAI客户端
-openai.api_key = config.OPENAI_API_KEY
+from services.openai_client import get_openai_client
+import config
 
 class OpenAIService:
     """
@@ -18,8 +16,15 @@ class OpenAIService:
 
     属性:
         api_key (str): OpenAI API密钥
+        client (openai.OpenAI): 共享连接池的OpenAI客户端
+        DEFAULT_WARNINGS (Dict[str, str]): 无法生成警告时按语言使用的固定警告信息
     """
 
+    DEFAULT_WARNINGS = {
+        "zh": "不要淘气，这不是你这个年龄该知道的内容哦！让我们聊一些有趣又健康的话题吧。",
+        "en": "Don't be naughty! This isn't something for someone your age. Let's talk about fun and healthy topics instead!",
+    }
+
     def __init__(self, api_key: Optional[str] = None):
         """
         初始化OpenAIService实例
@@ -32,7 +37,7 @@ class OpenAIService:
             >>> service = OpenAIService(api_key="your-api-key")  # 使用自定义API密钥
         """
         self.api_key = api_key or config.OPENAI_API_KEY
-        openai.api_key = self.api_key
+        self.client = get_openai_client(self.api_key)
 
     def moderate_content(self, text: str) -> Tuple[bool, Any]:
         """
@@ -54,7 +59,7 @@ class OpenAIService:
             >>>     print("内容适合儿童")
         """
         try:
-            response = openai.moderations.create(input=text)
+            response = self.client.moderations.create(input=text)
             result = response.results[0]
             return (result.flagged, result.categories)
         except Exception as e:
@@ -86,7 +91,7 @@ class OpenAIService:
             system_prompt += "不要重复或引用用户的不当内容。使用友好、善良但坚定的语气。"
 
             # 获取被标记的类别
-            flagged_categories = self._extract_flagged_categories(categories)
+            flagged_categories = self.extract_flagged_categories(categories)
 
             # 生成类别信息
             category_info = f"用户询问了关于以下内容的问题: {', '.join(flagged_categories) if flagged_categories else '不适当内容'}"
@@ -104,7 +109,7 @@ class OpenAIService:
             user_prompt = f"{category_info}\n{context_summary}\n{lang_instruction}\n请生成一个友好但明确的警告，让孩子明白这个话题不适合他们，并鼓励他们询问适合年龄的内容。"
 
             # 调用OpenAI API
-            response = openai.chat.completions.create(
+            response = self.client.chat.completions.create(
                 model="gpt-4-turbo",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -120,10 +125,7 @@ class OpenAIService:
         except Exception as e:
             print(f"生成警告信息错误: {str(e)}")
             # 出错时返回默认警告
-            if language == 'zh':
-                return "不要淘气，这不是你这个年龄该知道的内容哦！让我们聊一些有趣又健康的话题吧。"
-            else:
-                return "Don't be naughty! This isn't something for someone your age. Let's talk about fun and healthy topics instead!"
+            return self.DEFAULT_WARNINGS["zh" if language == 'zh' else "en"]
 
     def transcribe_audio(self, audio_file: Any) -> str:
         """
@@ -146,7 +148,7 @@ class OpenAIService:
             from utils.audio_utils import prepare_audio_file_for_api
             file_data, _ = prepare_audio_file_for_api(audio_file)
 
-            response = openai.audio.transcriptions.create(
+            response = self.client.audio.transcriptions.create(
                 model="whisper-1",
                 file=file_data
             )
@@ -174,7 +176,7 @@ class OpenAIService:
             >>> print(f"AI回复: {response}")
         """
         try:
-            response = openai.chat.completions.create(
+            response = self.client.chat.completions.create(
                 model="gpt-4-turbo",
                 messages=messages
             )
@@ -183,13 +185,16 @@ class OpenAIService:
             print(f"获取聊天回复错误: {str(e)}")
             raise
 
-    def text_to_speech(self, text: str, voice: str = "alloy") -> bytes:
+    def text_to_speech(self, text: str, voice: str = "alloy", model: str = "tts-1",
+                       response_format: str = "mp3") -> bytes:
         """
         使用OpenAI TTS API将文本转换为语音
 
         参数:
             text (str): 要转换的文本
             voice (str): 语音类型 (alloy, echo, fable, onyx, nova, shimmer)
+            model (str): TTS模型
+            response_format (str): 音频格式 (mp3, opus, aac, flac, wav)
 
         返回:
             bytes: 音频数据的二进制内容
@@ -202,17 +207,52 @@ class OpenAIService:
             >>>     f.write(audio_data)
         """
         try:
-            response = openai.audio.speech.create(
-                model="tts-1",
+            response = self.client.audio.speech.create(
+                model=model,
                 voice=voice,
-                input=text
+                input=text,
+                response_format=response_format
             )
             return response.content
         except Exception as e:
             print(f"文字转语音错误: {str(e)}")
             raise
 
-    def _extract_flagged_categories(self, categories: Any) -> List[str]:
+    def text_to_speech_stream(self, text: str, voice: str = "alloy", model: str = "tts-1",
+                              response_format: str = "mp3", chunk_size: int = 4096) -> Iterator[bytes]:
+        """
+        使用OpenAI TTS API流式合成语音，收到数据块就返回，不等待整段音频生成（生成器函数）
+
+        参数:
+            text (str): 要转换的文本
+            voice (str): 语音类型 (alloy, echo, fable, onyx, nova, shimmer)
+            model (str): TTS模型
+            response_format (str): 音频格式 (mp3, opus, aac, flac, wav)
+            chunk_size (int): 数据块大小（字节）
+
+        返回:
+            Iterator[bytes]: 音频数据块
+
+        示例:
+            >>> with open("output.mp3", "wb") as f:
+            >>>     for chunk in service.text_to_speech_stream("你好，我是AI助手。"):
+            >>>         f.write(chunk)
+        """
+        try:
+            with self.client.audio.speech.with_streaming_response.create(
+                model=model,
+                voice=voice,
+                input=text,
+                response_format=response_format
+            ) as response:
+                for chunk in response.iter_bytes(chunk_size):
+                    yield chunk
+        except Exception as e:
+            print(f"流式文字转语音错误: {str(e)}")
+            raise
+
+    @staticmethod
+    def extract_flagged_categories(categories: Any) -> List[str]:
         """
         从分类对象中提取被标记的类别
 
@@ -221,6 +261,10 @@ class OpenAIService:
 
         返回:
             List[str]: 被标记的类别列表
+
+        示例:
+            >>> OpenAIService.extract_flagged_categories({'sexual': True, 'hate': False})
+            ['sexual']
         """
         flagged_categories = []
         if hasattr(categories, 'items'):
@@ -0,0 +1,274 @@
+"""
+Assistant运行引擎
+基于Assistants API的流式运行事件驱动一次运行，替代按固定间隔轮询runs.retrieve
+"""
+import os
+import inspect
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional
+
+from services.run_watcher import get_run_watcher
+from utils.cancellation import CancellationToken, Cancelled, record_saved
+
+# 表示运行已经结束的状态
+TERMINAL_STATUSES = {"completed", "failed", "cancelled", "expired", "incomplete"}
+
+# 在服务端取消运行后等待其结束的默认时间（秒）
+DEFAULT_CANCEL_WAIT_SECONDS = 10.0
+
+
+class RunEvent(NamedTuple):
+    """
+    运行引擎产生的事件
+
+    type取值:
+        status: 运行状态变化，data为状态字符串（queued、in_progress、requires_action等）
+        delta: 助手回复的文本增量，data为文本片段
+        handler: 工具调用处理函数产生的事件，data为处理函数yield的原始值
+        done: 运行结束，data为RunResult
+    """
+    type: str
+    data: Any
+
+
+class RunResult(NamedTuple):
+    """
+    运行结果
+
+    属性:
+        status (str): 最终状态（completed、failed、cancelled、expired或incomplete）
+        run_id (Optional[str]): 运行ID
+        text (str): 助手在本次运行中最后完成的一条消息的文本
+        last_error (Optional[str]): 运行失败时的错误信息
+    """
+    status: str
+    run_id: Optional[str]
+    text: str
+    last_error: Optional[str] = None
+
+
+# 工具调用处理函数：接收tool_calls，返回tool_outputs列表；也可以是生成器，
+# 它yield的值会作为handler事件转发，return的值作为tool_outputs
+ToolCallHandler = Callable[[List[Any]], Any]
+
+
+class RunEngine:
+    """
+    Assistant运行引擎
+
+    通过runs.create(stream=True)创建运行并消费服务端推送的事件：状态变化立即转发，
+    requires_action到达时立即调用工具处理函数，并用submit_tool_outputs(stream=True)
+    在同一个事件流程中继续运行，直到运行结束。整个过程不需要轮询。
+
+    client只需要提供beta.threads.runs.create和beta.threads.runs.submit_tool_outputs，
+    返回可迭代的事件流（每个事件有event和data属性），因此可以用本地的假事件流测试。
+
+    属性:
+        client: OpenAI客户端
+    """
+
+    def __init__(self, client: Any):
+        """
+        初始化运行引擎
+
+        参数:
+            client: OpenAI客户端
+
+        示例:
+            >>> engine = RunEngine(openai.OpenAI())
+            >>> for event in engine.run(thread_id, assistant_id, handle_tool_calls):
+            >>>     print(event.type, event.data)
+        """
+        self.client = client
+
+    def run(self, thread_id: str, assistant_id: str, on_tool_calls: ToolCallHandler,
+            cancel_token: Optional[CancellationToken] = None, **run_options: Any) -> Iterator[RunEvent]:
+        """
+        创建并驱动一次运行（生成器函数）
+
+        cancel_token被取消时关闭当前事件流，在服务端取消运行并等待它结束，然后抛出Cancelled，
+        这样同一线程上的下一次运行不会因为仍有活动的运行而被拒绝。运行结束前关闭本生成器同样会取消运行。
+
+        参数:
+            thread_id (str): 线程ID
+            assistant_id (str): Assistant ID
+            on_tool_calls (ToolCallHandler): 处理requires_action中工具调用的函数
+            cancel_token (Optional[CancellationToken]): 取消令牌
+            **run_options: 传给runs.create的其他参数
+
+        返回:
+            Iterator[RunEvent]: 运行事件，最后一个事件的类型为done
+
+        异常:
+            RuntimeError: 事件流返回error事件时抛出
+            Cancelled: 运行被取消时抛出
+
+        示例:
+            >>> for event in engine.run(thread_id, assistant_id, handler):
+            >>>     if event.type == "done":
+            >>>         print(event.data.status, event.data.text)
+        """
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        stream = self.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            stream=True,
+            **run_options
+        )
+
+        run_id = None
+        status = None
+        last_error = None
+        text = ""
+
+        # 取消时关闭当前事件流，中断阻塞的读取
+        streams = [stream]
+        unregister = cancel_token.add_callback(lambda: self._close(streams[-1])) \
+            if cancel_token is not None else None
+
+        try:
+            while stream is not None:
+                next_stream = None
+                try:
+                    for event in stream:
+                        if cancel_token is not None and cancel_token.is_cancelled:
+                            break
+
+                        kind = getattr(event, "event", "")
+                        data = getattr(event, "data", None)
+
+                        if kind.startswith("thread.run.") and not kind.startswith("thread.run.step."):
+                            run_id = getattr(data, "id", None) or run_id
+                            status = getattr(data, "status", None) or kind.rsplit(".", 1)[-1]
+                            yield RunEvent("status", status)
+
+                            if kind == "thread.run.requires_action":
+                                tool_calls = data.required_action.submit_tool_outputs.tool_calls
+                                tool_outputs = yield from self._call_handler(on_tool_calls, tool_calls)
+                                if cancel_token is not None:
+                                    cancel_token.raise_if_cancelled()
+                                # 当前事件流在requires_action之后结束，提交结果后继续消费新的事件流
+                                next_stream = self.client.beta.threads.runs.submit_tool_outputs(
+                                    thread_id=thread_id,
+                                    run_id=run_id,
+                                    tool_outputs=tool_outputs,
+                                    stream=True
+                                )
+                                streams.append(next_stream)
+                                break
+
+                            if status in TERMINAL_STATUSES:
+                                error = getattr(data, "last_error", None)
+                                if error is not None:
+                                    last_error = getattr(error, "message", None) or str(error)
+
+                        elif kind == "thread.message.delta":
+                            for part in getattr(data.delta, "content", None) or []:
+                                if getattr(part, "type", None) == "text" and part.text and part.text.value:
+                                    yield RunEvent("delta", part.text.value)
+
+                        elif kind == "thread.message.completed":
+                            text = self._message_text(data)
+
+                        elif kind == "error":
+                            raise RuntimeError(f"Assistant run stream error: {getattr(data, 'message', data)}")
+                finally:
+                    self._close(stream)
+                stream = next_stream
+        except GeneratorExit:
+            # 调用方不再消费事件（例如客户端断开后关闭了响应），运行没有人需要了
+            if status not in TERMINAL_STATUSES:
+                self._cancel_run(thread_id, run_id)
+            raise
+        except Exception:
+            # 取消后关闭的事件流和被中止的工具调用都会抛出异常，统一按取消处理
+            if cancel_token is None or not cancel_token.is_cancelled:
+                raise
+        finally:
+            if unregister is not None:
+                unregister()
+
+        if cancel_token is not None and cancel_token.is_cancelled:
+            if status not in TERMINAL_STATUSES:
+                self._cancel_run(thread_id, run_id)
+            raise Cancelled(cancel_token.reason)
+
+        yield RunEvent("done", RunResult(
+            status=status if status in TERMINAL_STATUSES else "failed",
+            run_id=run_id,
+            text=text,
+            last_error=last_error
+        ))
+
+    def run_to_completion(self, thread_id: str, assistant_id: str, on_tool_calls: ToolCallHandler,
+                          cancel_token: Optional[CancellationToken] = None, **run_options: Any) -> RunResult:
+        """
+        执行一次运行并返回结果，忽略中间事件
+
+        参数:
+            thread_id (str): 线程ID
+            assistant_id (str): Assistant ID
+            on_tool_calls (ToolCallHandler): 处理工具调用的函数
+            cancel_token (Optional[CancellationToken]): 取消令牌
+            **run_options: 传给runs.create的其他参数
+
+        返回:
+            RunResult: 运行结果
+
+        异常:
+            Cancelled: 运行被取消时抛出
+
+        示例:
+            >>> result = engine.run_to_completion(thread_id, assistant_id, handler)
+            >>> print(result.status)
+        """
+        result = None
+        for event in self.run(thread_id, assistant_id, on_tool_calls, cancel_token, **run_options):
+            if event.type == "done":
+                result = event.data
+        return result
+
+    def _cancel_run(self, thread_id: str, run_id: Optional[str]) -> None:
+        """在服务端取消运行，并等待它结束（最长RUN_CANCEL_WAIT_SECONDS秒）"""
+        if run_id is None:
+            return
+        try:
+            self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+            record_saved("runs_cancelled")
+            print(f"🛑 已取消运行: {run_id}")
+            get_run_watcher(self.client).wait(
+                thread_id, run_id, settle_on=TERMINAL_STATUSES,
+                timeout=float(os.getenv("RUN_CANCEL_WAIT_SECONDS", DEFAULT_CANCEL_WAIT_SECONDS))
+            )
+        except Exception as e:
+            print(f"⚠️ 取消运行失败 {run_id}: {str(e)}")
+
+    @staticmethod
+    def _close(stream: Any) -> None:
+        """关闭事件流"""
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+    def _call_handler(self, on_tool_calls: ToolCallHandler, tool_calls: List[Any]):
+        """调用工具处理函数，转发生成器处理函数产生的事件并返回tool_outputs"""
+        outcome = on_tool_calls(tool_calls)
+        if not inspect.isgenerator(outcome):
+            return outcome
+
+        while True:
+            try:
+                item = next(outcome)
+            except StopIteration as stop:
+                return stop.value
+            yield RunEvent("handler", item)
+
+    @staticmethod
+    def _message_text(message: Any) -> str:
+        """提取消息中所有文本内容"""
+        parts = []
+        for content in getattr(message, "content", None) or []:
+            if getattr(content, "type", None) == "text":
+                parts.append(content.text.value)
+        return "".join(parts)
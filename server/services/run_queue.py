@@ -0,0 +1,359 @@
+"""
+运行队列
+保证同一个Assistant线程上同时只有一个运行，运行期间到达的消息合并到下一次运行
+"""
+import os
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.cancellation import Cancelled
+
+DEFAULT_WAIT_SECONDS = 300
+
+# 批次状态
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+
+
+class RunBatch:
+    """
+    在同一次运行中处理的一批消息
+
+    第一个加入批次的请求是批次的发起者，负责把消息添加到线程、执行运行并通过RunQueue.release提交回复；
+    其他加入批次的请求通过RunQueue.follow等待同一个回复，发起者在开始运行前离开时由其中一个请求接替它。
+
+    属性:
+        thread_id (str): 线程ID
+        messages (List[str]): 本次运行要添加到线程的用户消息，开始运行后不再变化
+        state (str): 批次状态（queued、running或done）
+        waiters (int): 除发起者外等待该批次回复的请求数
+        abandoned (bool): 发起者的客户端已断开且运行将被取消，新的消息不再加入该批次
+    """
+
+    def __init__(self, thread_id: str, message: str, now: float):
+        self.thread_id = thread_id
+        self.messages: List[str] = [message]
+        self.state = QUEUED
+        self.waiters = 0
+        self.abandoned = False
+        self._leaderless = False
+        self._submitted_at: List[float] = [now]
+        self._event = threading.Event()
+        self._result = None
+        self._error: Optional[BaseException] = None
+
+    def contains(self, message: str) -> bool:
+        """判断批次中是否已有相同的消息（忽略首尾空白和大小写）"""
+        key = _message_key(message)
+        return any(_message_key(existing) == key for existing in self.messages)
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """
+        等待批次的运行结束并返回回复，运行失败时抛出同一个异常
+
+        参数:
+            timeout (Optional[float]): 最长等待时间（秒），默认从环境变量RUN_QUEUE_WAIT_SECONDS获取
+
+        返回:
+            Any: 发起者提交的回复
+
+        异常:
+            TimeoutError: 超时时抛出
+        """
+        if timeout is None:
+            timeout = float(os.getenv("RUN_QUEUE_WAIT_SECONDS", DEFAULT_WAIT_SECONDS))
+        if not self._event.wait(timeout):
+            raise TimeoutError(f"Timed out waiting for the run on thread {self.thread_id}")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def _message_key(message: str) -> str:
+    return " ".join(message.split()).casefold()
+
+
+class _Lane:
+    """一个线程的运行状态：正在运行的批次和等待运行的批次"""
+
+    __slots__ = ("active", "pending")
+
+    def __init__(self):
+        self.active: Optional[RunBatch] = None
+        self.pending: Optional[RunBatch] = None
+
+
+class RunQueue:
+    """
+    按线程串行化运行的队列
+
+    OpenAI不允许在已有运行的线程上创建新的运行。每个请求先通过submit提交消息：
+        - 线程空闲时，请求成为新批次的发起者，立即运行；
+        - 线程正在运行时，消息加入等待运行的批次，当前运行结束后这一批消息在一次运行中处理，
+          批次中的所有请求得到同一个回复；
+        - 与正在运行或等待运行的批次中相同的消息（例如连续点击两次发送）不会重复添加，
+          而是直接等待该批次的回复。
+
+    队列只在进程内生效；多进程共享会话时，同一个会话的请求需要路由到同一个进程。
+
+    示例:
+        >>> batch, leader = queue.submit(thread_id, message)
+        >>> if not leader and not queue.follow(batch):
+        >>>     return batch.wait()
+        >>> queue.acquire(batch)
+        >>> try:
+        >>>     reply = run(batch.messages)
+        >>> finally:
+        >>>     queue.release(batch, reply)
+    """
+
+    def __init__(self):
+        """
+        初始化运行队列
+
+        示例:
+            >>> queue = RunQueue()
+        """
+        self._cond = threading.Condition()
+        self._lanes: Dict[str, _Lane] = {}
+        self._metrics = {"submitted": 0, "batched": 0, "deduplicated": 0, "promoted": 0, "runs": 0, "timeouts": 0,
+                         "waits": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+
+    def submit(self, thread_id: str, message: str) -> Tuple[RunBatch, bool]:
+        """
+        提交一条消息
+
+        参数:
+            thread_id (str): 线程ID
+            message (str): 用户消息
+
+        返回:
+            Tuple[RunBatch, bool]: (消息所在的批次, 是否为批次的发起者)。
+                                   发起者需要调用acquire和release，其他请求调用follow
+
+        示例:
+            >>> batch, leader = queue.submit("thread_abc", "推荐一些冒险类图书")
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._metrics["submitted"] += 1
+            lane = self._lanes.setdefault(thread_id, _Lane())
+
+            for batch in (lane.active, lane.pending):
+                if batch is not None and not batch.abandoned and batch.contains(message):
+                    batch.waiters += 1
+                    self._metrics["deduplicated"] += 1
+                    return batch, False
+
+            if lane.pending is not None:
+                lane.pending.messages.append(message)
+                lane.pending._submitted_at.append(now)
+                lane.pending.waiters += 1
+                self._metrics["batched"] += 1
+                return lane.pending, False
+
+            batch = RunBatch(thread_id, message, now)
+            if lane.active is None:
+                self._start_locked(lane, batch, now)
+            else:
+                lane.pending = batch
+            return batch, True
+
+    def acquire(self, batch: RunBatch, timeout: Optional[float] = None) -> None:
+        """
+        发起者等待线程上的前一次运行结束，然后开始本批次的运行
+
+        返回后批次不再接受新消息，batch.messages即为要添加到线程的全部消息。
+
+        参数:
+            batch (RunBatch): submit返回的批次
+            timeout (Optional[float]): 最长等待时间（秒），默认从环境变量RUN_QUEUE_WAIT_SECONDS获取
+
+        异常:
+            TimeoutError: 超时时抛出，批次中的其他请求也会收到该异常
+            Cancelled: 等待期间批次被abandon移出队列时抛出
+        """
+        if timeout is None:
+            timeout = float(os.getenv("RUN_QUEUE_WAIT_SECONDS", DEFAULT_WAIT_SECONDS))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            lane = self._lanes[batch.thread_id]
+            while batch.state == QUEUED:
+                if lane.active is None:
+                    lane.pending = None
+                    self._start_locked(lane, batch, time.monotonic())
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    lane.pending = None
+                    self._metrics["timeouts"] += 1
+                    error = TimeoutError(f"Timed out waiting for the previous run on thread {batch.thread_id}")
+                    self._finish_locked(batch, None, error)
+                    raise error
+                self._cond.wait(remaining)
+            if batch.state == DONE:
+                raise batch._error or RuntimeError("The run ended without a reply")
+
+    def follow(self, batch: RunBatch, timeout: Optional[float] = None) -> bool:
+        """
+        非发起者等待批次的运行结束；发起者在开始运行前离开时，由本请求接替它成为发起者
+
+        参数:
+            batch (RunBatch): submit返回的批次
+            timeout (Optional[float]): 最长等待时间（秒），默认从环境变量RUN_QUEUE_WAIT_SECONDS获取
+
+        返回:
+            bool: True表示本请求已成为发起者，需要调用acquire和release；
+                  False表示批次已结束，通过batch.wait获取回复
+
+        异常:
+            TimeoutError: 超时时抛出
+
+        示例:
+            >>> if not queue.follow(batch):
+            >>>     return batch.wait()
+        """
+        if timeout is None:
+            timeout = float(os.getenv("RUN_QUEUE_WAIT_SECONDS", DEFAULT_WAIT_SECONDS))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while batch.state != DONE:
+                if batch._leaderless:
+                    batch._leaderless = False
+                    batch.waiters -= 1
+                    self._metrics["promoted"] += 1
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    batch.waiters -= 1
+                    raise TimeoutError(f"Timed out waiting for the run on thread {batch.thread_id}")
+                self._cond.wait(remaining)
+            return False
+
+    def abandon(self, batch: RunBatch, reason: str = "client disconnected") -> bool:
+        """
+        发起者的客户端断开时调用，判断是否可以取消本批次的运行
+
+        批次中没有其他请求等待时返回True：正在运行的批次不再接受相同的消息，
+        还在等待运行的批次直接移出队列，在acquire中等待的发起者收到Cancelled。
+        有其他请求等待时返回False，发起者应继续运行，并通过release把回复交给它们。
+
+        参数:
+            batch (RunBatch): 批次
+            reason (str): 取消原因
+
+        返回:
+            bool: 是否可以取消运行
+
+        示例:
+            >>> if queue.abandon(batch):
+            >>>     run_token.cancel("client disconnected")
+        """
+        with self._cond:
+            if batch.state == DONE or batch.waiters:
+                return False
+            batch.abandoned = True
+            if batch.state == QUEUED:
+                self._finish_locked(batch, None, Cancelled(reason))
+            return True
+
+    def release(self, batch: RunBatch, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """
+        发起者结束本批次的运行，把回复交给批次中的其他请求，并让下一批次开始运行
+
+        重复调用时忽略，因此可以放在finally中。批次还在等待运行时调用表示发起者离开了（例如客户端断开）：
+        批次中还有其他请求时由其中一个通过follow接替发起者，批次留在队列中；
+        没有其他请求时把批次移出队列，之后的消息开始新的批次。
+
+        参数:
+            batch (RunBatch): 批次
+            result (Any): 回复；为None且没有error时，等待者收到RuntimeError
+            error (Optional[BaseException]): 运行失败的原因
+        """
+        if result is None and error is None:
+            error = RuntimeError("The run ended without a reply")
+        with self._cond:
+            if batch.state == DONE:
+                return
+            if batch.state == QUEUED and batch.waiters:
+                batch._leaderless = True
+                self._cond.notify_all()
+                return
+            self._finish_locked(batch, result, error)
+
+    def _start_locked(self, lane: _Lane, batch: RunBatch, now: float) -> None:
+        lane.active = batch
+        batch.state = RUNNING
+        self._metrics["runs"] += 1
+        for submitted_at in batch._submitted_at:
+            wait = now - submitted_at
+            self._metrics["waits"] += 1
+            self._metrics["wait_seconds_total"] += wait
+            self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], wait)
+
+    def _finish_locked(self, batch: RunBatch, result: Any, error: Optional[BaseException]) -> None:
+        batch._result = result
+        batch._error = error
+        batch.state = DONE
+        batch._event.set()
+        lane = self._lanes.get(batch.thread_id)
+        if lane is not None:
+            if lane.active is batch:
+                lane.active = None
+            # 发起者在开始运行前放弃了等待中的批次且没有请求接替它，否则线程会一直被它占住
+            if lane.pending is batch:
+                lane.pending = None
+            if lane.active is None and lane.pending is None:
+                del self._lanes[batch.thread_id]
+        self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取队列统计信息
+
+        返回:
+            Dict[str, Any]: 包含active_runs（正在运行的线程数）、queued_batches和queued_messages（队列深度）、
+                            submitted、batched（合并到下一次运行的消息数）、deduplicated（重复消息数）、
+                            promoted（接替离开的发起者的次数）、runs、timeouts以及avg_wait_seconds和max_wait_seconds（消息等待开始运行的时间）的字典
+
+        示例:
+            >>> stats = queue.stats()
+            >>> print(f"排队消息: {stats['queued_messages']}")
+        """
+        with self._cond:
+            metrics = dict(self._metrics)
+            lanes = list(self._lanes.values())
+            active = sum(1 for lane in lanes if lane.active is not None)
+            pending = [lane.pending for lane in lanes if lane.pending is not None]
+
+        waits = metrics.pop("waits")
+        total = metrics.pop("wait_seconds_total")
+        metrics["max_wait_seconds"] = round(metrics.pop("wait_seconds_max"), 3)
+        metrics["avg_wait_seconds"] = round(total / waits, 3) if waits else 0.0
+        metrics["active_runs"] = active
+        metrics["queued_batches"] = len(pending)
+        metrics["queued_messages"] = sum(len(batch.messages) for batch in pending)
+        return metrics
+
+
+# 进程内共享的运行队列
+_default_queue: Optional[RunQueue] = None
+_default_queue_lock = threading.Lock()
+
+
+def get_run_queue() -> RunQueue:
+    """
+    获取进程内共享的运行队列
+
+    所有AssistantService实例共用它，因此api和controllers中的实例不会在同一个线程上同时运行。
+
+    返回:
+        RunQueue: 运行队列
+    """
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = RunQueue()
+        return _default_queue
@@ -0,0 +1,336 @@
+"""
+Assistant运行监视器
+由少量后台线程统一轮询所有进行中的运行，调用方通过Future等待运行结果
+"""
+import os
+import heapq
+import random
+import itertools
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 运行停止推进、需要调用方处理的状态
+SETTLED_STATUSES = ("completed", "failed", "cancelled", "expired", "incomplete", "requires_action")
+
+# 默认配置
+DEFAULT_WORKERS = 4
+DEFAULT_MIN_INTERVAL = 0.25
+DEFAULT_MAX_INTERVAL = 4.0
+DEFAULT_BACKOFF = 1.5
+DEFAULT_JITTER = 0.2
+DEFAULT_MAX_ERRORS = 3
+DEFAULT_WAIT_TIMEOUT = 300.0
+
+
+class _WatchedRun:
+    """监视器内部记录的一次运行"""
+
+    __slots__ = ("thread_id", "run_id", "future", "settle_on", "interval", "last_status", "deadline", "errors")
+
+    def __init__(self, thread_id: str, run_id: str, settle_on: Tuple[str, ...],
+                 interval: float, deadline: Optional[float]):
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.future: Future = Future()
+        self.settle_on = settle_on
+        self.interval = interval
+        self.last_status: Optional[str] = None
+        self.deadline = deadline
+        self.errors = 0
+
+
+class RunWatcher:
+    """
+    Assistant运行监视器
+
+    调用方登记(thread_id, run_id)后得到一个Future，运行进入settle_on中的状态时
+    Future以最新的Run对象完成。所有运行按各自的下次检查时间排在一个堆里，
+    一个调度线程按时间取出到期的运行，交给固定数量的工作线程调用runs.retrieve。
+
+    检查间隔自适应：状态发生变化后回到min_interval，状态不变时按backoff倍数增长到max_interval，
+    每次间隔再加上±jitter比例的随机抖动，避免大量运行在同一时刻集中请求。
+    因此数百个并发运行只占用几个线程，而不是每个运行阻塞一个请求线程轮询。
+
+    属性:
+        client: OpenAI客户端
+        workers (int): 执行查询的工作线程数
+        min_interval (float): 最短检查间隔（秒）
+        max_interval (float): 最长检查间隔（秒）
+        backoff (float): 状态不变时检查间隔的增长倍数
+        jitter (float): 检查间隔的随机抖动比例
+        max_errors (int): 连续查询失败多少次后放弃该运行
+    """
+
+    def __init__(self, client: Any,
+                 workers: Optional[int] = None,
+                 min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None,
+                 backoff: float = DEFAULT_BACKOFF,
+                 jitter: float = DEFAULT_JITTER,
+                 max_errors: int = DEFAULT_MAX_ERRORS):
+        """
+        初始化运行监视器
+
+        参数:
+            client: OpenAI客户端，需要提供beta.threads.runs.retrieve
+            workers (Optional[int]): 工作线程数，默认从环境变量RUN_WATCHER_WORKERS获取
+            min_interval (Optional[float]): 最短检查间隔（秒），默认从环境变量RUN_WATCHER_MIN_INTERVAL获取
+            max_interval (Optional[float]): 最长检查间隔（秒），默认从环境变量RUN_WATCHER_MAX_INTERVAL获取
+            backoff (float): 状态不变时检查间隔的增长倍数
+            jitter (float): 检查间隔的随机抖动比例（0到1）
+            max_errors (int): 连续查询失败的最大次数
+
+        示例:
+            >>> watcher = RunWatcher(openai.OpenAI())
+            >>> run = watcher.watch(thread.id, run.id).result(timeout=60)
+        """
+        self.client = client
+        self.workers = workers or int(os.getenv("RUN_WATCHER_WORKERS", DEFAULT_WORKERS))
+        self.min_interval = min_interval if min_interval is not None else float(
+            os.getenv("RUN_WATCHER_MIN_INTERVAL", DEFAULT_MIN_INTERVAL))
+        self.max_interval = max_interval if max_interval is not None else float(
+            os.getenv("RUN_WATCHER_MAX_INTERVAL", DEFAULT_MAX_INTERVAL))
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_errors = max_errors
+
+        self._heap: List[Tuple[float, int, _WatchedRun]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="run-watcher")
+        self._scheduler: Optional[threading.Thread] = None
+        self._closed = False
+        self._random = random.Random()
+
+        self._metrics = {
+            "watched": 0,
+            "polls": 0,
+            "settled": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "status_changes": 0,
+        }
+
+    def watch(self, thread_id: str, run_id: str,
+              settle_on: Optional[Iterable[str]] = None,
+              timeout: Optional[float] = None) -> Future:
+        """
+        登记一个需要监视的运行
+
+        参数:
+            thread_id (str): 线程ID
+            run_id (str): 运行ID
+            settle_on (Optional[Iterable[str]]): 让Future完成的状态，默认为SETTLED_STATUSES
+            timeout (Optional[float]): 最长监视时间（秒），超时后Future以TimeoutError失败
+
+        返回:
+            Future: 运行进入settle_on中的状态时以Run对象完成；取消Future会停止监视
+
+        异常:
+            RuntimeError: 监视器已关闭时抛出
+
+        示例:
+            >>> future = watcher.watch(thread.id, run.id)
+            >>> run = future.result()
+            >>> print(run.status)
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        entry = _WatchedRun(thread_id, run_id, tuple(settle_on or SETTLED_STATUSES),
+                            self.min_interval, deadline)
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("RunWatcher is closed")
+            self._metrics["watched"] += 1
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._schedule_loop,
+                                                   name="run-watcher-scheduler", daemon=True)
+                self._scheduler.start()
+            self._push_locked(entry, self._next_delay(entry.interval))
+        return entry.future
+
+    def wait(self, thread_id: str, run_id: str,
+             settle_on: Optional[Iterable[str]] = None,
+             timeout: Optional[float] = None) -> Any:
+        """
+        等待运行进入settle_on中的状态并返回Run对象
+
+        参数:
+            thread_id (str): 线程ID
+            run_id (str): 运行ID
+            settle_on (Optional[Iterable[str]]): 停止等待的状态，默认为SETTLED_STATUSES
+            timeout (Optional[float]): 最长等待时间（秒），默认从环境变量RUN_WATCHER_TIMEOUT获取
+
+        返回:
+            Any: 最新的Run对象
+
+        异常:
+            TimeoutError: 超时时抛出
+
+        示例:
+            >>> run = watcher.wait(thread.id, run.id)
+            >>> if run.status == "requires_action":
+            >>>     ...
+        """
+        if timeout is None:
+            timeout = float(os.getenv("RUN_WATCHER_TIMEOUT", DEFAULT_WAIT_TIMEOUT))
+        future = self.watch(thread_id, run_id, settle_on, timeout=timeout)
+        return future.result()
+
+    def _next_delay(self, interval: float) -> float:
+        """在检查间隔上加上随机抖动"""
+        if self.jitter <= 0:
+            return interval
+        return interval * (1 + self._random.uniform(-self.jitter, self.jitter))
+
+    def _push_locked(self, entry: _WatchedRun, delay: float) -> None:
+        """把运行按下次检查时间放回堆中，调用方需持有锁"""
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), entry))
+        self._condition.notify()
+
+    def _schedule_loop(self) -> None:
+        """调度线程：取出到期的运行交给工作线程查询"""
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._heap:
+                        wait_time = self._heap[0][0] - time.monotonic()
+                        if wait_time <= 0:
+                            break
+                        self._condition.wait(wait_time)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+                _, _, entry = heapq.heappop(self._heap)
+
+            if entry.future.done():
+                # 调用方已经取消
+                continue
+            if entry.deadline is not None and time.monotonic() >= entry.deadline:
+                with self._condition:
+                    self._metrics["timeouts"] += 1
+                self._finish(entry, error=TimeoutError(f"Run {entry.run_id} did not settle in time"))
+                continue
+
+            try:
+                self._executor.submit(self._poll, entry)
+            except RuntimeError:
+                # 线程池已关闭
+                return
+
+    def _poll(self, entry: _WatchedRun) -> None:
+        """工作线程：查询一次运行状态，未完成时按自适应间隔重新排队"""
+        try:
+            run = self.client.beta.threads.runs.retrieve(thread_id=entry.thread_id, run_id=entry.run_id)
+        except Exception as e:
+            entry.errors += 1
+            with self._condition:
+                self._metrics["polls"] += 1
+                self._metrics["errors"] += 1
+            if entry.errors >= self.max_errors:
+                print(f"⚠️ 查询运行状态失败 {entry.run_id}: {str(e)}")
+                self._finish(entry, error=e)
+                return
+            entry.interval = min(entry.interval * self.backoff, self.max_interval)
+            self._requeue(entry)
+            return
+
+        entry.errors = 0
+        status = run.status
+        with self._condition:
+            self._metrics["polls"] += 1
+            if status != entry.last_status:
+                self._metrics["status_changes"] += 1
+
+        if status in entry.settle_on:
+            with self._condition:
+                self._metrics["settled"] += 1
+            self._finish(entry, result=run)
+            return
+
+        # 状态刚变化时很可能马上还会变化，回到最短间隔；否则逐渐放慢
+        if status != entry.last_status:
+            entry.interval = self.min_interval
+        else:
+            entry.interval = min(entry.interval * self.backoff, self.max_interval)
+        entry.last_status = status
+        self._requeue(entry)
+
+    def _requeue(self, entry: _WatchedRun) -> None:
+        """把运行重新放回堆中等待下次检查"""
+        with self._condition:
+            if self._closed:
+                return
+            self._push_locked(entry, self._next_delay(entry.interval))
+
+    @staticmethod
+    def _finish(entry: _WatchedRun, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """完成运行对应的Future，Future已被取消时忽略"""
+        try:
+            if error is not None:
+                entry.future.set_exception(error)
+            else:
+                entry.future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取监视器统计信息
+
+        返回:
+            Dict[str, int]: 包含watched、pending、polls、settled、errors、timeouts和status_changes的字典
+
+        示例:
+            >>> stats = watcher.stats()
+            >>> print(f"监视中的运行: {stats['pending']}")
+        """
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics["pending"] = sum(1 for _, _, entry in self._heap if not entry.future.done())
+        return metrics
+
+    def close(self) -> None:
+        """
+        停止监视器，取消所有仍在监视中的运行
+
+        示例:
+            >>> watcher.close()
+        """
+        with self._condition:
+            self._closed = True
+            pending = [entry for _, _, entry in self._heap]
+            self._heap.clear()
+            self._condition.notify_all()
+        for entry in pending:
+            entry.future.cancel()
+        self._executor.shutdown(wait=False)
+
+
+# 进程内共享的运行监视器，按客户端区分
+_shared_watchers: Dict[int, RunWatcher] = {}
+_shared_watchers_lock = threading.Lock()
+
+
+def get_run_watcher(client: Any) -> RunWatcher:
+    """
+    获取进程内共享的运行监视器，同一个客户端只会创建一个监视器
+
+    参数:
+        client: OpenAI客户端
+
+    返回:
+        RunWatcher: 运行监视器
+
+    示例:
+        >>> run = get_run_watcher(client).wait(thread.id, run.id)
+    """
+    with _shared_watchers_lock:
+        watcher = _shared_watchers.get(id(client))
+        if watcher is None or watcher._closed or watcher.client is not client:
+            watcher = RunWatcher(client)
+            _shared_watchers[id(client)] = watcher
+        return watcher
@@ -0,0 +1,426 @@
+"""
+会话存储
+保存用户会话ID到Assistant线程ID的映射，支持进程内LRU+TTL和跨进程共享的SQLite两种后端
+"""
+import os
+import abc
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from utils.file_utils import ensure_directory_exists
+from utils.single_flight import SingleFlight
+
+# 默认配置
+DEFAULT_TTL_SECONDS = 86400
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "cache", "sessions.sqlite")
+PURGE_INTERVAL_SECONDS = 300
+
+SQLITE_SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ASSISTANT_SESSION (
+    SESSION_ID TEXT PRIMARY KEY,
+    THREAD_ID TEXT,
+    CLAIM_TOKEN TEXT,
+    CREATED_AT REAL NOT NULL,
+    LAST_ACCESS REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS IDX_ASSISTANT_SESSION_LAST_ACCESS ON ASSISTANT_SESSION (LAST_ACCESS);
+"""
+
+# 创建线程的函数，返回线程ID
+ThreadFactory = Callable[[], str]
+
+
+class SessionStore(abc.ABC):
+    """
+    会话存储抽象基类
+
+    get_or_create是原子的：同一个会话的并发首次请求只会调用一次create，
+    其余请求等待并得到同一个线程ID。超过ttl没有访问的会话视为过期，下次访问时重新创建线程。
+
+    属性:
+        name (str): 后端名称
+        ttl (float): 会话空闲过期时间（秒），0表示永不过期
+    """
+
+    name = "base"
+
+    def __init__(self, ttl: Optional[float] = None):
+        """
+        初始化会话存储
+
+        参数:
+            ttl (Optional[float]): 会话空闲过期时间（秒），默认从环境变量SESSION_TTL_SECONDS获取
+        """
+        self.ttl = ttl if ttl is not None else float(os.getenv("SESSION_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self._inflight = SingleFlight()
+        self._last_purge = time.monotonic()
+        self._metrics = {"hits": 0, "created": 0, "expired": 0, "evicted": 0}
+        self._metrics_lock = threading.Lock()
+
+    @abc.abstractmethod
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        获取会话的线程ID并刷新访问时间
+
+        参数:
+            session_id (str): 会话ID
+
+        返回:
+            Optional[str]: 线程ID，不存在或已过期时返回None
+        """
+
+    def get_or_create(self, session_id: str, create: ThreadFactory) -> Tuple[str, bool]:
+        """
+        获取会话的线程ID，不存在时调用create创建
+
+        参数:
+            session_id (str): 会话ID
+            create (ThreadFactory): 创建线程并返回线程ID的函数
+
+        返回:
+            Tuple[str, bool]: (线程ID, 是否由本次调用创建)
+
+        示例:
+            >>> thread_id, created = store.get_or_create("user123", lambda: client.beta.threads.create().id)
+        """
+        self._maybe_purge()
+        thread_id = self.get(session_id)
+        if thread_id is not None:
+            self._count("hits")
+            return thread_id, False
+
+        # 同一进程内的并发请求合并为一次创建
+        (thread_id, created), shared = self._inflight.do(session_id, self._create, session_id, create)
+        return thread_id, created and not shared
+
+    @abc.abstractmethod
+    def _create(self, session_id: str, create: ThreadFactory) -> Tuple[str, bool]:
+        """在持有该会话的创建权后创建线程，子类实现"""
+
+    @abc.abstractmethod
+    def delete(self, session_id: str) -> None:
+        """
+        删除会话
+
+        参数:
+            session_id (str): 会话ID
+        """
+
+    @abc.abstractmethod
+    def purge_expired(self) -> int:
+        """
+        删除所有过期的会话
+
+        返回:
+            int: 删除的会话数
+        """
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """当前保存的会话数"""
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计信息
+
+        返回:
+            Dict[str, int]: 包含hits、created、expired、evicted和sessions的字典
+        """
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics["sessions"] = len(self)
+        return metrics
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._metrics_lock:
+            self._metrics[key] += amount
+
+    def _expired(self, last_access: float, now: float) -> bool:
+        return self.ttl > 0 and last_access + self.ttl <= now
+
+    def _maybe_purge(self) -> None:
+        """每隔PURGE_INTERVAL_SECONDS顺便清理一次过期会话"""
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        try:
+            self.purge_expired()
+        except Exception as e:
+            print(f"⚠️ 清理过期会话失败: {str(e)}")
+
+
+class MemorySessionStore(SessionStore):
+    """
+    进程内会话存储
+
+    按最近访问顺序保存在OrderedDict中，超过max_entries时淘汰最久未访问的会话。
+    只在单进程内有效，多进程部署请使用SqliteSessionStore。
+
+    属性:
+        max_entries (int): 最大会话数
+    """
+
+    name = "memory"
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        初始化进程内会话存储
+
+        参数:
+            ttl (Optional[float]): 会话空闲过期时间（秒），默认从环境变量SESSION_TTL_SECONDS获取
+            max_entries (Optional[int]): 最大会话数，默认从环境变量SESSION_MAX_ENTRIES获取
+
+        示例:
+            >>> store = MemorySessionStore(ttl=3600, max_entries=1000)
+        """
+        super().__init__(ttl)
+        self.max_entries = max_entries or int(os.getenv("SESSION_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self._sessions: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            thread_id, last_access = entry
+            if self._expired(last_access, now):
+                del self._sessions[session_id]
+                self._count("expired")
+                return None
+            self._sessions[session_id] = (thread_id, now)
+            self._sessions.move_to_end(session_id)
+            return thread_id
+
+    def _create(self, session_id: str, create: ThreadFactory) -> Tuple[str, bool]:
+        # 等待创建权期间其他请求可能已经创建
+        thread_id = self.get(session_id)
+        if thread_id is not None:
+            return thread_id, False
+
+        thread_id = create()
+        with self._lock:
+            self._sessions[session_id] = (thread_id, time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+                self._count("evicted")
+        self._count("created")
+        return thread_id, True
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [session_id for session_id, (_, last_access) in self._sessions.items()
+                       if self._expired(last_access, now)]
+            for session_id in expired:
+                del self._sessions[session_id]
+        self._count("expired", len(expired))
+        return len(expired)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    SQLite会话存储
+
+    多个进程（例如多个gunicorn worker）共用同一个数据库文件，因此同一会话在所有进程中对应同一个线程。
+    首次创建时先在事务中写入一条没有THREAD_ID的占位记录（带CLAIM_TOKEN）取得创建权，
+    其他进程看到占位记录后等待，直到创建者写入THREAD_ID；创建失败或创建者崩溃时，
+    占位记录在claim_timeout后失效，由下一个请求重新取得创建权。
+
+    属性:
+        path (str): 数据库文件路径
+        claim_timeout (float): 占位记录的有效时间（秒）
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None,
+                 claim_timeout: float = 30.0, poll_interval: float = 0.05):
+        """
+        初始化SQLite会话存储
+
+        参数:
+            path (Optional[str]): 数据库文件路径，默认从环境变量SESSION_STORE_PATH获取，
+                                  未设置时为项目根目录下的cache/sessions.sqlite
+            ttl (Optional[float]): 会话空闲过期时间（秒），默认从环境变量SESSION_TTL_SECONDS获取
+            claim_timeout (float): 占位记录的有效时间（秒），应大于创建线程所需的时间
+            poll_interval (float): 等待其他进程创建线程时的检查间隔（秒）
+
+        示例:
+            >>> store = SqliteSessionStore("cache/sessions.sqlite")
+        """
+        super().__init__(ttl)
+        self.path = path or os.getenv("SESSION_STORE_PATH") or DEFAULT_SQLITE_PATH
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        ensure_directory_exists(os.path.dirname(os.path.abspath(self.path)))
+        self._connection().executescript(SQLITE_SESSION_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取当前线程的连接，autocommit模式，事务由BEGIN IMMEDIATE显式控制"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # WAL模式下读取不会被其他进程的写入阻塞
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[str]:
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT THREAD_ID, LAST_ACCESS FROM ASSISTANT_SESSION WHERE SESSION_ID = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        thread_id, last_access = row
+        if self._expired(last_access, now):
+            return None
+        conn.execute("UPDATE ASSISTANT_SESSION SET LAST_ACCESS = ? WHERE SESSION_ID = ? AND THREAD_ID = ?",
+                     (now, session_id, thread_id))
+        return thread_id
+
+    def _create(self, session_id: str, create: ThreadFactory) -> Tuple[str, bool]:
+        conn = self._connection()
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.claim_timeout
+
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT THREAD_ID, LAST_ACCESS FROM ASSISTANT_SESSION WHERE SESSION_ID = ?",
+                    (session_id,)
+                ).fetchone()
+                if row is not None and row[0] is not None and not self._expired(row[1], now):
+                    # 其他进程已经创建
+                    conn.execute("UPDATE ASSISTANT_SESSION SET LAST_ACCESS = ? WHERE SESSION_ID = ?",
+                                 (now, session_id))
+                    conn.execute("COMMIT")
+                    return row[0], False
+
+                claimed_by_other = row is not None and row[0] is None and row[1] + self.claim_timeout > now
+                if not claimed_by_other:
+                    if row is not None and row[0] is not None:
+                        self._count("expired")
+                    # 取得创建权：写入占位记录，LAST_ACCESS记录占位时间
+                    conn.execute(
+                        "INSERT INTO ASSISTANT_SESSION (SESSION_ID, THREAD_ID, CLAIM_TOKEN, CREATED_AT, LAST_ACCESS) "
+                        "VALUES (?, NULL, ?, ?, ?) "
+                        "ON CONFLICT(SESSION_ID) DO UPDATE SET THREAD_ID = NULL, CLAIM_TOKEN = excluded.CLAIM_TOKEN, "
+                        "CREATED_AT = excluded.CREATED_AT, LAST_ACCESS = excluded.LAST_ACCESS",
+                        (session_id, token, now, now)
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            if not claimed_by_other:
+                break
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out waiting for another process to create session {session_id}")
+            time.sleep(self.poll_interval)
+
+        try:
+            thread_id = create()
+        except BaseException:
+            conn.execute("DELETE FROM ASSISTANT_SESSION WHERE SESSION_ID = ? AND CLAIM_TOKEN = ? AND THREAD_ID IS NULL",
+                         (session_id, token))
+            raise
+
+        conn.execute(
+            "UPDATE ASSISTANT_SESSION SET THREAD_ID = ?, LAST_ACCESS = ? WHERE SESSION_ID = ? AND CLAIM_TOKEN = ?",
+            (thread_id, time.time(), session_id, token)
+        )
+        self._count("created")
+        return thread_id, True
+
+    def delete(self, session_id: str) -> None:
+        self._connection().execute("DELETE FROM ASSISTANT_SESSION WHERE SESSION_ID = ?", (session_id,))
+
+    def purge_expired(self) -> int:
+        if self.ttl <= 0:
+            return 0
+        now = time.time()
+        cursor = self._connection().execute(
+            "DELETE FROM ASSISTANT_SESSION WHERE (THREAD_ID IS NOT NULL AND LAST_ACCESS <= ?) "
+            "OR (THREAD_ID IS NULL AND LAST_ACCESS <= ?)",
+            (now - self.ttl, now - self.claim_timeout)
+        )
+        self._count("expired", cursor.rowcount)
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM ASSISTANT_SESSION WHERE THREAD_ID IS NOT NULL"
+        ).fetchone()[0]
+
+
+def create_session_store(name: Optional[str] = None, **kwargs) -> SessionStore:
+    """
+    根据名称创建会话存储
+
+    参数:
+        name (Optional[str]): 后端名称（memory或sqlite），默认从环境变量SESSION_STORE获取，未设置时为memory
+        **kwargs: 传给会话存储构造函数的参数
+
+    返回:
+        SessionStore: 会话存储
+
+    异常:
+        ValueError: 后端名称无效时抛出
+
+    示例:
+        >>> store = create_session_store("sqlite", path="cache/sessions.sqlite")
+    """
+    name = (name or os.getenv("SESSION_STORE") or MemorySessionStore.name).lower()
+    if name == MemorySessionStore.name:
+        return MemorySessionStore(**kwargs)
+    if name == SqliteSessionStore.name:
+        return SqliteSessionStore(**kwargs)
+    raise ValueError(f"Unknown session store: {name}")
+
+
+# 进程内共享的默认会话存储
+_default_store: Optional[SessionStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """
+    获取进程内共享的默认会话存储（由SESSION_STORE环境变量决定）
+
+    所有AssistantService实例共用它，因此api和controllers中的实例看到同一组会话。
+
+    返回:
+        SessionStore: 会话存储
+
+    示例:
+        >>> thread_id, _ = get_session_store().get_or_create(session_id, create_thread)
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = create_session_store()
+        return _default_store
@@ -10,7 +10,8 @@ from flask import current_app
 from werkzeug.utils import secure_filename
 
 from services.openai_service import OpenAIService
-from utils.file_utils import create_temp_file, save_temp_file_reference
+from services.tts_cache import TTSCache, get_tts_cache
+from services.warning_bank import WarningBank, get_warning_bank
 from utils.audio_utils import is_valid_audio_format, prepare_audio_file_for_api
 import config
 
@@ -24,11 +25,15 @@ class SpeechService:
         openai_service (OpenAIService): OpenAI服务实例
         allowed_formats (list): 允许的音频格式列表
         voice (str): 默认TTS语音类型
+        tts_cache (TTSCache): 语音合成缓存
+        warning_bank (WarningBank): 预先生成的审核警告
     """
 
     def __init__(self, openai_service: Optional[OpenAIService] = None,
                  allowed_formats: Optional[list] = None,
-                 voice: Optional[str] = None):
+                 voice: Optional[str] = None,
+                 tts_cache: Optional[TTSCache] = None,
+                 warning_bank: Optional[WarningBank] = None):
         """
         初始化语音服务
 
@@ -36,6 +41,8 @@ class SpeechService:
             openai_service (Optional[OpenAIService]): OpenAI服务实例，如不提供则创建新实例
             allowed_formats (Optional[list]): 允许的音频格式列表，默认为配置中的值
             voice (Optional[str]): 默认的语音类型，默认为配置中的值
+            tts_cache (Optional[TTSCache]): 语音合成缓存，如不提供则使用共享缓存
+            warning_bank (Optional[WarningBank]): 审核警告库，如不提供则使用共享警告库
 
         示例:
             >>> service = SpeechService()  # 使用默认配置
@@ -44,6 +51,8 @@ class SpeechService:
         self.openai_service = openai_service or OpenAIService()
         self.allowed_formats = allowed_formats or config.ALLOWED_AUDIO_FORMATS
         self.voice = voice or os.getenv("OPENAI_VOICE", "alloy")
+        self.tts_cache = tts_cache or get_tts_cache()
+        self.warning_bank = warning_bank or get_warning_bank()
 
     def transcribe_audio(self, audio_file: BinaryIO) -> Dict[str, str]:
         """
@@ -75,16 +84,18 @@ class SpeechService:
 
         return {"text": text}
 
-    def text_to_speech(self, text: str, voice: Optional[str] = None) -> Dict[str, str]:
+    def text_to_speech(self, text: str, voice: Optional[str] = None,
+                       stream: Optional[bool] = None) -> Dict[str, Any]:
         """
         将文本转换为语音
 
         参数:
             text (str): 要转换的文本
             voice (Optional[str]): 语音类型，默认使用实例的voice属性
+            stream (Optional[bool]): 是否流式合成（立即返回URL，音频边合成边发送），默认由TTS_STREAMING决定
 
         返回:
-            Dict[str, str]: 包含音频URL的字典
+            Dict[str, Any]: 包含音频URL（audio_url）和按顺序排列的各段音频URL（audio_playlist）的字典
 
         异常:
             Exception: 如果转换过程中出错
@@ -96,16 +107,11 @@ class SpeechService:
         # 使用指定的语音或默认语音
         voice_to_use = voice or self.voice
 
-        # 生成语音
-        audio_data = self.openai_service.text_to_speech(text, voice_to_use)
+        # 长文本按句子分段并行合成，相同的片段直接复用缓存的音频
+        audio_url, playlist = self.tts_cache.synthesize_playlist(text, voice_to_use, openai_service=self.openai_service,
+                                                                 stream=stream)
 
-        # 创建临时文件保存音频
-        audio_path, filename = create_temp_file(audio_data, suffix='.mp3')
-
-        # 保存文件路径以便后续请求
-        save_temp_file_reference(filename, audio_path)
-
-        return {"audio_url": f"/api/audio/{filename}"}
+        return {"audio_url": audio_url, "audio_playlist": playlist}
 
     def moderate_and_respond(self, text: str, language: str = 'en') -> Dict[str, Any]:
         """
@@ -129,23 +135,14 @@ class SpeechService:
         is_flagged, categories = self.openai_service.moderate_content(text)
 
         if is_flagged:
-            # 生成警告信息
-            warning_message = self.openai_service.generate_friendly_warning(categories, language)
-
-            # 生成语音
-            audio_data = self.openai_service.text_to_speech(warning_message)
-
-            # 创建临时文件保存音频
-            audio_path, filename = create_temp_file(audio_data, suffix='.mp3')
-
-            # 保存文件引用
-            save_temp_file_reference(filename, audio_path)
+            # 从警告库取用预先生成的警告和语音
+            warning = self.warning_bank.warning(categories, language)
 
             # 构建警告响应
             return {
-                "text": warning_message,
+                "text": warning["text"],
                 "is_warning": True,
-                "audio_url": f"/api/audio/{filename}"
+                "audio_url": warning["audio_url"]
             }
 
         return {"is_flagged": False}
@@ -0,0 +1,269 @@
+"""
+启动编排
+把启动任务组织成依赖图，在后台并发执行互不依赖的步骤，HTTP服务无需等待启动完成
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from flask import current_app, has_app_context
+
+# 步骤状态
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+FAILED = "failed"
+BLOCKED = "blocked"  # 依赖的步骤失败，不会再执行
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class StartupStep:
+    """
+    启动依赖图中的一个步骤
+
+    属性:
+        name (str): 步骤名称，也是健康检查中的组件名
+        fn (Callable[[Dict[str, Any]], Any]): 执行函数，参数为依赖步骤的结果字典（步骤名 -> 结果）
+        depends_on (tuple): 依赖的步骤名称
+        state (str): 当前状态
+        result (Any): 执行结果
+        error (Optional[str]): 失败原因
+    """
+
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any]], Any], depends_on: Iterable[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.depends_on = tuple(depends_on)
+        self.state = PENDING
+        self.result = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+
+class StartupGraph:
+    """
+    启动依赖图
+
+    通过add登记步骤及其依赖，start后在后台线程池中执行：没有依赖的步骤立即并发执行，
+    其余步骤在所有依赖都就绪后执行；依赖失败的步骤标记为blocked，不再执行。
+    start立即返回，调用方可以马上启动HTTP服务，通过wait等待某个组件就绪，
+    通过status获取每个组件的状态用于健康检查。
+
+    属性:
+        max_workers (int): 并发执行步骤的线程数
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        初始化启动依赖图
+
+        参数:
+            max_workers (int): 并发执行步骤的线程数
+
+        示例:
+            >>> graph = StartupGraph()
+            >>> graph.add("catalog", lambda deps: export_catalog())
+            >>> graph.add("title_index", lambda deps: build_index(deps["catalog"]), depends_on=["catalog"])
+            >>> graph.start()
+        """
+        self.max_workers = max_workers
+        self._steps: Dict[str, StartupStep] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._started_at: Optional[float] = None
+
+    def add(self, name: str, fn: Callable[[Dict[str, Any]], Any], depends_on: Iterable[str] = ()) -> StartupStep:
+        """
+        登记一个步骤
+
+        参数:
+            name (str): 步骤名称
+            fn (Callable[[Dict[str, Any]], Any]): 执行函数，参数为依赖步骤的结果字典
+            depends_on (Iterable[str]): 依赖的步骤名称，必须已经登记
+
+        返回:
+            StartupStep: 登记的步骤
+
+        异常:
+            ValueError: 步骤重名或依赖未登记时抛出
+        """
+        if name in self._steps:
+            raise ValueError(f"Duplicate startup step: {name}")
+        step = StartupStep(name, fn, depends_on)
+        for dependency in step.depends_on:
+            if dependency not in self._steps:
+                raise ValueError(f"Startup step {name} depends on unknown step: {dependency}")
+        self._steps[name] = step
+        return step
+
+    def start(self) -> None:
+        """
+        在后台开始执行依赖图，立即返回
+
+        示例:
+            >>> graph.start()
+            >>> app.run()
+        """
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._started_at = time.monotonic()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="startup")
+            self._schedule_locked()
+
+    def _schedule_locked(self) -> None:
+        """提交所有依赖已就绪的步骤，并把依赖失败的步骤标记为blocked，调用方需持有锁"""
+        changed = True
+        while changed:
+            changed = False
+            for step in self._steps.values():
+                if step.state != PENDING:
+                    continue
+                dependency_states = [self._steps[name].state for name in step.depends_on]
+                if any(state in (FAILED, BLOCKED) for state in dependency_states):
+                    step.state = BLOCKED
+                    step.error = "dependency failed: " + ", ".join(
+                        name for name in step.depends_on if self._steps[name].state in (FAILED, BLOCKED))
+                    step.done.set()
+                    print(f"⏭️ 启动步骤 {step.name} 已跳过: {step.error}")
+                    changed = True
+                elif all(state == READY for state in dependency_states):
+                    step.state = RUNNING
+                    step.started_at = time.monotonic()
+                    dependencies = {name: self._steps[name].result for name in step.depends_on}
+                    self._executor.submit(self._run_step, step, dependencies)
+
+    def _run_step(self, step: StartupStep, dependencies: Dict[str, Any]) -> None:
+        """工作线程：执行步骤并调度后续步骤"""
+        print(f"🚀 启动步骤开始: {step.name}")
+        try:
+            result = step.fn(dependencies)
+        except Exception as e:
+            with self._lock:
+                step.state = FAILED
+                step.error = str(e)
+                step.finished_at = time.monotonic()
+                step.done.set()
+                self._schedule_locked()
+            print(f"❌ 启动步骤失败 {step.name}: {str(e)}")
+            return
+
+        with self._lock:
+            step.result = result
+            step.state = READY
+            step.finished_at = time.monotonic()
+            step.done.set()
+            self._schedule_locked()
+        print(f"✅ 启动步骤完成: {step.name} ({step.finished_at - step.started_at:.1f}s)")
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        等待步骤结束
+
+        参数:
+            name (str): 步骤名称
+            timeout (Optional[float]): 最长等待时间（秒），None表示一直等待
+
+        返回:
+            bool: 步骤是否已就绪（失败、被跳过或超时都返回False）
+
+        示例:
+            >>> if graph.wait("vector_store_index", timeout=10):
+            >>>     recommend()
+        """
+        step = self._steps.get(name)
+        if step is None:
+            return False
+        step.done.wait(timeout)
+        return step.state == READY
+
+    def is_ready(self, name: str) -> bool:
+        """
+        判断步骤是否已就绪
+
+        参数:
+            name (str): 步骤名称
+
+        返回:
+            bool: 是否已就绪
+        """
+        step = self._steps.get(name)
+        return step is not None and step.state == READY
+
+    def result(self, name: str) -> Any:
+        """
+        获取已就绪步骤的结果
+
+        参数:
+            name (str): 步骤名称
+
+        返回:
+            Any: 步骤结果，未就绪时为None
+        """
+        step = self._steps.get(name)
+        return step.result if step is not None and step.state == READY else None
+
+    def status(self) -> Dict[str, Any]:
+        """
+        获取每个组件的状态
+
+        返回:
+            Dict[str, Any]: 包含status（ready、starting或degraded）和components的字典，
+                            components中每个组件包含state、depends_on、error和duration_seconds
+
+        示例:
+            >>> graph.status()["components"]["catalog"]["state"]
+            'ready'
+        """
+        now = time.monotonic()
+        with self._lock:
+            components = {}
+            for step in self._steps.values():
+                duration = None
+                if step.started_at is not None:
+                    duration = round((step.finished_at or now) - step.started_at, 2)
+                components[step.name] = {
+                    "state": step.state,
+                    "depends_on": list(step.depends_on),
+                    "error": step.error,
+                    "duration_seconds": duration
+                }
+            states = [step.state for step in self._steps.values()]
+
+        if any(state in (FAILED, BLOCKED) for state in states):
+            overall = "degraded"
+        elif all(state == READY for state in states):
+            overall = "ready"
+        else:
+            overall = "starting"
+        return {"status": overall, "components": components}
+
+
+def wait_for_component(name: str, timeout: Optional[float] = None) -> bool:
+    """
+    在请求处理中等待启动组件就绪
+
+    从当前Flask应用配置的STARTUP中获取启动依赖图；应用没有使用启动依赖图时（例如测试或脚本）直接返回True。
+
+    参数:
+        name (str): 组件名称
+        timeout (Optional[float]): 最长等待时间（秒），默认从环境变量STARTUP_WAIT_SECONDS获取
+
+    返回:
+        bool: 组件是否已就绪
+
+    示例:
+        >>> if not wait_for_component("vector_store_index"):
+        >>>     return {"status": "unavailable"}
+    """
+    graph = current_app.config.get("STARTUP") if has_app_context() else None
+    if graph is None:
+        return True
+    if timeout is None:
+        timeout = float(os.getenv("STARTUP_WAIT_SECONDS", "15"))
+    return graph.wait(name, timeout)
@@ -0,0 +1,296 @@
+"""
+书名索引
+基于本地书籍目录构建的倒排索引，支持模糊和容错的书名搜索
+"""
+import os
+import json
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+# 中日韩文字的Unicode范围
+_CJK_PATTERN = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_CJK_RUN = re.compile(f"[{_CJK_PATTERN}]+")
+_NON_WORD = re.compile(f"[^0-9a-z{_CJK_PATTERN}]+")
+
+# 评分权重
+GRAM_WEIGHT = 0.6
+TOKEN_WEIGHT = 0.4
+PHRASE_BONUS = 0.2
+DEFAULT_MIN_SCORE = 0.3
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化文本：全角转半角、统一小写、去掉重音符号，并把标点替换为空格
+
+    参数:
+        text (str): 原始文本
+
+    返回:
+        str: 规范化后的文本
+
+    示例:
+        >>> normalize_text("The Café's  Secret!")
+        'the cafe s secret'
+    """
+    text = unicodedata.normalize("NFKD", unicodedata.normalize("NFKC", text or "").casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def tokenize(normalized: str) -> List[str]:
+    """
+    把规范化后的文本切分为词元
+
+    拉丁字母和数字按空格分词；连续的中日韩文字切分为二元组，单个汉字保留为一元组。
+
+    参数:
+        normalized (str): normalize_text处理后的文本
+
+    返回:
+        List[str]: 词元列表
+
+    示例:
+        >>> tokenize("little red 小红帽")
+        ['little', 'red', '小红', '红帽']
+    """
+    tokens = []
+    for part in normalized.split():
+        pos = 0
+        for match in _CJK_RUN.finditer(part):
+            if match.start() > pos:
+                tokens.append(part[pos:match.start()])
+            run = match.group()
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            pos = match.end()
+        if pos < len(part):
+            tokens.append(part[pos:])
+    return tokens
+
+
+def char_ngrams(tokens: List[str], n: int = 3) -> Set[str]:
+    """
+    生成用于模糊匹配的字符n元组
+
+    拉丁词元两端加上边界符后切分为三元组，因此拼写错误只影响少量n元组；
+    中日韩词元本身已经是二元组，直接作为n元组使用。
+
+    参数:
+        tokens (List[str]): 词元列表
+        n (int): n元组长度
+
+    返回:
+        Set[str]: n元组集合
+    """
+    grams = set()
+    for token in tokens:
+        if _CJK_RUN.match(token):
+            grams.add(token)
+            continue
+        padded = f"${token}$"
+        if len(padded) <= n:
+            grams.add(padded)
+        else:
+            grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+class TitleIndex:
+    """
+    书名倒排索引
+
+    为每本书的书名建立词元和字符n元组两个倒排表。搜索时先通过倒排表找出候选书籍，
+    再结合n元组的Dice相似度、按IDF加权的词元覆盖率以及整句匹配加分进行排序。
+
+    属性:
+        books (List[Dict[str, Any]]): 目录中的书籍记录
+        source_path (Optional[str]): 构建索引使用的目录文件
+        source_mtime (Optional[float]): 构建时目录文件的修改时间
+    """
+
+    def __init__(self, books: List[Dict[str, Any]], source_path: Optional[str] = None,
+                 source_mtime: Optional[float] = None):
+        """
+        根据书籍记录构建索引
+
+        参数:
+            books (List[Dict[str, Any]]): 书籍记录，每条包含book_id和book_title
+            source_path (Optional[str]): 目录文件路径
+            source_mtime (Optional[float]): 目录文件的修改时间
+
+        示例:
+            >>> index = TitleIndex([{"book_id": "1-1", "book_title": "The Lost Kitten"}])
+            >>> index.search("lost kiten")
+        """
+        self.books = books
+        self.source_path = source_path
+        self.source_mtime = source_mtime
+
+        self._titles: List[str] = []
+        self._token_sets: List[Set[str]] = []
+        self._gram_counts: List[int] = []
+        self._token_postings: Dict[str, List[int]] = defaultdict(list)
+        self._gram_postings: Dict[str, List[int]] = defaultdict(list)
+
+        for doc_id, book in enumerate(books):
+            normalized = normalize_text(book.get("book_title", ""))
+            tokens = set(tokenize(normalized))
+            grams = char_ngrams(list(tokens))
+
+            self._titles.append(normalized)
+            self._token_sets.append(tokens)
+            self._gram_counts.append(len(grams))
+            for token in tokens:
+                self._token_postings[token].append(doc_id)
+            for gram in grams:
+                self._gram_postings[gram].append(doc_id)
+
+        doc_count = max(len(books), 1)
+        self._idf = {
+            token: math.log(1 + doc_count / len(postings))
+            for token, postings in self._token_postings.items()
+        }
+
+    @classmethod
+    def from_catalog(cls, catalog_path: str) -> "TitleIndex":
+        """
+        从JSON Lines格式的书籍目录文件构建索引
+
+        参数:
+            catalog_path (str): 目录文件路径（如cache/production_books.json）
+
+        返回:
+            TitleIndex: 书名索引
+
+        示例:
+            >>> index = TitleIndex.from_catalog("cache/production_books.json")
+        """
+        mtime = os.path.getmtime(catalog_path)
+        books = []
+        with open(catalog_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    book = json.loads(line)
+                except ValueError:
+                    continue
+                if book.get("book_id") and book.get("book_title"):
+                    books.append(book)
+        return cls(books, source_path=catalog_path, source_mtime=mtime)
+
+    def __len__(self) -> int:
+        return len(self.books)
+
+    def search(self, query: str, limit: int = 5,
+               min_score: float = DEFAULT_MIN_SCORE) -> List[Dict[str, Any]]:
+        """
+        搜索书名
+
+        参数:
+            query (str): 用户提供的书名（可以不完整或有拼写错误）
+            limit (int): 最多返回的结果数
+            min_score (float): 最低相关度，低于该值的结果被丢弃
+
+        返回:
+            List[Dict[str, Any]]: 按相关度从高到低排列的书籍记录，每条附带score字段
+
+        示例:
+            >>> for book in index.search("harry poter", limit=3):
+            >>>     print(book["book_id"], book["book_title"], book["score"])
+        """
+        normalized = normalize_text(query)
+        if not normalized:
+            return []
+
+        query_tokens = set(tokenize(normalized))
+        query_grams = char_ngrams(list(query_tokens))
+        if not query_grams:
+            return []
+
+        # 通过n元组倒排表统计每本书共享的n元组数量
+        shared_grams: Dict[int, int] = defaultdict(int)
+        for gram in query_grams:
+            for doc_id in self._gram_postings.get(gram, ()):
+                shared_grams[doc_id] += 1
+
+        query_weight = sum(self._idf.get(token, 1.0) for token in query_tokens)
+
+        scored: List[Tuple[float, int]] = []
+        for doc_id, shared in shared_grams.items():
+            gram_score = 2 * shared / (len(query_grams) + self._gram_counts[doc_id])
+
+            matched_weight = sum(
+                self._idf.get(token, 1.0)
+                for token in query_tokens if token in self._token_sets[doc_id]
+            )
+            token_score = matched_weight / query_weight if query_weight else 0.0
+
+            score = GRAM_WEIGHT * gram_score + TOKEN_WEIGHT * token_score
+            title = self._titles[doc_id]
+            if title == normalized:
+                score += PHRASE_BONUS
+            elif normalized in title:
+                score += PHRASE_BONUS / 2
+
+            if score >= min_score:
+                scored.append((score, doc_id))
+
+        scored.sort(key=lambda item: (-item[0], len(self._titles[item[1]])))
+
+        results = []
+        for score, doc_id in scored[:limit]:
+            book = dict(self.books[doc_id])
+            book["score"] = round(min(score, 1.0), 3)
+            results.append(book)
+        return results
+
+
+# 进程内共享的书名索引，目录文件更新后自动重建
+_shared_index: Optional[TitleIndex] = None
+_shared_index_lock = threading.Lock()
+
+
+def get_title_index(catalog_path: str) -> Optional[TitleIndex]:
+    """
+    获取进程内共享的书名索引
+
+    首次调用或目录文件的修改时间变化时重新构建索引，目录文件不存在时返回None。
+
+    参数:
+        catalog_path (str): 目录文件路径
+
+    返回:
+        Optional[TitleIndex]: 书名索引
+
+    示例:
+        >>> index = get_title_index(os.path.join(cache_dir, "production_books.json"))
+        >>> if index:
+        >>>     results = index.search("little red riding hood")
+    """
+    global _shared_index
+
+    try:
+        mtime = os.path.getmtime(catalog_path)
+    except OSError:
+        return None
+
+    index = _shared_index
+    if index is not None and index.source_path == catalog_path and index.source_mtime == mtime:
+        return index
+
+    with _shared_index_lock:
+        index = _shared_index
+        if index is None or index.source_path != catalog_path or index.source_mtime != mtime:
+            index = TitleIndex.from_catalog(catalog_path)
+            _shared_index = index
+            print(f"🔎 书名索引已构建: {len(index)} 本书")
+        return index
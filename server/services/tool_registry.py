@@ -0,0 +1,387 @@
+"""
+工具注册表
+登记Assistant可调用的函数，并发执行同一步骤中的多个工具调用，支持超时和结果缓存
+"""
+import os
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+from utils.cancellation import CancellationToken, Cancelled, record_saved
+
+# 默认配置
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CACHE_MAX_ENTRIES = 256
+
+# 工具处理函数：接收参数字典和状态回调report(str)，返回可JSON序列化的结果字典
+ToolHandler = Callable[[Dict[str, Any], Callable[[str], None]], Dict[str, Any]]
+
+
+class ToolSpec(NamedTuple):
+    """
+    一个已登记的工具
+
+    属性:
+        name (str): 函数名称，与Assistant定义中的名称一致
+        handler (ToolHandler): 处理函数
+        timeout (float): 超时时间（秒），超时后返回结构化错误
+        cache_ttl (float): 成功结果的缓存时间（秒），0表示不缓存
+        function_type (Optional[str]): 客户端进度显示使用的类型
+        icon (str): 客户端进度显示使用的图标
+    """
+    name: str
+    handler: ToolHandler
+    timeout: float
+    cache_ttl: float = 0
+    function_type: Optional[str] = None
+    icon: str = "🔄"
+
+
+class ToolCall(NamedTuple):
+    """
+    requires_action中的一个工具调用
+
+    属性:
+        call_id (str): 工具调用ID
+        name (str): 函数名称
+        arguments (Dict[str, Any]): 解析后的参数
+    """
+    call_id: str
+    name: str
+    arguments: Dict[str, Any]
+
+
+class ToolEvent(NamedTuple):
+    """
+    执行工具调用时产生的事件
+
+    type取值:
+        start: 开始输出该调用的事件，data为ToolSpec（未登记的工具为None）
+        status: 处理函数报告的状态，data为状态字符串
+        result: 调用结束，data为结果字典
+    """
+    type: str
+    index: int
+    call: ToolCall
+    data: Any
+
+
+class ToolRegistry:
+    """
+    工具注册表
+
+    工具通过register登记，各自声明超时时间和缓存策略。run_batch为每个步骤创建一个线程池，
+    同时执行该步骤中的所有调用（最多max_workers个），因此search_book_by_title和get_book_content
+    不再依次等待，不同请求的调用也不会互相排队。
+    事件仍按调用顺序输出：先输出第一个调用的全部状态和结果，再输出第二个调用
+    已经缓冲的事件，以此类推，客户端看到的进度顺序与串行执行时相同。
+
+    处理函数在工作线程中运行，提交时如果存在Flask应用上下文，会在工作线程中推入同一个应用的上下文，
+    因此处理函数可以继续使用current_app.config。超时时间从处理函数开始执行时计算。
+    超时的调用无法被强制停止，它在自己的线程中运行结束，但结果会被丢弃，调用方立即收到status为timeout的结果；
+    还没开始的调用被撤销。
+    请求被取消时，尚未开始的调用不再执行，正在执行的调用的结果同样被丢弃。
+
+    属性:
+        max_workers (int): 同一个步骤中最多同时执行的调用数
+        default_timeout (float): 未指定超时时间的工具使用的超时时间（秒）
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, default_timeout: Optional[float] = None,
+                 cache_max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        """
+        初始化工具注册表
+
+        参数:
+            max_workers (Optional[int]): 同一个步骤中最多同时执行的调用数，默认从环境变量TOOL_MAX_WORKERS获取
+            default_timeout (Optional[float]): 默认超时时间（秒），默认从环境变量TOOL_TIMEOUT_SECONDS获取
+            cache_max_entries (int): 结果缓存的最大条目数
+
+        示例:
+            >>> registry = ToolRegistry()
+            >>> registry.register("search_book_by_title", search, timeout=10, cache_ttl=300)
+        """
+        self.max_workers = max_workers or int(os.getenv("TOOL_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        self.default_timeout = default_timeout or float(os.getenv("TOOL_TIMEOUT_SECONDS", DEFAULT_TIMEOUT))
+        self.cache_max_entries = cache_max_entries
+
+        self._tools: Dict[str, ToolSpec] = {}
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"calls": 0, "cache_hits": 0, "timeouts": 0, "errors": 0, "aborted": 0,
+                         "timed_out_running": 0}
+
+    def register(self, name: str, handler: ToolHandler, timeout: Optional[float] = None,
+                 cache_ttl: float = 0, function_type: Optional[str] = None, icon: str = "🔄") -> ToolSpec:
+        """
+        登记一个工具
+
+        参数:
+            name (str): 函数名称
+            handler (ToolHandler): 处理函数，签名为handler(arguments, report)
+            timeout (Optional[float]): 超时时间（秒），默认为default_timeout
+            cache_ttl (float): 成功结果的缓存时间（秒），0表示不缓存
+            function_type (Optional[str]): 客户端进度显示使用的类型
+            icon (str): 客户端进度显示使用的图标
+
+        返回:
+            ToolSpec: 登记的工具
+
+        示例:
+            >>> registry.register("get_book_content", get_content, timeout=20,
+            >>>                   function_type="book_content", icon="📖")
+        """
+        spec = ToolSpec(name, handler, timeout or self.default_timeout, cache_ttl, function_type, icon)
+        self._tools[name] = spec
+        return spec
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        """
+        获取已登记的工具
+
+        参数:
+            name (str): 函数名称
+
+        返回:
+            Optional[ToolSpec]: 工具，未登记时返回None
+        """
+        return self._tools.get(name)
+
+    def run_batch(self, calls: List[ToolCall],
+                  cancel_token: Optional[CancellationToken] = None) -> Iterator[ToolEvent]:
+        """
+        并发执行一个步骤中的所有工具调用，按调用顺序输出事件（生成器函数）
+
+        参数:
+            calls (List[ToolCall]): 工具调用列表
+            cancel_token (Optional[CancellationToken]): 取消令牌，取消后尚未完成的调用被中止
+
+        返回:
+            Iterator[ToolEvent]: 每个调用依次产生start、若干status和一个result事件
+
+        异常:
+            Cancelled: 取消令牌被取消时抛出
+
+        示例:
+            >>> for event in registry.run_batch(calls):
+            >>>     if event.type == "result":
+            >>>         print(event.call.name, event.data["status"])
+        """
+        app = current_app._get_current_object() if has_app_context() else None
+
+        # 先找出需要执行的调用，再一起提交，最后按顺序等待
+        channels = []
+        runnable = []
+        for index, call in enumerate(calls):
+            spec = self._tools.get(call.name)
+            channel: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+            channels.append(channel)
+            if spec is None:
+                channel.put(("result", {"status": "function_not_found"}))
+                continue
+            with self._lock:
+                self._metrics["calls"] += 1
+            cached = self._cache_get(spec, call.arguments)
+            if cached is not None:
+                channel.put(("result", cached))
+            else:
+                runnable.append(index)
+
+        futures: List[Optional[Future]] = [None] * len(calls)
+        if runnable:
+            # 每个步骤一个线程池：超时仍在运行的处理函数只占用本步骤的线程
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(runnable)),
+                                          thread_name_prefix="tool")
+            for index in runnable:
+                futures[index] = executor.submit(self._run, self._tools[calls[index].name],
+                                                 calls[index].arguments, channels[index], app)
+            # 不等待，排队中的调用在线程池中继续执行，全部结束后线程退出
+            executor.shutdown(wait=False)
+        pending = [(call, self._tools.get(call.name), channel, future)
+                   for call, channel, future in zip(calls, channels, futures)]
+
+        def abort():
+            # 在取消请求的线程中执行：撤销尚未开始的调用，并唤醒正在等待结果的生成器
+            aborted = 0
+            for _, _, channel, future in pending:
+                if future is not None and not future.done():
+                    future.cancel()
+                    aborted += 1
+                channel.put(("cancelled", None))
+            if aborted:
+                with self._lock:
+                    self._metrics["aborted"] += aborted
+                record_saved("tool_calls_aborted", aborted)
+
+        unregister = cancel_token.add_callback(abort) if cancel_token is not None else None
+        try:
+            yield from self._emit(pending, cancel_token)
+        except GeneratorExit:
+            # 调用方不再需要结果
+            abort()
+            raise
+        finally:
+            if unregister is not None:
+                unregister()
+
+    def _emit(self, pending: List[Tuple[ToolCall, Optional[ToolSpec], "queue.Queue[Tuple[str, Any]]",
+                                        Optional[Future]]],
+              cancel_token: Optional[CancellationToken]) -> Iterator[ToolEvent]:
+        """按调用顺序输出已提交调用的事件"""
+        for index, (call, spec, channel, future) in enumerate(pending):
+            yield ToolEvent("start", index, call, spec)
+            # 处理函数开始执行前的排队时间不计入超时；排队本身最多等待一个超时时间，
+            # 避免同一步骤中卡住的调用占满线程后，后面的调用一直等下去
+            deadline = time.monotonic() + spec.timeout if future is not None else None
+            while True:
+                try:
+                    if deadline is None:
+                        kind, data = channel.get()
+                    else:
+                        kind, data = channel.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self._record_timeout(future)
+                    print(f"⏱️ 工具调用超时: {call.name} ({spec.timeout:g}s)")
+                    yield ToolEvent("result", index, call, {
+                        "status": "timeout",
+                        "error": f"{call.name} did not finish within {spec.timeout:g} seconds"
+                    })
+                    break
+                if kind == "cancelled":
+                    raise Cancelled(cancel_token.reason)
+                if kind == "started":
+                    deadline = data + spec.timeout
+                    continue
+                yield ToolEvent(kind, index, call, data)
+                if kind == "result":
+                    break
+
+    def _record_timeout(self, future: Future) -> None:
+        """记录超时：还没开始的调用被撤销，已经开始的调用计入仍在运行的超时调用，结束后扣除"""
+        with self._lock:
+            self._metrics["timeouts"] += 1
+        if future.cancel():
+            return
+        with self._lock:
+            self._metrics["timed_out_running"] += 1
+
+        def finished(_):
+            with self._lock:
+                self._metrics["timed_out_running"] -= 1
+
+        future.add_done_callback(finished)
+
+    def execute(self, name: str, arguments: Dict[str, Any],
+                report: Optional[Callable[[str], Any]] = None,
+                cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        执行单个工具调用
+
+        参数:
+            name (str): 函数名称
+            arguments (Dict[str, Any]): 函数参数
+            report (Optional[Callable[[str], Any]]): 接收状态更新的回调函数
+            cancel_token (Optional[CancellationToken]): 取消令牌
+
+        返回:
+            Dict[str, Any]: 调用结果
+
+        异常:
+            Cancelled: 取消令牌被取消时抛出
+
+        示例:
+            >>> result = registry.execute("search_book_by_title", {"title": "Columbus"})
+        """
+        result = None
+        for event in self.run_batch([ToolCall("", name, arguments)], cancel_token):
+            if event.type == "status" and report:
+                report(event.data)
+            elif event.type == "result":
+                result = event.data
+        return result
+
+    def _run(self, spec: ToolSpec, arguments: Dict[str, Any],
+             channel: "queue.Queue[Tuple[str, Any]]", app: Any) -> None:
+        """工作线程：执行处理函数，把状态和结果写入该调用的事件通道"""
+        def report(message: str) -> None:
+            channel.put(("status", message))
+
+        channel.put(("started", time.monotonic()))
+        try:
+            with app.app_context() if app is not None else nullcontext():
+                result = spec.handler(arguments, report)
+        except Exception as e:
+            print(f"❌ 工具调用失败 {spec.name}: {str(e)}")
+            with self._lock:
+                self._metrics["errors"] += 1
+            result = {"status": "error", "error": str(e)}
+        else:
+            self._cache_put(spec, arguments, result)
+        channel.put(("result", result))
+
+    @staticmethod
+    def _cache_key(spec: ToolSpec, arguments: Dict[str, Any]) -> Tuple[str, str]:
+        """生成缓存键：工具名称加上规范化的参数"""
+        return spec.name, json.dumps(arguments, sort_keys=True, ensure_ascii=False)
+
+    def _cache_get(self, spec: ToolSpec, arguments: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """读取未过期的缓存结果"""
+        if spec.cache_ttl <= 0:
+            return None
+        key = self._cache_key(spec, arguments)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at <= time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self._metrics["cache_hits"] += 1
+            return result
+
+    def _cache_put(self, spec: ToolSpec, arguments: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """缓存成功的结果，超出容量时淘汰最久未使用的条目"""
+        if spec.cache_ttl <= 0 or not isinstance(result, dict) or result.get("status") != "success":
+            return
+        key = self._cache_key(spec, arguments)
+        with self._lock:
+            self._cache[key] = (time.monotonic() + spec.cache_ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self) -> None:
+        """
+        清空结果缓存
+
+        示例:
+            >>> registry.clear_cache()
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计信息
+
+        返回:
+            Dict[str, int]: 包含calls、cache_hits、timeouts、errors、aborted、cached和
+                            timed_out_running（已超时但处理函数仍在运行的调用数）的字典
+
+        示例:
+            >>> print(registry.stats()["cache_hits"])
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["cached"] = len(self._cache)
+        return metrics
@@ -0,0 +1,507 @@
+"""
+语音合成缓存
+按内容寻址缓存TTS音频，相同的文本、语音、模型和格式只合成一次，支持边合成边播放和长文本分句并行合成
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from services.audio_stream import AudioStream, AudioStreamHub
+from utils.disk_cache import DiskLRUCache
+from utils.single_flight import SingleFlight
+from utils.speech_segments import split_speech_segments
+
+# 默认配置
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_VOICE = "alloy"
+DEFAULT_MODEL = "tts-1"
+DEFAULT_FORMAT = "mp3"
+DEFAULT_STREAM_CHUNK_BYTES = 4096
+DEFAULT_SEGMENT_CHARS = 300
+DEFAULT_SEGMENT_PARALLELISM = 3
+DEFAULT_AUDIO_WAIT_SECONDS = 5.0
+PLAYLIST_MAX_BYTES = 16 * 1024 * 1024
+
+# 音频格式对应的MIME类型
+AUDIO_MIMETYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+}
+
+# 可以把多段音频首尾相接播放的格式（按帧或按页组织，没有描述整个文件的文件头）
+CONCATENABLE_FORMATS = {"mp3", "aac", "opus"}
+
+# 缓存音频的文件名：tts-<键>.<格式>
+_FILENAME_PATTERN = re.compile(r"^tts-([0-9a-f]{64})\.([a-z0-9]+)$")
+
+# 分段音频拼接而成的音频流的文件名：ttsp-<播放列表键>.<格式>
+_PLAYLIST_PATTERN = re.compile(r"^ttsp-([0-9a-f]{64})\.([a-z0-9]+)$")
+
+
+class TTSCache:
+    """
+    语音合成缓存类
+
+    缓存键是文本、语音、模型和格式的SHA-256摘要，音频保存在cache/tts目录下，
+    超出容量上限时按LRU淘汰。命中时直接返回稳定的URL /api/audio/tts-<键>.<格式>，
+    不调用OpenAI API；同一个键的并发未命中只合成一次。
+
+    流式模式下未命中时在后台开始流式合成并立即返回URL，/api/audio收到第一个数据块就开始分块发送，
+    同时把音频写入缓存供之后重放；合成还在进行时请求同一个URL的收听者加入同一个流。
+
+    长文本由synthesize_playlist按句子切分，各段有限并发地合成并分别缓存，返回有序的播放列表，
+    以及一个按顺序拼接各段音频的URL，第一句可以在后面的句子还在合成时开始播放。
+
+    属性:
+        store (DiskLRUCache): 底层磁盘缓存
+        playlists (DiskLRUCache): 播放列表清单
+        streams (AudioStreamHub): 进行中的流式合成
+        streaming (bool): 默认是否使用流式合成；关闭时/api/audio不发送合成中的音频，而是等待合成完成
+        audio_wait_seconds (float): 关闭流式播放时/api/audio等待后台合成完成的最长时间（秒）
+        segment_chars (int): 分段合成时每段的目标字符数
+        segment_parallelism (int): 同一段文本最多同时合成的片段数
+        openai_service: 默认用于合成语音的OpenAI服务
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None, openai_service: Any = None,
+                 streaming: Optional[bool] = None, stream_chunk_bytes: Optional[int] = None,
+                 segment_chars: Optional[int] = None, segment_parallelism: Optional[int] = None):
+        """
+        初始化语音合成缓存
+
+        参数:
+            cache_dir (Optional[str]): 项目缓存目录，音频保存在其中的tts子目录，默认为项目根目录下的cache目录
+            max_bytes (Optional[int]): 缓存容量上限，默认从环境变量TTS_CACHE_MAX_BYTES获取
+            ttl_seconds (Optional[float]): 缓存有效期（秒），默认从环境变量TTS_CACHE_TTL_SECONDS获取
+            openai_service: 默认用于合成语音的OpenAI服务，如不提供则在第一次合成时创建
+            streaming (Optional[bool]): 默认是否使用流式合成，默认从环境变量TTS_STREAMING获取
+            stream_chunk_bytes (Optional[int]): 流式合成的数据块大小，默认从环境变量TTS_STREAM_CHUNK_BYTES获取
+            segment_chars (Optional[int]): 分段合成时每段的目标字符数，默认从环境变量TTS_SEGMENT_CHARS获取
+            segment_parallelism (Optional[int]): 分段合成的并发数，默认从环境变量TTS_SEGMENT_PARALLELISM获取
+
+        示例:
+            >>> cache = TTSCache()
+            >>> url = cache.synthesize("Hello!", voice="nova")
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(__file__), "..", "..", "cache")
+        if max_bytes is None:
+            max_bytes = int(os.getenv("TTS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("TTS_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        if streaming is None:
+            streaming = os.getenv("TTS_STREAMING", "true").lower() == "true"
+
+        self.store = DiskLRUCache(os.path.join(cache_dir, "tts"), max_bytes=max_bytes,
+                                  ttl_seconds=ttl_seconds, suffix=".audio")
+        self.playlists = DiskLRUCache(os.path.join(cache_dir, "tts-playlists"), max_bytes=PLAYLIST_MAX_BYTES,
+                                      ttl_seconds=ttl_seconds, suffix=".json")
+        self.streams = AudioStreamHub()
+        self.streaming = streaming
+        self.stream_chunk_bytes = stream_chunk_bytes or int(
+            os.getenv("TTS_STREAM_CHUNK_BYTES", DEFAULT_STREAM_CHUNK_BYTES))
+        self.segment_chars = segment_chars or int(os.getenv("TTS_SEGMENT_CHARS", DEFAULT_SEGMENT_CHARS))
+        self.segment_parallelism = max(1, segment_parallelism or int(
+            os.getenv("TTS_SEGMENT_PARALLELISM", DEFAULT_SEGMENT_PARALLELISM)))
+        self.audio_wait_seconds = float(os.getenv("TTS_AUDIO_WAIT_SECONDS", DEFAULT_AUDIO_WAIT_SECONDS))
+        self.openai_service = openai_service
+        self._inflight = SingleFlight()
+        self._lock = threading.Lock()
+        self._metrics = {"synthesized": 0, "synthesized_chars": 0, "saved_calls": 0, "saved_chars": 0,
+                         "playlists": 0, "playlist_segments": 0}
+
+    @staticmethod
+    def cache_key(text: str, voice: str = DEFAULT_VOICE, model: str = DEFAULT_MODEL,
+                  response_format: str = DEFAULT_FORMAT) -> str:
+        """
+        计算缓存键
+
+        参数:
+            text (str): 文本
+            voice (str): 语音类型
+            model (str): TTS模型
+            response_format (str): 音频格式
+
+        返回:
+            str: 64位十六进制摘要
+
+        示例:
+            >>> TTSCache.cache_key("Hello!", "alloy", "tts-1", "mp3")
+        """
+        payload = json.dumps([model, voice, response_format, text], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def url_for(key: str, response_format: str = DEFAULT_FORMAT) -> str:
+        """
+        获取缓存音频的URL
+
+        参数:
+            key (str): 缓存键
+            response_format (str): 音频格式
+
+        返回:
+            str: 音频URL
+        """
+        return f"/api/audio/tts-{key}.{response_format}"
+
+    def synthesize(self, text: str, voice: str = DEFAULT_VOICE, model: str = DEFAULT_MODEL,
+                   response_format: str = DEFAULT_FORMAT, openai_service: Any = None,
+                   stream: Optional[bool] = None) -> str:
+        """
+        获取文本对应的音频URL，缓存未命中时调用TTS API合成并缓存
+
+        流式模式下不等待合成完成，返回的URL可以立即请求，音频边合成边发送。
+
+        参数:
+            text (str): 要转换的文本
+            voice (str): 语音类型
+            model (str): TTS模型
+            response_format (str): 音频格式
+            openai_service: 用于合成语音的OpenAI服务，默认为构造时提供的服务
+            stream (Optional[bool]): 是否使用流式合成，默认为streaming属性
+
+        返回:
+            str: 音频URL，相同输入总是得到相同的URL
+
+        示例:
+            >>> url = tts_cache.synthesize("你好！", voice="nova", openai_service=self.openai_service)
+            >>> print(url)
+            /api/audio/tts-3f2a....mp3
+        """
+        key = self.cache_key(text, voice, model, response_format)
+        if self.store.touch(key):
+            self._record_saved(text)
+            return self.url_for(key, response_format)
+
+        service = openai_service or self._default_openai_service()
+        if self.streaming if stream is None else stream:
+            self._start_stream(key, text, voice, model, response_format, service)
+            return self.url_for(key, response_format)
+
+        _, shared = self._inflight.do(key, self._synthesize, key, text, voice, model, response_format,
+                                      service)
+        if shared:
+            self._record_saved(text)
+        return self.url_for(key, response_format)
+
+    def _synthesize(self, key: str, text: str, voice: str, model: str, response_format: str,
+                    openai_service: Any) -> str:
+        """调用TTS API并写入缓存"""
+        # 同一段音频正在流式合成时等它写入缓存
+        live = self.streams.get(key)
+        if live is not None:
+            live.wait()
+        # 等待合并期间其他请求可能已经写入
+        if self.store.contains(key):
+            return self.store.path_for(key)
+        audio_data = openai_service.text_to_speech(text, voice, model=model, response_format=response_format)
+        with self._lock:
+            self._metrics["synthesized"] += 1
+            self._metrics["synthesized_chars"] += len(text)
+        return self.store.set(key, audio_data)
+
+    def synthesize_playlist(self, text: str, voice: str = DEFAULT_VOICE, model: str = DEFAULT_MODEL,
+                            response_format: str = DEFAULT_FORMAT, openai_service: Any = None,
+                            stream: Optional[bool] = None) -> Tuple[str, List[str]]:
+        """
+        按句子切分长文本并有限并发地合成各段，返回拼接音频的URL和有序的播放列表
+
+        单次合成的耗时与文本长度成正比，且超过TTS接口的输入上限时会直接失败。这里第一段只包含第一句，
+        之后的句子合并为约segment_chars个字符一段，最多segment_parallelism段同时合成，
+        每段单独缓存，因此重复的句子（例如固定的开场白）也能命中缓存。
+        只有一段时与synthesize完全相同。
+
+        参数:
+            text (str): 要转换的文本
+            voice (str): 语音类型
+            model (str): TTS模型
+            response_format (str): 音频格式
+            openai_service: 用于合成语音的OpenAI服务，默认为构造时提供的服务
+            stream (Optional[bool]): 是否使用流式合成，默认为streaming属性。流式时立即返回，
+                                     否则等所有片段合成完成后返回
+
+        返回:
+            Tuple[str, List[str]]: (音频URL, 各段音频的URL)。格式可以拼接（mp3、aac、opus）时
+                                   音频URL按顺序播放所有片段，否则为第一段的URL，客户端应依次播放列表
+
+        示例:
+            >>> audio_url, playlist = tts_cache.synthesize_playlist(long_reply, openai_service=self.openai_service)
+            >>> print(audio_url)
+            /api/audio/ttsp-9b1c....mp3
+        """
+        segments = split_speech_segments(text, self.segment_chars)
+        if len(segments) <= 1:
+            url = self.synthesize(text, voice, model, response_format, openai_service, stream)
+            return url, [url]
+
+        service = openai_service or self._default_openai_service()
+        keys = [self.cache_key(segment, voice, model, response_format) for segment in segments]
+
+        # 每段文本各用一个有界线程池，先提交的片段先合成
+        executor = ThreadPoolExecutor(max_workers=min(self.segment_parallelism, len(segments)),
+                                      thread_name_prefix="tts-segment")
+        try:
+            if self.streaming if stream is None else stream:
+                for key, segment in zip(keys, segments):
+                    if self.store.touch(key):
+                        self._record_saved(segment)
+                    else:
+                        self._start_stream(key, segment, voice, model, response_format, service, executor)
+            else:
+                list(executor.map(lambda segment: self.synthesize(segment, voice, model, response_format,
+                                                                  service, stream=False), segments))
+        finally:
+            # 不等待排队中的片段，它们在线程池中继续执行
+            executor.shutdown(wait=False)
+
+        playlist_key = hashlib.sha256(json.dumps(keys).encode("utf-8")).hexdigest()
+        if not self.playlists.contains(playlist_key):
+            manifest = {"voice": voice, "model": model, "format": response_format,
+                        "segments": [{"key": key, "text": segment} for key, segment in zip(keys, segments)]}
+            self.playlists.set(playlist_key, json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self._metrics["playlists"] += 1
+            self._metrics["playlist_segments"] += len(segments)
+
+        urls = [self.url_for(key, response_format) for key in keys]
+        if response_format not in CONCATENABLE_FORMATS:
+            return urls[0], urls
+        return f"/api/audio/ttsp-{playlist_key}.{response_format}", urls
+
+    def playlist_stream(self, filename: str) -> Optional[Iterator[bytes]]:
+        """
+        根据拼接音频URL中的文件名，按顺序读取播放列表中各段的音频
+
+        还在合成的片段加入其音频流，已合成的片段从缓存读取，已被淘汰的片段重新合成，
+        因此第一段可以在后面的片段还在合成时开始发送。
+
+        参数:
+            filename (str): 文件名，如ttsp-<键>.mp3
+
+        返回:
+            Optional[Iterator[bytes]]: 音频数据块，不是播放列表文件名或清单已过期时返回None
+
+        示例:
+            >>> chunks = tts_cache.playlist_stream(filename)
+            >>> if chunks is not None:
+            >>>     return Response(chunks, mimetype=TTSCache.mimetype_for(filename))
+        """
+        match = _PLAYLIST_PATTERN.match(filename)
+        if not match:
+            return None
+        data = self.playlists.get(match.group(1))
+        if data is None:
+            return None
+        return self._iter_playlist(json.loads(data.decode("utf-8")))
+
+    def _iter_playlist(self, manifest: Dict[str, Any]) -> Iterator[bytes]:
+        """依次发送各段音频，跳过合成失败的片段"""
+        for segment in manifest["segments"]:
+            key = segment["key"]
+            live = self.streams.attach(key)
+            if live is None and not self.store.touch(key):
+                self.synthesize(segment["text"], manifest["voice"], manifest["model"], manifest["format"],
+                                stream=True)
+                live = self.streams.attach(key)
+            if live is not None:
+                yield from live.iter_chunks()
+                continue
+            try:
+                with open(self.store.path_for(key), "rb") as f:
+                    while True:
+                        chunk = f.read(self.stream_chunk_bytes)
+                        if not chunk:
+                            break
+                        yield chunk
+            except OSError:
+                continue
+
+    def _start_stream(self, key: str, text: str, voice: str, model: str, response_format: str,
+                      openai_service: Any, executor: Optional[Executor] = None) -> AudioStream:
+        """开始流式合成，完成后写入缓存；同一个键已在合成时加入它"""
+        def source():
+            return openai_service.text_to_speech_stream(text, voice, model=model, response_format=response_format,
+                                                        chunk_size=self.stream_chunk_bytes)
+
+        stream, started = self.streams.start(key, source, on_complete=lambda data: self.store.set(key, data),
+                                             executor=executor)
+        if started:
+            with self._lock:
+                self._metrics["synthesized"] += 1
+                self._metrics["synthesized_chars"] += len(text)
+        else:
+            self._record_saved(text)
+        return stream
+
+    def _record_saved(self, text: str) -> None:
+        with self._lock:
+            self._metrics["saved_calls"] += 1
+            self._metrics["saved_chars"] += len(text)
+
+    def _default_openai_service(self) -> Any:
+        if self.openai_service is None:
+            from services.openai_service import OpenAIService
+            self.openai_service = OpenAIService()
+        return self.openai_service
+
+    def _keys_for(self, filename: str) -> Optional[List[str]]:
+        """获取音频文件名对应的缓存键，播放列表返回各段的键；不是缓存音频的文件名时返回None"""
+        match = _FILENAME_PATTERN.match(filename)
+        if match:
+            return [match.group(1)]
+        match = _PLAYLIST_PATTERN.match(filename)
+        if match:
+            data = self.playlists.get(match.group(1))
+            if data is not None:
+                return [segment["key"] for segment in json.loads(data.decode("utf-8"))["segments"]]
+        return None
+
+    def audio_status(self, filename: str) -> str:
+        """
+        获取音频URL对应的合成状态
+
+        参数:
+            filename (str): 文件名，如tts-<键>.mp3或ttsp-<键>.mp3
+
+        返回:
+            str: pending（还在后台合成）、ready（全部已缓存）、failed（合成失败或已被淘汰）
+                 或missing（不是缓存音频的文件名）
+
+        示例:
+            >>> if tts_cache.audio_status(filename) == "ready":
+            >>>     return send_file(tts_cache.resolve(filename))
+        """
+        keys = self._keys_for(filename)
+        if keys is None:
+            return "missing"
+        if any(self.streams.get(key) is not None for key in keys):
+            return "pending"
+        return "ready" if all(self.store.contains(key) for key in keys) else "failed"
+
+    def wait_ready(self, filename: str, timeout: float) -> str:
+        """
+        等待音频URL对应的后台合成完成
+
+        参数:
+            filename (str): 文件名，如tts-<键>.mp3或ttsp-<键>.mp3
+            timeout (float): 最长等待时间（秒）
+
+        返回:
+            str: 等待后的合成状态，取值同audio_status，超时时为pending
+
+        示例:
+            >>> if tts_cache.wait_ready(filename, 5) == "pending":
+            >>>     return jsonify({"status": "pending"}), 202
+        """
+        keys = self._keys_for(filename)
+        if keys is None:
+            return "missing"
+        deadline = time.monotonic() + timeout
+        for key in keys:
+            live = self.streams.get(key)
+            if live is not None and not live.wait(max(0.0, deadline - time.monotonic())):
+                return "pending"
+        return self.audio_status(filename)
+
+    def resolve(self, filename: str) -> Optional[str]:
+        """
+        根据音频URL中的文件名获取缓存文件路径
+
+        参数:
+            filename (str): 文件名，如tts-<键>.mp3
+
+        返回:
+            Optional[str]: 缓存文件路径，不是缓存文件名或已被淘汰时返回None
+
+        示例:
+            >>> path = tts_cache.resolve("tts-3f2a....mp3")
+        """
+        match = _FILENAME_PATTERN.match(filename)
+        if not match or not self.store.contains(match.group(1)):
+            return None
+        path = self.store.path_for(match.group(1))
+        return path if os.path.exists(path) else None
+
+    def live_stream(self, filename: str) -> Optional[AudioStream]:
+        """
+        根据音频URL中的文件名加入进行中的流式合成
+
+        参数:
+            filename (str): 文件名，如tts-<键>.mp3
+
+        返回:
+            Optional[AudioStream]: 进行中的音频流，没有进行中的合成时返回None，此时应改用resolve
+
+        示例:
+            >>> stream = tts_cache.live_stream(filename)
+            >>> if stream is not None:
+            >>>     return Response(stream.iter_chunks(), mimetype=TTSCache.mimetype_for(filename))
+        """
+        match = _FILENAME_PATTERN.match(filename)
+        if not match:
+            return None
+        return self.streams.attach(match.group(1))
+
+    @staticmethod
+    def mimetype_for(filename: str) -> str:
+        """
+        根据文件名获取音频MIME类型
+
+        参数:
+            filename (str): 文件名
+
+        返回:
+            str: MIME类型，未知格式时为audio/mpeg
+        """
+        extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        return AUDIO_MIMETYPES.get(extension, "audio/mpeg")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        返回:
+            Dict[str, Any]: 磁盘缓存的命中、淘汰、条目数和字节数，以及synthesized（实际合成次数）、
+                            saved_calls（命中缓存省去的API调用次数）和对应的字符数，
+                            playlists和playlist_segments（分段合成的文本数和片段数），streams为流式合成的统计
+        """
+        stats = self.store.stats()
+        with self._lock:
+            stats.update(self._metrics)
+        stats["streams"] = self.streams.stats()
+        return stats
+
+
+# 进程内共享的语音合成缓存
+_default_cache: Optional[TTSCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSCache:
+    """
+    获取进程内共享的语音合成缓存
+
+    SpeechService和AssistantService共用它，因此回复、警告和/api/text-to-speech请求共享同一份缓存。
+
+    返回:
+        TTSCache: 语音合成缓存
+
+    示例:
+        >>> url = get_tts_cache().synthesize(text, openai_service=self.openai_service)
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TTSCache()
+        return _default_cache
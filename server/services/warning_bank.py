@@ -0,0 +1,320 @@
+"""
+审核警告库
+按类别和语言预先生成一组友好的警告并合成语音，内容被标记时直接轮流取用，不必等待模型生成
+"""
+import os
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from services.tts_cache import TTSCache, get_tts_cache
+from utils.file_utils import ensure_directory_exists, write_file_atomic
+
+BANK_VERSION = 1
+
+# 默认配置
+DEFAULT_VARIANTS = 3
+DEFAULT_PARALLELISM = 4
+
+# 警告库的类别，按优先级排列：同时命中多个类别时使用最靠前的一个
+CATEGORIES = ["self-harm", "sexual", "violence", "hate", "harassment", "illicit"]
+
+# 无法归入上述类别时使用的通用警告
+GENERAL_CATEGORY = "general"
+
+LANGUAGES = ["en", "zh"]
+
+
+def warning_category(flagged_categories: List[str]) -> str:
+    """
+    把审核接口返回的细分类别归入警告库的类别
+
+    细分类别（如sexual/minors、self_harm_intent）按前缀归入主类别。
+
+    参数:
+        flagged_categories (List[str]): 被标记的类别名称
+
+    返回:
+        str: 警告库的类别，无法归类时为general
+
+    示例:
+        >>> warning_category(["violence/graphic", "self_harm_intent"])
+        'self-harm'
+    """
+    normalized = [name.replace("_", "-").lower() for name in flagged_categories]
+    for category in CATEGORIES:
+        if any(name.startswith(category) for name in normalized):
+            return category
+    return GENERAL_CATEGORY
+
+
+def warning_language(language: Optional[str]) -> str:
+    """
+    把用户的语言代码归入警告库的语言
+
+    参数:
+        language (Optional[str]): 语言代码，如zh、zh-CN或en
+
+    返回:
+        str: zh或en
+
+    示例:
+        >>> warning_language("zh-CN")
+        'zh'
+    """
+    return "zh" if (language or "").lower().startswith("zh") else "en"
+
+
+class WarningBank:
+    """
+    审核警告库类
+
+    警告库文件（默认cache/warning_bank.json）按类别和语言保存若干条警告文本，
+    对应的语音保存在语音合成缓存中。ensure在启动时（或由build_warning_bank.py离线）
+    补齐每个类别和语言缺少的警告并预先合成语音；warning按轮换顺序取用，
+    同一个孩子连续触发审核时听到的警告不会完全相同。
+    只有警告库中完全没有可用的警告时才实时生成，生成的警告也加入警告库。
+
+    属性:
+        path (str): 警告库文件路径
+        variants (int): 每个类别和语言保存的警告条数
+        tts_cache (TTSCache): 保存警告语音的语音合成缓存
+        openai_service: 用于生成警告和合成语音的OpenAI服务
+    """
+
+    def __init__(self, path: Optional[str] = None, variants: Optional[int] = None,
+                 openai_service: Any = None, tts_cache: Optional[TTSCache] = None):
+        """
+        初始化审核警告库并读取已有的警告
+
+        参数:
+            path (Optional[str]): 警告库文件路径，默认从环境变量WARNING_BANK_PATH获取，
+                                  未设置时为项目根目录下的cache/warning_bank.json
+            variants (Optional[int]): 每个类别和语言保存的警告条数，默认从环境变量WARNING_BANK_VARIANTS获取
+            openai_service: 用于生成警告和合成语音的OpenAI服务，如不提供则在第一次使用时创建
+            tts_cache (Optional[TTSCache]): 语音合成缓存，如不提供则使用共享缓存
+
+        示例:
+            >>> bank = WarningBank()
+            >>> warning = bank.warning(categories, language="zh")
+        """
+        if path is None:
+            path = os.getenv("WARNING_BANK_PATH") or os.path.join(
+                os.path.dirname(__file__), "..", "..", "cache", "warning_bank.json")
+        if variants is None:
+            variants = int(os.getenv("WARNING_BANK_VARIANTS", DEFAULT_VARIANTS))
+        self.path = path
+        self.variants = max(0, variants)
+        self.tts_cache = tts_cache or get_tts_cache()
+        self.openai_service = openai_service
+        self._lock = threading.Lock()
+        self._warnings: Dict[str, Dict[str, List[str]]] = self.load()["warnings"]
+        self._cursors: Dict[str, int] = {}
+        self._metrics = {"served": 0, "live_fallbacks": 0, "generated": 0}
+
+    def load(self) -> Dict[str, Any]:
+        """
+        读取警告库文件
+
+        返回:
+            Dict[str, Any]: 警告库内容，文件不存在或损坏时返回空警告库
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == BANK_VERSION and isinstance(data.get("warnings"), dict):
+                return data
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 读取审核警告库失败，将重新生成: {str(e)}")
+        return {"version": BANK_VERSION, "warnings": {}}
+
+    def save(self) -> None:
+        """原子地写入警告库文件"""
+        with self._lock:
+            data = {"version": BANK_VERSION, "warnings": self._warnings}
+            payload = json.dumps(data, ensure_ascii=False, indent=2)
+        ensure_directory_exists(os.path.dirname(os.path.abspath(self.path)))
+        write_file_atomic(self.path, payload)
+
+    def texts(self, category: str, language: str) -> List[str]:
+        """
+        获取某个类别和语言的全部警告文本
+
+        参数:
+            category (str): 警告库的类别
+            language (str): zh或en
+
+        返回:
+            List[str]: 警告文本，没有时为空列表
+        """
+        with self._lock:
+            return list(self._warnings.get(category, {}).get(language, []))
+
+    def warning(self, categories: Any, language: str = "en") -> Dict[str, Any]:
+        """
+        获取与被标记类别和语言对应的警告及其语音
+
+        按轮换顺序从警告库中取用，该类别没有警告时使用通用警告；
+        警告库中完全没有可用的警告时实时生成，并把它加入警告库。
+
+        参数:
+            categories (Any): 审核接口返回的被标记类别
+            language (str): 用户语言代码
+
+        返回:
+            Dict[str, Any]: text（警告文本）、audio_url（警告语音，预先合成时已在缓存中）、
+                            category（警告库的类别）和source（bank或live）
+
+        示例:
+            >>> warning = bank.warning(categories, language="zh")
+            >>> print(warning["text"], warning["audio_url"])
+        """
+        service = self._default_openai_service()
+        category = warning_category(service.extract_flagged_categories(categories))
+        language = warning_language(language)
+
+        text = self._next_text(category, language)
+        source = "bank"
+        if text is None:
+            print(f"⚠️ 审核警告库中没有 {category}/{language} 的警告，实时生成")
+            text = service.generate_friendly_warning(categories, language)
+            with self._lock:
+                self._metrics["live_fallbacks"] += 1
+            if self._add(category, language, text, service):
+                self.save()
+            source = "live"
+
+        # 预先合成的语音直接命中缓存，否则在后台合成
+        audio_url = self.tts_cache.synthesize(text, openai_service=service, stream=True)
+        return {"text": text, "audio_url": audio_url, "category": category, "source": source}
+
+    def ensure(self, render_audio: bool = True) -> Dict[str, int]:
+        """
+        补齐每个类别和语言缺少的警告，并预先合成全部警告的语音
+
+        参数:
+            render_audio (bool): 是否预先合成语音
+
+        返回:
+            Dict[str, int]: warnings（警告总数）、generated（本次新生成的条数）和rendered（已合成语音的条数）
+
+        示例:
+            >>> get_warning_bank().ensure()
+            {'warnings': 42, 'generated': 0, 'rendered': 42}
+        """
+        service = self._default_openai_service()
+        jobs = []
+        for category in CATEGORIES + [GENERAL_CATEGORY]:
+            for language in LANGUAGES:
+                missing = self.variants - len(self.texts(category, language))
+                jobs.extend([(category, language)] * max(0, missing))
+
+        generated = 0
+        if jobs:
+            with ThreadPoolExecutor(max_workers=DEFAULT_PARALLELISM, thread_name_prefix="warning-bank") as executor:
+                texts = list(executor.map(lambda job: self._generate(service, *job), jobs))
+            for (category, language), text in zip(jobs, texts):
+                generated += self._add(category, language, text, service)
+            if generated:
+                self.save()
+
+        with self._lock:
+            all_texts = [text for languages in self._warnings.values() for texts in languages.values()
+                         for text in texts]
+
+        rendered = 0
+        if render_audio and all_texts:
+            with ThreadPoolExecutor(max_workers=DEFAULT_PARALLELISM, thread_name_prefix="warning-bank") as executor:
+                rendered = sum(executor.map(lambda text: self._render(service, text), all_texts))
+
+        print(f"✅ 审核警告库就绪: {len(all_texts)} 条警告，新生成 {generated} 条，已合成语音 {rendered} 条")
+        return {"warnings": len(all_texts), "generated": generated, "rendered": rendered}
+
+    def _next_text(self, category: str, language: str) -> Optional[str]:
+        """按轮换顺序取下一条警告，从随机位置开始，没有可用的警告时返回None"""
+        with self._lock:
+            texts = (self._warnings.get(category, {}).get(language)
+                     or self._warnings.get(GENERAL_CATEGORY, {}).get(language))
+            if not texts:
+                return None
+            cursor_key = f"{category}/{language}"
+            cursor = self._cursors.get(cursor_key)
+            if cursor is None:
+                cursor = random.randrange(len(texts))
+            self._cursors[cursor_key] = cursor + 1
+            self._metrics["served"] += 1
+            return texts[cursor % len(texts)]
+
+    @staticmethod
+    def _generate(service: Any, category: str, language: str) -> str:
+        """为一个类别和语言生成一条警告"""
+        categories = {} if category == GENERAL_CATEGORY else {category: True}
+        return service.generate_friendly_warning(categories, language)
+
+    def _add(self, category: str, language: str, text: str, service: Any) -> bool:
+        """把警告加入警告库；空文本、重复文本和生成失败时的固定警告不加入"""
+        text = (text or "").strip()
+        if not text or text in service.DEFAULT_WARNINGS.values():
+            return False
+        with self._lock:
+            texts = self._warnings.setdefault(category, {}).setdefault(language, [])
+            if text in texts:
+                return False
+            texts.append(text)
+            self._metrics["generated"] += 1
+            return True
+
+    def _render(self, service: Any, text: str) -> bool:
+        """合成一条警告的语音，失败时下次取用再合成"""
+        try:
+            self.tts_cache.synthesize(text, openai_service=service, stream=False)
+            return True
+        except Exception as e:
+            print(f"⚠️ 合成警告语音失败: {str(e)}")
+            return False
+
+    def _default_openai_service(self) -> Any:
+        if self.openai_service is None:
+            from services.openai_service import OpenAIService
+            self.openai_service = OpenAIService()
+        return self.openai_service
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取警告库统计信息
+
+        返回:
+            Dict[str, Any]: warnings（警告总数）、served（从警告库取用的次数）、
+                            live_fallbacks（实时生成的次数）和generated（加入警告库的条数）
+        """
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["warnings"] = sum(len(texts) for languages in self._warnings.values()
+                                    for texts in languages.values())
+        return stats
+
+
+# 进程内共享的审核警告库
+_default_bank: Optional[WarningBank] = None
+_default_bank_lock = threading.Lock()
+
+
+def get_warning_bank() -> WarningBank:
+    """
+    获取进程内共享的审核警告库
+
+    返回:
+        WarningBank: 审核警告库
+
+    示例:
+        >>> warning = get_warning_bank().warning(categories, language)
+    """
+    global _default_bank
+    with _default_bank_lock:
+        if _default_bank is None:
+            _default_bank = WarningBank()
+        return _default_bank
@@ -0,0 +1,184 @@
+import os
+import sys
+import itertools
+import openai
+import pytest
+from types import SimpleNamespace
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.assistant_registry import AssistantRegistry, AssistantSpec
+
+
+class FakeNotFoundError(openai.NotFoundError):
+    """A NotFoundError that does not need an HTTP response."""
+
+    def __init__(self):
+        Exception.__init__(self, 'not found')
+
+
+class FakeCollection:
+    """An in-memory stand-in for an OpenAI object collection."""
+
+    def __init__(self, prefix, ids):
+        self.prefix = prefix
+        self.ids = ids
+        self.objects = {}
+        self.created = 0
+
+    def create(self, **options):
+        obj = SimpleNamespace(id=f'{self.prefix}_{next(self.ids)}', **options)
+        self.objects[obj.id] = obj
+        self.created += 1
+        return obj
+
+    def retrieve(self, object_id):
+        if object_id not in self.objects:
+            raise FakeNotFoundError()
+        return self.objects[object_id]
+
+    def update(self, object_id, **options):
+        obj = self.retrieve(object_id)
+        for key, value in options.items():
+            setattr(obj, key, value)
+        return obj
+
+    def list(self, limit=100):
+        return list(self.objects.values())
+
+    def delete(self, object_id):
+        self.retrieve(object_id)
+        del self.objects[object_id]
+
+
+class FakeVectorStoreFiles:
+    def __init__(self):
+        self.links = {}
+
+    def create(self, vector_store_id, file_id):
+        self.links.setdefault(vector_store_id, []).append(file_id)
+
+    def list(self, vector_store_id):
+        return [SimpleNamespace(id=file_id) for file_id in self.links.get(vector_store_id, [])]
+
+    def delete(self, vector_store_id, file_id):
+        self.links[vector_store_id].remove(file_id)
+
+
+class FakeClient:
+    def __init__(self):
+        ids = itertools.count(1)
+        self.assistants = FakeCollection('asst', ids)
+        self.vector_stores = FakeCollection('vs', ids)
+        self.vector_stores.files = FakeVectorStoreFiles()
+        self.files = FakeCollection('file', ids)
+        self.beta = SimpleNamespace(assistants=self.assistants)
+
+
+@pytest.fixture
+def client():
+    return FakeClient()
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / 'production_books.json'
+    path.write_text('{"book_id": "1-1", "book_title": "Book 1"}\n')
+    return path
+
+
+def make_spec(role='learning', instructions='Help the reader.', catalog_path=None):
+    tools = [{'type': 'function', 'function': {'name': 'get_book_content'}}]
+    return AssistantSpec(role, 'Learning Assistant', instructions, 'gpt-4o', tools, catalog_path)
+
+
+def test_restart_reuses_unchanged_assistants(client, catalog, tmp_path):
+    """A second start with the same definitions and catalog creates nothing."""
+    path = str(tmp_path / 'registry.json')
+    first = AssistantRegistry(client, path=path)
+    learning_id = first.ensure(make_spec())
+    books_id = first.ensure(make_spec('book_recommendation', catalog_path=str(catalog)))
+
+    second = AssistantRegistry(client, path=path)
+    assert second.ensure(make_spec()) == learning_id
+    assert second.ensure(make_spec('book_recommendation', catalog_path=str(catalog))) == books_id
+
+    assert client.assistants.created == 2
+    assert client.vector_stores.created == 1
+    assert client.assistants.objects[learning_id].metadata['role'] == 'learning'
+
+
+def test_changed_definition_updates_in_place(client, tmp_path):
+    """New instructions update the existing assistant instead of creating another one."""
+    registry = AssistantRegistry(client, path=str(tmp_path / 'registry.json'))
+    assistant_id = registry.ensure(make_spec())
+
+    assert registry.ensure(make_spec(instructions='Help the reader, briefly.')) == assistant_id
+    assert client.assistants.created == 1
+    assert client.assistants.objects[assistant_id].instructions == 'Help the reader, briefly.'
+
+
+def test_changed_catalog_replaces_vector_store(client, catalog, tmp_path):
+    """A new catalog hash uploads a new vector store and deletes the old one."""
+    registry = AssistantRegistry(client, path=str(tmp_path / 'registry.json'))
+    assistant_id = registry.ensure(make_spec('book_recommendation', catalog_path=str(catalog)))
+    old_store = registry.load()['assistants']['book_recommendation']['vector_store_id']
+
+    catalog.write_text(catalog.read_text() + '{"book_id": "2-1", "book_title": "Book 2"}\n')
+    assert registry.ensure(make_spec('book_recommendation', catalog_path=str(catalog))) == assistant_id
+
+    new_store = registry.load()['assistants']['book_recommendation']['vector_store_id']
+    assert new_store != old_store
+    assert list(client.vector_stores.objects) == [new_store]
+    assert client.assistants.objects[assistant_id].tool_resources == {
+        'file_search': {'vector_store_ids': [new_store]}
+    }
+
+
+def test_lost_registry_adopts_matching_remote_assistant(client, tmp_path):
+    """Without a registry file, a tagged assistant with the same fingerprint is reused."""
+    assistant_id = AssistantRegistry(client, path=str(tmp_path / 'first.json')).ensure(make_spec())
+
+    assert AssistantRegistry(client, path=str(tmp_path / 'second.json')).ensure(make_spec()) == assistant_id
+    assert client.assistants.created == 1
+
+
+def test_collect_garbage_removes_orphans_only(client, tmp_path):
+    """Orphans of this namespace are removed; other namespaces and untagged objects are kept by default."""
+    registry = AssistantRegistry(client, path=str(tmp_path / 'registry.json'))
+    kept = registry.ensure(make_spec())
+    orphan = client.assistants.create(name='Learning Assistant',
+                                      metadata={'app': 'pickatale-assistant', 'namespace': 'default'})
+    other = client.assistants.create(name='Learning Assistant',
+                                     metadata={'app': 'pickatale-assistant', 'namespace': 'staging'})
+    legacy = client.assistants.create(name='Book Search Assistant', metadata={})
+    orphan_store = client.vector_stores.create(name='Library Vector Store',
+                                               metadata={'app': 'pickatale-assistant', 'namespace': 'default'})
+
+    removed = registry.collect_garbage(dry_run=True)
+    assert removed == {'assistants': [orphan.id], 'vector_stores': [orphan_store.id]}
+    assert orphan.id in client.assistants.objects
+
+    removed = registry.collect_garbage(include_untagged=True)
+    assert removed['assistants'] == [orphan.id, legacy.id]
+    assert set(client.assistants.objects) == {kept, other.id}
+    assert client.vector_stores.objects == {}
+
+
+def test_wait_for_index_polls_until_files_are_indexed(client, tmp_path):
+    """Waiting returns once no file is in progress and fails when nothing could be indexed."""
+    counts = iter([(1, 0, 0), (1, 0, 0), (0, 1, 0)])
+
+    def retrieve(vector_store_id):
+        in_progress, completed, failed = next(counts)
+        return SimpleNamespace(id=vector_store_id, file_counts=SimpleNamespace(
+            in_progress=in_progress, completed=completed, failed=failed))
+
+    client.vector_stores.retrieve = retrieve
+    registry = AssistantRegistry(client, path=str(tmp_path / 'registry.json'))
+    assert registry.wait_for_index('vs_1', timeout=5, interval=0.001).file_counts.completed == 1
+
+    counts = iter([(0, 0, 1)])
+    with pytest.raises(RuntimeError):
+        registry.wait_for_index('vs_1', timeout=5, interval=0.001)
@@ -0,0 +1,160 @@
+import os
+import sys
+import threading
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.audio_stream import AudioStreamHub
+from services.tts_cache import TTSCache
+
+
+class GatedSource:
+    """Yields chunks one at a time, each only after the test releases it."""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.gates = [threading.Event() for _ in chunks]
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        for index, chunk in enumerate(self.chunks):
+            self.gates[index].wait(5)
+            if self.fail_after is not None and index == self.fail_after:
+                raise RuntimeError('synthesis failed')
+            yield chunk
+
+    def release(self, count=None):
+        for gate in self.gates[:count]:
+            gate.set()
+
+
+class FakeStreamingService:
+    """Streams deterministic audio from a GatedSource and records calls."""
+
+    def __init__(self, source):
+        self.source = source
+        self.calls = []
+
+    def text_to_speech_stream(self, text, voice='alloy', model='tts-1', response_format='mp3', chunk_size=4096):
+        self.calls.append((text, voice, model, response_format, chunk_size))
+        return self.source()
+
+
+def test_listener_receives_chunks_before_synthesis_finishes():
+    """The first chunk reaches a listener while later chunks are still pending."""
+    hub = AudioStreamHub()
+    source = GatedSource([b'one', b'two'])
+    hub.start('k', source)
+
+    chunks = hub.attach('k').iter_chunks()
+    source.release(1)
+    assert next(chunks) == b'one'
+
+    source.release()
+    assert list(chunks) == [b'two']
+
+
+def test_second_listener_attaches_to_stream_in_progress():
+    """A late listener gets the whole audio from the start and no second synthesis starts."""
+    hub = AudioStreamHub()
+    source = GatedSource([b'one', b'two', b'three'])
+    saved = []
+    stream, started = hub.start('k', source, on_complete=saved.append)
+    assert started
+
+    first = hub.attach('k')
+    source.release(1)
+    assert next(first.iter_chunks()) == b'one'
+
+    again, started_again = hub.start('k', source)
+    assert again is stream and not started_again
+    second = hub.attach('k')
+    source.release()
+
+    assert b''.join(second.iter_chunks()) == b'onetwothree'
+    assert stream.wait(5)
+    assert saved == [b'onetwothree']
+    assert source.calls == 1
+    stats = hub.stats()
+    assert stats['listeners'] == 2
+    assert stats['shared_listeners'] == 1
+    assert stats['completed'] == 1
+    assert stats['active'] == 0
+
+
+def test_failed_synthesis_ends_stream_without_saving():
+    """A failure ends listeners after the bytes already sent and skips storage."""
+    hub = AudioStreamHub()
+    source = GatedSource([b'one', b'two'], fail_after=1)
+    saved = []
+    stream, _ = hub.start('k', source, on_complete=saved.append)
+    source.release()
+
+    assert list(stream.iter_chunks()) == [b'one']
+    assert isinstance(stream.error, RuntimeError)
+    assert saved == []
+    assert hub.get('k') is None
+    assert hub.stats()['failed'] == 1
+
+
+def test_tts_cache_streams_then_serves_from_disk(tmp_path):
+    """Streaming mode returns the URL at once, tees audio into the cache and replays it from disk."""
+    source = GatedSource([b'ID3', b'audio'])
+    service = FakeStreamingService(source)
+    cache = TTSCache(str(tmp_path), max_bytes=0, ttl_seconds=0, openai_service=service,
+                     streaming=True, stream_chunk_bytes=1024)
+
+    url = cache.synthesize('Hello there!')
+    filename = url.rsplit('/', 1)[-1]
+    assert url == cache.synthesize('Hello there!')
+    assert len(service.calls) == 1
+    assert service.calls[0][-1] == 1024
+
+    live = cache.live_stream(filename)
+    assert live is not None
+    assert cache.resolve(filename) is None
+    source.release()
+    assert b''.join(live.iter_chunks()) == b'ID3audio'
+    assert live.wait(5)
+
+    assert cache.live_stream(filename) is None
+    with open(cache.resolve(filename), 'rb') as f:
+        assert f.read() == b'ID3audio'
+    stats = cache.stats()
+    assert stats['synthesized'] == 1
+    assert stats['saved_calls'] == 1
+    assert stats['streams']['completed'] == 1
+
+
+def test_wait_ready_reports_background_render_status(tmp_path):
+    """Audio rendering in the background is pending until its stream finishes, then ready."""
+    source = GatedSource([b'ID3', b'audio'])
+    cache = TTSCache(str(tmp_path), max_bytes=0, ttl_seconds=0, openai_service=FakeStreamingService(source),
+                     streaming=False)
+
+    url = cache.synthesize('Hello there!', stream=True)
+    filename = url.rsplit('/', 1)[-1]
+    assert cache.audio_status(filename) == 'pending'
+    assert cache.wait_ready(filename, 0.05) == 'pending'
+
+    source.release()
+    assert cache.wait_ready(filename, 5) == 'ready'
+    assert cache.audio_status('abc123.mp3') == 'missing'
+
+
+def test_wait_ready_covers_every_playlist_segment(tmp_path):
+    """A playlist is ready only after all of its segments are rendered; failures are reported."""
+    source = GatedSource([b'ID3'], fail_after=0)
+    cache = TTSCache(str(tmp_path), max_bytes=0, ttl_seconds=0, openai_service=FakeStreamingService(source),
+                     streaming=False, segment_chars=10)
+
+    url, playlist = cache.synthesize_playlist('First one. Second one.', stream=True)
+    filename = url.rsplit('/', 1)[-1]
+    assert len(playlist) == 2
+    assert cache.audio_status(filename) == 'pending'
+
+    source.release()
+    assert cache.wait_ready(filename, 5) == 'failed'
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.book_cache import BookContentCache
+from utils.disk_cache import DiskLRUCache
+
+
+MOCK_BOOK = {
+    'book_id': '12550-1',
+    'book_title': 'Mock Book 1',
+    'book_description': 'Description for Mock Book 1',
+    'book_content': 'Page 1 content for book 12550-1.\nPage 2 content for book 12550-1.\n'
+}
+
+
+def test_book_cache_roundtrip(tmp_path):
+    """A cached book is returned unchanged and counted as a hit."""
+    cache = BookContentCache(str(tmp_path), max_bytes=0, ttl_seconds=0)
+
+    assert cache.get('12550-1') is None
+    cache.set('12550-1', MOCK_BOOK)
+
+    assert cache.get('12550-1') == MOCK_BOOK
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['entries'] == 1
+
+
+def test_book_cache_is_compressed(tmp_path):
+    """Book content is stored gzip-compressed on disk."""
+    cache = BookContentCache(str(tmp_path), max_bytes=0, ttl_seconds=0)
+    book = dict(MOCK_BOOK, book_content='Once upon a time. ' * 2000)
+    cache.set(book['book_id'], book)
+
+    path = cache.store.path_for(book['book_id'])
+    assert path.endswith('.json.gz')
+    assert os.path.getsize(path) < len(book['book_content']) / 10
+
+
+def test_book_cache_survives_restart(tmp_path):
+    """A new cache instance over the same directory sees existing entries."""
+    BookContentCache(str(tmp_path), max_bytes=0, ttl_seconds=0).set('12550-1', MOCK_BOOK)
+
+    cache = BookContentCache(str(tmp_path), max_bytes=0, ttl_seconds=0)
+    assert cache.get('12550-1') == MOCK_BOOK
+
+
+def test_disk_cache_lru_eviction(tmp_path):
+    """The least recently used entry is evicted when the size cap is exceeded."""
+    cache = DiskLRUCache(str(tmp_path), max_bytes=250)
+    cache.set('a', b'x' * 100)
+    cache.set('b', b'x' * 100)
+
+    # Touch 'a' so that 'b' becomes the least recently used entry
+    assert cache.get('a') is not None
+    cache.set('c', b'x' * 100)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= 250
+
+
+def test_disk_cache_ttl_expiry(tmp_path):
+    """Entries older than the TTL are treated as misses and removed."""
+    cache = DiskLRUCache(str(tmp_path), ttl_seconds=0.05)
+    cache.set('a', b'data')
+    assert cache.get('a') == b'data'
+
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert cache.stats()['expired'] == 1
+    assert not os.path.exists(cache.path_for('a'))
+
+
+def test_disk_cache_touch_refreshes_lru(tmp_path):
+    """touch() counts a hit and protects the entry from the next eviction."""
+    cache = DiskLRUCache(str(tmp_path), max_bytes=250)
+    cache.set('a', b'x' * 100)
+    cache.set('b', b'x' * 100)
+
+    assert cache.touch('a') is True
+    assert cache.touch('missing') is False
+    cache.set('c', b'x' * 100)
+
+    assert cache.contains('a')
+    assert not cache.contains('b')
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+import time
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.cancellation import CancellationToken, Cancelled, cancellation_stats
+from utils.sse_utils import HEARTBEAT, stream_until_disconnect
+
+
+def test_token_runs_callbacks_once():
+    token = CancellationToken()
+    calls = []
+    token.add_callback(lambda: calls.append('first'))
+    unregister = token.add_callback(lambda: calls.append('removed'))
+    unregister()
+
+    assert token.cancel('client disconnected')
+    assert not token.cancel('again')
+    token.add_callback(lambda: calls.append('late'))
+
+    assert calls == ['first', 'late']
+    assert token.reason == 'client disconnected'
+    try:
+        token.raise_if_cancelled()
+    except Cancelled as e:
+        assert str(e) == 'client disconnected'
+    else:
+        raise AssertionError('Cancelled was not raised')
+
+
+def test_stream_sends_heartbeats_while_the_producer_is_busy():
+    token = CancellationToken()
+
+    def events():
+        yield 'event: status\n\n'
+        time.sleep(0.15)
+        yield 'event: complete\n\n'
+
+    items = list(stream_until_disconnect(events(), token, heartbeat=0.05))
+
+    assert items[0] == 'event: status\n\n' and items[-1] == 'event: complete\n\n'
+    assert HEARTBEAT in items
+    assert not token.is_cancelled
+
+
+def test_closing_the_stream_cancels_the_producer():
+    """A client disconnect closes the response, which cancels the token and stops the producer."""
+    token = CancellationToken()
+    closed = threading.Event()
+    before = cancellation_stats()['cancelled_requests']
+
+    def events():
+        try:
+            yield 'event: status\n\n'
+            while not token.is_cancelled:
+                time.sleep(0.01)
+            yield 'event: complete\n\n'
+        finally:
+            closed.set()
+
+    stream = stream_until_disconnect(events(), token, heartbeat=0.05)
+    assert next(stream) == 'event: status\n\n'
+    stream.close()
+
+    assert token.is_cancelled
+    assert closed.wait(2)
+    assert cancellation_stats()['cancelled_requests'] == before + 1
@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import pytest
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import services.catalog_store as catalog_store
+from services.catalog_store import CatalogStore, build_offset_index, index_path_for
+
+
+MOCK_CATALOG = [
+    {'book_id': '14082-1', 'book_title': 'The Discovery of America LOW', 'book_Description': 'Columbus sails west.'},
+    {'book_id': '12550-1', 'book_title': 'The Lost Kitten', 'book_Description': 'A kitten finds home.'},
+    {'book_id': '2940-5', 'book_title': '小红帽', 'book_Description': '小红帽去看外婆。'},
+]
+
+
+def write_catalog(path, books):
+    path.write_text(''.join(json.dumps(book) + '\n' for book in books), encoding='utf-8')
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    """Writes the mock catalog in the JSON Lines format used by production_books.json."""
+    path = tmp_path / 'production_books.json'
+    write_catalog(path, MOCK_CATALOG)
+    return path
+
+
+def test_build_offset_index_writes_sidecar(catalog_file):
+    """The sidecar index maps every book_id to the byte range of its line."""
+    index = build_offset_index(str(catalog_file))
+
+    assert os.path.exists(index_path_for(str(catalog_file)))
+    assert set(index['offsets']) == {'14082-1', '12550-1', '2940-5'}
+
+    data = catalog_file.read_bytes()
+    offset, length = index['offsets']['2940-5']
+    assert json.loads(data[offset:offset + length]) == MOCK_CATALOG[2]
+
+
+def test_get_returns_records(catalog_file):
+    """Lookups return the catalog record, or None for unknown IDs."""
+    store = CatalogStore(str(catalog_file))
+    try:
+        assert store.get('12550-1') == MOCK_CATALOG[1]
+        assert store.get('2940-5')['book_title'] == '小红帽'
+        assert store.get('missing-1') is None
+        assert '14082-1' in store
+        assert len(store) == 3
+    finally:
+        store.close()
+
+
+def test_store_remaps_replaced_catalog(catalog_file, monkeypatch):
+    """A replaced catalog is remapped and a stale sidecar index is rebuilt."""
+    monkeypatch.setattr(catalog_store, 'STAT_CHECK_INTERVAL', 0)
+    store = CatalogStore(str(catalog_file))
+    try:
+        assert len(store) == 3
+
+        new_book = {'book_id': '99-1', 'book_title': 'A New Book', 'book_Description': 'Fresh.'}
+        write_catalog(catalog_file, MOCK_CATALOG + [new_book])
+        os.utime(catalog_file, ns=(0, 1))
+
+        assert store.get('99-1') == new_book
+        assert len(store) == 4
+    finally:
+        store.close()
+
+
+def test_missing_catalog_is_empty(tmp_path):
+    """A catalog that has not been synced yet behaves as an empty store."""
+    store = CatalogStore(str(tmp_path / 'production_books.json'))
+    assert len(store) == 0
+    assert store.get('12550-1') is None
@@ -0,0 +1,95 @@
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.catalog_sync import CatalogSync, read_catalog
+
+
+@pytest.fixture
+def data_service(tmp_path):
+    """A minimal stand-in for DataService with a scripted _query."""
+    service = MagicMock()
+    service.catalog_path = str(tmp_path / 'production_books.json')
+    return service
+
+
+def row(book_id, title, synced_at):
+    return (book_id, title, f'About {title}', synced_at)
+
+
+def test_full_then_incremental_sync(data_service):
+    """An incremental sync only asks for rows past the watermark and merges them."""
+    sync = CatalogSync(data_service, interval=60, full_refresh_interval=3600)
+
+    data_service._query.return_value = [
+        row('1-1', 'Book One', '2026-01-01T00:00:00'),
+        row('2-1', 'Book Two', '2026-01-02T00:00:00'),
+    ]
+    result = sync.sync()
+    assert result['mode'] == 'full'
+    assert list(read_catalog(data_service.catalog_path)) == ['1-1', '2-1']
+    assert sync.load_meta()['watermark'] == '2026-01-02T00:00:00'
+
+    data_service._query.return_value = [
+        row('2-1', 'Book Two (Revised)', '2026-01-03T00:00:00'),
+        row('3-1', 'Book Three', '2026-01-03T00:00:00'),
+    ]
+    result = sync.sync()
+
+    assert result['mode'] == 'incremental'
+    assert data_service._query.call_args[0][1] == ('2026-01-02T00:00:00',)
+    assert (result['added'], result['updated'], result['removed']) == (1, 1, 0)
+
+    catalog = read_catalog(data_service.catalog_path)
+    assert list(catalog) == ['1-1', '2-1', '3-1']
+    assert catalog['2-1']['book_title'] == 'Book Two (Revised)'
+    assert set(catalog['1-1']) == {'book_id', 'book_title', 'book_Description'}
+    data_service.content_cache.invalidate.assert_called_once_with('2-1')
+
+
+def test_full_sync_refuses_empty_result(data_service):
+    """A full sync returning no books never replaces a good catalog."""
+    sync = CatalogSync(data_service, interval=60, full_refresh_interval=3600)
+    data_service._query.return_value = [row('1-1', 'Book One', '2026-01-01T00:00:00')]
+    sync.sync(full=True)
+
+    data_service._query.return_value = []
+    result = sync.sync(full=True)
+
+    assert result['refused'] is True
+    assert list(read_catalog(data_service.catalog_path)) == ['1-1']
+
+
+def test_full_sync_removes_unpublished_books(data_service):
+    """A full refresh drops books that are no longer in production."""
+    sync = CatalogSync(data_service, interval=60, full_refresh_interval=3600)
+    data_service._query.return_value = [
+        row('1-1', 'Book One', '2026-01-01T00:00:00'),
+        row('2-1', 'Book Two', '2026-01-01T00:00:00'),
+    ]
+    sync.sync(full=True)
+
+    data_service._query.return_value = [row('2-1', 'Book Two', '2026-01-01T00:00:00')]
+    result = sync.sync(full=True)
+
+    assert result['removed'] == 1
+    assert list(read_catalog(data_service.catalog_path)) == ['2-1']
+
+
+def test_failed_query_keeps_catalog(data_service):
+    """A failing query leaves the existing catalog and watermark untouched."""
+    sync = CatalogSync(data_service, interval=60, full_refresh_interval=3600)
+    data_service._query.return_value = [row('1-1', 'Book One', '2026-01-01T00:00:00')]
+    sync.sync(full=True)
+
+    data_service._query.side_effect = Exception('warehouse unavailable')
+    with pytest.raises(Exception):
+        sync.sync()
+
+    assert list(read_catalog(data_service.catalog_path)) == ['1-1']
+    assert sync.load_meta()['watermark'] == '2026-01-01T00:00:00'
+    assert not [name for name in os.listdir(os.path.dirname(data_service.catalog_path)) if name.startswith('.tmp-')]
@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import pytest
+from unittest.mock import MagicMock
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.data_service import DataService
+
+
+def make_row(book_id, pages):
+    """Builds a result row shaped like the book content query."""
+    return (
+        book_id,
+        f'Title {book_id}',
+        f'Description {book_id}',
+        json.dumps([{'rawText': text} for text in pages])
+    )
+
+
+@pytest.fixture
+def mock_pool():
+    """Creates a mock connection pool and returns it with its cursor."""
+    mock_cursor = MagicMock()
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    pool = MagicMock()
+    pool.connection.return_value.__enter__.return_value = mock_conn
+    return pool, mock_cursor
+
+
+@pytest.fixture
+def data_service(tmp_path, mock_pool):
+    """Creates a DataService backed by the mock pool and a temporary cache."""
+    pool, _ = mock_pool
+    return DataService(cache_dir=str(tmp_path), pool=pool)
+
+
+def test_fetch_book_content_uses_bound_parameter(data_service, mock_pool):
+    """The book ID is passed as a bound parameter rather than interpolated."""
+    _, mock_cursor = mock_pool
+    mock_cursor.fetchall.return_value = [make_row('12550-1', ['Page 1.', 'Page 2.'])]
+
+    book = data_service.fetch_book_content("12550-1' OR '1'='1")
+
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "OR '1'='1" not in sql
+    assert params == ("12550-1' OR '1'='1",)
+    assert book['book_content'] == 'Page 1.\nPage 2.\n'
+
+
+def test_fetch_book_content_is_cached(data_service, mock_pool):
+    """A second fetch of the same book is served from the content cache."""
+    _, mock_cursor = mock_pool
+    mock_cursor.fetchall.return_value = [make_row('12550-1', ['Page 1.'])]
+
+    first = data_service.fetch_book_content('12550-1')
+    second = data_service.fetch_book_content('12550-1')
+
+    assert first == second
+    mock_cursor.execute.assert_called_once()
+    assert data_service.content_cache.stats()['hits'] == 1
+
+
+def test_fetch_book_contents_single_query(data_service, mock_pool):
+    """Several books are fetched with one IN query and missing IDs are reported."""
+    _, mock_cursor = mock_pool
+    mock_cursor.fetchall.return_value = [
+        make_row('12550-1', ['A.']),
+        make_row('2590-3', ['B.', 'C.']),
+    ]
+
+    books, missing = data_service.fetch_book_contents(['12550-1', '2590-3', 'nope-1', '12550-1'])
+
+    mock_cursor.execute.assert_called_once()
+    sql, params = mock_cursor.execute.call_args[0]
+    assert 'IN (%s, %s, %s)' in sql
+    assert params == ('12550-1', '2590-3', 'nope-1')
+    assert set(books) == {'12550-1', '2590-3'}
+    assert books['2590-3']['book_content'] == 'B.\nC.\n'
+    assert missing == ['nope-1']
+
+
+def test_fetch_book_contents_chunks_and_skips_cached(data_service, mock_pool):
+    """Cached books are not queried and the rest are fetched in chunks."""
+    _, mock_cursor = mock_pool
+    data_service.content_cache.set('1-1', {'book_id': '1-1', 'book_title': 'T', 'book_description': 'D', 'book_content': 'x\n'})
+    mock_cursor.fetchall.side_effect = [
+        [make_row('2-1', ['b'])],
+        [make_row('4-1', ['d'])],
+    ]
+
+    books, missing = data_service.fetch_book_contents(['1-1', '2-1', '3-1', '4-1'], chunk_size=2)
+
+    assert mock_cursor.execute.call_count == 2
+    assert [call[0][1] for call in mock_cursor.execute.call_args_list] == [('2-1', '3-1'), ('4-1',)]
+    assert set(books) == {'1-1', '2-1', '4-1'}
+    assert missing == ['3-1']
+
+
+def test_book_pages_random_access(data_service, mock_pool):
+    """Page offsets are kept with the record and allow page-range access."""
+    _, mock_cursor = mock_pool
+    mock_cursor.fetchall.return_value = [make_row('2590-3', ['One.', 'Two\nlines.', 'Three.'])]
+
+    book = data_service.fetch_book_content('2590-3')
+    assert book['book_content'] == 'One.\nTwo\nlines.\nThree.\n'
+    assert book['page_offsets'] == [0, 5, 16]
+
+    pages = list(data_service.iter_book_pages('2590-3'))
+    assert [page['text'] for page in pages] == ['One.', 'Two\nlines.', 'Three.']
+    assert [page['page_number'] for page in pages] == [1, 2, 3]
+
+    part = data_service.get_book_pages('2590-3', start_page=2, end_page=5)
+    assert part['book_content'] == 'Two\nlines.\nThree.\n'
+    assert (part['start_page'], part['end_page'], part['page_count']) == (2, 3, 3)
+    assert 'page_offsets' not in part
+
+    # All page accesses after the first fetch come from the cache
+    mock_cursor.execute.assert_called_once()
+
+
+def test_book_pages_accept_page_numbers_as_strings(data_service, mock_pool):
+    """Page numbers from tool-call arguments may be strings; unparsable ones count as not given."""
+    _, mock_cursor = mock_pool
+    mock_cursor.fetchall.return_value = [make_row('2590-3', ['One.', 'Two.', 'Three.'])]
+
+    part = data_service.get_book_pages('2590-3', start_page='2', end_page=' 3 ')
+    assert (part['start_page'], part['end_page'], part['book_content']) == (2, 3, 'Two.\nThree.\n')
+
+    part = data_service.get_book_pages('2590-3', start_page='first', end_page=None)
+    assert (part['start_page'], part['end_page']) == (1, 3)
+    assert [page['text'] for page in data_service.iter_book_pages('2590-3', '3')] == ['Three.']
+
+
+def test_book_pages_missing_book(data_service, mock_pool):
+    """Page access to an unknown book yields nothing."""
+    _, mock_cursor = mock_pool
+    mock_cursor.fetchall.return_value = []
+
+    assert data_service.get_book_pages('nope-1') is None
+    assert list(data_service.iter_book_pages('nope-1')) == []
+
+
+def test_missing_book_is_negatively_cached(data_service, mock_pool):
+    """A book that does not exist is only queried once within the negative cache TTL."""
+    _, mock_cursor = mock_pool
+    mock_cursor.fetchall.return_value = []
+
+    assert data_service.fetch_book_content('404-1') is None
+    assert data_service.fetch_book_content('404-1') is None
+    books, missing = data_service.fetch_book_contents(['404-1'])
+
+    assert mock_cursor.execute.call_count == 1
+    assert missing == ['404-1']
+    stats = data_service.lookup_stats()
+    assert stats['negative_hits'] == 2
+    assert stats['negative_entries'] == 1
+
+    # Once the catalog reports the book, it is queried again
+    data_service.forget_missing(['404-1'])
+    mock_cursor.fetchall.return_value = [make_row('404-1', ['Found.'])]
+    assert data_service.fetch_book_content('404-1')['book_content'] == 'Found.\n'
+
+
+def test_query_errors_are_not_negatively_cached(data_service, mock_pool):
+    """A failed query is retried on the next request instead of being cached as missing."""
+    _, mock_cursor = mock_pool
+    mock_cursor.execute.side_effect = [Exception('warehouse unavailable'), None]
+    mock_cursor.fetchall.return_value = [make_row('12550-1', ['Page 1.'])]
+
+    assert data_service.fetch_book_content('12550-1') is None
+    assert data_service.fetch_book_content('12550-1')['book_id'] == '12550-1'
+    assert data_service.lookup_stats()['negative_entries'] == 0
+
+
+def test_concurrent_fetches_share_one_query(tmp_path, mock_pool):
+    """Concurrent requests for the same book wait for the in-flight query instead of repeating it."""
+    import threading
+
+    pool, mock_cursor = mock_pool
+    release = threading.Event()
+
+    def slow_fetchall():
+        release.wait(5)
+        return [make_row('12550-1', ['Page 1.'])]
+
+    mock_cursor.fetchall.side_effect = slow_fetchall
+    content_cache = MagicMock()
+    content_cache.get.return_value = None
+    data_service = DataService(cache_dir=str(tmp_path), pool=pool, content_cache=content_cache)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(data_service.fetch_book_content('12550-1')))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # Wait until every request has either started the query or joined it
+    for _ in range(500):
+        stats = data_service.lookup_stats()
+        if stats['fetches'] + stats['coalesced'] == 5:
+            break
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert mock_cursor.execute.call_count == 1
+    assert [book['book_id'] for book in results] == ['12550-1'] * 5
+    assert data_service.lookup_stats()['coalesced'] == 4
+
+
+def test_failed_catalog_export_raises_without_writing_a_file(data_service):
+    """A failing or empty first export raises instead of leaving an empty catalog behind."""
+    data_service._query = MagicMock(side_effect=Exception('warehouse unavailable'))
+    with pytest.raises(Exception):
+        data_service.fetch_all_production_books()
+    assert not os.path.exists(data_service.catalog_path)
+
+    data_service._query = MagicMock(return_value=[])
+    with pytest.raises(RuntimeError):
+        data_service.fetch_all_production_books()
+    assert not os.path.exists(data_service.catalog_path)
+
+
+def test_empty_catalog_file_is_exported_again(data_service):
+    """An empty catalog left by an earlier failed export is not reused."""
+    os.makedirs(os.path.dirname(data_service.catalog_path), exist_ok=True)
+    open(data_service.catalog_path, 'w').close()
+    data_service._query = MagicMock(return_value=[('1-1', 'Book One', 'About Book One', '2026-01-01T00:00:00')])
+
+    assert data_service.fetch_all_production_books() == data_service.catalog_path
+    with open(data_service.catalog_path) as f:
+        assert json.loads(f.readline())['book_id'] == '1-1'
+
+
+def test_negative_cache_is_shared_by_services_on_the_same_pool(tmp_path, mock_pool):
+    """Clearing a missing book on one DataService (e.g. the catalog sync's) clears it for the others."""
+    pool, mock_cursor = mock_pool
+    mock_cursor.fetchall.return_value = []
+    serving = DataService(cache_dir=str(tmp_path / 'serving'), pool=pool)
+    syncing = DataService(cache_dir=str(tmp_path / 'syncing'), pool=pool)
+
+    assert serving.fetch_book_content('404-1') is None
+    assert syncing.fetch_book_content('404-1') is None
+    assert mock_cursor.execute.call_count == 1
+
+    syncing.forget_missing(['404-1'])
+    mock_cursor.fetchall.return_value = [make_row('404-1', ['Found.'])]
+    assert serving.fetch_book_content('404-1')['book_content'] == 'Found.\n'
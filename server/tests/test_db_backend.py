@@ -0,0 +1,117 @@
+import os
+import sys
+import pytest
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_backend import DatabaseBackend, SnowflakeBackend, SqliteBackend, create_backend
+from services.data_service import DataService, BOOK_CONTENT_SQL
+from services.catalog_sync import CatalogSync, read_catalog
+from seed_sqlite import seed_database
+from utils.book_pages import slice_pages
+
+
+@pytest.fixture
+def sqlite_service(tmp_path):
+    """Creates a DataService backed by a small seeded SQLite catalog."""
+    db_path = str(tmp_path / 'books.sqlite')
+    seed_database(db_path, books=50, pages=3, words_per_page=5, unpublished_ratio=0.2)
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    service = DataService(cache_dir=str(cache_dir), backend=SqliteBackend(db_path))
+    yield service
+    service.close_db_connection()
+
+
+def test_create_backend_from_env(monkeypatch, tmp_path):
+    """DATA_BACKEND selects the backend and SQLITE_PATH its database file."""
+    monkeypatch.setenv('DATA_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'books.sqlite'))
+    backend = create_backend()
+    assert isinstance(backend, SqliteBackend)
+    assert backend.path == str(tmp_path / 'books.sqlite')
+
+    assert isinstance(create_backend('snowflake'), SnowflakeBackend)
+    with pytest.raises(ValueError):
+        create_backend('oracle')
+
+
+def test_data_service_uses_backend_from_env(monkeypatch, tmp_path):
+    """DataService leaves the backend choice to create_backend; Snowflake credentials only reach Snowflake."""
+    monkeypatch.setenv('DATA_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'books.sqlite'))
+    service = DataService(cache_dir=str(tmp_path), snowflake_user='user')
+    assert isinstance(service.backend, SqliteBackend)
+
+    snowflake = create_backend('snowflake', user='user', password='secret', account='acct', path='ignored')
+    assert (snowflake.user, snowflake.password, snowflake.account) == ('user', 'secret', 'acct')
+    with pytest.raises(TypeError):
+        DatabaseBackend()
+
+
+def test_sqlite_render_strips_schema_and_placeholders():
+    """Snowflake-style SQL is rewritten to unqualified tables and ? placeholders."""
+    sql = SqliteBackend('books.sqlite').render(BOOK_CONTENT_SQL.format(condition="RB.PERMANENT_ID = %s"))
+    assert 'FIVETRAN_DATABASE' not in sql
+    assert '%s' not in sql
+    assert 'RB.PERMANENT_ID = ?' in sql
+
+    snowflake_sql = BOOK_CONTENT_SQL.format(condition="RB.PERMANENT_ID = %s")
+    assert SnowflakeBackend().render(snowflake_sql) == snowflake_sql
+
+
+def test_fetch_book_content_from_sqlite(sqlite_service):
+    """Book content queries run unchanged against the SQLite schema."""
+    book = sqlite_service.fetch_book_content('1-1')
+    assert book['book_id'] == '1-1'
+    assert book['book_title'].endswith(' 1')
+    assert len(book['page_offsets']) == 3
+
+    books, missing = sqlite_service.fetch_book_contents(['2-1', '3-1', '999-1'])
+    assert set(books) == {'2-1', '3-1'} - set(missing)
+    assert '999-1' in missing
+
+
+def test_catalog_sync_against_sqlite(sqlite_service):
+    """Full and incremental syncs work with SQLite's GREATEST and text timestamps."""
+    result = CatalogSync(sqlite_service).sync(full=True)
+    catalog = read_catalog(sqlite_service.catalog_path)
+
+    # Books only published to staging or development are not part of the catalog
+    assert 0 < result['book_count'] < 50
+    assert len(catalog) == result['book_count']
+    assert CatalogSync(sqlite_service).load_meta()['watermark'].startswith('2024-')
+
+    result = CatalogSync(sqlite_service).sync(full=False)
+    assert result['mode'] == 'incremental'
+    assert result['added'] == 0
+
+
+def test_server_projection_matches_python_projection(sqlite_service):
+    """Extracting page text in SQL yields the same records as parsing the JSON blob locally."""
+    book_ids = ['1-1', '2-1', '3-1', '4-1', '5-1']
+    python_books = sqlite_service._query_books("RB.PERMANENT_ID IN (%s, %s, %s, %s, %s)", tuple(book_ids))
+
+    sqlite_service.content_projection = 'server'
+    server_books = sqlite_service._query_books("RB.PERMANENT_ID IN (%s, %s, %s, %s, %s)", tuple(book_ids))
+
+    assert python_books
+    assert sorted(server_books, key=lambda b: b['book_id']) == sorted(python_books, key=lambda b: b['book_id'])
+
+
+def test_server_projection_page_range(sqlite_service):
+    """With server projection, uncached page ranges only fetch the selected pages."""
+    full = sqlite_service._query_books("RB.PERMANENT_ID = %s", ('1-1',))
+    if not full:
+        pytest.skip('book 1-1 was seeded as unpublished')
+
+    sqlite_service.content_projection = 'server'
+    part = sqlite_service.get_book_pages('1-1', start_page=2, end_page=5)
+
+    assert part['start_page'] == 2
+    assert part['end_page'] == 3
+    assert part['page_count'] == 3
+    assert part['book_content'] == slice_pages(full[0], 2, 5)['book_content']
+    # Partial fetches are not cached as if they were the whole book
+    assert sqlite_service.content_cache.get('1-1') is None
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import threading
+import pytest
+from unittest.mock import MagicMock
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_pool import ConnectionPool, PoolTimeoutError
+
+
+class SessionExpiredError(Exception):
+    """Mimics the Snowflake error raised for an expired session."""
+    errno = 390112
+
+
+def make_pool(**kwargs):
+    """Creates a pool whose connections are MagicMocks, recording each one created."""
+    created = []
+
+    def connect():
+        conn = MagicMock()
+        conn.is_closed.return_value = False
+        created.append(conn)
+        return conn
+
+    kwargs.setdefault('max_idle_seconds', 0)
+    return ConnectionPool(connect, **kwargs), created
+
+
+def test_pool_reuses_connections():
+    """A released connection is handed out again instead of opening a new one."""
+    pool, created = make_pool(max_size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert len(created) == 1
+    assert pool.stats()['checkouts'] == 2
+
+
+def test_pool_is_bounded():
+    """Checkout times out once max_size connections are in use."""
+    pool, created = make_pool(max_size=1)
+    conn = pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+
+    pool.release(conn)
+    assert pool.acquire(timeout=0.05) is conn
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_pool_waits_for_release():
+    """A waiting checkout is served as soon as another thread releases."""
+    pool, created = make_pool(max_size=1)
+    conn = pool.acquire()
+
+    timer = threading.Timer(0.05, pool.release, args=(conn,))
+    timer.start()
+    assert pool.acquire(timeout=2) is conn
+    assert pool.stats()['max_wait_ms'] > 0
+
+
+def test_discarded_connection_wakes_waiting_checkout():
+    """Discarding a checked-out connection frees its slot for a thread already waiting."""
+    pool, created = make_pool(max_size=1, checkout_timeout=5)
+    conn = pool.acquire()
+
+    timer = threading.Timer(0.05, pool.release, args=(conn,), kwargs={'discard': True})
+    timer.start()
+    started = time.monotonic()
+    replacement = pool.acquire()
+
+    assert time.monotonic() - started < 1
+    assert replacement is created[1]
+    created[0].close.assert_called_once()
+
+
+def test_pool_discards_expired_session():
+    """A connection that raised a session-expired error is replaced."""
+    pool, created = make_pool(max_size=1)
+
+    with pytest.raises(SessionExpiredError):
+        with pool.connection():
+            raise SessionExpiredError("Session no longer exists")
+
+    with pool.connection() as conn:
+        pass
+
+    assert conn is created[1]
+    created[0].close.assert_called_once()
+    assert pool.stats()['reconnects'] == 1
+
+
+def test_pool_health_check_replaces_dead_connection():
+    """Idle connections failing the health check are closed before reuse."""
+    pool, created = make_pool(max_size=1, health_check_interval=0)
+
+    with pool.connection():
+        pass
+    created[0].cursor.return_value.execute.side_effect = Exception("connection reset")
+
+    with pool.connection() as conn:
+        pass
+
+    assert conn is created[1]
+    assert pool.stats()['failed_health_checks'] == 1
+
+
+def test_pool_reaps_idle_connections():
+    """Connections idle longer than max_idle_seconds are closed by the reaper."""
+    pool, created = make_pool(max_size=2)
+    pool.max_idle_seconds = 0.01
+
+    with pool.connection():
+        pass
+    threading.Event().wait(0.05)
+
+    assert pool.reap_idle() == 1
+    assert pool.stats()['size'] == 0
+    created[0].close.assert_called_once()
@@ -0,0 +1,58 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.openai_client import OpenAIClientPool
+
+
+def test_limits_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv('OPENAI_MAX_CONNECTIONS', '4')
+    monkeypatch.setenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '8')
+    pool = OpenAIClientPool(api_key='sk-test')
+
+    # Keep-alive connections can never exceed the connection limit
+    assert (pool.max_connections, pool.max_keepalive_connections) == (4, 4)
+    stats = pool.stats()
+    assert stats['connections'] == 0 and stats['utilization'] == 0.0
+    pool.close()
+
+
+def test_defaults_keep_sdk_limits_and_a_short_pool_timeout(monkeypatch):
+    """The shared pool is not smaller than a per-client SDK pool, and waiting for a free connection fails fast."""
+    import openai
+
+    for name in ('OPENAI_MAX_CONNECTIONS', 'OPENAI_MAX_KEEPALIVE_CONNECTIONS', 'OPENAI_READ_TIMEOUT',
+                 'OPENAI_POOL_TIMEOUT'):
+        monkeypatch.delenv(name, raising=False)
+    pool = OpenAIClientPool(api_key='sk-test')
+
+    assert pool.max_connections == openai.DEFAULT_CONNECTION_LIMITS.max_connections
+    assert pool.max_keepalive_connections == openai.DEFAULT_CONNECTION_LIMITS.max_keepalive_connections
+    timeout = pool.client.timeout
+    assert (timeout.read, timeout.connect, timeout.pool) == (120.0, 5.0, 10.0)
+    pool.close()
+
+
+def test_other_api_keys_share_the_connection_pool():
+    pool = OpenAIClientPool(api_key='sk-test')
+    other = pool.with_api_key('sk-other')
+
+    assert other.api_key == 'sk-other'
+    assert other._client is pool.client._client is pool.http_client
+    pool.close()
+
+
+def test_warm_up_opens_connections_concurrently():
+    pool = OpenAIClientPool(api_key='sk-test', max_keepalive_connections=2)
+    pool.client = MagicMock()
+    models = pool.client.with_options.return_value.models
+    models.list.side_effect = [None, RuntimeError('offline'), None]
+
+    # The request is capped at the number of connections the pool keeps alive
+    assert pool.warm_up(3) == 1
+    assert models.list.call_count == 2
+    pool.client.with_options.assert_called_once_with(max_retries=0)
+    assert pool.stats()['warmed'] == 1
@@ -0,0 +1,143 @@
+import os
+import sys
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.run_engine import RunEngine
+
+
+class FakeStream:
+    """A local stand-in for the SDK's event stream."""
+
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def close(self):
+        self.closed = True
+
+
+def run_event(kind, run_id='run_1', **fields):
+    status = kind.rsplit('.', 1)[-1]
+    return SimpleNamespace(event=f'thread.run.{kind}', data=SimpleNamespace(id=run_id, status=status, **fields))
+
+
+def delta_event(text):
+    part = SimpleNamespace(type='text', text=SimpleNamespace(value=text))
+    return SimpleNamespace(event='thread.message.delta', data=SimpleNamespace(delta=SimpleNamespace(content=[part])))
+
+
+def message_completed(text):
+    part = SimpleNamespace(type='text', text=SimpleNamespace(value=text))
+    return SimpleNamespace(event='thread.message.completed', data=SimpleNamespace(content=[part]))
+
+
+def requires_action(*tool_call_ids):
+    tool_calls = [SimpleNamespace(id=tool_call_id, function=SimpleNamespace(name='get_book_content',
+                                                                             arguments='{"book_id": "1-1"}'))
+                  for tool_call_id in tool_call_ids]
+    action = SimpleNamespace(type='submit_tool_outputs', submit_tool_outputs=SimpleNamespace(tool_calls=tool_calls))
+    return run_event('requires_action', required_action=action)
+
+
+@pytest.fixture
+def client():
+    return MagicMock()
+
+
+def test_run_without_tools_streams_status_and_text(client):
+    """Status changes and text deltas are forwarded as they arrive, without polling."""
+    stream = FakeStream([
+        run_event('created'), run_event('queued'), run_event('in_progress'),
+        delta_event('Once upon '), delta_event('a time.'),
+        message_completed('Once upon a time.'),
+        run_event('completed'),
+    ])
+    client.beta.threads.runs.create.return_value = stream
+
+    events = list(RunEngine(client).run('thread_1', 'asst_1', lambda tool_calls: []))
+
+    assert [e.data for e in events if e.type == 'status'] == ['created', 'queued', 'in_progress', 'completed']
+    assert ''.join(e.data for e in events if e.type == 'delta') == 'Once upon a time.'
+    result = events[-1].data
+    assert events[-1].type == 'done'
+    assert (result.status, result.run_id, result.text) == ('completed', 'run_1', 'Once upon a time.')
+    assert stream.closed
+    client.beta.threads.runs.create.assert_called_once_with(thread_id='thread_1', assistant_id='asst_1', stream=True)
+    client.beta.threads.runs.retrieve.assert_not_called()
+
+
+def test_requires_action_submits_outputs_and_continues(client):
+    """Tool calls are handled immediately and the run continues on the submit_tool_outputs stream."""
+    client.beta.threads.runs.create.return_value = FakeStream([
+        run_event('created'), message_completed('Let me look that up.'), requires_action('call_1', 'call_2'),
+    ])
+    client.beta.threads.runs.submit_tool_outputs.return_value = FakeStream([
+        run_event('in_progress'), message_completed('Here is the book.'), run_event('completed'),
+    ])
+
+    def handler(tool_calls):
+        yield 'working'
+        return [{'tool_call_id': call.id, 'output': '{}'} for call in tool_calls]
+
+    events = list(RunEngine(client).run('thread_1', 'asst_1', handler))
+
+    assert [e.data for e in events if e.type == 'handler'] == ['working']
+    client.beta.threads.runs.submit_tool_outputs.assert_called_once_with(
+        thread_id='thread_1', run_id='run_1', stream=True,
+        tool_outputs=[{'tool_call_id': 'call_1', 'output': '{}'}, {'tool_call_id': 'call_2', 'output': '{}'}]
+    )
+    # Only the final message is the reply
+    assert events[-1].data.text == 'Here is the book.'
+    assert events[-1].data.status == 'completed'
+
+
+def test_run_to_completion_reports_failure(client):
+    """A failed run ends with its status and error message."""
+    client.beta.threads.runs.create.return_value = FakeStream([
+        run_event('created'),
+        run_event('failed', last_error=SimpleNamespace(code='server_error', message='Something broke')),
+    ])
+
+    result = RunEngine(client).run_to_completion('thread_1', 'asst_1', lambda tool_calls: [])
+
+    assert result.status == 'failed'
+    assert result.last_error == 'Something broke'
+
+
+def test_stream_error_event_raises(client):
+    """An error event on the stream is raised and the stream is still closed."""
+    stream = FakeStream([run_event('created'), SimpleNamespace(event='error', data=SimpleNamespace(message='boom'))])
+    client.beta.threads.runs.create.return_value = stream
+
+    with pytest.raises(RuntimeError):
+        list(RunEngine(client).run('thread_1', 'asst_1', lambda tool_calls: []))
+    assert stream.closed
+
+
+def test_cancelled_run_is_cancelled_server_side(client, monkeypatch):
+    """Cancelling during tool calls skips submitting outputs, cancels the run and waits for it to settle."""
+    from utils.cancellation import CancellationToken, Cancelled
+
+    monkeypatch.setenv('RUN_CANCEL_WAIT_SECONDS', '5')
+    client.beta.threads.runs.create.return_value = FakeStream([run_event('created'), requires_action('call_1')])
+    client.beta.threads.runs.retrieve.return_value = SimpleNamespace(id='run_1', status='cancelled')
+    token = CancellationToken()
+
+    def handle(tool_calls):
+        token.cancel('client disconnected')
+        return []
+
+    with pytest.raises(Cancelled):
+        list(RunEngine(client).run('thread_1', 'asst_1', handle, token))
+
+    client.beta.threads.runs.submit_tool_outputs.assert_not_called()
+    client.beta.threads.runs.cancel.assert_called_once_with(thread_id='thread_1', run_id='run_1')
+    client.beta.threads.runs.retrieve.assert_called_with(thread_id='thread_1', run_id='run_1')
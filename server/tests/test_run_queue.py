@@ -0,0 +1,235 @@
+import os
+import sys
+import threading
+import pytest
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.run_queue import RunQueue, RUNNING, QUEUED
+
+
+def test_idle_thread_runs_immediately():
+    queue = RunQueue()
+    batch, leader = queue.submit('thread_1', 'hello')
+
+    assert leader and batch.state == RUNNING
+    queue.acquire(batch)
+    queue.release(batch, {'text': 'hi'})
+    assert batch.wait(1) == {'text': 'hi'}
+    assert queue.stats()['active_runs'] == 0
+
+
+def test_messages_during_a_run_are_batched_into_the_next_run():
+    """Messages arriving while a run is active share one follow-up run and one reply."""
+    queue = RunQueue()
+    first, _ = queue.submit('thread_1', 'tell me a story')
+    second, second_leader = queue.submit('thread_1', 'about dragons')
+    third, third_leader = queue.submit('thread_1', 'please')
+
+    assert second_leader and not third_leader
+    assert second is third and second.state == QUEUED
+    assert queue.stats()['queued_messages'] == 2
+
+    acquired = threading.Event()
+
+    def run_next():
+        queue.acquire(second)
+        acquired.set()
+        queue.release(second, {'text': 'dragons'})
+
+    worker = threading.Thread(target=run_next)
+    worker.start()
+    assert not acquired.wait(0.05)
+
+    queue.release(first, {'text': 'story'})
+    worker.join(5)
+    assert second.messages == ['about dragons', 'please']
+    assert third.wait(1) == {'text': 'dragons'}
+    stats = queue.stats()
+    assert stats['runs'] == 2 and stats['batched'] == 1
+    assert stats['max_wait_seconds'] >= 0.05
+
+
+def test_duplicate_message_shares_the_active_run():
+    queue = RunQueue()
+    batch, _ = queue.submit('thread_1', 'Recommend a book')
+    duplicate, leader = queue.submit('thread_1', '  recommend a BOOK ')
+    other_thread, other_leader = queue.submit('thread_2', 'Recommend a book')
+
+    assert duplicate is batch and not leader
+    assert other_leader and other_thread is not batch
+    assert batch.messages == ['Recommend a book']
+    assert queue.stats()['deduplicated'] == 1
+
+
+def test_failure_and_timeout_reach_every_waiter():
+    queue = RunQueue()
+    first, _ = queue.submit('thread_1', 'one')
+    second, _ = queue.submit('thread_1', 'two')
+    queue.submit('thread_1', 'three')
+
+    with pytest.raises(TimeoutError):
+        queue.acquire(second, timeout=0.01)
+    with pytest.raises(TimeoutError):
+        second.wait(1)
+
+    queue.release(first, error=RuntimeError('run failed'))
+    with pytest.raises(RuntimeError):
+        first.wait(1)
+    assert queue.stats()['timeouts'] == 1
+
+
+def test_abandoned_queued_batch_frees_the_thread():
+    """A leader that gives up before its batch runs without waiters removes it, so later messages are not stuck."""
+    queue = RunQueue()
+    first, _ = queue.submit('thread_1', 'one')
+    second, leader = queue.submit('thread_1', 'two')
+    assert leader
+
+    queue.release(second)
+    with pytest.raises(RuntimeError):
+        second.wait(1)
+    assert queue.stats()['queued_batches'] == 0
+
+    queue.release(first, {'text': 'one'})
+    third, third_leader = queue.submit('thread_1', 'three')
+    assert third_leader and third.state == RUNNING
+    queue.release(third, {'text': 'three'})
+    assert queue.stats()['active_runs'] == 0
+
+
+def test_waiter_takes_over_an_abandoned_queued_batch():
+    """When the leader leaves a queued batch, a waiting request becomes its leader instead of failing."""
+    queue = RunQueue()
+    first, _ = queue.submit('thread_1', 'one')
+    second, _ = queue.submit('thread_1', 'two')
+    joined, leader = queue.submit('thread_1', 'three')
+    assert not leader and joined is second
+
+    queue.release(second)
+    assert second.state == QUEUED
+    assert queue.follow(joined, 1)
+    assert queue.stats()['promoted'] == 1
+
+    queue.release(first, {'text': 'one'})
+    queue.acquire(joined, 1)
+    assert joined.messages == ['two', 'three']
+    queue.release(joined, {'text': 'two and three'})
+    assert joined.wait(0) == {'text': 'two and three'}
+    assert queue.stats()['active_runs'] == 0
+
+
+def test_follow_returns_once_the_batch_is_done():
+    """A waiter whose leader stays is not promoted and reads the shared reply."""
+    queue = RunQueue()
+    first, _ = queue.submit('thread_1', 'one')
+    joined, _ = queue.submit('thread_1', 'ONE')
+
+    threading.Timer(0.05, queue.release, args=(first, {'text': 'one'})).start()
+    assert not queue.follow(joined, 2)
+    assert joined.wait(0) == {'text': 'one'}
+
+
+def test_abandon_only_cancels_batches_nobody_else_waits_for():
+    """abandon refuses while other requests wait on the batch and otherwise takes the batch out of play."""
+    from utils.cancellation import Cancelled
+
+    queue = RunQueue()
+    first, _ = queue.submit('thread_1', 'one')
+    queue.submit('thread_1', 'ONE')
+    assert not queue.abandon(first)
+
+    second, _ = queue.submit('thread_1', 'two')
+    assert queue.abandon(second)
+    with pytest.raises(Cancelled):
+        queue.acquire(second, timeout=1)
+    assert queue.stats()['queued_batches'] == 0
+
+    queue.release(first, {'text': 'one'})
+    third, _ = queue.submit('thread_1', 'three')
+    assert queue.abandon(third)
+    fourth, leader = queue.submit('thread_1', 'three')
+    assert leader and fourth is not third
+    queue.release(third, error=Cancelled('client disconnected'))
+    queue.release(fourth, {'text': 'three'})
+    assert queue.stats()['active_runs'] == 0
+
+
+def test_client_disconnect_while_waiting_releases_the_queued_batch():
+    """Closing the chat stream at the waiting status does not wedge the session's thread."""
+    pytest.importorskip('markdown')
+    os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+    from services.assistant_service import AssistantService
+
+    class FakeModeration:
+        def moderate_content(self, text):
+            return False, None
+
+    service = AssistantService.__new__(AssistantService)
+    service.openai_service = FakeModeration()
+    service.run_queue = RunQueue()
+    service.init_assistant_thread = lambda session_id: 'thread_1'
+
+    first, _ = service.run_queue.submit('thread_1', 'one')
+    stream = service.chat_stream('two', 'user_1')
+    next(stream)
+    assert 'Waiting for the previous reply' in next(stream)
+    stream.close()
+
+    assert service.run_queue.stats()['queued_batches'] == 0
+    service.run_queue.release(first, {'text': 'one'})
+    third, leader = service.run_queue.submit('thread_1', 'three')
+    assert leader and third.state == RUNNING
+
+
+def test_leader_disconnect_keeps_the_run_for_waiters():
+    """A leader whose client leaves finishes the run silently when another request waits on the batch."""
+    pytest.importorskip('markdown')
+    os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+    from services.assistant_service import AssistantService
+    from utils.cancellation import CancellationToken
+
+    class FakeModeration:
+        def moderate_content(self, text):
+            return False, None
+
+    proceed = threading.Event()
+    cancelled = []
+
+    def stream_messages(thread_id, messages, format_sse, cancel_token):
+        yield format_sse('status', {'status': 'Thinking...'})
+        proceed.wait(2)
+        if cancel_token.is_cancelled:
+            cancelled.append(cancel_token.reason)
+        cancel_token.raise_if_cancelled()
+        yield format_sse('delta', {'text': 'Once', 'reset': False})
+        return {'text': 'Once upon a time'}
+
+    service = AssistantService.__new__(AssistantService)
+    service.openai_service = FakeModeration()
+    service.run_queue = RunQueue()
+    service.init_assistant_thread = lambda session_id: 'thread_1'
+    service._stream_messages = stream_messages
+
+    token = CancellationToken()
+    stream = service.chat_stream('Tell me a story', 'user_1', cancel_token=token)
+    next(stream)
+    assert 'Thinking' in next(stream)
+
+    events = []
+    waiter = threading.Thread(target=lambda: events.extend(service.chat_stream('tell me a story', 'user_1')))
+    waiter.start()
+    for _ in range(200):
+        if service.run_queue.stats()['deduplicated']:
+            break
+        threading.Event().wait(0.01)
+
+    token.cancel('client disconnected')
+    proceed.set()
+    stream.close()
+    waiter.join(2)
+
+    assert cancelled == []
+    assert any(event.startswith('event: complete') and 'Once upon a time' in event for event in events)
+    assert service.run_queue.stats()['active_runs'] == 0
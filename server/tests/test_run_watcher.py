@@ -0,0 +1,120 @@
+import os
+import sys
+import threading
+import pytest
+from types import SimpleNamespace
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.run_watcher import RunWatcher
+
+
+class FakeRuns:
+    """Returns scripted statuses for each run, one per retrieve call."""
+
+    def __init__(self, scripts):
+        self.scripts = {run_id: list(statuses) for run_id, statuses in scripts.items()}
+        self.calls = {run_id: 0 for run_id in scripts}
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def retrieve(self, thread_id, run_id):
+        with self.lock:
+            self.threads.add(threading.current_thread().name)
+            self.calls[run_id] += 1
+            statuses = self.scripts[run_id]
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        if isinstance(status, Exception):
+            raise status
+        return SimpleNamespace(id=run_id, thread_id=thread_id, status=status)
+
+
+def make_watcher(runs, **kwargs):
+    client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+    options = dict(workers=2, min_interval=0.001, max_interval=0.01, jitter=0.1)
+    options.update(kwargs)
+    return RunWatcher(client, **options)
+
+
+def test_many_runs_share_a_few_threads():
+    """Hundreds of pending runs are polled by the watcher's own small thread pool."""
+    scripts = {f'run_{i}': ['queued', 'in_progress', 'completed'] for i in range(200)}
+    runs = FakeRuns(scripts)
+    watcher = make_watcher(runs)
+    try:
+        futures = {run_id: watcher.watch('thread_1', run_id) for run_id in scripts}
+        results = {run_id: future.result(timeout=10) for run_id, future in futures.items()}
+    finally:
+        watcher.close()
+
+    assert all(run.status == 'completed' for run in results.values())
+    assert all(run.id == run_id for run_id, run in results.items())
+    assert all(name.startswith('run-watcher') for name in runs.threads)
+    assert len(runs.threads) <= 2
+    stats = watcher.stats()
+    assert stats['settled'] == 200
+    assert stats['polls'] == 600
+
+
+def test_requires_action_settles_and_can_be_watched_again():
+    """A run waiting for tool outputs is handed back, then watched again after submitting."""
+    runs = FakeRuns({'run_1': ['in_progress', 'requires_action', 'in_progress', 'completed']})
+    watcher = make_watcher(runs)
+    try:
+        assert watcher.wait('thread_1', 'run_1').status == 'requires_action'
+        assert watcher.wait('thread_1', 'run_1').status == 'completed'
+    finally:
+        watcher.close()
+
+
+def test_interval_backs_off_while_status_is_unchanged():
+    """Unchanged statuses are polled less and less often, bounded by max_interval."""
+    runs = FakeRuns({'run_1': ['in_progress'] * 8 + ['completed']})
+    watcher = make_watcher(runs, min_interval=0.001, max_interval=0.02, backoff=2.0, jitter=0)
+    intervals = []
+    original_requeue = watcher._requeue
+
+    def record(entry):
+        intervals.append(entry.interval)
+        original_requeue(entry)
+
+    watcher._requeue = record
+    try:
+        watcher.wait('thread_1', 'run_1', timeout=5)
+    finally:
+        watcher.close()
+
+    assert intervals[0] == 0.001
+    assert intervals == sorted(intervals)
+    assert max(intervals) == 0.02
+
+
+def test_retrieve_errors_and_timeouts_fail_the_future():
+    """Repeated retrieve errors and runs that never settle surface as exceptions."""
+    runs = FakeRuns({'broken': [ConnectionError('down')], 'stuck': ['in_progress']})
+    watcher = make_watcher(runs, max_errors=3)
+    try:
+        with pytest.raises(ConnectionError):
+            watcher.watch('thread_1', 'broken').result(timeout=5)
+        assert runs.calls['broken'] == 3
+
+        with pytest.raises(TimeoutError):
+            watcher.wait('thread_1', 'stuck', timeout=0.05)
+        assert watcher.stats()['timeouts'] == 1
+    finally:
+        watcher.close()
+
+
+def test_cancelled_future_stops_polling():
+    """Cancelling the future removes the run from the watcher."""
+    runs = FakeRuns({'run_1': ['in_progress']})
+    watcher = make_watcher(runs, min_interval=0.05, max_interval=0.05)
+    try:
+        future = watcher.watch('thread_1', 'run_1')
+        assert future.cancel()
+        threading.Event().wait(0.2)
+        assert runs.calls['run_1'] == 0
+        assert watcher.stats()['pending'] == 0
+    finally:
+        watcher.close()
@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+import threading
+import itertools
+import pytest
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.session_store import (MemorySessionStore, SessionStore, SqliteSessionStore, create_session_store)
+
+
+class ThreadFactory:
+    """Creates fake thread IDs, optionally slowly, and counts the calls."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.ids = itertools.count(1)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            return f'thread_{next(self.ids)}'
+
+
+def create_concurrently(stores, session_id, factory, count=8):
+    results = []
+    barrier = threading.Barrier(count)
+
+    def worker(store):
+        barrier.wait()
+        results.append(store.get_or_create(session_id, factory))
+
+    threads = [threading.Thread(target=worker, args=(stores[i % len(stores)],)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_memory_store_reuses_and_evicts_least_recently_used():
+    store = MemorySessionStore(ttl=0, max_entries=2)
+    factory = ThreadFactory()
+
+    assert store.get_or_create('a', factory) == ('thread_1', True)
+    assert store.get_or_create('b', factory) == ('thread_2', True)
+    assert store.get_or_create('a', factory) == ('thread_1', False)
+    store.get_or_create('c', factory)
+
+    assert store.get('b') is None
+    assert store.get('a') == 'thread_1'
+    assert store.stats()['evicted'] == 1
+
+
+def test_memory_store_expires_idle_sessions():
+    store = MemorySessionStore(ttl=0.05)
+    factory = ThreadFactory()
+    store.get_or_create('a', factory)
+    store.get_or_create('b', factory)
+    time.sleep(0.1)
+
+    assert store.get_or_create('a', factory) == ('thread_3', True)
+    assert store.purge_expired() == 1
+    assert len(store) == 1
+
+
+def test_memory_store_creates_once_for_concurrent_first_requests():
+    store = MemorySessionStore()
+    factory = ThreadFactory(delay=0.05)
+
+    results = create_concurrently([store], 'a', factory)
+
+    assert factory.calls == 1
+    assert {thread_id for thread_id, _ in results} == {'thread_1'}
+    assert sum(created for _, created in results) == 1
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    """Two stores on one file behave like two worker processes sharing sessions."""
+    path = str(tmp_path / 'sessions.sqlite')
+    factory = ThreadFactory()
+    first = SqliteSessionStore(path, ttl=0)
+    second = SqliteSessionStore(path, ttl=0)
+
+    assert first.get_or_create('a', factory) == ('thread_1', True)
+    assert second.get_or_create('a', factory) == ('thread_1', False)
+    second.delete('a')
+    assert first.get('a') is None
+
+
+def test_sqlite_store_creates_once_across_instances(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite')
+    stores = [SqliteSessionStore(path, poll_interval=0.01) for _ in range(3)]
+    factory = ThreadFactory(delay=0.05)
+
+    results = create_concurrently(stores, 'a', factory, count=9)
+
+    assert len(results) == 9
+    assert factory.calls == 1
+    assert {thread_id for thread_id, _ in results} == {'thread_1'}
+
+
+def test_sqlite_store_releases_claim_when_creation_fails(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / 'sessions.sqlite'))
+
+    def fail():
+        raise RuntimeError('OpenAI unavailable')
+
+    with pytest.raises(RuntimeError):
+        store.get_or_create('a', fail)
+    assert store.get_or_create('a', ThreadFactory()) == ('thread_1', True)
+
+
+def test_sqlite_store_expires_idle_sessions(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / 'sessions.sqlite'), ttl=0.05)
+    factory = ThreadFactory()
+    store.get_or_create('a', factory)
+    store.get_or_create('b', factory)
+    time.sleep(0.1)
+
+    assert store.get('a') is None
+    assert store.purge_expired() == 2
+    assert len(store) == 0
+
+
+def test_create_session_store_by_name(tmp_path, monkeypatch):
+    monkeypatch.delenv('SESSION_STORE', raising=False)
+    assert isinstance(create_session_store(), MemorySessionStore)
+    assert isinstance(create_session_store('sqlite', path=str(tmp_path / 's.sqlite')), SqliteSessionStore)
+    with pytest.raises(ValueError):
+        create_session_store('redis')
+
+
+def test_session_store_base_class_is_abstract():
+    """A store that does not implement the storage methods cannot be created."""
+    with pytest.raises(TypeError):
+        SessionStore()
+
+    class PartialStore(SessionStore):
+        def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
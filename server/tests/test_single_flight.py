@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+import pytest
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.single_flight import SingleFlight
+
+
+def test_do_runs_and_releases_key():
+    """Sequential calls each run the function; nothing is cached between them."""
+    flight = SingleFlight()
+    calls = []
+
+    assert flight.do('a', lambda: calls.append(1) or 'first') == ('first', False)
+    assert flight.do('a', lambda: calls.append(1) or 'second') == ('second', False)
+    assert len(calls) == 2
+    assert flight.stats() == {'calls': 2, 'coalesced': 0, 'in_flight': 0}
+
+
+def test_waiters_share_result_and_errors():
+    """Followers receive the leader's result, or the same exception when it fails."""
+    flight = SingleFlight()
+    call, leader = flight.begin('book')
+    follower_call, follower_leader = flight.begin('book')
+    assert leader and not follower_leader
+    assert follower_call is call
+
+    flight.finish('book', call, result={'book_id': 'book'})
+    assert follower_call.wait() == {'book_id': 'book'}
+
+    call, _ = flight.begin('broken')
+    follower_call, _ = flight.begin('broken')
+    flight.finish('broken', call, error=ValueError('boom'))
+    with pytest.raises(ValueError):
+        follower_call.wait()
+
+    assert flight.stats()['coalesced'] == 2
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_concurrent_do_runs_once():
+    """Threads calling do for the same key while it is in flight share a single execution."""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def work():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', work)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', work))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()['coalesced'] < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(runs) == 1
+    assert sorted(results) == [(42, False), (42, True), (42, True), (42, True)]
@@ -0,0 +1,52 @@
+import os
+import sys
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.speech_segments import MAX_TTS_INPUT_CHARS, split_sentences, split_speech_segments
+
+
+def test_split_sentences_on_western_and_cjk_punctuation():
+    """Sentences end at Western or CJK terminal punctuation and at line breaks."""
+    text = "你好！今天读什么书？Let's read. Pi is 3.14, right?\n“真的吗？”他问。Last line"
+
+    assert split_sentences(text) == [
+        '你好！', '今天读什么书？', "Let's read.", 'Pi is 3.14, right?', '“真的吗？”', '他问。', 'Last line'
+    ]
+
+
+def test_first_segment_is_first_sentence():
+    """The first segment is kept short so playback can start early; the rest are grouped."""
+    segments = split_speech_segments('One. Two. Three. Four.', target_chars=12)
+
+    assert segments == ['One.', 'Two. Three.', 'Four.']
+
+
+def test_abbreviations_and_initials_do_not_end_a_sentence():
+    """Titles, initials and abbreviations stay with their sentence, so playback never opens with "Mr."."""
+    segments = split_speech_segments('Mr. Smith went to Washington. He met Dr. J. R. Jones, e.g. at 3 p.m. today.',
+                                     target_chars=20)
+
+    assert segments == ['Mr. Smith went to Washington.', 'He met Dr. J. R. Jones, e.g. at 3 p.m. today.']
+    assert split_sentences('We read books etc. Then we sing.') == ['We read books etc.', 'Then we sing.']
+
+
+def test_cjk_sentences_are_joined_without_spaces():
+    """CJK sentences are grouped without inserting spaces."""
+    assert split_speech_segments('第一句。第二句。第三句。', target_chars=10) == ['第一句。', '第二句。第三句。']
+
+
+def test_no_segment_exceeds_the_input_limit():
+    """Overlong sentences are split at clause boundaries, then cut to the TTS input limit."""
+    clauses = split_speech_segments('word, ' * 40, target_chars=50, max_chars=50)
+    assert all(len(segment) <= 50 for segment in clauses)
+    assert all(segment.endswith(',') for segment in clauses)
+
+    unbroken = split_speech_segments('a' * 9000)
+    assert [len(segment) for segment in unbroken] == [MAX_TTS_INPUT_CHARS, MAX_TTS_INPUT_CHARS, 808]
+
+
+def test_empty_text_has_no_segments():
+    """Whitespace-only text produces no segments."""
+    assert split_speech_segments('  \n ') == []
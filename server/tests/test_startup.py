@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import pytest
+from flask import Flask
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.startup import StartupGraph, wait_for_component
+
+
+def meet_at(barrier, value):
+    """Returns a step that waits at the barrier and then returns value."""
+    def step(deps):
+        # Barrier.wait returns the arrival index, so the value is returned explicitly
+        barrier.wait()
+        return value
+    return step
+
+
+def test_independent_steps_run_concurrently_and_dependencies_wait():
+    """Steps without dependencies overlap; dependent steps receive their dependencies' results."""
+    barrier = threading.Barrier(2, timeout=2)
+    graph = StartupGraph()
+    graph.add("catalog", meet_at(barrier, "catalog.json"))
+    graph.add("assistant", meet_at(barrier, "asst_1"))
+    graph.add("index", lambda deps: f"index of {deps['catalog']}", depends_on=["catalog"])
+
+    graph.start()
+
+    assert graph.wait("index", timeout=5)
+    assert graph.wait("assistant", timeout=5)
+    assert graph.result("index") == "index of catalog.json"
+    assert graph.result("assistant") == "asst_1"
+    status = graph.status()
+    assert status["status"] == "ready"
+    assert status["components"]["index"]["depends_on"] == ["catalog"]
+
+
+def test_start_returns_before_slow_steps_finish():
+    """The caller can serve requests while steps are still running."""
+    release = threading.Event()
+    graph = StartupGraph()
+    graph.add("slow", lambda deps: release.wait(5))
+    graph.start()
+
+    assert graph.status()["status"] == "starting"
+    assert not graph.wait("slow", timeout=0.01)
+    release.set()
+    assert graph.wait("slow", timeout=5)
+
+
+def test_failure_blocks_dependents():
+    """A failed step is reported and the steps depending on it never run."""
+    ran = []
+    graph = StartupGraph()
+    graph.add("catalog", lambda deps: 1 / 0)
+    graph.add("index", lambda deps: ran.append("index"), depends_on=["catalog"])
+    graph.add("assistant", lambda deps: "asst_1")
+    graph.start()
+
+    assert not graph.wait("index", timeout=5)
+    assert graph.wait("assistant", timeout=5)
+    components = graph.status()["components"]
+    assert components["catalog"]["state"] == "failed"
+    assert components["index"]["state"] == "blocked"
+    assert graph.status()["status"] == "degraded"
+    assert ran == []
+
+
+def test_unknown_dependency_is_rejected():
+    graph = StartupGraph()
+    with pytest.raises(ValueError):
+        graph.add("index", lambda deps: None, depends_on=["catalog"])
+
+
+def test_wait_for_component_uses_app_startup_graph():
+    """Requests wait on the app's graph, and proceed immediately when there is none."""
+    app = Flask(__name__)
+    with app.app_context():
+        assert wait_for_component("vector_store_index")
+
+        indexed = threading.Event()
+        graph = StartupGraph()
+        graph.add("vector_store_index", lambda deps: indexed.wait(5))
+        app.config["STARTUP"] = graph
+        graph.start()
+        assert not wait_for_component("vector_store_index", timeout=0.01)
+        indexed.set()
+        assert wait_for_component("vector_store_index", timeout=5)
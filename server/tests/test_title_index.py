@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import pytest
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.title_index import TitleIndex, get_title_index, normalize_text, tokenize
+
+
+MOCK_CATALOG = [
+    {'book_id': '14082-1', 'book_title': 'The Discovery of America LOW', 'book_Description': 'Columbus sails west.'},
+    {'book_id': '12550-1', 'book_title': 'The Lost Kitten', 'book_Description': 'A kitten finds home.'},
+    {'book_id': '12551-1', 'book_title': 'The Lost City', 'book_Description': 'An ancient city.'},
+    {'book_id': '2590-3', 'book_title': 'Café Stories', 'book_Description': 'Stories from a café.'},
+    {'book_id': '2940-5', 'book_title': '小红帽', 'book_Description': '小红帽去看外婆。'},
+]
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    """Writes the mock catalog in the JSON Lines format used by production_books.json."""
+    path = tmp_path / 'production_books.json'
+    path.write_text(''.join(json.dumps(book) + '\n' for book in MOCK_CATALOG), encoding='utf-8')
+    return str(path)
+
+
+def test_normalize_and_tokenize():
+    """Accents and punctuation are stripped and CJK runs become bigrams."""
+    assert normalize_text("Café's  STORIES!") == 'cafe s stories'
+    assert tokenize(normalize_text('Little Red 小红帽')) == ['little', 'red', '小红', '红帽']
+
+
+@pytest.mark.parametrize('query, expected_id', [
+    ('The Lost Kitten', '12550-1'),
+    ('lost kiten', '12550-1'),
+    ('discovery america', '14082-1'),
+    ('cafe stories', '2590-3'),
+    ('小红帽', '2940-5'),
+    ('红帽', '2940-5'),
+])
+def test_search_ranks_best_match_first(catalog_file, query, expected_id):
+    """Exact, partial, misspelled, accent-free and Chinese queries find the right book."""
+    index = TitleIndex.from_catalog(catalog_file)
+    results = index.search(query)
+
+    assert results
+    assert results[0]['book_id'] == expected_id
+    assert 'book_Description' in results[0]
+    assert 0 < results[0]['score'] <= 1
+
+
+def test_search_respects_limit_and_threshold(catalog_file):
+    """Unrelated queries return nothing and the limit caps the result count."""
+    index = TitleIndex.from_catalog(catalog_file)
+
+    assert index.search('zzzz qqqq') == []
+    assert len(index.search('the lost', limit=1)) == 1
+
+
+def test_shared_index_rebuilds_when_catalog_changes(catalog_file):
+    """The shared index is rebuilt after the catalog file is rewritten."""
+    index = get_title_index(catalog_file)
+    assert get_title_index(catalog_file) is index
+
+    with open(catalog_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'book_id': '9-1', 'book_title': 'Brand New Book'}) + '\n')
+    os.utime(catalog_file, (index.source_mtime + 10, index.source_mtime + 10))
+
+    rebuilt = get_title_index(catalog_file)
+    assert rebuilt is not index
+    assert rebuilt.search('brand new book')[0]['book_id'] == '9-1'
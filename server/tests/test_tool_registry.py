@@ -0,0 +1,172 @@
+import os
+import sys
+import threading
+import time
+import pytest
+from flask import Flask, current_app
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.tool_registry import ToolCall, ToolRegistry
+
+
+@pytest.fixture
+def registry():
+    return ToolRegistry(max_workers=4, default_timeout=5)
+
+
+def test_calls_in_one_step_run_concurrently(registry):
+    """Two slow calls take about as long as one, not the sum of both."""
+    barrier = threading.Barrier(2, timeout=2)
+
+    def slow(args, report):
+        # Both calls must be running at the same time to pass the barrier
+        barrier.wait()
+        return {"status": "success", "value": args["value"]}
+
+    registry.register("slow", slow)
+    calls = [ToolCall("call_1", "slow", {"value": 1}), ToolCall("call_2", "slow", {"value": 2})]
+
+    results = [e.data for e in registry.run_batch(calls) if e.type == "result"]
+
+    assert results == [{"status": "success", "value": 1}, {"status": "success", "value": 2}]
+
+
+def test_events_are_ordered_by_call(registry):
+    """A later call that finishes first still has its events emitted after the earlier call's."""
+    def first(args, report):
+        report("first started")
+        time.sleep(0.1)
+        report("first done")
+        return {"status": "success"}
+
+    def second(args, report):
+        report("second done")
+        return {"status": "success"}
+
+    registry.register("first", first)
+    registry.register("second", second)
+    calls = [ToolCall("call_1", "first", {}), ToolCall("call_2", "second", {})]
+
+    events = [(e.type, e.call.call_id, e.data if e.type == "status" else None)
+              for e in registry.run_batch(calls)]
+
+    assert events == [
+        ("start", "call_1", None), ("status", "call_1", "first started"), ("status", "call_1", "first done"),
+        ("result", "call_1", None),
+        ("start", "call_2", None), ("status", "call_2", "second done"), ("result", "call_2", None),
+    ]
+
+
+def test_timeout_and_errors_return_structured_results(registry):
+    """Slow, failing and unknown tools produce results instead of raising."""
+    registry.register("stuck", lambda args, report: time.sleep(1) or {"status": "success"}, timeout=0.05)
+    registry.register("broken", lambda args, report: 1 / 0)
+
+    calls = [ToolCall("call_1", "stuck", {}), ToolCall("call_2", "broken", {}), ToolCall("call_3", "missing", {})]
+    results = [e.data for e in registry.run_batch(calls) if e.type == "result"]
+
+    assert results[0]["status"] == "timeout"
+    assert results[1]["status"] == "error"
+    assert results[2] == {"status": "function_not_found"}
+    assert registry.stats()["timeouts"] == 1
+    assert registry.stats()["errors"] == 1
+
+
+def test_cache_policy_reuses_successful_results(registry):
+    """Tools with a cache TTL reuse successful results for the same arguments."""
+    calls = []
+
+    def search(args, report):
+        calls.append(args)
+        return {"status": "success" if args["title"] else "error"}
+
+    registry.register("search", search, cache_ttl=60)
+    registry.register("uncached", search)
+
+    for _ in range(3):
+        registry.execute("search", {"title": "Columbus"})
+        registry.execute("search", {"title": ""})
+    registry.execute("uncached", {"title": "Columbus"})
+    registry.execute("uncached", {"title": "Columbus"})
+
+    # One call for the cached success, every call for errors and the uncached tool
+    assert calls.count({"title": "Columbus"}) == 3
+    assert calls.count({"title": ""}) == 3
+    assert registry.stats()["cache_hits"] == 2
+
+
+def test_handlers_run_in_the_callers_app_context(registry):
+    """Worker threads see the same Flask app configuration as the request."""
+    app = Flask(__name__)
+    app.config["BOOK_RECOMMANDATION_ASSISTANT_ID"] = "asst_books"
+    registry.register("config", lambda args, report: {
+        "status": "success", "assistant_id": current_app.config.get("BOOK_RECOMMANDATION_ASSISTANT_ID")
+    })
+
+    with app.app_context():
+        result = registry.execute("config", {})
+
+    assert result["assistant_id"] == "asst_books"
+
+
+def test_cancellation_aborts_pending_calls():
+    """Cancelling wakes the waiting caller at once and drops calls that have not started."""
+    from utils.cancellation import CancellationToken, Cancelled
+
+    registry = ToolRegistry(max_workers=1, default_timeout=5)
+    started = threading.Event()
+    release = threading.Event()
+    ran = []
+
+    def slow(args, report):
+        ran.append(args["value"])
+        started.set()
+        release.wait(5)
+        return {"status": "success"}
+
+    registry.register("slow", slow)
+    token = CancellationToken()
+    calls = [ToolCall("call_1", "slow", {"value": 1}), ToolCall("call_2", "slow", {"value": 2})]
+    threading.Thread(target=lambda: started.wait(5) and token.cancel("client disconnected")).start()
+
+    began = time.monotonic()
+    with pytest.raises(Cancelled):
+        list(registry.run_batch(calls, token))
+    release.set()
+
+    assert time.monotonic() - began < 2
+    assert registry.stats()["aborted"] == 2
+    time.sleep(0.05)
+    assert ran == [1]
+
+
+def test_timeout_starts_when_the_handler_starts():
+    """Time spent queued behind another call in the same step does not count against the timeout."""
+    registry = ToolRegistry(max_workers=1, default_timeout=5)
+    registry.register("slow", lambda args, report: time.sleep(0.15) or {"status": "success"})
+    registry.register("quick", lambda args, report: time.sleep(0.02) or {"status": "success"}, timeout=0.1)
+
+    calls = [ToolCall("call_1", "slow", {}), ToolCall("call_2", "quick", {})]
+    results = [e.data for e in registry.run_batch(calls) if e.type == "result"]
+
+    assert [result["status"] for result in results] == ["success", "success"]
+
+
+def test_timed_out_handler_does_not_block_other_requests():
+    """A handler still running after its timeout keeps only its own step's thread busy."""
+    registry = ToolRegistry(max_workers=1, default_timeout=5)
+    release = threading.Event()
+    registry.register("stuck", lambda args, report: release.wait(5) and {"status": "success"}, timeout=0.05)
+    registry.register("quick", lambda args, report: {"status": "success"}, timeout=0.5)
+
+    assert registry.execute("stuck", {})["status"] == "timeout"
+    assert registry.stats()["timed_out_running"] == 1
+    assert registry.execute("quick", {})["status"] == "success"
+
+    release.set()
+    deadline = time.monotonic() + 2
+    while registry.stats()["timed_out_running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry.stats()["timed_out_running"] == 0
@@ -0,0 +1,201 @@
+import os
+import sys
+import threading
+import time
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.tts_cache import TTSCache
+
+
+class FakeOpenAIService:
+    """Records text_to_speech calls and returns deterministic audio bytes."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def text_to_speech(self, text, voice='alloy', model='tts-1', response_format='mp3'):
+        with self._lock:
+            self.calls.append((text, voice, model, response_format))
+        time.sleep(self.delay)
+        return f'{model}:{voice}:{response_format}:{text}'.encode('utf-8')
+
+
+def make_cache(tmp_path, **kwargs):
+    service = FakeOpenAIService(delay=kwargs.pop('delay', 0.0))
+    kwargs.setdefault('max_bytes', 0)
+    kwargs.setdefault('ttl_seconds', 0)
+    kwargs.setdefault('streaming', False)
+    return TTSCache(str(tmp_path), openai_service=service, **kwargs), service
+
+
+def test_hit_returns_same_url_without_api_call(tmp_path):
+    """A repeated synthesis returns the same URL and does not call the TTS API again."""
+    cache, service = make_cache(tmp_path)
+
+    first = cache.synthesize('Hello there!')
+    second = cache.synthesize('Hello there!')
+
+    assert first == second
+    assert first.startswith('/api/audio/tts-') and first.endswith('.mp3')
+    assert len(service.calls) == 1
+    stats = cache.stats()
+    assert stats['synthesized'] == 1
+    assert stats['saved_calls'] == 1
+    assert stats['saved_chars'] == len('Hello there!')
+
+
+def test_key_covers_voice_model_and_format(tmp_path):
+    """Changing the voice, model or format produces a separate cache entry."""
+    cache, service = make_cache(tmp_path)
+
+    urls = {
+        cache.synthesize('Hi'),
+        cache.synthesize('Hi', voice='nova'),
+        cache.synthesize('Hi', model='tts-1-hd'),
+        cache.synthesize('Hi', response_format='opus'),
+    }
+
+    assert len(urls) == 4
+    assert len(service.calls) == 4
+
+
+def test_concurrent_misses_synthesize_once(tmp_path):
+    """Concurrent requests for the same text share a single TTS call."""
+    cache, service = make_cache(tmp_path, delay=0.2)
+    urls = []
+
+    def worker():
+        urls.append(cache.synthesize('Same warning'))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(urls)) == 1
+    assert len(service.calls) == 1
+    assert cache.stats()['saved_calls'] == 4
+
+
+def test_resolve_serves_cached_file(tmp_path):
+    """The filename from the audio URL resolves to the cached audio file."""
+    cache, _ = make_cache(tmp_path)
+    url = cache.synthesize('Read along', response_format='opus')
+    filename = url.rsplit('/', 1)[-1]
+
+    path = cache.resolve(filename)
+    with open(path, 'rb') as f:
+        assert f.read() == b'tts-1:alloy:opus:Read along'
+    assert TTSCache.mimetype_for(filename) == 'audio/ogg'
+
+    assert cache.resolve('abc123.mp3') is None
+    assert cache.resolve('tts-' + '0' * 64 + '.mp3') is None
+
+
+def test_cache_survives_restart(tmp_path):
+    """A new cache over the same directory reuses audio synthesized earlier."""
+    cache, _ = make_cache(tmp_path)
+    url = cache.synthesize('Welcome back')
+
+    restarted, service = make_cache(tmp_path)
+    assert restarted.synthesize('Welcome back') == url
+    assert service.calls == []
+
+
+def test_evicted_audio_is_synthesized_again(tmp_path):
+    """Audio evicted by the byte cap is regenerated on the next request."""
+    cache, service = make_cache(tmp_path, max_bytes=60)
+    cache.synthesize('a' * 30)
+    cache.synthesize('b' * 30)
+
+    assert cache.stats()['evictions'] == 1
+    cache.synthesize('a' * 30)
+    assert len(service.calls) == 3
+
+
+class FakeSegmentService(FakeOpenAIService):
+    """Tracks how many syntheses run at once and supports streaming."""
+
+    def __init__(self, delay=0.0):
+        super().__init__(delay)
+        self.active = 0
+        self.peak = 0
+
+    def text_to_speech(self, text, voice='alloy', model='tts-1', response_format='mp3'):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            return super().text_to_speech(text, voice, model, response_format)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def text_to_speech_stream(self, text, voice='alloy', model='tts-1', response_format='mp3', chunk_size=4096):
+        yield self.text_to_speech(text, voice, model, response_format)
+
+
+LONG_REPLY = 'First sentence. Second one here. Third one here. Fourth one here. Fifth one here.'
+
+
+def test_playlist_synthesizes_segments_with_bounded_parallelism(tmp_path):
+    """A long text is synthesized per segment, at most segment_parallelism at a time."""
+    service = FakeSegmentService(delay=0.1)
+    cache = TTSCache(str(tmp_path), max_bytes=0, ttl_seconds=0, openai_service=service, streaming=False,
+                     segment_chars=20, segment_parallelism=2)
+
+    audio_url, playlist = cache.synthesize_playlist(LONG_REPLY)
+
+    assert sorted(call[0] for call in service.calls) == sorted([
+        'First sentence.', 'Second one here.', 'Third one here.', 'Fourth one here.', 'Fifth one here.'])
+    assert service.peak == 2
+    assert len(playlist) == 5
+    assert audio_url.startswith('/api/audio/ttsp-')
+    assert cache.stats()['playlist_segments'] == 5
+
+
+def test_playlist_for_short_text_matches_synthesize(tmp_path):
+    """Text with a single segment keeps the plain cache URL."""
+    cache, _ = make_cache(tmp_path)
+
+    audio_url, playlist = cache.synthesize_playlist('Just one sentence.')
+
+    assert playlist == [audio_url]
+    assert audio_url == cache.synthesize('Just one sentence.')
+
+
+def test_playlist_stream_concatenates_segments_in_order(tmp_path):
+    """The concatenated stream plays every segment in order, streaming or from disk."""
+    service = FakeSegmentService()
+    cache = TTSCache(str(tmp_path), max_bytes=0, ttl_seconds=0, openai_service=service, streaming=True,
+                     segment_chars=20, segment_parallelism=3)
+
+    audio_url, playlist = cache.synthesize_playlist(LONG_REPLY)
+    chunks = cache.playlist_stream(audio_url.rsplit('/', 1)[-1])
+    expected = b''.join(f'tts-1:alloy:mp3:{text}'.encode('utf-8') for text in [
+        'First sentence.', 'Second one here.', 'Third one here.', 'Fourth one here.', 'Fifth one here.'])
+    assert b''.join(chunks) == expected
+
+    # Evicted segments are synthesized again when the playlist is replayed
+    cache.store.delete(TTSCache.cache_key('Third one here.'))
+    assert b''.join(cache.playlist_stream(audio_url.rsplit('/', 1)[-1])) == expected
+    assert len(service.calls) == 6
+
+    assert cache.playlist_stream('ttsp-' + '0' * 64 + '.mp3') is None
+
+
+def test_playlist_for_unconcatenable_format_points_at_first_segment(tmp_path):
+    """Formats that cannot be joined return the first segment as the audio URL."""
+    service = FakeSegmentService()
+    cache = TTSCache(str(tmp_path), max_bytes=0, ttl_seconds=0, openai_service=service, streaming=False,
+                     segment_chars=20)
+
+    audio_url, playlist = cache.synthesize_playlist(LONG_REPLY, response_format='wav')
+
+    assert audio_url == playlist[0]
+    assert all(url.endswith('.wav') for url in playlist)
@@ -0,0 +1,163 @@
+import os
+import sys
+import threading
+
+# Add the server directory to the Python path so we can import modules from it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.tts_cache import TTSCache
+from services.warning_bank import CATEGORIES, GENERAL_CATEGORY, WarningBank, warning_category, warning_language
+
+
+class FakeWarningService:
+    """Generates numbered warnings per category and language and records TTS calls."""
+
+    DEFAULT_WARNINGS = {'zh': '默认警告', 'en': 'Default warning'}
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.generated = []
+        self.spoken = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def extract_flagged_categories(categories):
+        return [name for name, flagged in categories.items() if flagged]
+
+    def generate_friendly_warning(self, categories, language='en', conversation_context=None):
+        if self.fail:
+            return self.DEFAULT_WARNINGS['zh' if language == 'zh' else 'en']
+        with self._lock:
+            self.generated.append((tuple(self.extract_flagged_categories(categories)), language))
+            return f'{language}:{"+".join(self.extract_flagged_categories(categories)) or "general"}:{len(self.generated)}'
+
+    def text_to_speech(self, text, voice='alloy', model='tts-1', response_format='mp3'):
+        with self._lock:
+            self.spoken.append(text)
+        return text.encode('utf-8')
+
+    def text_to_speech_stream(self, text, voice='alloy', model='tts-1', response_format='mp3', chunk_size=4096):
+        yield self.text_to_speech(text, voice, model, response_format)
+
+
+def make_bank(tmp_path, service=None, variants=2):
+    service = service or FakeWarningService()
+    cache = TTSCache(str(tmp_path / 'cache'), max_bytes=0, ttl_seconds=0, openai_service=service, streaming=False)
+    bank = WarningBank(str(tmp_path / 'warning_bank.json'), variants=variants, openai_service=service,
+                       tts_cache=cache)
+    return bank, service, cache
+
+
+def test_subcategories_map_to_bank_categories():
+    """Moderation subcategories fold into their main category; self-harm takes priority."""
+    assert warning_category(['sexual/minors']) == 'sexual'
+    assert warning_category(['violence_graphic', 'self_harm_intent']) == 'self-harm'
+    assert warning_category(['illicit/violent']) == 'illicit'
+    assert warning_category(['something-new']) == GENERAL_CATEGORY
+    assert warning_category([]) == GENERAL_CATEGORY
+    assert warning_language('zh-CN') == 'zh'
+    assert warning_language(None) == 'en'
+
+
+def test_ensure_fills_every_category_and_renders_speech(tmp_path):
+    """ensure generates the missing variants per category and language and pre-renders their audio."""
+    bank, service, _ = make_bank(tmp_path)
+
+    result = bank.ensure()
+
+    expected = (len(CATEGORIES) + 1) * 2 * 2
+    assert result == {'warnings': expected, 'generated': expected, 'rendered': expected}
+    assert len(bank.texts('violence', 'zh')) == 2
+    assert len(set(service.spoken)) == expected
+
+    # A second run has nothing left to generate or synthesize
+    service.generated.clear()
+    spoken = len(service.spoken)
+    assert bank.ensure()['generated'] == 0
+    assert service.generated == []
+    assert len(service.spoken) == spoken
+
+
+def test_warning_is_served_from_bank_without_model_or_tts_calls(tmp_path):
+    """A flagged message gets a banked warning whose audio is already cached."""
+    bank, service, cache = make_bank(tmp_path)
+    bank.ensure()
+    generated, spoken = len(service.generated), len(service.spoken)
+
+    warning = bank.warning({'violence': True, 'hate': False}, 'zh')
+
+    assert warning['category'] == 'violence'
+    assert warning['source'] == 'bank'
+    assert warning['text'] in bank.texts('violence', 'zh')
+    assert warning['audio_url'] == cache.synthesize(warning['text'])
+    assert len(service.generated) == generated
+    assert len(service.spoken) == spoken
+    assert bank.stats()['served'] == 1
+
+
+def test_warnings_rotate_through_variants(tmp_path):
+    """Consecutive warnings for the same category cycle through every variant."""
+    bank, _, _ = make_bank(tmp_path, variants=3)
+    bank.ensure(render_audio=False)
+
+    texts = [bank.warning({'hate': True}, 'en')['text'] for _ in range(6)]
+
+    assert set(texts) == set(bank.texts('hate', 'en'))
+    assert texts[:3] == texts[3:]
+
+
+def test_bank_survives_restart(tmp_path):
+    """A new bank over the same file reuses the stored warnings."""
+    bank, _, _ = make_bank(tmp_path)
+    bank.ensure(render_audio=False)
+
+    restarted, service, _ = make_bank(tmp_path)
+    assert restarted.ensure(render_audio=False)['generated'] == 0
+    assert service.generated == []
+    assert restarted.texts('sexual', 'en') == bank.texts('sexual', 'en')
+
+
+def test_empty_bank_falls_back_to_live_generation(tmp_path):
+    """Without any banked warning one is generated live and kept for next time."""
+    bank, service, _ = make_bank(tmp_path)
+
+    warning = bank.warning({'harassment': True}, 'en')
+
+    assert warning['source'] == 'live'
+    assert service.generated == [(('harassment',), 'en')]
+    assert bank.texts('harassment', 'en') == [warning['text']]
+    assert bank.warning({'harassment': True}, 'en')['source'] == 'bank'
+    assert bank.stats()['live_fallbacks'] == 1
+
+
+def test_missing_category_uses_general_warning(tmp_path):
+    """A category without warnings is answered with a general warning in the same language."""
+    bank, service, _ = make_bank(tmp_path)
+    bank._add(GENERAL_CATEGORY, 'zh', '这个话题不适合你哦。', service)
+
+    warning = bank.warning({'illicit': True}, 'zh')
+
+    assert warning['text'] == '这个话题不适合你哦。'
+    assert warning['source'] == 'bank'
+    assert service.generated == []
+
+
+def test_fallback_warning_is_not_stored(tmp_path):
+    """The fixed warning returned when generation fails is served but not banked."""
+    bank, service, _ = make_bank(tmp_path, service=FakeWarningService(fail=True))
+
+    assert bank.ensure(render_audio=False)['generated'] == 0
+    assert bank.warning({'sexual': True}, 'zh')['text'] == '默认警告'
+    assert bank.texts('sexual', 'zh') == []
+    assert not os.path.exists(bank.path)
+
+
+def test_corrupt_bank_file_is_rebuilt(tmp_path):
+    """A damaged bank file is ignored and replaced on the next ensure."""
+    (tmp_path / 'warning_bank.json').write_text('{not json', encoding='utf-8')
+    bank, _, _ = make_bank(tmp_path, variants=1)
+
+    expected = (len(CATEGORIES) + 1) * 2
+    assert bank.stats()['warnings'] == 0
+    assert bank.ensure(render_audio=False)['generated'] == expected
+    assert WarningBank(bank.path, variants=1, tts_cache=bank.tts_cache).stats()['warnings'] == expected
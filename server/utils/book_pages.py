@@ -0,0 +1,169 @@
+"""
+书籍分页工具函数
+提供书籍内容的拼接、分页遍历和按页范围截取功能
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def join_pages(page_texts: List[str]) -> Tuple[str, List[int]]:
+    """
+    把各页文本拼接为完整的书籍内容，并记录每页的起始偏移
+
+    每页文本后追加一个换行符，与原先逐页拼接的结果一致，但只做一次拼接。
+
+    参数:
+        page_texts (List[str]): 按页码排列的页面文本
+
+    返回:
+        Tuple[str, List[int]]: (书籍内容, 每页在内容中的起始偏移)
+
+    示例:
+        >>> content, offsets = join_pages(["Page one.", "Page two."])
+        >>> print(offsets)  # [0, 10]
+    """
+    offsets = []
+    position = 0
+    for text in page_texts:
+        offsets.append(position)
+        position += len(text) + 1
+    return "".join(text + "\n" for text in page_texts), offsets
+
+
+def get_page_count(book: Dict[str, Any]) -> int:
+    """
+    获取书籍的页数
+
+    参数:
+        book (Dict[str, Any]): 书籍记录
+
+    返回:
+        int: 页数，没有分页信息的旧记录视为一页
+    """
+    offsets = book.get("page_offsets")
+    if offsets is None:
+        return 1 if book.get("book_content") else 0
+    return len(offsets)
+
+
+def _page_bounds(book: Dict[str, Any], page_index: int) -> Tuple[int, int]:
+    """返回第page_index页（从0开始）在内容中的起止位置，不含页尾换行符"""
+    content = book.get("book_content", "")
+    offsets = book.get("page_offsets") or [0]
+    start = offsets[page_index]
+    end = offsets[page_index + 1] if page_index + 1 < len(offsets) else len(content)
+    if end > start and content[end - 1] == "\n":
+        end -= 1
+    return start, end
+
+
+def iter_pages(book: Dict[str, Any], start_page: int = 1,
+               end_page: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    逐页遍历书籍内容
+
+    参数:
+        book (Dict[str, Any]): 带有page_offsets的书籍记录
+        start_page (int): 起始页码（从1开始）
+        end_page (Optional[int]): 结束页码（包含），默认到最后一页
+
+    返回:
+        Iterator[Dict[str, Any]]: 每页一个字典，包含page_number和text
+
+    示例:
+        >>> for page in iter_pages(book):
+        >>>     print(page["page_number"], page["text"])
+    """
+    content = book.get("book_content", "")
+    start_page, end_page = clamp_page_range(book, start_page, end_page)
+    for page_number in range(start_page, end_page + 1):
+        start, end = _page_bounds(book, page_number - 1)
+        yield {"page_number": page_number, "text": content[start:end]}
+
+
+def parse_page_number(value: Any) -> Optional[int]:
+    """
+    把页码转换为整数
+
+    页码可能来自模型的函数调用参数，类型不一定是整数（例如"3"）。
+
+    参数:
+        value (Any): 页码
+
+    返回:
+        Optional[int]: 整数页码，为None或无法解析时返回None（视为未指定）
+
+    示例:
+        >>> parse_page_number("3")
+        3
+        >>> parse_page_number("first") is None
+        True
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def clamp_page_range(book: Dict[str, Any], start_page: Optional[Any] = None,
+                     end_page: Optional[Any] = None) -> Tuple[int, int]:
+    """
+    把页码范围限制在书籍的有效页码内
+
+    页码先经过parse_page_number转换，无法解析的页码视为未指定。
+
+    参数:
+        book (Dict[str, Any]): 书籍记录
+        start_page (Optional[Any]): 起始页码（从1开始），默认第一页
+        end_page (Optional[Any]): 结束页码（包含），默认最后一页
+
+    返回:
+        Tuple[int, int]: 有效的(起始页码, 结束页码)，书籍没有内容时返回(1, 0)
+    """
+    page_count = get_page_count(book)
+    start_page = parse_page_number(start_page)
+    end_page = parse_page_number(end_page)
+    start_page = max(1, start_page or 1)
+    end_page = page_count if end_page is None else min(end_page, page_count)
+    return start_page, end_page
+
+
+def slice_pages(book: Dict[str, Any], start_page: Optional[int] = None,
+                end_page: Optional[int] = None) -> Dict[str, Any]:
+    """
+    截取书籍中指定页码范围的内容
+
+    返回的新记录只包含所选页面的内容（每页后带换行符，与完整内容格式一致），
+    并附带页码范围和总页数，不包含page_offsets。
+
+    参数:
+        book (Dict[str, Any]): 带有page_offsets的书籍记录
+        start_page (Optional[int]): 起始页码（从1开始），默认第一页
+        end_page (Optional[int]): 结束页码（包含），默认最后一页
+
+    返回:
+        Dict[str, Any]: 书籍记录，包含book_content、start_page、end_page和page_count
+
+    示例:
+        >>> part = slice_pages(book, start_page=3, end_page=5)
+        >>> print(part["book_content"])
+    """
+    content = book.get("book_content", "")
+    start_page, end_page = clamp_page_range(book, start_page, end_page)
+
+    if start_page > end_page:
+        selected = ""
+    else:
+        start, _ = _page_bounds(book, start_page - 1)
+        offsets = book.get("page_offsets") or [0]
+        end = offsets[end_page] if end_page < len(offsets) else len(content)
+        selected = content[start:end]
+
+    result = {key: value for key, value in book.items()
+              if key not in ("book_content", "page_offsets")}
+    result.update({
+        "book_content": selected,
+        "start_page": start_page,
+        "end_page": end_page,
+        "page_count": get_page_count(book)
+    })
+    return result
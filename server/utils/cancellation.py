@@ -0,0 +1,134 @@
+"""
+取消工具
+在请求处理链路中传递取消信号，并统计取消后节省的工作量
+"""
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class Cancelled(Exception):
+    """请求已被取消（例如客户端断开连接）"""
+
+
+class CancellationToken:
+    """
+    取消令牌
+
+    由请求的发起方持有并调用cancel，执行方通过is_cancelled或raise_if_cancelled在阶段之间检查，
+    或通过add_callback在取消时立即中断阻塞的等待。令牌只能被取消一次。
+
+    属性:
+        reason (Optional[str]): 取消原因，未取消时为None
+    """
+
+    def __init__(self):
+        """
+        初始化取消令牌
+
+        示例:
+            >>> token = CancellationToken()
+            >>> token.add_callback(lambda: stream.close())
+            >>> token.cancel("client disconnected")
+        """
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def is_cancelled(self) -> bool:
+        """是否已取消"""
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """
+        取消并依次调用已登记的回调函数
+
+        参数:
+            reason (str): 取消原因
+
+        返回:
+            bool: 本次调用是否真正取消了令牌（已取消时返回False）
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ 取消回调执行失败: {str(e)}")
+        return True
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        登记取消时调用的函数，令牌已取消时立即调用
+
+        参数:
+            callback (Callable[[], None]): 回调函数，在调用cancel的线程中执行
+
+        返回:
+            Callable[[], None]: 注销该回调的函数，阶段结束后应调用它
+
+        示例:
+            >>> unregister = token.add_callback(abort)
+            >>> try:
+            >>>     wait_for_results()
+            >>> finally:
+            >>>     unregister()
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self) -> None:
+        """
+        已取消时抛出Cancelled
+
+        异常:
+            Cancelled: 令牌已取消时抛出
+        """
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+
+# 取消后节省的工作量统计
+_metrics = {"cancelled_requests": 0, "runs_cancelled": 0, "tool_calls_aborted": 0, "tts_skipped": 0}
+_metrics_lock = threading.Lock()
+
+
+def record_saved(name: str, amount: int = 1) -> None:
+    """
+    记录因取消而省去的工作
+
+    参数:
+        name (str): 统计项（cancelled_requests、runs_cancelled、tool_calls_aborted或tts_skipped）
+        amount (int): 数量
+    """
+    with _metrics_lock:
+        _metrics[name] = _metrics.get(name, 0) + amount
+
+
+def cancellation_stats() -> Dict[str, int]:
+    """
+    获取取消统计
+
+    返回:
+        Dict[str, int]: 被取消的请求数、在服务端取消的运行数、中止的工具调用数和跳过的语音合成数
+
+    示例:
+        >>> print(cancellation_stats()["runs_cancelled"])
+    """
+    with _metrics_lock:
+        return dict(_metrics)
@@ -0,0 +1,309 @@
+"""
+磁盘缓存工具
+提供带容量上限、LRU淘汰和TTL过期的本地文件缓存
+"""
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from utils.file_utils import ensure_directory_exists
+
+
+class DiskLRUCache:
+    """
+    基于本地文件的LRU缓存
+
+    每个条目保存为缓存目录下的一个独立文件，文件名由键的SHA-256摘要生成，
+    因此任意字符串都可以作为键。内存中只保存条目的大小和写入时间，
+    启动时通过扫描目录恢复索引，多个进程可以共享同一个缓存目录。
+
+    属性:
+        directory (str): 缓存目录
+        max_bytes (int): 缓存占用的最大字节数，0表示不限制
+        ttl_seconds (float): 条目的有效期（秒），0表示永不过期
+        suffix (str): 缓存文件后缀
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 0,
+                 ttl_seconds: float = 0, suffix: str = ".bin"):
+        """
+        初始化磁盘缓存
+
+        参数:
+            directory (str): 缓存目录，不存在时自动创建
+            max_bytes (int): 缓存占用的最大字节数，0表示不限制
+            ttl_seconds (float): 条目的有效期（秒），0表示永不过期
+            suffix (str): 缓存文件后缀
+
+        示例:
+            >>> cache = DiskLRUCache("/tmp/my_cache", max_bytes=50 * 1024 * 1024, ttl_seconds=3600)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.suffix = suffix
+
+        self._lock = threading.Lock()
+        # 摘要 -> (文件大小, 写入时间)，按访问顺序排列，最近访问的在末尾
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+
+        ensure_directory_exists(self.directory)
+        self._load_index()
+
+    def _digest(self, key: str) -> str:
+        """计算键对应的文件名摘要"""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _path_for_digest(self, digest: str) -> str:
+        """根据摘要获取缓存文件路径"""
+        return os.path.join(self.directory, digest + self.suffix)
+
+    def path_for(self, key: str) -> str:
+        """
+        获取键对应的缓存文件路径（文件不一定存在）
+
+        参数:
+            key (str): 缓存键
+
+        返回:
+            str: 缓存文件的完整路径
+        """
+        return self._path_for_digest(self._digest(key))
+
+    def _load_index(self) -> None:
+        """扫描缓存目录，按文件修改时间恢复LRU顺序"""
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name[:-len(self.suffix)], stat.st_size))
+
+        for mtime, digest, size in sorted(found):
+            self._entries[digest] = (size, mtime)
+            self._total_bytes += size
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        """判断条目是否已过期"""
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def _remove_locked(self, digest: str) -> None:
+        """删除条目及其文件，调用方需持有锁"""
+        size, _ = self._entries.pop(digest, (0, 0))
+        self._total_bytes -= size
+        try:
+            os.unlink(self._path_for_digest(digest))
+        except OSError:
+            pass
+
+    def _adopt_locked(self, digest: str) -> bool:
+        """把其他进程写入的缓存文件纳入本进程的索引，调用方需持有锁"""
+        try:
+            stat = os.stat(self._path_for_digest(digest))
+        except OSError:
+            return False
+        self._entries[digest] = (stat.st_size, stat.st_mtime)
+        self._total_bytes += stat.st_size
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        读取缓存条目
+
+        参数:
+            key (str): 缓存键
+
+        返回:
+            Optional[bytes]: 缓存的数据，未命中或已过期时返回None
+
+        示例:
+            >>> data = cache.get("12550-1")
+            >>> if data is None:
+            >>>     print("缓存未命中")
+        """
+        digest = self._digest(key)
+        now = time.time()
+
+        with self._lock:
+            if digest not in self._entries and not self._adopt_locked(digest):
+                self._misses += 1
+                return None
+
+            _, stored_at = self._entries[digest]
+            if self._is_expired(stored_at, now):
+                self._remove_locked(digest)
+                self._expired += 1
+                self._misses += 1
+                return None
+
+            try:
+                with open(self._path_for_digest(digest), "rb") as f:
+                    data = f.read()
+            except OSError:
+                # 文件被其他进程淘汰，同步索引
+                size, _ = self._entries.pop(digest)
+                self._total_bytes -= size
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(digest)
+            self._hits += 1
+            return data
+
+    def touch(self, key: str) -> bool:
+        """
+        检查条目是否有效并把它标记为最近使用，不读取文件内容，计入命中统计
+
+        适用于调用方只需要文件路径（例如直接把文件发送给客户端）的场景。
+
+        参数:
+            key (str): 缓存键
+
+        返回:
+            bool: 条目存在且有效时返回True
+
+        示例:
+            >>> if cache.touch(key):
+            >>>     return send_file(cache.path_for(key))
+        """
+        digest = self._digest(key)
+        now = time.time()
+
+        with self._lock:
+            if digest not in self._entries and not self._adopt_locked(digest):
+                self._misses += 1
+                return False
+
+            _, stored_at = self._entries[digest]
+            if self._is_expired(stored_at, now):
+                self._remove_locked(digest)
+                self._expired += 1
+                self._misses += 1
+                return False
+
+            self._entries.move_to_end(digest)
+            self._hits += 1
+            return True
+
+    def set(self, key: str, data: bytes) -> str:
+        """
+        写入缓存条目，必要时淘汰最久未使用的条目
+
+        写入通过临时文件加原子重命名完成，读者不会看到写了一半的文件。
+
+        参数:
+            key (str): 缓存键
+            data (bytes): 要缓存的数据
+
+        返回:
+            str: 缓存文件路径
+
+        示例:
+            >>> cache.set("12550-1", b"...")
+        """
+        digest = self._digest(key)
+        path = self._path_for_digest(digest)
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            old_size, _ = self._entries.pop(digest, (0, 0))
+            self._total_bytes -= old_size
+            self._entries[digest] = (len(data), time.time())
+            self._total_bytes += len(data)
+            self._evict_locked(keep=digest)
+
+        return path
+
+    def _evict_locked(self, keep: Optional[str] = None) -> None:
+        """按LRU顺序淘汰条目直到满足容量上限，调用方需持有锁"""
+        if self.max_bytes <= 0:
+            return
+        while self._total_bytes > self.max_bytes and self._entries:
+            digest = next(iter(self._entries))
+            if digest == keep:
+                # 单个条目超过上限时仍然保留最新写入的条目
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(digest)
+                continue
+            self._remove_locked(digest)
+            self._evictions += 1
+
+    def contains(self, key: str) -> bool:
+        """
+        检查键是否存在且未过期，不影响命中统计和LRU顺序
+
+        参数:
+            key (str): 缓存键
+
+        返回:
+            bool: 条目存在且有效时返回True
+        """
+        digest = self._digest(key)
+        with self._lock:
+            if digest not in self._entries and not self._adopt_locked(digest):
+                return False
+            _, stored_at = self._entries[digest]
+            return not self._is_expired(stored_at, time.time())
+
+    def delete(self, key: str) -> None:
+        """
+        删除缓存条目
+
+        参数:
+            key (str): 缓存键
+        """
+        with self._lock:
+            self._remove_locked(self._digest(key))
+
+    def clear(self) -> None:
+        """清空所有缓存条目"""
+        with self._lock:
+            for digest in list(self._entries):
+                self._remove_locked(digest)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        返回:
+            Dict[str, Any]: 包含命中、未命中、过期、淘汰次数以及当前条目数和字节数的字典
+
+        示例:
+            >>> stats = cache.stats()
+            >>> print(f"命中率: {stats['hit_rate']:.0%}")
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -136,6 +136,29 @@ def ensure_directory_exists(directory_path: str) -> bool:
         print(f"创建目录错误: {str(e)}")
         return False
 
+def write_file_atomic(path: str, data: str) -> None:
+    """
+    原子地写入文本文件：先写入同目录下的临时文件，再重命名覆盖目标文件
+
+    读者要么看到旧文件，要么看到完整的新文件，不会读到写了一半的内容。
+
+    参数:
+        path (str): 目标文件路径
+        data (str): 文件内容
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
 def is_valid_audio_file(file_obj: BinaryIO, allowed_formats: List[str]) -> bool:
     """
     检查文件是否为有效的音频文件
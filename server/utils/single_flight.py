@@ -0,0 +1,139 @@
+"""
+请求合并工具
+同一个key的并发请求共享一次正在进行的调用（single-flight）
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class InFlightCall:
+    """
+    一次正在进行的调用，等待者通过wait获取结果
+
+    属性:
+        waiters (int): 除发起者外等待该调用结果的请求数
+    """
+
+    __slots__ = ("_event", "_result", "_error", "waiters")
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._error = None
+        self.waiters = 0
+
+    def wait(self) -> Any:
+        """
+        等待调用完成并返回结果，调用失败时抛出同一个异常
+
+        返回:
+            Any: 调用结果
+        """
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class SingleFlight:
+    """
+    请求合并器
+
+    第一个请求某个key的线程成为发起者并执行实际的调用，调用完成前到达的相同key的请求
+    不会重复执行，而是等待并共享发起者的结果（或异常）。调用完成后key被移除，
+    之后的请求会重新执行，因此这里不缓存任何结果。
+
+    除了do之外，还提供begin/finish，便于批量查询时只为尚未在进行中的key发起一次合并查询。
+    """
+
+    def __init__(self):
+        """
+        初始化请求合并器
+
+        示例:
+            >>> flight = SingleFlight()
+            >>> book, shared = flight.do("12550-1", load_book, "12550-1")
+        """
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, InFlightCall] = {}
+        self._metrics = {"calls": 0, "coalesced": 0}
+
+    def begin(self, key: Hashable) -> Tuple[InFlightCall, bool]:
+        """
+        登记对key的请求
+
+        参数:
+            key (Hashable): 请求的key
+
+        返回:
+            Tuple[InFlightCall, bool]: (调用, 是否为发起者)。发起者必须在完成后调用finish，
+                                       非发起者调用call.wait()获取结果
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._metrics["coalesced"] += 1
+                return call, False
+            call = InFlightCall()
+            self._calls[key] = call
+            self._metrics["calls"] += 1
+            return call, True
+
+    def finish(self, key: Hashable, call: InFlightCall, result: Any = None,
+               error: Optional[BaseException] = None) -> None:
+        """
+        发起者完成调用，唤醒所有等待者
+
+        参数:
+            key (Hashable): 请求的key
+            call (InFlightCall): begin返回的调用
+            result (Any): 调用结果
+            error (Optional[BaseException]): 调用抛出的异常，等待者会收到同一个异常
+        """
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call._result = result
+        call._error = error
+        call._event.set()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, bool]:
+        """
+        执行fn，如果相同key的调用正在进行则等待并共享其结果
+
+        参数:
+            key (Hashable): 请求的key
+            fn (Callable[..., Any]): 实际执行的函数
+            *args: 传给fn的位置参数
+            **kwargs: 传给fn的关键字参数
+
+        返回:
+            Tuple[Any, bool]: (调用结果, 是否共享了其他请求的结果)
+
+        示例:
+            >>> book, shared = flight.do(book_id, data_service._load_book, book_id)
+        """
+        call, leader = self.begin(key)
+        if not leader:
+            return call.wait(), True
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result, False
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计信息
+
+        返回:
+            Dict[str, int]: 包含calls（实际执行次数）、coalesced（被合并的请求数）和in_flight的字典
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["in_flight"] = len(self._calls)
+        return metrics
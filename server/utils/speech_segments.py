@@ -0,0 +1,125 @@
+"""
+语音分段工具函数
+把长文本按句子切分为适合逐段合成语音的片段
+"""
+import re
+from typing import List
+
+# OpenAI TTS单次请求允许的最大输入字符数
+MAX_TTS_INPUT_CHARS = 4096
+
+# 一个句子：以中日韩句末标点、英文句末标点（后接空白或结尾）或换行结束，句末的引号和括号归入本句
+_SENTENCE_PATTERN = re.compile(
+    r".+?(?:[。！？；…]+[”’」』）)\"']*|[.!?;]+[”’\"')\]]*(?=\s|$)|\n+|$)",
+    re.S
+)
+
+# 句子过长时的次级切分位置：逗号、顿号、冒号和空白
+_CLAUSE_PATTERN = re.compile(r".+?(?:[，、：,:]+\s*|\s+|$)", re.S)
+
+# 后面的句点不表示句子结束的常见英文缩写（小写，不含句点）；etc.经常出现在句末，不在其中
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "ft", "vs", "no", "vol", "fig",
+    "capt", "gen", "lt", "sgt", "col", "rev", "hon", "gov", "pres", "inc", "ltd", "co", "corp",
+    "jan", "feb", "mar", "apr", "aug", "sept", "sep", "oct", "nov", "dec", "e.g", "i.e", "a.m", "p.m",
+}
+
+
+def _ends_with_abbreviation(sentence: str) -> bool:
+    """判断句子是否以缩写或单个大写字母的姓名首字母（如Mr.、J.）结束，而不是真正的句末"""
+    if not sentence.endswith("."):
+        return False
+    word = sentence.rsplit(None, 1)[-1][:-1].lstrip("\"'“‘([")
+    return word.lower() in _ABBREVIATIONS or (len(word) == 1 and word.isupper())
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    按句末标点和换行把文本切分为句子
+
+    以常见缩写或姓名首字母结尾的片段（如"Mr."、"J."）与下一句合并，不单独成句。
+
+    参数:
+        text (str): 文本
+
+    返回:
+        List[str]: 去掉首尾空白后的非空句子
+
+    示例:
+        >>> split_sentences("你好！今天读什么书？Mr. Smith reads. OK")
+        ['你好！', '今天读什么书？', 'Mr. Smith reads.', 'OK']
+    """
+    sentences = []
+    for match in _SENTENCE_PATTERN.finditer(text):
+        sentence = match.group(0).strip()
+        if not sentence:
+            continue
+        if sentences and _ends_with_abbreviation(sentences[-1]):
+            sentences[-1] += " " + sentence
+        else:
+            sentences.append(sentence)
+    return sentences
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """把超过max_chars的句子按分句切开，仍然过长的部分按长度截断"""
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    pieces = []
+    current = ""
+    for match in _CLAUSE_PATTERN.finditer(sentence):
+        clause = match.group(0)
+        if not clause:
+            continue
+        if current and len(current) + len(clause) > max_chars:
+            pieces.append(current)
+            current = ""
+        while len(clause) > max_chars:
+            pieces.append(clause[:max_chars])
+            clause = clause[max_chars:]
+        current += clause
+    if current:
+        pieces.append(current)
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+
+def split_speech_segments(text: str, target_chars: int = 300,
+                          max_chars: int = MAX_TTS_INPUT_CHARS) -> List[str]:
+    """
+    把文本切分为逐段合成语音的片段
+
+    第一段只包含第一个句子，让播放尽早开始；之后的句子合并到约target_chars个字符一段，
+    减少请求次数。任何一段都不超过max_chars，超长的句子在逗号或空白处切开。
+
+    参数:
+        text (str): 文本
+        target_chars (int): 合并后每段的目标字符数
+        max_chars (int): 每段的最大字符数，默认为TTS接口的输入上限
+
+    返回:
+        List[str]: 按顺序排列的片段，文本为空时返回空列表
+
+    示例:
+        >>> split_speech_segments("第一句。第二句。第三句。", target_chars=10)
+        ['第一句。', '第二句。第三句。']
+    """
+    target_chars = min(target_chars, max_chars)
+    sentences = []
+    for sentence in split_sentences(text):
+        sentences.extend(_split_long(sentence, max_chars))
+    if not sentences:
+        return []
+
+    segments = [sentences[0]]
+    current = ""
+    for sentence in sentences[1:]:
+        # 英文句子之间保留空格，中文句子直接相连
+        separator = " " if current and sentence[0].isascii() and current[-1].isascii() else ""
+        if current and len(current) + len(separator) + len(sentence) > target_chars:
+            segments.append(current)
+            current, separator = "", ""
+        current += separator + sentence
+    if current:
+        segments.append(current)
+    return segments
@@ -0,0 +1,86 @@
+"""
+SSE工具
+在后台线程中生成事件流，空闲时发送心跳，以便及时发现客户端断开
+"""
+import os
+import queue
+import threading
+from contextlib import nullcontext
+from typing import Any, Iterator, Optional
+
+from utils.cancellation import CancellationToken, record_saved
+
+DEFAULT_HEARTBEAT_SECONDS = 3.0
+
+# SSE注释行，浏览器的EventSource会忽略它
+HEARTBEAT = ": keepalive\n\n"
+
+_END = object()
+
+
+def stream_until_disconnect(events: Iterator[str], token: CancellationToken,
+                            app: Any = None, heartbeat: Optional[float] = None) -> Iterator[str]:
+    """
+    转发事件流，客户端断开时取消令牌（生成器函数）
+
+    WSGI服务器只有在写入失败时才知道客户端已经断开，随后关闭响应生成器。
+    事件流在执行函数调用等阻塞阶段可能很久不产生事件，因此这里在后台线程中消费events，
+    没有事件时每隔heartbeat秒发送一次心跳注释；写入失败导致本生成器被关闭时取消token，
+    后台线程中的运行、函数调用和语音合成据此尽快停止。
+
+    参数:
+        events (Iterator[str]): 已格式化的SSE事件
+        token (CancellationToken): 客户端断开时取消的令牌，events的生产者应检查它
+        app (Any): Flask应用，提供时后台线程在其应用上下文中消费events
+        heartbeat (Optional[float]): 心跳间隔（秒），默认从环境变量SSE_HEARTBEAT_SECONDS获取
+
+    返回:
+        Iterator[str]: 事件和心跳
+
+    示例:
+        >>> token = CancellationToken()
+        >>> events = assistant_service.chat_stream(message, cancel_token=token)
+        >>> return Response(stream_until_disconnect(events, token, current_app._get_current_object()))
+    """
+    if heartbeat is None:
+        heartbeat = float(os.getenv("SSE_HEARTBEAT_SECONDS", DEFAULT_HEARTBEAT_SECONDS))
+    channel: "queue.Queue[Any]" = queue.Queue()
+
+    def produce():
+        try:
+            with app.app_context() if app is not None else nullcontext():
+                try:
+                    for event in events:
+                        if token.is_cancelled:
+                            break
+                        channel.put(event)
+                finally:
+                    close = getattr(events, "close", None)
+                    if close is not None:
+                        close()
+        except BaseException as e:
+            channel.put(e)
+        finally:
+            channel.put(_END)
+
+    threading.Thread(target=produce, name="sse-stream", daemon=True).start()
+
+    finished = False
+    try:
+        while True:
+            try:
+                item = channel.get(timeout=heartbeat)
+            except queue.Empty:
+                yield HEARTBEAT
+                continue
+            if item is _END:
+                finished = True
+                return
+            if isinstance(item, BaseException):
+                finished = True
+                raise item
+            yield item
+    finally:
+        if not finished and token.cancel("client disconnected"):
+            record_saved("cancelled_requests")
+            print("🔌 客户端已断开，取消进行中的请求")